@@ -20,12 +20,12 @@ from backend.tools.market_data import market_data_toolkit
 from backend.tools.risk_management import risk_management_toolkit
 from backend.tools.traffic_rules import TrafficRuleToolkit
 from backend.khala_integration import KhalaMemoryToolkit
-from agno.tools.duckduckgo import DuckDuckGoTools
+from backend.tools.web_search import DuckDuckGoTools
 from backend.tools.sleep_time import sleep_time_toolkit
 
 # Import storage and config
-from backend.storage.sqlite import SqliteStorage
 from backend.storage.base import Storage
+from backend.storage.registry import get_storage as get_registered_storage
 from backend.config import Config
 from backend.factory import create_agent
 from backend.agents.researchers import get_bull_researcher, get_bear_researcher, get_debate_coordinator
@@ -35,23 +35,12 @@ from backend.agentspec.wrapper import apply_enforcement_to_toolkit
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-# Singleton storage instance
-_storage = None
-
 def get_storage() -> Storage:
     """
-    Returns the singleton storage instance.
-    Initializes safely using SQLAlchemy pooling.
+    Returns the process-wide storage instance for STORAGE_TYPE / STORAGE_URL.
+    Shared with the toolkits through the storage registry.
     """
-    global _storage
-    if _storage is None:
-        storage_type = os.getenv("STORAGE_TYPE", "sqlite")
-        storage_url = os.getenv("STORAGE_URL", "sqlite.db")
-        if storage_type == "sqlite":
-            _storage = SqliteStorage(storage_url)
-        else:
-            raise ValueError(f"Unsupported storage type: {storage_type}")
-    return _storage
+    return get_registered_storage()
 
 # Initialize storage
 storage = get_storage()
@@ -0,0 +1,423 @@
+"""
+Record/replay of outbound HTTP and RPC traffic ("cassettes").
+
+Benchmarks and regression runs of the agent pipeline used to depend on live
+CoinGecko, Etherscan, Rugcheck, news and RPC endpoints. With cassettes enabled,
+every shared ``httpx`` client (``backend.http_client``) is given a
+``CassetteTransport``, and web3 JSON-RPC goes through those clients too
+(``backend.rpc``), so all of that traffic passes one interception point:
+
+* ``record`` sends every request upstream and stores the response;
+* ``replay`` serves stored responses only and never touches the network; a
+  request that was not recorded raises ``CassetteMiss``;
+* ``auto`` replays what is stored and records the rest.
+
+Responses live in one SQLite file, keyed by a request fingerprint: method, URL
+with sorted query parameters minus credentials, and body. Credentials in the
+URL path (RPC providers put the API key there, e.g. Infura's ``/v3/<key>``) are
+replaced by ``REDACTED`` in both the fingerprint and the stored URL. JSON bodies are
+canonicalized and JSON-RPC ``id``s are ignored (web3 numbers its requests), and
+the replayed response gets the caller's id back. Bodies are stored decoded and
+zlib-compressed. A request made several times keeps one response per occurrence
+(``seq``); replay hands them out in the same order and repeats the last one.
+
+Replays can simulate upstream latency: none, the recorded time, a fixed delay or
+a range. Range delays are derived from the fingerprint, so runs are repeatable.
+Rate limiting is skipped while replaying, since nothing reaches the upstream.
+
+Clients that do not use ``httpx`` (the DuckDuckGo search library) are recorded
+at call level through ``cassette_call``.
+
+Environment:
+
+    HTTP_CASSETTE_MODE        off (default), record, replay or auto
+    HTTP_CASSETTE_PATH        cassette file (default cassettes/http.sqlite)
+    HTTP_CASSETTE_LATENCY     replay delay: 0 (default), "recorded", milliseconds ("120")
+                              or a range ("50-200")
+    HTTP_CASSETTE_IGNORE      extra query parameters left out of fingerprints, comma-separated
+    HTTP_CASSETTE_REDACT      extra URL patterns to redact, whitespace-separated regexes whose
+                              first group is the secret, e.g. "node.example.com/key/([^/]+)"
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Pattern, Tuple, Union
+
+import httpx
+
+MODES = ("off", "record", "replay", "auto")
+
+# Credentials never belong in a fingerprint or a cassette.
+IGNORED_PARAMS = frozenset({"apikey", "api_key", "key", "token", "access_token", "x_cg_demo_api_key", "x_cg_pro_api_key"})
+# Path credentials of known RPC providers; group 1 of each pattern is the secret.
+REDACTED_PATHS: Tuple[Pattern[str], ...] = tuple(
+    re.compile(pattern)
+    for pattern in (
+        r"\.infura\.io/v3/([^/?#]+)",
+        r"\.alchemy\.com/v2/([^/?#]+)",
+        r"\.alchemyapi\.io/v2/([^/?#]+)",
+        r"\.quiknode\.pro/([^/?#]+)",
+        r"//rpc\.ankr\.com/[^/?#]+/([^/?#]+)",
+    )
+)
+# Headers that describe the wire encoding of the original response, not its body.
+DROPPED_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive", "set-cookie"})
+
+
+class CassetteMiss(httpx.RequestError):
+    """Replay mode found no recorded response for a request."""
+
+
+class Recorded(NamedTuple):
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    elapsed_ms: float
+
+
+def _canonical_json(body: bytes) -> Optional[bytes]:
+    try:
+        payload = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    def strip_ids(value: Any) -> Any:
+        if isinstance(value, list):
+            return [strip_ids(v) for v in value]
+        if isinstance(value, dict) and "jsonrpc" in value:
+            return {k: v for k, v in value.items() if k != "id"}
+        return value
+
+    return json.dumps(strip_ids(payload), sort_keys=True, separators=(",", ":")).encode()
+
+
+def redact_path(url: str, redact: Tuple[Pattern[str], ...] = REDACTED_PATHS) -> str:
+    """``url`` with the first group of every matching ``redact`` pattern replaced by ``REDACTED``."""
+
+    def replace(match: "re.Match[str]") -> str:
+        start, end = match.start(1) - match.start(), match.end(1) - match.start()
+        return match.group(0)[:start] + "REDACTED" + match.group(0)[end:]
+
+    for pattern in redact:
+        url = pattern.sub(replace, url)
+    return url
+
+
+def fingerprint(
+    method: str,
+    url: str,
+    body: bytes = b"",
+    ignore: frozenset = IGNORED_PARAMS,
+    redact: Tuple[Pattern[str], ...] = REDACTED_PATHS,
+) -> str:
+    """Stable key of a request; see the module docstring for what it covers."""
+    parsed = httpx.URL(url)
+    params = sorted((k, v) for k, v in parsed.params.multi_items() if k.lower() not in ignore)
+    target = redact_path(str(parsed.copy_with(query=None, fragment=None)), redact)
+    digest = hashlib.sha256()
+    digest.update(method.upper().encode())
+    digest.update(b" " + target.encode() + b"?")
+    digest.update(json.dumps(params).encode())
+    if body:
+        digest.update(b"\n" + (_canonical_json(body) or body))
+    return digest.hexdigest()[:32]
+
+
+def parse_latency(spec: str) -> Callable[[str, Recorded], float]:
+    """Seconds to wait before serving a replay, from ``HTTP_CASSETTE_LATENCY``."""
+    spec = (spec or "0").strip().lower()
+    if spec == "recorded":
+        return lambda fp, recorded: recorded.elapsed_ms / 1000.0
+    low, _, high = spec.partition("-")
+    low_s = float(low) / 1000.0
+    high_s = float(high) / 1000.0 if high else low_s
+    if high_s < low_s:
+        raise ValueError(f"Invalid HTTP_CASSETTE_LATENCY range: {spec}")
+    if high_s == low_s:
+        return lambda fp, recorded: low_s
+    # Position in the range comes from the fingerprint, so every run waits the same.
+    return lambda fp, recorded: low_s + (high_s - low_s) * (int(fp[:8], 16) / 0xFFFFFFFF)
+
+
+class CassetteStore:
+    """Recorded responses in a SQLite file, one row per (fingerprint, occurrence)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "fingerprint TEXT NOT NULL, seq INTEGER NOT NULL, method TEXT NOT NULL, url TEXT NOT NULL, "
+            "status INTEGER NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL, elapsed_ms REAL NOT NULL, "
+            "recorded_at REAL NOT NULL, PRIMARY KEY (fingerprint, seq))"
+        )
+
+    def get(self, fp: str, seq: int) -> Optional[Recorded]:
+        """Occurrence ``seq`` of ``fp``, or the last one recorded before it."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, headers, body, elapsed_ms FROM responses WHERE fingerprint = ? AND seq <= ? "
+                "ORDER BY seq DESC LIMIT 1",
+                (fp, seq),
+            ).fetchone()
+        if row is None:
+            return None
+        status, headers, body, elapsed_ms = row
+        return Recorded(status, [tuple(h) for h in json.loads(headers)], zlib.decompress(body), elapsed_ms)
+
+    def put(self, fp: str, seq: int, method: str, url: str, recorded: Recorded) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    fp, seq, method, url, recorded.status, json.dumps(recorded.headers),
+                    zlib.compress(recorded.body, 6), recorded.elapsed_ms, time.time(),
+                ),
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _redacted(url: httpx.URL, ignore: frozenset, redact: Tuple[Pattern[str], ...]) -> str:
+    params = [(k, v) for k, v in url.params.multi_items() if k.lower() not in ignore]
+    return redact_path(str(url.copy_with(params=params)) if params else str(url.copy_with(query=None)), redact)
+
+
+class Cassette:
+    """
+    Mode, store and per-fingerprint occurrence counters. The counters make a
+    replay hand out responses in recording order; ``rewind()`` restarts them.
+    """
+
+    def __init__(self, store: CassetteStore, mode: str = "replay", latency: str = "0",
+                 ignore: frozenset = IGNORED_PARAMS, redact: Tuple[Pattern[str], ...] = REDACTED_PATHS):
+        if mode not in MODES or mode == "off":
+            raise ValueError(f"Invalid cassette mode: {mode}")
+        self.store = store
+        self.mode = mode
+        self.delay = parse_latency(latency)
+        self.ignore = ignore
+        self.redact = redact
+        self.hits = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._seq: Dict[str, int] = {}
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def rewind(self) -> None:
+        with self._lock:
+            self._seq.clear()
+
+    def _next(self, fp: str) -> int:
+        with self._lock:
+            seq = self._seq.get(fp, 0)
+            self._seq[fp] = seq + 1
+            return seq
+
+    def key(self, request: httpx.Request) -> Tuple[str, int]:
+        fp = fingerprint(request.method, str(request.url), request.content, self.ignore, self.redact)
+        return fp, self._next(fp)
+
+    def lookup(self, request: httpx.Request, fp: str, seq: int) -> Optional[Recorded]:
+        if self.mode == "record":
+            return None
+        recorded = self.store.get(fp, seq)
+        if recorded is None and self.mode == "replay":
+            raise CassetteMiss(f"No recorded response for {request.method} {_redacted(request.url, self.ignore, self.redact)}", request=request)
+        if recorded is not None:
+            self.hits += 1
+        return recorded
+
+    def save(self, request: httpx.Request, fp: str, seq: int, response: httpx.Response, elapsed_ms: float) -> Recorded:
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in DROPPED_HEADERS]
+        recorded = Recorded(response.status_code, headers, response.content, elapsed_ms)
+        self.store.put(fp, seq, request.method, _redacted(request.url, self.ignore, self.redact), recorded)
+        self.recorded += 1
+        return recorded
+
+    @staticmethod
+    def response(request: httpx.Request, recorded: Recorded) -> httpx.Response:
+        body = recorded.body
+        if request.content:
+            body = _restore_rpc_ids(request.content, body)
+        return httpx.Response(recorded.status, headers=recorded.headers, content=body, request=request)
+
+
+def _restore_rpc_ids(request_body: bytes, body: bytes) -> bytes:
+    """Gives a replayed JSON-RPC response the ids of the request being answered."""
+    try:
+        request = json.loads(request_body)
+        response = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return body
+    if isinstance(request, dict) and isinstance(response, dict) and "jsonrpc" in request and "id" in request:
+        response["id"] = request["id"]
+    elif isinstance(request, list) and isinstance(response, list) and len(request) == len(response):
+        # Batch answers are matched positionally to the recorded (sorted) order.
+        for req, resp in zip(request, response):
+            if isinstance(req, dict) and isinstance(resp, dict) and "id" in req:
+                resp["id"] = req["id"]
+    else:
+        return body
+    return json.dumps(response).encode()
+
+
+class CassetteTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, inner: httpx.BaseTransport):
+        self.cassette = cassette
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        fp, seq = self.cassette.key(request)
+        recorded = self.cassette.lookup(request, fp, seq)
+        if recorded is not None:
+            time.sleep(self.cassette.delay(fp, recorded))
+        else:
+            start = time.perf_counter()
+            response = self.inner.handle_request(request)
+            try:
+                response.read()
+            finally:
+                response.close()
+            recorded = self.cassette.save(request, fp, seq, response, (time.perf_counter() - start) * 1000.0)
+        return self.cassette.response(request, recorded)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, inner: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        fp, seq = self.cassette.key(request)
+        # The store is a blocking SQLite file; keep its reads and writes off the event loop.
+        recorded = await asyncio.to_thread(self.cassette.lookup, request, fp, seq)
+        if recorded is not None:
+            await asyncio.sleep(self.cassette.delay(fp, recorded))
+        else:
+            start = time.perf_counter()
+            response = await self.inner.handle_async_request(request)
+            try:
+                await response.aread()
+            finally:
+                await response.aclose()
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            recorded = await asyncio.to_thread(self.cassette.save, request, fp, seq, response, elapsed_ms)
+        return self.cassette.response(request, recorded)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+def cassette_call(namespace: str, params: Dict[str, Any], call: Callable[[], Any]) -> Any:
+    """
+    ``call()`` recorded at call level, for clients that bypass ``httpx``. The
+    result must be JSON-serializable; it is keyed by ``namespace`` and ``params``.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return call()
+    request = httpx.Request("CALL", f"call://{namespace}", content=json.dumps(params, sort_keys=True).encode())
+    fp, seq = cassette.key(request)
+    recorded = cassette.lookup(request, fp, seq)
+    if recorded is not None:
+        time.sleep(cassette.delay(fp, recorded))
+        return json.loads(recorded.body)
+    start = time.perf_counter()
+    result = call()
+    response = httpx.Response(200, content=json.dumps(result).encode())
+    cassette.save(request, fp, seq, response, (time.perf_counter() - start) * 1000.0)
+    return result
+
+
+_cassette: Optional[Cassette] = None
+_cassette_config: Optional[Tuple[str, str, str, str, str]] = None
+_lock = threading.Lock()
+
+
+def cassette_mode() -> str:
+    mode = os.getenv("HTTP_CASSETTE_MODE", "off").strip().lower() or "off"
+    if mode not in MODES:
+        raise ValueError(f"Invalid HTTP_CASSETTE_MODE: {mode} (expected one of {', '.join(MODES)})")
+    return mode
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The process-wide cassette, or None when ``HTTP_CASSETTE_MODE`` is off."""
+    global _cassette, _cassette_config
+    mode = cassette_mode()
+    if mode == "off":
+        return None
+    config = (
+        mode,
+        os.getenv("HTTP_CASSETTE_PATH", "cassettes/http.sqlite"),
+        os.getenv("HTTP_CASSETTE_LATENCY", "0"),
+        os.getenv("HTTP_CASSETTE_IGNORE", ""),
+        os.getenv("HTTP_CASSETTE_REDACT", ""),
+    )
+    with _lock:
+        if _cassette is None or _cassette_config != config:
+            if _cassette is not None:
+                _cassette.store.close()
+            extra = frozenset(p.strip().lower() for p in config[3].split(",") if p.strip())
+            redact = REDACTED_PATHS + tuple(re.compile(pattern) for pattern in config[4].split())
+            if any(pattern.groups < 1 for pattern in redact):
+                raise ValueError("HTTP_CASSETTE_REDACT patterns need a group around the secret")
+            _cassette = Cassette(CassetteStore(config[1]), mode, config[2], IGNORED_PARAMS | extra, redact)
+            _cassette_config = config
+        return _cassette
+
+
+def reset_cassette() -> None:
+    global _cassette, _cassette_config
+    with _lock:
+        if _cassette is not None:
+            _cassette.store.close()
+        _cassette = None
+        _cassette_config = None
+
+
+def replaying() -> bool:
+    """True when nothing may reach the network (``replay`` mode)."""
+    return cassette_mode() == "replay"
+
+
+def wrap_transport(
+    options: Dict[str, Any], asynchronous: bool
+) -> Union[httpx.BaseTransport, httpx.AsyncBaseTransport, None]:
+    """
+    A cassette transport over a pooled transport built from ``client_options()``,
+    or None when cassettes are off.
+    """
+    cassette = get_cassette()
+    if cassette is None:
+        return None
+    pool = {"limits": options["limits"], "http2": options["http2"]}
+    if asynchronous:
+        return AsyncCassetteTransport(cassette, httpx.AsyncHTTPTransport(**pool))
+    return CassetteTransport(cassette, httpx.HTTPTransport(**pool))
@@ -0,0 +1,180 @@
+"""
+Shared outbound HTTP clients.
+
+Toolkits used to open a new ``httpx.AsyncClient()`` (or a bare ``requests`` call)
+per request, paying a TCP and TLS handshake every time. This module keeps one
+long-lived client per upstream origin (scheme, host, port) with keep-alive and,
+when ``h2`` is installed, HTTP/2:
+
+* ``get_async_client(url)`` for coroutines,
+* ``get_client(url)`` for the synchronous tools, which run in worker threads.
+
+Clients are shared: use them directly and never ``async with`` / ``close()`` them.
+With ``HTTP_CASSETTE_MODE`` set, their transport records or replays traffic
+(``backend.cassettes``).
+
+Async connections belong to the event loop that opened them. ``start_http_clients()``
+(called at API startup) binds the pooled clients to the server loop; any other
+loop, such as a toolkit's short-lived loop, gets its own clients that are dropped
+with the loop. ``close_http_clients()`` runs at shutdown.
+
+Environment:
+
+    HTTP_MAX_CONNECTIONS      connections per origin (default 20)
+    HTTP_MAX_KEEPALIVE        idle keep-alive connections per origin (default 10)
+    HTTP_KEEPALIVE_EXPIRY_S   idle connection lifetime (default 30)
+    HTTP_CONNECT_TIMEOUT_S    connect timeout (default 5)
+    HTTP_TIMEOUT_S            read/write/pool timeout (default 10); calls may pass their own
+    HTTP_HTTP2                0 disables HTTP/2 (default 1)
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from backend.cassettes import wrap_transport
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "CryptoSentinel/1.0"
+
+Origin = Tuple[str, str, int]
+
+
+def _origin(url: str) -> Origin:
+    parsed = httpx.URL(url)
+    if not parsed.host:
+        raise ValueError(f"Invalid URL for outbound request: {url!r}")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return parsed.scheme, parsed.host, port
+
+
+def _http2_enabled() -> bool:
+    if os.getenv("HTTP_HTTP2", "1").lower() in ("0", "false", "no"):
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def client_options() -> Dict[str, Any]:
+    """Keyword arguments shared by the sync and async clients."""
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S", "30")),
+        ),
+        "timeout": httpx.Timeout(
+            float(os.getenv("HTTP_TIMEOUT_S", "10")),
+            connect=float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "5")),
+        ),
+        "http2": _http2_enabled(),
+        "headers": {"User-Agent": USER_AGENT},
+        "follow_redirects": True,
+    }
+
+
+def _with_transport(options: Dict[str, Any], asynchronous: bool) -> Dict[str, Any]:
+    # Record/replay mode (backend.cassettes) intercepts every request at the transport.
+    transport = wrap_transport(options, asynchronous)
+    if transport is not None:
+        options["transport"] = transport
+    return options
+
+
+class HttpClients:
+    """
+    Per-origin ``httpx`` clients. Thread-safe; async clients are per event loop
+    as described in the module docstring.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync: Dict[Origin, httpx.Client] = {}
+        self._pooled_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pooled: Dict[Origin, httpx.AsyncClient] = {}
+        self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Origin, httpx.AsyncClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def client(self, url: str) -> httpx.Client:
+        origin = _origin(url)
+        with self._lock:
+            client = self._sync.get(origin)
+            if client is None:
+                client = httpx.Client(**_with_transport(client_options(), asynchronous=False))
+                self._sync[origin] = client
+            return client
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        origin = _origin(url)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop is self._pooled_loop:
+                clients = self._pooled
+            else:
+                clients = self._loop_clients.setdefault(loop, {})
+            client = clients.get(origin)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(**_with_transport(client_options(), asynchronous=True))
+                clients[origin] = client
+            return client
+
+    def start(self) -> None:
+        """Binds the pooled async clients to the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._pooled_loop is not loop:
+                self._pooled_loop = loop
+                self._pooled = self._loop_clients.pop(loop, {})
+
+    async def aclose(self) -> None:
+        """Closes the async clients of the running loop (the pooled ones on the server loop)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop is self._pooled_loop:
+                clients, self._pooled, self._pooled_loop = self._pooled, {}, None
+            else:
+                clients = self._loop_clients.pop(loop, {})
+        for client in clients.values():
+            try:
+                await client.aclose()
+            except Exception:
+                logger.exception("Failed to close HTTP client cleanly")
+
+    def close(self) -> None:
+        """Closes the synchronous clients."""
+        with self._lock:
+            clients, self._sync = self._sync, {}
+        for client in clients.values():
+            try:
+                client.close()
+            except Exception:
+                logger.exception("Failed to close HTTP client cleanly")
+
+
+_clients = HttpClients()
+
+
+def get_client(url: str) -> httpx.Client:
+    """The shared synchronous client for ``url``'s origin."""
+    return _clients.client(url)
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """The shared async client for ``url``'s origin on the running loop."""
+    return _clients.async_client(url)
+
+
+async def start_http_clients() -> None:
+    _clients.start()
+
+
+async def close_http_clients() -> None:
+    """Closes every shared client. Called on application shutdown."""
+    await _clients.aclose()
+    _clients.close()
@@ -9,8 +9,9 @@ from typing import List, Dict, Any, Optional
 from functools import lru_cache
 
 import httpx
+import numpy as np
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException, Header, Request, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, ValidationError
@@ -18,9 +19,16 @@ from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
-from agno.tools.duckduckgo import DuckDuckGoTools
-from backend.storage.models import TradeData, ActivityData
-from backend.agents import get_crypto_trading_team, storage
+from backend.tools.web_search import DuckDuckGoTools
+from backend.storage.models import TradeData, ActivityData, AlertRecord, AgentMessageRecord, RecordPage
+from backend.agents import get_crypto_trading_team
+from backend.http_client import close_http_clients, get_async_client, start_http_clients
+from backend.market.charts import get_chart_cache
+from backend.market.live import get_live_prices, start_live_feed, stop_live_feed
+from backend.market.symbols import get_symbol_resolver, start_symbol_refresh, stop_symbol_refresh
+from backend.rate_limit import Priority, rate_limited_get, request_priority
+from backend.storage.registry import close_async_storages, close_storages, get_async_storage, get_storage
+from backend.tools.blacklist import reload_blacklist
 from backend.tools.consensus import ConsensusToolkit
 
 # Configure Logging
@@ -44,6 +52,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_storage():
+    """Binds the async storage pool to the server loop and checks the schema once."""
+    await get_async_storage().start()
+    # Outbound HTTP clients keep their connections on the server loop.
+    await start_http_clients()
+    # Symbol index: loaded from disk now, re-downloaded in the background when stale.
+    await run_in_threadpool(get_symbol_resolver)
+    start_symbol_refresh()
+    # Stream live prices into memory when LIVE_FEED is configured.
+    start_live_feed()
+    # Load the blacklist membership index now so per-trade checks never hit the DB.
+    await run_in_threadpool(reload_blacklist)
+    # Archive, seal and export in the background when any of them is configured.
+    get_storage().start_maintenance()
+
+@app.on_event("shutdown")
+async def shutdown_storage():
+    """Closes the shared storage and HTTP pools so pooled connections are released cleanly."""
+    await stop_live_feed()
+    await stop_symbol_refresh()
+    await close_async_storages()
+    await close_http_clients()
+    await run_in_threadpool(close_storages)
+
 # --- Pydantic Models ---
 class ChatRequest(BaseModel):
     message: str
@@ -62,9 +95,36 @@ class NewsItem(BaseModel):
     coins: List[str]
     agentId: str
 
-class PriceDataPoint(BaseModel):
-    time: float
-    price: float
+# /market/price returns pre-rendered JSON bytes, so its shapes are documented here
+# rather than enforced through a response_model.
+PRICE_CHART_RESPONSES = {
+    200: {
+        "description": "Price points, oldest first: objects (default) or compact ``[time, price]`` pairs.",
+        "content": {
+            "application/json": {
+                "schema": {
+                    "oneOf": [
+                        {
+                            "title": "objects",
+                            "type": "array",
+                            "items": {
+                                "type": "object",
+                                "properties": {"time": {"type": "number"}, "price": {"type": "number"}},
+                                "required": ["time", "price"],
+                            },
+                        },
+                        {
+                            "title": "compact",
+                            "type": "array",
+                            "items": {"type": "array", "items": {"type": "number"}, "minItems": 2, "maxItems": 2},
+                        },
+                    ]
+                }
+            }
+        },
+    },
+    304: {"description": "Not modified: the ETag or Last-Modified the client sent is still current."},
+}
 
 # --- Authentication & Security ---
 class SecurityConfig:
@@ -191,34 +251,91 @@ async def get_latest_news(request: Request, limit: int = 20, api_key: str = Depe
 @limiter.limit("30/minute")
 async def get_recent_trades(request: Request, limit: int = 15, api_key: str = Depends(get_api_key)):
     """Returns the most recent trades from the database (Non-blocking)."""
-    return await run_in_threadpool(storage.get_recent_trades, limit)
+    return await get_async_storage().get_recent_trades(limit)
 
 @app.get("/agent/activities/recent", response_model=List[ActivityData])
 @limiter.limit("30/minute")
 async def get_recent_agent_activities(request: Request, limit: int = 20, api_key: str = Depends(get_api_key)):
     """Returns the most recent agent activities from the database (Non-blocking)."""
-    return await run_in_threadpool(storage.get_recent_activities, limit)
+    return await get_async_storage().get_recent_activities(limit)
+
+# --- Paginated history ---
+# Keyset pagination: pass the previous response's next_cursor to get the next page.
+# start/end bound the range as start <= timestamp < end.
+MAX_PAGE_SIZE = 500
+
+class PageQuery:
+    """Query parameters shared by the paginated history routes."""
+
+    def __init__(
+        self,
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        order: str = Query("desc", pattern="^(asc|desc)$"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.start = start
+        self.end = end
+        self.ascending = order == "asc"
+
+    async def fetch(self, fetch_page):
+        """One page from an async storage ``get_*_page`` method; bad cursors and ranges are 400s."""
+        try:
+            return await fetch_page(self.limit, cursor=self.cursor, start=self.start, end=self.end, ascending=self.ascending)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-@app.get("/market/price", response_model=List[PriceDataPoint])
+@app.get("/trades", response_model=RecordPage[TradeData])
+@limiter.limit("60/minute")
+async def list_trades(request: Request, page: PageQuery = Depends(), api_key: str = Depends(get_api_key)):
+    """Returns one page of trade history."""
+    return await page.fetch(get_async_storage().get_trades_page)
+
+@app.get("/agent/activities", response_model=RecordPage[ActivityData])
+@limiter.limit("60/minute")
+async def list_agent_activities(request: Request, page: PageQuery = Depends(), api_key: str = Depends(get_api_key)):
+    """Returns one page of agent activity history."""
+    return await page.fetch(get_async_storage().get_activities_page)
+
+@app.get("/alerts", response_model=RecordPage[AlertRecord])
+@limiter.limit("60/minute")
+async def list_alerts(request: Request, page: PageQuery = Depends(), api_key: str = Depends(get_api_key)):
+    """Returns one page of alert history."""
+    return await page.fetch(get_async_storage().get_alerts_page)
+
+@app.get("/agent/messages", response_model=RecordPage[AgentMessageRecord])
+@limiter.limit("60/minute")
+async def list_agent_messages(request: Request, page: PageQuery = Depends(), api_key: str = Depends(get_api_key)):
+    """Returns one page of inter-agent message history."""
+    return await page.fetch(get_async_storage().get_agent_messages_page)
+
+@app.get("/market/price", response_class=Response, responses=PRICE_CHART_RESPONSES)
 @limiter.limit("20/minute")
-async def get_market_price(request: Request, symbol: str = "BTC", period: str = "1D", api_key: str = Depends(get_api_key)):
+async def get_market_price(
+    request: Request,
+    symbol: str = "BTC",
+    period: str = "1D",
+    points: Optional[int] = Query(None, ge=2, le=10000, description="Downsample to at most this many points."),
+    method: str = Query("lttb", pattern="^(lttb|minmax)$"),
+    fmt: str = Query("objects", alias="format", pattern="^(objects|compact)$"),
+    api_key: str = Depends(get_api_key),
+):
     """
-    Fetches real market price data directly from the CoinGecko API.
-    Uses API Key if available.
+    Price chart from CoinGecko, served from the chart cache (see backend.market.charts).
+    ``points`` caps the series (LTTB or min/max buckets), ``format=compact`` returns
+    ``[[time, price], ...]``. Responses carry an ETag and Last-Modified and answer
+    conditional requests with 304. Uses API Key if available.
     """
-    # Helper to map symbols. In a real system, this would be a DB lookup or config.
-    def get_coin_id(sym: str) -> str:
-        mapping = {
-            "BTC": "bitcoin",
-            "ETH": "ethereum",
-            "DOGE": "dogecoin",
-            "SOL": "solana",
-            "MATIC": "matic-network",
-            "BNB": "binancecoin",
-        }
-        return mapping.get(sym.upper(), sym.lower())
-
-    coin_id = get_coin_id(symbol)
+    resolver = get_symbol_resolver()
+    coin_id = resolver.resolve(symbol)
+    if coin_id is None:
+        # With the full coin list indexed, an unknown symbol cannot exist upstream either.
+        if resolver.loaded:
+            raise HTTPException(status_code=404, detail=f"Coin '{symbol}' not found")
+        coin_id = symbol.lower()
 
     period_to_days = {
         "1D": 1,
@@ -243,30 +360,41 @@ async def get_market_price(request: Request, symbol: str = "BTC", period: str =
     if cg_api_key:
          headers["x-cg-demo-api-key"] = cg_api_key
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        try:
-            response = await client.get(url, params=params, headers=headers)
-            if response.status_code == 404:
-                raise HTTPException(status_code=404, detail=f"Coin '{symbol}' not found")
-            response.raise_for_status()
-            data = response.json()
-
-            price_data = [
-                PriceDataPoint(time=item[0] / 1000, price=item[1])
-                for item in data.get("prices", [])
-            ]
-            return price_data
-        except httpx.HTTPStatusError as e:
-            logger.error(f"CoinGecko API error: {e}")
-            if e.response.status_code == 429:
-                 raise HTTPException(status_code=429, detail="Market data rate limit exceeded. Please configure COINGECKO_API_KEY.")
-            raise HTTPException(status_code=e.response.status_code, detail="Market data provider error")
-        except httpx.RequestError as e:
-            logger.error(f"CoinGecko connection error: {e}")
-            raise HTTPException(status_code=503, detail="Market data provider unavailable")
-        except Exception as e:
-            logger.exception("Unexpected error processing price data")
-            raise HTTPException(status_code=500, detail="Internal server error")
+    async def fetch_chart():
+        client = get_async_client(url)
+        # Interactive: served ahead of queued agent and background fetches.
+        response = await rate_limited_get(
+            client, url, priority=Priority.INTERACTIVE, params=params, headers=headers, timeout=10.0
+        )
+        if response.status_code == 404:
+            raise HTTPException(status_code=404, detail=f"Coin '{symbol}' not found")
+        response.raise_for_status()
+        prices = np.asarray(response.json().get("prices", []), dtype=np.float64).reshape(-1, 2)
+        return prices[:, 0] / 1000, prices[:, 1]
+
+    try:
+        chart = await get_chart_cache().get_or_fetch(coin_id, days, fetch_chart)
+        # Extend the chart to the latest streamed tick, which is newer than CoinGecko's last point.
+        rendered = chart.render(points, method, fmt, tail=get_live_prices().latest(coin_id))
+    except HTTPException:
+        raise
+    except httpx.HTTPStatusError as e:
+        logger.error(f"CoinGecko API error: {e}")
+        if e.response.status_code == 429:
+             raise HTTPException(status_code=429, detail="Market data rate limit exceeded. Please configure COINGECKO_API_KEY.")
+        raise HTTPException(status_code=e.response.status_code, detail="Market data provider error")
+    except httpx.RequestError as e:
+        logger.error(f"CoinGecko connection error: {e}")
+        raise HTTPException(status_code=503, detail="Market data provider unavailable")
+    except Exception as e:
+        logger.exception("Unexpected error processing price data")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    # Authenticated data: browsers may keep it but must revalidate (cheap 304s).
+    response_headers = {**rendered.headers, "Cache-Control": "private, no-cache"}
+    if rendered.not_modified(request.headers.get("if-none-match"), request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=response_headers)
+    return Response(rendered.body, media_type="application/json", headers=response_headers)
 
 
 @app.post("/chat")
@@ -287,8 +415,10 @@ async def chat_with_agent(request: Request, chat_req: ChatRequest, api_key: str
             team = get_crypto_trading_team(session_id)
             prep_agent = team.get_member("MentalPreparation")
             if prep_agent:
-                # We run this in a threadpool because the agent's internal logic might be sync
-                await run_in_threadpool(prep_agent.run, "Begin mental preparation for the upcoming session.")
+                # We run this in a threadpool because the agent's internal logic might be sync.
+                # Its market-data fetches queue behind interactive requests.
+                with request_priority(Priority.BACKGROUND):
+                    await run_in_threadpool(prep_agent.run, "Begin mental preparation for the upcoming session.")
                 logger.info(f"[{session_id}] Sleep-time compute phase complete.")
             else:
                 logger.warning(f"[{session_id}] MentalPreparation agent not found. Skipping sleep-time compute.")
@@ -0,0 +1,200 @@
+"""
+Process-wide cache for CoinGecko price series.
+
+Every analysis toolkit calls ``fetch_coingecko_prices`` on its own, and the Bull
+and Bear researchers each hold their own toolkits, so one debate used to download
+the same 365-day series many times. ``SeriesCache`` keeps decoded DataFrames keyed
+by ``(symbol, days, vs_currency)``:
+
+* the TTL follows CoinGecko's granularity for the window: 5-minute points up to
+  1 day, hourly up to 90 days, daily beyond that;
+* concurrent misses for the same key share one upstream request (coalescing);
+* entries are evicted least-recently-used once their total size exceeds the
+  memory cap.
+
+Failed fetches are not cached; every waiter of the failed request gets the error.
+
+Environment:
+
+    MARKET_CACHE              0 disables the cache (default 1)
+    MARKET_CACHE_MAX_MB       memory cap for cached series (default 64)
+    MARKET_CACHE_TTLS         "minute=60,hourly=300,daily=1800" overrides, in seconds
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_TTLS = {"minute": 60.0, "hourly": 300.0, "daily": 1800.0}
+
+
+def granularity(days: float) -> str:
+    """CoinGecko's automatic ``market_chart`` granularity for a window of ``days``."""
+    if days <= 1:
+        return "minute"
+    if days <= 90:
+        return "hourly"
+    return "daily"
+
+
+def parse_ttls(spec: str) -> Dict[str, float]:
+    """Parses ``"minute=30,daily=3600"`` over the defaults."""
+    ttls = dict(DEFAULT_TTLS)
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, seconds = item.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_TTLS:
+            raise ValueError(f"Unknown granularity in MARKET_CACHE_TTLS: {name}")
+        ttls[name] = float(seconds)
+    return ttls
+
+
+def _size(frame: pd.DataFrame) -> int:
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+class SeriesCache:
+    """
+    LRU cache of DataFrames with per-entry TTL and coalesced async fills.
+
+    Frames are copied on the way out, so callers may add columns without
+    corrupting the cache. Entries are shared across threads; coalescing applies
+    to callers on the same event loop.
+
+    Other values can be cached by passing ``size`` (their weight against
+    ``max_bytes``) and ``copy`` (applied on the way in and out; identity for
+    immutable values). ``ChartCache`` counts each chart as 1, so its budget is an
+    entry count.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttls: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        size: Callable[[Any], int] = _size,
+        copy: Callable[[Any], Any] = pd.DataFrame.copy,
+    ):
+        self._max_bytes = max_bytes
+        self._ttls = dict(ttls or DEFAULT_TTLS)
+        self._clock = clock
+        self._size = size
+        self._copy = copy
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def ttl_for(self, days: float) -> float:
+        return self._ttls[granularity(days)]
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, size, frame = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+        return self._copy(frame)
+
+    def put(self, key: Hashable, frame: Any, ttl: float) -> None:
+        size = self._size(frame)
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (self._clock() + ttl, size, self._copy(frame))
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drops one key, or everything."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry[1]
+
+    async def get_or_fetch(
+        self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float
+    ) -> Any:
+        """
+        Returns the cached frame for ``key``, or awaits ``fetch()`` once for all
+        concurrent callers and caches its result for ``ttl`` seconds.
+        """
+        frame = self.get(key)
+        if frame is not None:
+            self.hits += 1
+            return frame
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = loop.create_task(self._fill(key, fetch, ttl))
+            self._inflight[key] = task
+        # Shielded so one cancelled caller does not fail the others.
+        frame = await asyncio.shield(task)
+        return self._copy(frame)
+
+    async def _fill(self, key: Hashable, fetch: Callable[[], Awaitable[Any]], ttl: float) -> Any:
+        try:
+            frame = await fetch()
+            self.put(key, frame, ttl)
+            return frame
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+
+_cache: Optional[SeriesCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_price_cache() -> Optional[SeriesCache]:
+    """The process-wide series cache, or None when ``MARKET_CACHE=0``."""
+    global _cache
+    if os.getenv("MARKET_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SeriesCache(
+                max_bytes=int(float(os.getenv("MARKET_CACHE_MAX_MB", "64")) * 1024 * 1024),
+                ttls=parse_ttls(os.getenv("MARKET_CACHE_TTLS", "")),
+            )
+        return _cache
+
+
+def reset_price_cache() -> None:
+    """Drops the process-wide cache (tests, config reloads)."""
+    global _cache
+    with _cache_lock:
+        _cache = None
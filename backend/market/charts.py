@@ -0,0 +1,257 @@
+"""
+Server-side cache for ``/market/price`` charts.
+
+Each dashboard used to make ``/market/price`` download the full CoinGecko series
+again (thousands of points for 1Y), turn every point into a Pydantic model and
+serialize it, even when several clients asked for the same chart. ``ChartCache``
+keeps one ``Chart`` per ``(coin id, days)`` in a ``SeriesCache``, with the same
+granularity-based TTLs as the series cache (``MARKET_CACHE_TTLS``). Concurrent
+misses share one upstream request.
+
+A chart renders to ready-to-send JSON bytes with an ETag and a Last-Modified time.
+Renders are memoized per ``(points, method, format, live tail)``, so a repeated
+request costs a dict lookup, and a client that already holds the bytes gets a 304:
+
+* ``points`` caps the series at a point budget using ``lttb`` (Largest-Triangle-
+  Three-Buckets, which keeps the visual shape) or ``minmax`` (each bucket's
+  extremes, which keeps every spike);
+* ``format`` is ``objects`` (``[{"time", "price"}]``, the frontend's default) or
+  ``compact`` (``[[time, price], ...]``);
+* the live tail is the latest streamed tick (``backend.market.live``), appended
+  when it is newer than the last upstream point.
+
+Environment:
+
+    CHART_CACHE_MAX_ENTRIES   charts kept, least recently used evicted (default 256)
+    MARKET_CACHE_TTLS         shared with the series cache (see backend.market.cache)
+"""
+import email.utils
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .cache import SeriesCache, parse_ttls
+
+METHODS = ("lttb", "minmax")
+FORMATS = ("objects", "compact")
+MAX_RENDERS = 16
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Indices of ``points`` samples chosen by Largest-Triangle-Three-Buckets. The
+    first and last samples are always kept.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n) if points >= n else np.array([0, n - 1])[: max(points, 0)]
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    chosen = np.empty(points, dtype=np.int64)
+    chosen[0], chosen[-1] = 0, n - 1
+    previous = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        # The next bucket's average is the third corner of the triangle.
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[previous] - avg_x) * (by - y[previous]) - (x[previous] - bx) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        chosen[i + 1] = previous
+    return chosen
+
+
+def minmax(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Indices of each bucket's minimum and maximum, in time order, for
+    ``(points - 2) // 2`` equal buckets (first and last samples kept). Never more
+    than ``points`` indices; below 4 only the endpoints fit.
+    """
+    n = len(y)
+    if points >= n or points < 4:
+        return np.arange(n) if points >= n else np.array([0, n - 1])[: max(points, 0)]
+    buckets = max(1, (points - 2) // 2)
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.int64)
+    chosen = [0]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end <= start:
+            continue
+        window = y[start:end]
+        low, high = start + int(np.argmin(window)), start + int(np.argmax(window))
+        chosen.extend(sorted({low, high}))
+    chosen.append(n - 1)
+    return np.unique(np.asarray(chosen, dtype=np.int64))
+
+
+class Rendered(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: float  # epoch seconds
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"ETag": self.etag, "Last-Modified": email.utils.formatdate(self.last_modified, usegmt=True)}
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Whether a conditional GET with these headers can be answered with 304."""
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(self.last_modified) <= since
+        return False
+
+
+class Chart:
+    """One upstream series (seconds, prices) plus its memoized renders."""
+
+    def __init__(self, times: np.ndarray, prices: np.ndarray, fetched_at: float):
+        self.times = np.asarray(times, dtype=np.float64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.fetched_at = fetched_at
+        self._lock = threading.Lock()
+        self._renders: "OrderedDict[Tuple, Rendered]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def render(
+        self,
+        points: Optional[int] = None,
+        method: str = "lttb",
+        fmt: str = "objects",
+        tail: Optional[Tuple[float, float]] = None,
+    ) -> Rendered:
+        """JSON for the chart, downsampled to ``points``; ``tail`` is a live ``(price, time)``."""
+        if method not in METHODS:
+            raise ValueError(f"Unknown downsampling method: {method}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown chart format: {fmt}")
+        if tail is not None and len(self.times) and tail[1] <= self.times[-1]:
+            tail = None
+        key = (points, method, fmt, tail)
+        with self._lock:
+            rendered = self._renders.get(key)
+            if rendered is not None:
+                self._renders.move_to_end(key)
+                return rendered
+        rendered = self._render(points, method, fmt, tail)
+        with self._lock:
+            self._renders[key] = rendered
+            while len(self._renders) > MAX_RENDERS:
+                self._renders.popitem(last=False)
+        return rendered
+
+    def _render(self, points: Optional[int], method: str, fmt: str, tail: Optional[Tuple[float, float]]) -> Rendered:
+        times, prices = self.times, self.prices
+        if tail is not None:
+            times, prices = np.append(times, tail[1]), np.append(prices, tail[0])
+        if points is not None and points < len(times):
+            index = lttb(times, prices, points) if method == "lttb" else minmax(prices, points)
+            times, prices = times[index], prices[index]
+        pairs = np.column_stack([times, prices]).tolist()
+        if fmt == "compact":
+            payload = pairs
+        else:
+            payload = [{"time": t, "price": p} for t, p in pairs]
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        last_modified = max(self.fetched_at, tail[1]) if tail is not None else self.fetched_at
+        return Rendered(body, etag, last_modified)
+
+
+class ChartCache:
+    """
+    ``Chart``s per ``(coin id, days)`` in a ``SeriesCache``: LRU over
+    ``max_entries``, per-entry TTL and coalesced async fills. Charts are shared,
+    not copied; their renders are memoized on them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttls: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        wall_clock: Callable[[], float] = time.time,
+    ):
+        self._wall_clock = wall_clock
+        self._cache = SeriesCache(
+            max_bytes=max_entries,
+            ttls=parse_ttls("") if ttls is None else ttls,
+            clock=clock,
+            size=lambda chart: 1,
+            copy=lambda chart: chart,
+        )
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    @property
+    def coalesced(self) -> int:
+        return self._cache.coalesced
+
+    def ttl_for(self, days: float) -> float:
+        return self._cache.ttl_for(days)
+
+    def get(self, key: Hashable) -> Optional[Chart]:
+        return self._cache.get(key)
+
+    def put(self, key: Hashable, chart: Chart, ttl: float) -> None:
+        self._cache.put(key, chart, ttl)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        self._cache.invalidate(key)
+
+    async def get_or_fetch(
+        self, coin_id: str, days: int, fetch: Callable[[], Awaitable[Tuple[np.ndarray, np.ndarray]]]
+    ) -> Chart:
+        """
+        The cached chart for ``(coin_id, days)``, or one built from ``fetch()``
+        (``(times in seconds, prices)``), awaited once for all concurrent callers.
+        """
+
+        async def build() -> Chart:
+            times, prices = await fetch()
+            return Chart(times, prices, self._wall_clock())
+
+        return await self._cache.get_or_fetch((coin_id, int(days)), build, self.ttl_for(days))
+
+
+_cache: Optional[ChartCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_chart_cache() -> ChartCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChartCache(
+                max_entries=int(os.getenv("CHART_CACHE_MAX_ENTRIES", "256")),
+                ttls=parse_ttls(os.getenv("MARKET_CACHE_TTLS", "")),
+            )
+        return _cache
+
+
+def reset_chart_cache() -> None:
+    global _cache
+    with _cache_lock:
+        _cache = None
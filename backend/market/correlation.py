@@ -0,0 +1,195 @@
+"""
+Correlation and covariance over a universe of symbols.
+
+``load_returns`` fetches every symbol concurrently (through the shared cache, rate
+limiter and price store) and aligns them once on a common daily index: UTC daily
+closes, inner-joined, then simple returns. The aligned matrix is cached per
+``(coin ids, days, vs_currency)`` for the price cache's TTL, so several questions
+about the same universe reuse it.
+
+The statistics are plain NumPy on the ``(days, symbols)`` returns array:
+
+* ``pearson_matrix`` / ``spearman_matrix``: full correlation matrices,
+* ``rolling_correlation``: every column against one reference column over a
+  sliding window, from cumulative sums (O(n) per column),
+* ``ewma_covariance``: RiskMetrics-style exponentially weighted covariance
+  (zero-mean daily returns, decay ``lam``).
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from .cache import SeriesCache, parse_ttls
+from .symbols import resolve_coin_id
+
+Fetch = Callable[[str, int, str], Awaitable[pd.DataFrame]]  # (symbol, days, vs_currency)
+
+
+class SymbolFetchError(Exception):
+    """Fetching one symbol of the universe failed."""
+
+    def __init__(self, symbol: str, error: BaseException):
+        super().__init__(f"Failed to fetch {symbol}: {error}")
+        self.symbol = symbol
+        self.error = error
+
+
+class ReturnsMatrix(NamedTuple):
+    symbols: Tuple[str, ...]
+    index: pd.DatetimeIndex   # day of each return
+    closes: np.ndarray        # (days + 1, symbols) aligned daily closes
+    returns: np.ndarray       # (days, symbols) simple daily returns
+
+    def column(self, symbol: str) -> int:
+        return self.symbols.index(symbol)
+
+
+_returns_cache = SeriesCache(max_bytes=32 * 1024 * 1024, ttls=parse_ttls(os.getenv("MARKET_CACHE_TTLS", "")))
+
+
+def reset_correlation_cache() -> None:
+    _returns_cache.invalidate()
+
+
+def align_daily_closes(frames: Sequence[pd.DataFrame], symbols: Sequence[str]) -> pd.DataFrame:
+    """Daily (UTC) last prices of each frame, on the dates every frame has."""
+    closes = [frame["price"].resample("D").last().rename(symbol) for frame, symbol in zip(frames, symbols)]
+    return pd.concat(closes, axis=1, join="inner").dropna()
+
+
+async def load_returns(
+    symbols: Sequence[str],
+    days: int,
+    vs_currency: str = "usd",
+    fetch: Optional[Fetch] = None,
+) -> ReturnsMatrix:
+    """
+    Aligned daily returns of ``symbols``, keyed by their CoinGecko ids (order kept,
+    symbols resolving to the same coin dropped). Each coin is fetched with the
+    caller's string, since contract addresses such as Solana mints are
+    case-sensitive. Raises ``SymbolFetchError`` for the first symbol that could
+    not be fetched.
+    """
+    if fetch is None:
+        from backend.tools.utils import fetch_coingecko_prices as fetch
+    queries: Dict[str, str] = {}
+    for symbol in symbols:
+        queries.setdefault(resolve_coin_id(symbol), symbol)
+    unique = tuple(queries)
+    if not unique:
+        raise ValueError("No symbols given")
+    vs_currency = vs_currency.lower()
+
+    async def aligned() -> pd.DataFrame:
+        results = await asyncio.gather(
+            *(fetch(queries[coin_id], days, vs_currency) for coin_id in unique), return_exceptions=True
+        )
+        for coin_id, result in zip(unique, results):
+            if isinstance(result, BaseException):
+                raise SymbolFetchError(queries[coin_id], result)
+        return align_daily_closes(results, unique)
+
+    if os.getenv("MARKET_CACHE", "1").lower() in ("0", "false", "no"):
+        closes = await aligned()
+    else:
+        key = (unique, int(days), vs_currency)
+        closes = await _returns_cache.get_or_fetch(key, aligned, _returns_cache.ttl_for(days))
+    values = closes.to_numpy(dtype=np.float64)
+    returns = values[1:] / values[:-1] - 1.0
+    return ReturnsMatrix(unique, closes.index[1:], values, returns)
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    centered = values - values.mean(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return centered / np.sqrt((centered * centered).sum(axis=0))
+
+
+def pearson_matrix(returns: np.ndarray) -> np.ndarray:
+    """``(k, k)`` Pearson correlations of the columns; NaN for constant columns."""
+    z = _standardize(np.asarray(returns, dtype=np.float64))
+    corr = z.T @ z
+    np.fill_diagonal(corr, np.where(np.isnan(np.diag(corr)), np.nan, 1.0))
+    return np.clip(corr, -1.0, 1.0)
+
+
+def spearman_matrix(returns: np.ndarray) -> np.ndarray:
+    """Rank (Spearman) correlations: Pearson on per-column ranks, ties averaged."""
+    return pearson_matrix(rankdata(returns, axis=0))
+
+
+def rolling_correlation(returns: np.ndarray, window: int, reference: int = 0) -> np.ndarray:
+    """
+    ``(n - window + 1, k)`` correlations of every column with column ``reference``
+    over each trailing window; row ``i`` covers returns ``i .. i + window - 1``.
+    """
+    x = np.asarray(returns, dtype=np.float64)
+    n = len(x)
+    if window < 2 or window > n:
+        raise ValueError(f"window must be between 2 and {n}")
+    y = x[:, reference : reference + 1]
+
+    def windowed(values: np.ndarray) -> np.ndarray:
+        sums = np.cumsum(np.vstack([np.zeros((1, values.shape[1])), values]), axis=0)
+        return sums[window:] - sums[:-window]
+
+    sx, sy = windowed(x), windowed(y)
+    sxx, syy, sxy = windowed(x * x), windowed(y * y), windowed(x * y)
+    cov = sxy - sx * sy / window
+    var_x = sxx - sx * sx / window
+    var_y = syy - sy * sy / window
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.sqrt(var_x * var_y)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def ewma_covariance(returns: np.ndarray, lam: float = 0.94) -> np.ndarray:
+    """
+    ``(k, k)`` exponentially weighted covariance with weights ``(1 - lam) * lam**age``,
+    normalized to sum to one (RiskMetrics uses ``lam = 0.94`` for daily data).
+    """
+    if not 0.0 < lam < 1.0:
+        raise ValueError("lam must be in (0, 1)")
+    x = np.asarray(returns, dtype=np.float64)
+    ages = np.arange(len(x) - 1, -1, -1, dtype=np.float64)
+    weights = (1.0 - lam) * lam ** ages
+    weights /= weights.sum()
+    weighted = x * np.sqrt(weights)[:, None]
+    return weighted.T @ weighted
+
+
+def matrix_to_dict(matrix: np.ndarray, symbols: Sequence[str], digits: int = 4) -> Dict[str, Dict[str, Optional[float]]]:
+    """Nested ``{row: {column: value}}`` for tool output; NaN becomes None."""
+    rounded = np.round(matrix, digits)
+    return {
+        row: {col: (None if np.isnan(value) else float(value)) for col, value in zip(symbols, values)}
+        for row, values in zip(symbols, rounded)
+    }
+
+
+def universe_summary(matrix: ReturnsMatrix, window: Optional[int] = None, lam: float = 0.94) -> Dict[str, object]:
+    """Pearson, Spearman and EWMA statistics of a returns matrix, as plain dicts."""
+    symbols: List[str] = list(matrix.symbols)
+    cov = ewma_covariance(matrix.returns, lam)
+    summary: Dict[str, object] = {
+        "symbols": symbols,
+        "observations": int(len(matrix.returns)),
+        "start": matrix.index[0].isoformat() if len(matrix.index) else None,
+        "end": matrix.index[-1].isoformat() if len(matrix.index) else None,
+        "pearson": matrix_to_dict(pearson_matrix(matrix.returns), symbols),
+        "spearman": matrix_to_dict(spearman_matrix(matrix.returns), symbols),
+        "ewma_covariance": matrix_to_dict(cov, symbols, digits=8),
+        "ewma_volatility": {s: float(np.round(np.sqrt(v), 6)) for s, v in zip(symbols, np.diag(cov))},
+    }
+    if window:
+        rolling = rolling_correlation(matrix.returns, window, reference=0)
+        summary["rolling_window"] = window
+        summary[f"rolling_vs_{symbols[0]}"] = {
+            s: [None if np.isnan(v) else float(np.round(v, 4)) for v in rolling[:, i]] for i, s in enumerate(symbols[1:], 1)
+        }
+    return summary
+
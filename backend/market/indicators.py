@@ -0,0 +1,269 @@
+"""
+Technical indicators over whole price series.
+
+``get_technical_indicators`` used to rebuild rolling pandas windows for SMA, RSI,
+MACD and Bollinger Bands on every call and keep only the last value. Here an
+indicator set is computed over the full series in one pass of NumPy:
+
+* simple moving averages come from one cumulative sum (O(n) for any window),
+* EMAs are the recursive kernel ``y[t] = a * x[t] + (1 - a) * y[t - 1]`` run by
+  ``scipy.signal.lfilter`` (pandas ``ewm(span, adjust=False)``),
+* RSI averages gains and losses with the same cumulative sums (Cutler's RSI, as
+  the toolkit has always reported), MACD chains three EMAs, and Bollinger Bands
+  take the sample standard deviation of each trailing window.
+
+Results are columnar: one float array per column, aligned with the input, with
+NaN where a window is not full yet. ``IndicatorEngine`` memoizes them per
+``(symbol, series version)``, where the version is a digest of the series, so
+agents, regime detection and backtests that look at the same cached series share
+each column instead of recomputing it. A set that adds one indicator only
+computes that one.
+
+Indicator specs are short strings: ``sma:50``, ``ema:21``, ``rsi:14``,
+``macd:12,26,9`` and ``bb:20,2``.
+
+Environment:
+
+    INDICATOR_CACHE_MAX_ENTRIES   series kept, least recently used evicted (default 128)
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+DEFAULT_INDICATORS = ("sma:7", "sma:25", "sma:100", "rsi:14", "macd:12,26,9", "bb:20,2")
+KINDS = {"sma": 1, "ema": 1, "rsi": 1, "macd": 3, "bb": 2}
+DEFAULT_PARAMS = {"macd": (12.0, 26.0, 9.0), "bb": (20.0, 2.0)}
+
+Columns = Dict[str, np.ndarray]
+
+
+def sma(x: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over ``window`` samples; the first ``window - 1`` are NaN."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if 0 < window <= len(x):
+        sums = np.cumsum(np.concatenate(([0.0], x)))
+        out[window - 1 :] = (sums[window:] - sums[:-window]) / window
+    return out
+
+
+def ema(x: np.ndarray, span: float) -> np.ndarray:
+    """Exponential moving average with ``alpha = 2 / (span + 1)``, seeded with ``x[0]``."""
+    x = np.asarray(x, dtype=np.float64)
+    if not len(x):
+        return x.copy()
+    alpha = 2.0 / (span + 1.0)
+    out, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+    return out
+
+
+def rolling_std(x: np.ndarray, window: int) -> np.ndarray:
+    """Sample (ddof=1) standard deviation over each trailing window."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if 1 < window <= len(x):
+        out[window - 1 :] = sliding_window_view(x, window).std(axis=1, ddof=1)
+    return out
+
+
+def rsi(x: np.ndarray, period: int = 14) -> np.ndarray:
+    """Relative strength index from simple averages of gains and losses over ``period`` changes."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.full(len(x), np.nan)
+    if len(x) <= period:
+        return out
+    delta = np.diff(x)
+    gain = sma(np.maximum(delta, 0.0), period)
+    loss = sma(np.maximum(-delta, 0.0), period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out[1:] = 100.0 - 100.0 / (1.0 + gain / loss)
+    return out
+
+
+def macd(x: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram."""
+    line = ema(x, fast) - ema(x, slow)
+    trigger = ema(line, signal)
+    return line, trigger, line - trigger
+
+
+def bollinger(x: np.ndarray, window: int = 20, k: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Middle, upper and lower bands, ``k`` sample standard deviations around the SMA."""
+    middle = sma(x, window)
+    width = k * rolling_std(x, window)
+    return middle, middle + width, middle - width
+
+
+class Spec(NamedTuple):
+    kind: str
+    params: Tuple[float, ...]
+
+    @property
+    def columns(self) -> List[str]:
+        if self.kind in ("sma", "ema", "rsi"):
+            return [f"{self.kind}_{_fmt(self.params[0])}"]
+        suffix = "" if self.params == DEFAULT_PARAMS[self.kind] else "_" + "_".join(_fmt(p) for p in self.params)
+        if self.kind == "macd":
+            return [f"macd{suffix}", f"macd_signal{suffix}", f"macd_hist{suffix}"]
+        return [f"bb_middle{suffix}", f"bb_upper{suffix}", f"bb_lower{suffix}"]
+
+    def compute(self, prices: np.ndarray) -> Columns:
+        p = self.params
+        if self.kind == "sma":
+            values = (sma(prices, int(p[0])),)
+        elif self.kind == "ema":
+            values = (ema(prices, p[0]),)
+        elif self.kind == "rsi":
+            values = (rsi(prices, int(p[0])),)
+        elif self.kind == "macd":
+            values = macd(prices, int(p[0]), int(p[1]), int(p[2]))
+        else:
+            values = bollinger(prices, int(p[0]), p[1])
+        return dict(zip(self.columns, values))
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def parse_spec(text: Union[str, Spec]) -> Spec:
+    """``"macd:12,26,9"`` -> ``Spec("macd", (12.0, 26.0, 9.0))``; defaults fill missing parameters."""
+    if isinstance(text, Spec):
+        return text
+    kind, _, args = text.strip().lower().partition(":")
+    if kind not in KINDS:
+        raise ValueError(f"Unknown indicator: {kind!r} (expected one of {', '.join(KINDS)})")
+    try:
+        params = tuple(float(arg) for arg in args.split(",") if arg.strip())
+    except ValueError:
+        raise ValueError(f"Invalid indicator parameters: {text!r}") from None
+    defaults = DEFAULT_PARAMS.get(kind, ())
+    params = params + defaults[len(params) :]
+    if len(params) != KINDS[kind]:
+        raise ValueError(f"{kind} takes {KINDS[kind]} parameter(s): {text!r}")
+    windows = params[:1] if kind == "bb" else params
+    if any(w < 1 or not w.is_integer() for w in windows) or (kind == "bb" and params[1] <= 0):
+        raise ValueError(f"Invalid indicator parameters: {text!r}")
+    return Spec(kind, params)
+
+
+class Indicators(NamedTuple):
+    times: np.ndarray    # seconds since the epoch
+    prices: np.ndarray
+    columns: Columns
+
+    def last(self, columns: Optional[Sequence[str]] = None) -> Dict[str, Optional[float]]:
+        """Latest value of each column; None while its window is not full."""
+        names = self.columns if columns is None else columns
+        values = {name: self.columns[name][-1] if len(self.prices) else np.nan for name in names}
+        return {name: None if np.isnan(value) else float(value) for name, value in values.items()}
+
+
+def series_version(times: np.ndarray, prices: np.ndarray) -> str:
+    """Digest of a series; any added, dropped or revised point changes it."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(times, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(prices, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def frame_series(frame: pd.DataFrame, column: str = "price") -> Tuple[np.ndarray, np.ndarray]:
+    """``(times in seconds, values)`` of a price frame (``fetch_coingecko_prices`` layout)."""
+    prices = frame[column].to_numpy(dtype=np.float64)
+    if isinstance(frame.index, pd.DatetimeIndex):
+        times = frame.index.as_unit("ns").asi8 / 1e9
+    else:
+        times = np.arange(len(prices), dtype=np.float64)
+    return times, prices
+
+
+class IndicatorEngine:
+    """LRU of computed columns per ``(symbol, series version)``."""
+
+    def __init__(self, max_entries: int = 128):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Dict[Spec, Columns]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def compute(
+        self,
+        symbol: str,
+        times: np.ndarray,
+        prices: np.ndarray,
+        indicators: Sequence[Union[str, Spec]] = DEFAULT_INDICATORS,
+    ) -> Indicators:
+        """The columns of ``indicators`` over the whole series, reusing memoized ones."""
+        specs = list(dict.fromkeys(parse_spec(text) for text in indicators))
+        times = np.asarray(times, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        key = (symbol.lower(), series_version(times, prices))
+        with self._lock:
+            known = self._entries.get(key)
+            if known is not None:
+                self._entries.move_to_end(key)
+            known = dict(known or {})
+        missing = [spec for spec in specs if spec not in known]
+        self.hits += len(specs) - len(missing)
+        self.misses += len(missing)
+        for spec in missing:
+            columns = spec.compute(prices)
+            for values in columns.values():
+                values.setflags(write=False)  # shared between callers
+            known[spec] = columns
+        if missing:
+            with self._lock:
+                entry = self._entries.setdefault(key, {})
+                for spec in missing:
+                    entry.setdefault(spec, known[spec])
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        columns: Columns = {}
+        for spec in specs:
+            columns.update(known[spec])
+        return Indicators(times, prices, columns)
+
+    def from_frame(
+        self, symbol: str, frame: pd.DataFrame, indicators: Sequence[Union[str, Spec]] = DEFAULT_INDICATORS
+    ) -> Indicators:
+        """``compute`` over the ``price`` column of a ``fetch_coingecko_prices`` frame."""
+        times, prices = frame_series(frame)
+        return self.compute(symbol, times, prices, indicators)
+
+    def invalidate(self, symbol: Optional[str] = None) -> None:
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == symbol.lower()]:
+                    del self._entries[key]
+
+
+_engine: Optional[IndicatorEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_indicator_engine() -> IndicatorEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = IndicatorEngine(max_entries=int(os.getenv("INDICATOR_CACHE_MAX_ENTRIES", "128")))
+        return _engine
+
+
+def reset_indicator_engine() -> None:
+    global _engine
+    with _engine_lock:
+        _engine = None
@@ -0,0 +1,393 @@
+"""
+Streaming live prices held in memory.
+
+Every tool call that needed "the current price" used to make a CoinGecko REST
+request. ``LiveFeed`` instead keeps one WebSocket connection to an exchange feed
+open, normalizes each message into ``Tick``s and appends them to a fixed-size
+NumPy ring buffer per symbol (``PriceRing``). Readers such as
+``MarketDataToolkit``, ``/market/price`` and portfolio revaluation call
+``get_live_prices().price(symbol)``, which is an array read, and only fall back to
+REST when the symbol is not streamed or its last tick is older than
+``LIVE_MAX_AGE_S``.
+
+Each ring has one writer (the feed task on the server loop). Readers take no lock:
+the writer fills a slot before publishing it by bumping the ring's counter, and a
+reader retries if the slot it read may have been overwritten meanwhile.
+
+Rings are keyed by the base ticker ("BTC"). Readers may also pass a CoinGecko id
+("bitcoin"). It maps to a ticker's ring only if that ticker resolves back to the
+same id in the symbol index (``backend.market.symbols``), so another coin that
+shares the ticker never gets its price. Otherwise the built-in preferred coins
+are the only aliases. Binance quotes are in USDT, which is treated as USD.
+
+``ReplayServer`` serves recorded feed messages from a local WebSocket for tests and
+offline development (point ``LIVE_FEED_URL`` at it).
+
+Environment:
+
+    LIVE_FEED                 "binance" or "coinbase"; unset disables streaming (default)
+    LIVE_FEED_URL             overrides the feed's WebSocket URL, e.g. a replay server
+    LIVE_FEED_SYMBOLS         tickers to subscribe to (default "BTC,ETH,SOL,BNB,DOGE")
+    LIVE_RING_SIZE            ticks kept per symbol (default 4096)
+    LIVE_MAX_AGE_S            older prices are stale and readers use REST (default 30)
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.market.symbols import PREFERRED, get_symbol_resolver
+from backend.rate_limit import backoff
+
+logger = logging.getLogger(__name__)
+
+QUOTES = ("USDT", "USDC", "FDUSD", "BUSD", "USD")
+
+class Tick(NamedTuple):
+    symbol: str       # base ticker, upper case
+    price: float
+    volume: float
+    timestamp: float  # seconds since the epoch
+
+
+def _base(pair: str) -> str:
+    pair = pair.upper().replace("-", "").replace("/", "")
+    for quote in QUOTES:
+        if pair.endswith(quote) and len(pair) > len(quote):
+            return pair[: -len(quote)]
+    return pair
+
+
+def normalize_binance(message: Dict[str, Any]) -> List[Tick]:
+    """Ticks from a Binance ``trade``/``aggTrade``/``24hrTicker`` event, raw or combined-stream."""
+    data = message.get("data", message)
+    events = data if isinstance(data, list) else [data]
+    ticks = []
+    for event in events:
+        kind = event.get("e")
+        if kind in ("trade", "aggTrade"):
+            ticks.append(Tick(_base(event["s"]), float(event["p"]), float(event["q"]), event["T"] / 1000.0))
+        elif kind in ("24hrTicker", "24hrMiniTicker"):
+            ticks.append(Tick(_base(event["s"]), float(event["c"]), float(event.get("v", 0.0)), event["E"] / 1000.0))
+    return ticks
+
+
+def normalize_coinbase(message: Dict[str, Any]) -> List[Tick]:
+    """Ticks from a Coinbase Exchange ``ticker`` message."""
+    if message.get("type") != "ticker" or "price" not in message:
+        return []
+    stamp = message.get("time")
+    timestamp = datetime.fromisoformat(stamp.replace("Z", "+00:00")).timestamp() if stamp else time.time()
+    volume = float(message.get("last_size") or 0.0)
+    return [Tick(_base(message["product_id"]), float(message["price"]), volume, timestamp)]
+
+
+class Feed(NamedTuple):
+    url: Callable[[Sequence[str]], str]
+    subscribe: Callable[[Sequence[str]], Optional[Dict[str, Any]]]
+    normalize: Callable[[Dict[str, Any]], List[Tick]]
+
+
+FEEDS: Dict[str, Feed] = {
+    "binance": Feed(
+        url=lambda symbols: "wss://stream.binance.com:9443/stream?streams="
+        + "/".join(f"{s.lower()}usdt@trade" for s in symbols),
+        subscribe=lambda symbols: None,
+        normalize=normalize_binance,
+    ),
+    "coinbase": Feed(
+        url=lambda symbols: "wss://ws-feed.exchange.coinbase.com",
+        subscribe=lambda symbols: {
+            "type": "subscribe",
+            "product_ids": [f"{s.upper()}-USD" for s in symbols],
+            "channels": ["ticker"],
+        },
+        normalize=normalize_coinbase,
+    ),
+}
+
+
+class PriceRing:
+    """
+    The last ``capacity`` ticks of one symbol in preallocated arrays. Single writer,
+    lock-free readers (see the module docstring).
+    """
+
+    def __init__(self, capacity: int = 4096):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.capacity = capacity
+        # One spare slot: the writer's next slot is never one a reader may want.
+        self._slots = capacity + 1
+        self._timestamp = np.zeros(self._slots, dtype=np.float64)
+        self._price = np.zeros(self._slots, dtype=np.float64)
+        self._volume = np.zeros(self._slots, dtype=np.float64)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def append(self, timestamp: float, price: float, volume: float = 0.0) -> None:
+        slot = self._count % self._slots
+        self._timestamp[slot] = timestamp
+        self._price[slot] = price
+        self._volume[slot] = volume
+        self._count += 1  # publishes the slot
+
+    def _intact(self, oldest: int) -> bool:
+        # Slots from tick ``oldest`` on are intact until the writer starts wrapping onto them.
+        return self._count - oldest < self._slots
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """``(price, timestamp)`` of the newest tick, or None before the first."""
+        while True:
+            count = self._count
+            if count == 0:
+                return None
+            slot = (count - 1) % self._slots
+            price, timestamp = float(self._price[slot]), float(self._timestamp[slot])
+            if self._intact(count - 1):
+                return price, timestamp
+
+    def snapshot(self, last: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Copies of the newest ``last`` ticks (all held by default), oldest first: timestamps, prices, volumes."""
+        while True:
+            count = self._count
+            size = min(count, self.capacity, last if last is not None else self.capacity)
+            slots = np.arange(count - size, count) % self._slots
+            arrays = self._timestamp[slots], self._price[slots], self._volume[slots]
+            if self._intact(count - size):
+                return arrays
+
+
+# Explicit id -> ticker aliases, used when the symbol index has no answer.
+_PREFERRED_TICKERS = {coin_id: ticker.upper() for ticker, (coin_id, _) in PREFERRED.items()}
+
+
+class LivePrices:
+    """Per-symbol rings. Created on first write; keys are base tickers."""
+
+    def __init__(self, capacity: int = 4096, max_age: float = 30.0, clock: Callable[[], float] = time.time):
+        self.capacity = capacity
+        self.max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rings: Dict[str, PriceRing] = {}
+
+    def _key(self, symbol: str) -> str:
+        key = symbol.upper()
+        if key in self._rings:
+            return key
+        coin_id = symbol.lower()
+        resolver = get_symbol_resolver()
+        coin = resolver.index.by_id.get(coin_id)
+        # Many coins share a ticker: an id only reads a ticker's ring when it is the
+        # coin that ticker resolves to ("batcat" is not BTC).
+        if coin is not None and resolver.resolve(coin.symbol) == coin_id:
+            return coin.symbol.upper()
+        ticker = _PREFERRED_TICKERS.get(coin_id)
+        return ticker if ticker is not None else key
+
+    def symbols(self) -> List[str]:
+        return sorted(self._rings)
+
+    def ring(self, symbol: str) -> Optional[PriceRing]:
+        return self._rings.get(self._key(symbol))
+
+    def write(self, tick: Tick) -> None:
+        ring = self._rings.get(tick.symbol)
+        if ring is None:
+            with self._lock:
+                ring = self._rings.setdefault(tick.symbol, PriceRing(self.capacity))
+        ring.append(tick.timestamp, tick.price, tick.volume)
+
+    def latest(self, symbol: str, max_age: Optional[float] = None) -> Optional[Tuple[float, float]]:
+        """``(price, timestamp)`` if ``symbol`` ticked within ``max_age`` seconds (default ``self.max_age``)."""
+        ring = self.ring(symbol)
+        latest = ring.latest() if ring is not None else None
+        if latest is None:
+            return None
+        age = self._clock() - latest[1]
+        return latest if age <= (self.max_age if max_age is None else max_age) else None
+
+    def price(self, symbol: str, max_age: Optional[float] = None) -> Optional[float]:
+        latest = self.latest(symbol, max_age)
+        return latest[0] if latest is not None else None
+
+
+class LiveFeed:
+    """
+    Keeps one WebSocket connection to ``feed`` open, reconnecting with backoff,
+    and writes every normalized tick into ``prices``.
+    """
+
+    def __init__(self, feed: Feed, symbols: Sequence[str], prices: LivePrices, url: Optional[str] = None):
+        self.feed = feed
+        self.symbols = [s.upper() for s in symbols]
+        self.prices = prices
+        self.url = url or feed.url(self.symbols)
+        self.messages = 0
+        self.ticks = 0
+        self.errors = 0
+        self.reconnects = 0
+        self.connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def handle(self, raw: Any) -> None:
+        self.messages += 1
+        try:
+            ticks = self.feed.normalize(json.loads(raw))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.errors += 1
+            logger.debug("Ignoring malformed feed message: %r", raw)
+            return
+        for tick in ticks:
+            self.prices.write(tick)
+        self.ticks += len(ticks)
+
+    async def run(self) -> None:
+        from websockets.asyncio.client import connect
+
+        attempt = 0
+        while True:
+            try:
+                async with connect(self.url, ping_interval=20, max_size=2 ** 20) as ws:
+                    subscribe = self.feed.subscribe(self.symbols)
+                    if subscribe is not None:
+                        await ws.send(json.dumps(subscribe))
+                    self.connected.set()
+                    attempt = 0
+                    async for raw in ws:
+                        self.handle(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Live feed %s disconnected: %s", self.url, e)
+            self.connected.clear()
+            self.reconnects += 1
+            await asyncio.sleep(backoff(attempt))
+            attempt += 1
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+class ReplayServer:
+    """
+    Local WebSocket server that sends ``messages`` (dicts or raw strings) to each
+    client, ``interval`` seconds apart, then closes the connection (or keeps it
+    open with ``hold_open``). With ``wait_for_subscribe`` it first waits for the
+    client's subscription, as Coinbase does. Messages received from clients are
+    kept in ``received``.
+
+        async with ReplayServer(messages) as server:
+            feed = LiveFeed(FEEDS["binance"], ["BTC"], prices, url=server.url)
+    """
+
+    def __init__(self, messages: Iterable[Any], interval: float = 0.0, host: str = "127.0.0.1", port: int = 0,
+                 hold_open: bool = False, wait_for_subscribe: bool = False):
+        self.messages = [m if isinstance(m, str) else json.dumps(m) for m in messages]
+        self.interval = interval
+        self.host = host
+        self.port = port
+        self.hold_open = hold_open
+        self.wait_for_subscribe = wait_for_subscribe
+        self.received: List[str] = []
+        self.connections = 0
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def _serve(self, connection) -> None:
+        self.connections += 1
+        if self.wait_for_subscribe:
+            self.received.append(await connection.recv())
+
+        async def receive():
+            async for message in connection:
+                self.received.append(message)
+
+        receiver = asyncio.create_task(receive())
+        try:
+            for message in self.messages:
+                await connection.send(message)
+                if self.interval:
+                    await asyncio.sleep(self.interval)
+            if self.hold_open:
+                await connection.wait_closed()
+        finally:
+            receiver.cancel()
+
+    async def __aenter__(self) -> "ReplayServer":
+        from websockets.asyncio.server import serve
+
+        self._server = await serve(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+
+_prices: Optional[LivePrices] = None
+_feed: Optional[LiveFeed] = None
+_lock = threading.Lock()
+
+
+def get_live_prices() -> LivePrices:
+    """The process-wide live price rings (empty unless a feed is running)."""
+    global _prices
+    with _lock:
+        if _prices is None:
+            _prices = LivePrices(
+                capacity=int(os.getenv("LIVE_RING_SIZE", "4096")),
+                max_age=float(os.getenv("LIVE_MAX_AGE_S", "30")),
+            )
+        return _prices
+
+
+def reset_live_prices() -> None:
+    global _prices
+    with _lock:
+        _prices = None
+
+
+def start_live_feed() -> Optional[LiveFeed]:
+    """Starts the configured feed on the running loop; no-op when ``LIVE_FEED`` is unset."""
+    global _feed
+    name = os.getenv("LIVE_FEED", "").lower()
+    if not name:
+        return None
+    if name not in FEEDS:
+        raise ValueError(f"Unknown LIVE_FEED: {name} (expected one of {', '.join(FEEDS)})")
+    symbols = [s.strip() for s in os.getenv("LIVE_FEED_SYMBOLS", "BTC,ETH,SOL,BNB,DOGE").split(",") if s.strip()]
+    _feed = LiveFeed(FEEDS[name], symbols, get_live_prices(), url=os.getenv("LIVE_FEED_URL") or None)
+    _feed.start()
+    return _feed
+
+
+async def stop_live_feed() -> None:
+    global _feed
+    feed, _feed = _feed, None
+    if feed is not None:
+        await feed.stop()
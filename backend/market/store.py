@@ -0,0 +1,349 @@
+"""
+Local append-only store of CoinGecko ``market_chart`` series.
+
+Every analysis call used to download up to a year of history although only the
+newest points change. ``PriceStore`` keeps one series per
+``(vs_currency, symbol, granularity)`` on disk, as raw little-endian column files
+that are memory-mapped for reads::
+
+    <directory>/<vs_currency>/<symbol>/<granularity>/v<N>/
+        timestamp.bin   int64 ms, ascending
+        price.bin       float64
+        market_cap.bin  float64
+        volume.bin      float64
+        tail.npy        the live last point (timestamp, price, market_cap, volume)
+
+The granularity is CoinGecko's own for the requested window: 5-minute up to 1
+day, hourly up to 90 days, daily beyond. CoinGecko's last point is the current
+price, not a settled bar, so it is kept apart in ``tail.npy`` and replaced on the
+next refresh. Only settled points are appended.
+
+``load`` serves a window from disk when the series covers it and the tail is
+younger than the granularity's TTL (shared with ``cache.py``). Otherwise it
+fetches only the missing tail through ``/market_chart/range``. The range is
+widened to the shortest span CoinGecko serves at that granularity, for example
+91 days for daily series. A window that reaches further back than the series, or a gap
+longer than CoinGecko serves at that granularity, refetches the whole window and
+writes a new ``v<N>`` directory. Readers holding the old maps are unaffected.
+
+Appends write the value columns before ``timestamp.bin``, and readers map the
+shortest column, so a torn append is never read. Writers hold an ``flock`` on the
+series so several processes can share a directory (where ``fcntl`` is missing, as
+on Windows, only writers in the same process are serialized). ``load`` does its
+file I/O in a worker thread.
+
+Environment:
+
+    MARKET_STORE_DIR   directory for the store; empty disables it (default)
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .cache import granularity, parse_ttls
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("price", "<f8"),
+    ("market_cap", "<f8"),
+    ("volume", "<f8"),
+    ("timestamp", "<i8"),  # written last; its length publishes an append
+)
+# Position of each column in the (timestamp, price, market_cap, volume) rows.
+ROW_INDEX = {"timestamp": 0, "price": 1, "market_cap": 2, "volume": 3}
+STEP_MS = {"minute": 5 * 60_000, "hourly": 3_600_000, "daily": 86_400_000}
+DAY_S = 86_400
+# Shortest and longest range (seconds) CoinGecko answers at each granularity.
+RANGE_SPANS = {"minute": (0, DAY_S), "hourly": (DAY_S + 3600, 90 * DAY_S), "daily": (91 * DAY_S, None)}
+
+FetchRange = Callable[[int, int], Awaitable[Dict[str, Any]]]
+
+
+class SeriesWindow(NamedTuple):
+    """Settled columns of a window (memory-map views, not copies) and the live tail."""
+
+    timestamps: np.ndarray
+    prices: np.ndarray
+    market_caps: np.ndarray
+    volumes: np.ndarray
+    tail: Optional[np.ndarray]
+
+
+def payload_to_rows(payload: Dict[str, Any]) -> np.ndarray:
+    """
+    ``market_chart`` JSON -> ``(n, 4)`` float64 rows of (timestamp ms, price,
+    market_cap, volume), sorted and de-duplicated by timestamp.
+    """
+    prices = payload.get("prices") or []
+    if not prices:
+        raise ValueError("No price data found")
+    rows = np.full((len(prices), 4), np.nan)
+    rows[:, :2] = np.asarray(prices, dtype=np.float64)
+    for column, name in ((2, "market_caps"), (3, "total_volumes")):
+        values = payload.get(name) or []
+        if len(values) == len(prices):
+            rows[:, column] = np.asarray(values, dtype=np.float64)[:, 1]
+    rows = rows[np.argsort(rows[:, 0], kind="stable")]
+    keep = np.ones(len(rows), dtype=bool)
+    keep[:-1] = rows[1:, 0] != rows[:-1, 0]  # last of each duplicate timestamp wins
+    return rows[keep]
+
+
+def rows_to_frame(timestamps: np.ndarray, values: np.ndarray) -> pd.DataFrame:
+    """The DataFrame shape ``fetch_coingecko_prices`` returns: columns indexed by 'timestamp'."""
+    frame = pd.DataFrame(
+        {"price": values[:, 0], "market_cap": values[:, 1], "volume": values[:, 2]},
+        index=pd.to_datetime(np.asarray(timestamps, dtype=np.int64) * 1_000_000),  # ns, as before
+    )
+    frame.index.name = "timestamp"
+    return frame
+
+
+def _version_dirs(directory: str) -> List[int]:
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[1:]) for name in names if name.startswith("v") and name[1:].isdigit())
+
+
+def _write_columns(directory: str, rows: np.ndarray, mode: str) -> None:
+    for name, dtype in COLUMNS:
+        values = rows[:, ROW_INDEX[name]]
+        with open(os.path.join(directory, f"{name}.bin"), mode) as handle:
+            handle.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+            handle.flush()
+            os.fsync(handle.fileno())
+
+
+def _write_tail(directory: str, tail: np.ndarray) -> None:
+    tmp = os.path.join(directory, "tail.tmp.npy")
+    np.save(tmp, tail)
+    os.replace(tmp, os.path.join(directory, "tail.npy"))
+
+
+class PriceSeries:
+    """One on-disk series. Reads are lock-free; writes take the series lock."""
+
+    def __init__(self, directory: str, granularity_name: str):
+        self.directory = directory
+        self.granularity = granularity_name
+        self._maps: Dict[str, Tuple[Tuple[str, int], np.ndarray]] = {}
+        self._write_lock = threading.Lock()
+
+    def _current(self) -> Optional[str]:
+        versions = _version_dirs(self.directory)
+        return os.path.join(self.directory, f"v{versions[-1]}") if versions else None
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        os.makedirs(self.directory, exist_ok=True)
+        with self._write_lock, open(os.path.join(self.directory, ".lock"), "a") as handle:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _column(self, version_dir: str, name: str, dtype: str, length: int) -> np.ndarray:
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        key = (version_dir, length)
+        cached = self._maps.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        values = np.memmap(os.path.join(version_dir, f"{name}.bin"), dtype=dtype, mode="r", shape=(length,))
+        self._maps[name] = (key, values)
+        return values
+
+    def columns(self) -> Tuple[Dict[str, np.ndarray], Optional[np.ndarray]]:
+        """Settled columns (memory maps) and the tail row, as of now."""
+        try:
+            return self._read_columns()
+        except FileNotFoundError:
+            # A concurrent replace removed the version between listing and mapping.
+            return self._read_columns()
+
+    def _read_columns(self) -> Tuple[Dict[str, np.ndarray], Optional[np.ndarray]]:
+        version_dir = self._current()
+        if version_dir is None:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS}, None
+        length = None
+        for name, dtype in COLUMNS:
+            try:
+                rows = os.path.getsize(os.path.join(version_dir, f"{name}.bin")) // np.dtype(dtype).itemsize
+            except FileNotFoundError:
+                rows = 0
+            length = rows if length is None else min(length, rows)
+        columns = {name: self._column(version_dir, name, dtype, length or 0) for name, dtype in COLUMNS}
+        try:
+            tail = np.load(os.path.join(version_dir, "tail.npy"))
+        except FileNotFoundError:
+            tail = None
+        return columns, tail
+
+    def span(self) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+        """``(first, last settled, latest)`` timestamps in ms; None when empty."""
+        columns, tail = self.columns()
+        timestamps = columns["timestamp"]
+        first = int(timestamps[0]) if len(timestamps) else None
+        settled = int(timestamps[-1]) if len(timestamps) else None
+        latest = int(tail[0]) if tail is not None else settled
+        if first is None and tail is not None:
+            first = int(tail[0])
+        return first, settled, latest
+
+    def window(self, start_ms: int) -> SeriesWindow:
+        """Points at or after ``start_ms``; the settled part is a view of the maps."""
+        columns, tail = self.columns()
+        index = int(np.searchsorted(columns["timestamp"], start_ms, side="left"))
+        return SeriesWindow(
+            columns["timestamp"][index:],
+            columns["price"][index:],
+            columns["market_cap"][index:],
+            columns["volume"][index:],
+            tail if tail is not None and tail[0] >= start_ms else None,
+        )
+
+    def frame(self, start_ms: int) -> pd.DataFrame:
+        window = self.window(start_ms)
+        timestamps = window.timestamps
+        values = np.column_stack([window.prices, window.market_caps, window.volumes])
+        if window.tail is not None:
+            timestamps = np.append(timestamps, np.int64(window.tail[0]))
+            values = np.vstack([values, window.tail[1:]])
+        return rows_to_frame(timestamps, values)
+
+    def extend(self, rows: np.ndarray) -> None:
+        """Appends the settled rows newer than the series and replaces the tail with the last row."""
+        with self._locked():
+            version_dir = self._current()
+            if version_dir is None:
+                self._write_version(rows, 1)
+                return
+            columns, _ = self.columns()
+            settled = columns["timestamp"]
+            last = int(settled[-1]) if len(settled) else None
+            new = rows[:-1] if last is None else rows[:-1][rows[:-1, 0] > last]
+            if len(new):
+                _write_columns(version_dir, new, "ab")
+            _write_tail(version_dir, rows[-1])
+
+    def replace(self, rows: np.ndarray) -> None:
+        """Writes ``rows`` as a new version; readers of the old one keep their maps."""
+        with self._locked():
+            versions = _version_dirs(self.directory)
+            self._write_version(rows, (versions[-1] + 1) if versions else 1)
+            for version in versions:
+                _remove_version(os.path.join(self.directory, f"v{version}"))
+
+    def _write_version(self, rows: np.ndarray, version: int) -> None:
+        tmp = os.path.join(self.directory, f"v{version}.tmp")
+        os.makedirs(tmp, exist_ok=True)
+        _write_columns(tmp, rows[:-1], "wb")
+        _write_tail(tmp, rows[-1])
+        os.rename(tmp, os.path.join(self.directory, f"v{version}"))
+
+
+def _remove_version(directory: str) -> None:
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+class PriceStore:
+    """
+    Per-symbol series under ``directory``; see the module docstring.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttls: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.directory = directory
+        self._ttls = dict(ttls or parse_ttls(os.getenv("MARKET_CACHE_TTLS", "")))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str, str], PriceSeries] = {}
+        self.local_reads = 0
+        self.fetches = 0
+
+    def series(self, symbol: str, vs_currency: str, granularity_name: str) -> PriceSeries:
+        key = (vs_currency.lower(), symbol.lower(), granularity_name)
+        if any(part in ("", ".", "..") or os.sep in part for part in key[:2]):
+            raise ValueError(f"Invalid symbol for the price store: {symbol!r}")
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = PriceSeries(os.path.join(self.directory, *key), granularity_name)
+                self._series[key] = series
+            return series
+
+    async def load(self, symbol: str, days: float, vs_currency: str, fetch_range: FetchRange) -> pd.DataFrame:
+        """
+        The ``days`` window for ``symbol``, from disk when possible. ``fetch_range(from_s, to_s)``
+        returns the ``/market_chart/range`` payload for the missing part.
+        """
+        name = granularity(days)
+        series = self.series(symbol, vs_currency, name)
+        now = self._clock()
+        now_ms = int(now * 1000)
+        start_ms = now_ms - int(days * DAY_S * 1000)
+        # Disk reads, fsyncs and the series lock run in a worker thread, off the event loop.
+        first, settled, latest = await asyncio.to_thread(series.span)
+        covered = first is not None and first <= start_ms + STEP_MS[name]
+
+        if covered and now_ms - latest <= self._ttls[name] * 1000:
+            self.local_reads += 1
+            return await asyncio.to_thread(series.frame, start_ms)
+
+        self.fetches += 1
+        shortest, longest = RANGE_SPANS[name]
+        since = settled if settled is not None else latest
+        if covered and (longest is None or now_ms - since <= longest * 1000):
+            # Only the missing tail, widened to keep CoinGecko at this granularity.
+            from_s = min(since // 1000, int(now) - shortest)
+            write = series.extend
+        else:
+            from_s = int(now - days * DAY_S)
+            write = series.replace
+        rows = payload_to_rows(await fetch_range(from_s, int(now)))
+        await asyncio.to_thread(write, rows)
+        return await asyncio.to_thread(series.frame, start_ms)
+
+
+_store: Optional[PriceStore] = None
+_store_lock = threading.Lock()
+
+
+def get_price_store() -> Optional[PriceStore]:
+    """The process-wide store, or None when ``MARKET_STORE_DIR`` is unset."""
+    global _store
+    directory = os.getenv("MARKET_STORE_DIR")
+    if not directory:
+        return None
+    with _store_lock:
+        if _store is None or _store.directory != directory:
+            _store = PriceStore(directory)
+        return _store
+
+
+def reset_price_store() -> None:
+    global _store
+    with _store_lock:
+        _store = None
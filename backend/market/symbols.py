@@ -0,0 +1,367 @@
+"""
+Symbol to CoinGecko id resolution.
+
+The API used to map six tickers through a hardcoded dict and lowercase anything
+else, so "PEPE" became a request for ``/coins/pepe`` and a 404, and the toolkits
+expected callers to already know CoinGecko ids. ``SymbolResolver`` keeps
+CoinGecko's full coin list (``/coins/list?include_platform=true``) in memory as a
+``SymbolIndex``:
+
+* hash indexes over id, ticker, name, and contract address (per chain and across
+  chains), so exact lookups are one dict probe;
+* a sorted key array for prefix search (``bisect``), for autocomplete-style
+  queries.
+
+Tickers are ambiguous (hundreds of coins call themselves "BTC"). Candidates are
+ordered deterministically: the built-in preferred coin for the ticker, then
+market-cap rank (the top ``SYMBOLS_RANKED`` coins, fetched with the list), then
+native coins before tokens, then the shortest and alphabetically first id.
+
+The list is persisted to ``SYMBOLS_CACHE_PATH`` and loaded from there at start-up;
+``start_symbol_refresh()`` (API startup) downloads it again in the background
+once it is older than ``SYMBOLS_REFRESH_S``. Lookups never wait on the network.
+Until a list is available, the index only holds the built-in major coins and
+unknown queries fall back to the lowercased input, as before.
+
+Environment:
+
+    SYMBOLS_CACHE_PATH        persisted coin list (default market_store/coingecko_coins.json;
+                              empty keeps it in memory only)
+    SYMBOLS_REFRESH_S         age after which the list is downloaded again (default 86400)
+    SYMBOLS_RANKED            top coins by market cap to rank ambiguous tickers by (default 250, 0 disables)
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from backend.http_client import get_async_client
+from backend.rate_limit import Priority, rate_limited_get
+
+logger = logging.getLogger(__name__)
+
+# Preferred coin for the most traded tickers; also the index before a list is loaded.
+PREFERRED = {
+    "btc": ("bitcoin", "Bitcoin"),
+    "eth": ("ethereum", "Ethereum"),
+    "usdt": ("tether", "Tether"),
+    "bnb": ("binancecoin", "BNB"),
+    "sol": ("solana", "Solana"),
+    "usdc": ("usd-coin", "USDC"),
+    "xrp": ("ripple", "XRP"),
+    "doge": ("dogecoin", "Dogecoin"),
+    "ada": ("cardano", "Cardano"),
+    "trx": ("tron", "TRON"),
+    "avax": ("avalanche-2", "Avalanche"),
+    "link": ("chainlink", "Chainlink"),
+    "dot": ("polkadot", "Polkadot"),
+    "matic": ("matic-network", "Polygon"),
+    "ltc": ("litecoin", "Litecoin"),
+}
+
+# Common chain names used by the tools, mapped to CoinGecko platform ids.
+CHAIN_ALIASES = {
+    "eth": "ethereum",
+    "bsc": "binance-smart-chain",
+    "bnb": "binance-smart-chain",
+    "polygon": "polygon-pos",
+    "matic": "polygon-pos",
+    "arbitrum": "arbitrum-one",
+    "optimism": "optimistic-ethereum",
+    "avax": "avalanche",
+    "sol": "solana",
+}
+
+
+class Coin(NamedTuple):
+    id: str
+    symbol: str                # lower case
+    name: str
+    platforms: Dict[str, str]  # CoinGecko platform id -> contract address
+
+
+def _address_key(address: str) -> str:
+    # EVM addresses are case-insensitive hex; base58 (Solana) addresses are not.
+    return address.lower() if address.startswith("0x") else address
+
+
+def chain_id(chain: str) -> str:
+    chain = chain.strip().lower()
+    return CHAIN_ALIASES.get(chain, chain)
+
+
+class SymbolIndex:
+    """Immutable lookup structures over one coin list (see the module docstring)."""
+
+    def __init__(self, coins: Iterable[Coin], ranks: Optional[Dict[str, int]] = None):
+        self.ranks = dict(ranks or {})
+        self.by_id: Dict[str, Coin] = {}
+        for coin in coins:
+            self.by_id.setdefault(coin.id, coin)
+
+        by_symbol: Dict[str, List[Coin]] = {}
+        by_name: Dict[str, List[Coin]] = {}
+        by_address: Dict[str, List[Coin]] = {}
+        self.by_contract: Dict[Tuple[str, str], Coin] = {}
+        for coin in self.by_id.values():
+            by_symbol.setdefault(coin.symbol, []).append(coin)
+            by_name.setdefault(coin.name.lower(), []).append(coin)
+            for platform, address in coin.platforms.items():
+                if not address:
+                    continue
+                key = _address_key(address)
+                by_address.setdefault(key, []).append(coin)
+                self.by_contract.setdefault((platform, key), coin)
+        self.by_symbol = {k: tuple(sorted(v, key=self._preference)) for k, v in by_symbol.items()}
+        self.by_name = {k: tuple(sorted(v, key=self._preference)) for k, v in by_name.items()}
+        self.by_address = {k: tuple(sorted(v, key=self._preference)) for k, v in by_address.items()}
+
+        # Prefix index: (key, preference, id) sorted by key, searched with bisect.
+        entries = {(k, c.id) for k, cs in by_symbol.items() for c in cs}
+        entries |= {(k, c.id) for k, cs in by_name.items() for c in cs}
+        self._prefix = sorted((k, self._preference(self.by_id[i]), i) for k, i in entries)
+        self._prefix_keys = [entry[0] for entry in self._prefix]
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def _preference(self, coin: Coin) -> Tuple:
+        preferred = PREFERRED.get(coin.symbol, (None,))[0] == coin.id
+        rank = self.ranks.get(coin.id, float("inf"))
+        return (not preferred, rank, bool(coin.platforms), len(coin.id), coin.id)
+
+    def candidates(self, query: str, chain: Optional[str] = None) -> List[Coin]:
+        """
+        Every coin ``query`` may mean, best first: the preferred coin of a major
+        ticker, then id, contract address, ticker and name matches.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        lowered = query.lower()
+        found: List[Coin] = []
+        preferred = PREFERRED.get(lowered)
+        if preferred is not None and preferred[0] in self.by_id:
+            found.append(self.by_id[preferred[0]])
+        if lowered in self.by_id:
+            found.append(self.by_id[lowered])
+        address = _address_key(query)
+        if chain is not None:
+            coin = self.by_contract.get((chain_id(chain), address))
+            if coin is not None:
+                found.append(coin)
+        found.extend(self.by_address.get(address, ()))
+        found.extend(self.by_symbol.get(lowered, ()))
+        found.extend(self.by_name.get(lowered, ()))
+        return list({coin.id: coin for coin in found}.values())
+
+    def contract(self, address: str, chain: Optional[str] = None) -> Optional[Coin]:
+        """The coin deployed at ``address`` (on ``chain`` when given), or None."""
+        key = _address_key(address.strip())
+        if chain is not None:
+            return self.by_contract.get((chain_id(chain), key))
+        found = self.by_address.get(key)
+        return found[0] if found else None
+
+    def resolve(self, query: str, chain: Optional[str] = None) -> Optional[str]:
+        """The CoinGecko id ``query`` most likely means, or None."""
+        found = self.candidates(query, chain)
+        return found[0].id if found else None
+
+    def search(self, prefix: str, limit: int = 10) -> List[Coin]:
+        """Coins whose ticker or name starts with ``prefix``, best first."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self._prefix_keys, prefix)
+        end = bisect.bisect_left(self._prefix_keys, prefix + "\uffff", lo=start)
+        matches = sorted(self._prefix[start:end], key=lambda entry: (entry[0] != prefix, entry[1]))
+        ids = dict.fromkeys(entry[2] for entry in matches)
+        return [self.by_id[i] for i in list(ids)[:limit]]
+
+
+def seed_coins() -> List[Coin]:
+    return [Coin(coin_id, symbol, name, {}) for symbol, (coin_id, name) in PREFERRED.items()]
+
+
+def parse_coin_list(payload: List[Dict[str, Any]]) -> List[Coin]:
+    """Coins from a ``/coins/list?include_platform=true`` response."""
+    coins = []
+    for item in payload:
+        if not item.get("id") or not item.get("symbol"):
+            continue
+        platforms = {k: v for k, v in (item.get("platforms") or {}).items() if k and v}
+        coins.append(Coin(item["id"], item["symbol"].lower(), item.get("name") or item["id"], platforms))
+    return coins
+
+
+class SymbolResolver:
+    """
+    Holds the current ``SymbolIndex`` and replaces it when a refreshed list has
+    been downloaded. Reads are lock-free (one attribute read).
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 86400.0, ranked: int = 250,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_age = max_age
+        self.ranked = ranked
+        self._clock = clock
+        self.fetched_at: Optional[float] = None
+        self.index = SymbolIndex(seed_coins())
+        self._refreshing: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        if path:
+            self._load()
+
+    @property
+    def loaded(self) -> bool:
+        """Whether a full coin list (not just the built-in coins) is indexed."""
+        return self.fetched_at is not None
+
+    def is_stale(self) -> bool:
+        return self.fetched_at is None or self._clock() - self.fetched_at > self.max_age
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self._install(parse_coin_list(data["coins"]), data.get("ranks") or {}, float(data["fetched_at"]))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning("Ignoring unreadable coin list at %s", self.path, exc_info=True)
+
+    def _persist(self, payload: List[Dict[str, Any]], ranks: Dict[str, int]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.fetched_at, "coins": payload, "ranks": ranks}, f)
+        os.replace(tmp, self.path)
+
+    def _install(self, coins: List[Coin], ranks: Dict[str, int], fetched_at: float) -> None:
+        # Built-in coins stay resolvable even if the downloaded list lacks one.
+        self.index = SymbolIndex(coins + seed_coins(), ranks)
+        self.fetched_at = fetched_at
+
+    async def _download(self) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        from backend.tools.utils import COINGECKO_API_URL
+
+        client = get_async_client(COINGECKO_API_URL)
+        resp = await rate_limited_get(
+            client, f"{COINGECKO_API_URL}/coins/list?include_platform=true", priority=Priority.BACKGROUND, timeout=30.0
+        )
+        resp.raise_for_status()
+        payload = resp.json()
+        ranks: Dict[str, int] = {}
+        if self.ranked > 0:
+            try:
+                per_page = min(self.ranked, 250)
+                for page in range(1, -(-self.ranked // per_page) + 1):
+                    markets = await rate_limited_get(
+                        client,
+                        f"{COINGECKO_API_URL}/coins/markets?vs_currency=usd&order=market_cap_desc"
+                        f"&per_page={per_page}&page={page}",
+                        priority=Priority.BACKGROUND,
+                        timeout=30.0,
+                    )
+                    markets.raise_for_status()
+                    for item in markets.json():
+                        ranks.setdefault(item["id"], len(ranks) + 1)
+            except Exception:
+                # Ranking only orders ambiguous tickers; the list alone is still usable.
+                logger.warning("Could not fetch market-cap ranks for the coin list", exc_info=True)
+        return payload, ranks
+
+    async def refresh(self) -> None:
+        """Downloads, indexes and persists the coin list. Concurrent calls share one download."""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.get_running_loop().create_task(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh(self) -> None:
+        payload, ranks = await self._download()
+        coins = parse_coin_list(payload)
+        await asyncio.to_thread(self._install, coins, ranks, self._clock())
+        if self.path:
+            try:
+                await asyncio.to_thread(self._persist, payload, ranks)
+            except OSError:
+                logger.warning("Could not persist the coin list to %s", self.path, exc_info=True)
+        logger.info("Indexed %d CoinGecko coins", len(self.index))
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            if self.is_stale():
+                try:
+                    await self.refresh()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.warning("Coin list refresh failed; keeping the current index", exc_info=True)
+                    await asyncio.sleep(min(self.max_age, 300.0))
+                    continue
+            await asyncio.sleep(max(1.0, self.fetched_at + self.max_age - self._clock()))
+
+    def start(self) -> None:
+        """Keeps the list fresh from a background task on the running loop."""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        task, self._loop_task = self._loop_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def resolve(self, query: str, chain: Optional[str] = None) -> Optional[str]:
+        return self.index.resolve(query, chain)
+
+
+_resolver: Optional[SymbolResolver] = None
+_lock = threading.Lock()
+
+
+def get_symbol_resolver() -> SymbolResolver:
+    """The process-wide resolver, loaded from ``SYMBOLS_CACHE_PATH`` on first use."""
+    global _resolver
+    with _lock:
+        if _resolver is None:
+            _resolver = SymbolResolver(
+                path=os.getenv("SYMBOLS_CACHE_PATH", "market_store/coingecko_coins.json") or None,
+                max_age=float(os.getenv("SYMBOLS_REFRESH_S", "86400")),
+                ranked=int(os.getenv("SYMBOLS_RANKED", "250")),
+            )
+        return _resolver
+
+
+def reset_symbol_resolver() -> None:
+    global _resolver
+    with _lock:
+        _resolver = None
+
+
+def resolve_coin_id(query: str, chain: Optional[str] = None) -> str:
+    """
+    The CoinGecko id for a ticker, name, id or contract address. Unknown queries
+    come back lowercased, so callers behave as before for ids the index lacks.
+    """
+    return get_symbol_resolver().resolve(query, chain) or query.strip().lower()
+
+
+def start_symbol_refresh() -> None:
+    get_symbol_resolver().start()
+
+
+async def stop_symbol_refresh() -> None:
+    if _resolver is not None:
+        await _resolver.stop()
@@ -0,0 +1,470 @@
+"""
+Token-bucket rate limiting and retry for upstream APIs.
+
+CoinGecko answers bursts with 429s, and every toolkit used to fire its requests
+independently. Each limited upstream host gets one process-wide ``TokenBucket``;
+``rate_limited_get`` takes a token before every request and retries 429/5xx
+responses. It honours ``Retry-After`` (which also pauses the whole bucket) and
+otherwise backs off exponentially with jitter. The last response is returned
+once the retries run out, so callers keep their own 429 handling.
+
+``rate_limited_get_sync`` does the same for the synchronous tools, blocking their
+worker thread on the same bucket.
+
+Waiters are served by priority, then arrival. ``INTERACTIVE`` (API requests such
+as ``/market/price``) goes ahead of ``DEFAULT`` tool calls and ``BACKGROUND``
+work such as sleep-time preparation. Wrap a code path in
+``request_priority(...)`` to set the priority of everything it fetches; the value
+follows the context into tasks and ``run_in_threadpool`` calls.
+
+Budgets, as ``requests/seconds[:burst]`` per host:
+
+    COINGECKO_API_TIER        public (10/min), demo (30/min), analyst, lite (500/min) or pro (1000/min).
+                              Defaults to demo when COINGECKO_API_KEY is set, else public.
+    RATE_LIMITS               overrides, e.g. "api.coingecko.com=30/60:5,api.etherscan.io=5/1"
+    RATE_LIMIT_SHARED_PATH    SQLite file holding the buckets, so every worker process on the
+                              host shares one budget (default: per process)
+    RATE_LIMIT_MAX_RETRIES    retries after a 429/5xx or connection error (default 3)
+    RATE_LIMIT_MAX_BACKOFF_S  cap for one backoff sleep (default 30)
+"""
+import asyncio
+import contextlib
+import contextvars
+import email.utils
+import heapq
+import itertools
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from enum import IntEnum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+import httpx
+
+from backend.cassettes import replaying
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BACKGROUND = 2
+
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("request_priority", default=Priority.DEFAULT)
+
+
+@contextlib.contextmanager
+def request_priority(priority: Priority) -> Iterator[None]:
+    """Sets the priority of upstream requests made inside the block."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+# CoinGecko requests per minute by plan.
+COINGECKO_TIERS = {"public": 10, "demo": 30, "analyst": 500, "lite": 500, "pro": 1000}
+DEFAULT_LIMITS = {"api.etherscan.io": (5.0, 1.0, 5.0), "api.bscscan.com": (5.0, 1.0, 5.0)}
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, float, float]]:
+    """Parses ``"host=requests/seconds[:burst],..."`` into ``{host: (requests, seconds, burst)}``."""
+    limits: Dict[str, Tuple[float, float, float]] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        host, _, budget = item.partition("=")
+        budget, _, burst = budget.partition(":")
+        requests, _, seconds = budget.partition("/")
+        requests_f, seconds_f = float(requests), float(seconds or 1)
+        limits[host.strip().lower()] = (requests_f, seconds_f, float(burst) if burst else _default_burst(requests_f))
+    return limits
+
+
+def _default_burst(requests: float) -> float:
+    return max(1.0, requests / 2 if requests <= 30 else requests / 10)
+
+
+def configured_limits() -> Dict[str, Tuple[float, float, float]]:
+    tier = os.getenv("COINGECKO_API_TIER") or ("demo" if os.getenv("COINGECKO_API_KEY") else "public")
+    if tier.lower() not in COINGECKO_TIERS:
+        raise ValueError(f"Unknown COINGECKO_API_TIER: {tier}")
+    per_minute = float(COINGECKO_TIERS[tier.lower()])
+    limits = dict(DEFAULT_LIMITS)
+    limits["api.coingecko.com"] = (per_minute, 60.0, _default_burst(per_minute))
+    limits.update(parse_limits(os.getenv("RATE_LIMITS", "")))
+    return limits
+
+
+class SqliteTokenStore:
+    """
+    Bucket state in a SQLite file, so several worker processes share one budget.
+    Every take is one short ``BEGIN IMMEDIATE`` transaction, which
+    ``TokenBucket.acquire`` runs in a worker thread since it can wait on the file lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets "
+                "(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, blocked_until REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def take(self, name: str, rate: float, capacity: float) -> float:
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        db = self._connect()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT tokens, updated, blocked_until FROM rate_buckets WHERE name = ?", (name,)).fetchone()
+            tokens, updated, blocked_until = row if row else (capacity, now, 0.0)
+            tokens, delay = _take(tokens, updated, blocked_until, now, rate, capacity)
+            db.execute(
+                "INSERT INTO rate_buckets (name, tokens, updated, blocked_until) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (name, tokens, now, blocked_until),
+            )
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return delay
+
+    def block(self, name: str, until: float) -> None:
+        db = self._connect()
+        db.execute(
+            "INSERT INTO rate_buckets (name, tokens, updated, blocked_until) VALUES (?, 0, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)",
+            (name, time.time(), until),
+        )
+
+
+def _take(tokens: float, updated: float, blocked_until: float, now: float, rate: float, capacity: float) -> Tuple[float, float]:
+    """Refills and takes one token. Returns ``(tokens left, 0)`` or ``(tokens, seconds to wait)``."""
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if now < blocked_until:
+        return tokens, blocked_until - now
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    return tokens, (1.0 - tokens) / rate
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "loop", "future")
+
+    def __init__(self, priority: int, seq: int, loop: asyncio.AbstractEventLoop):
+        self.priority = priority
+        self.seq = seq
+        self.loop = loop
+        self.future: "asyncio.Future[None]" = loop.create_future()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self) -> None:
+        future = self.future
+
+        def _set():
+            if not future.done():
+                future.set_result(None)
+
+        try:
+            self.loop.call_soon_threadsafe(_set)
+        except RuntimeError:  # loop already closed
+            pass
+
+
+class _ThreadWaiter:
+    """A waiter blocked in ``TokenBucket.acquire_blocking`` on a worker thread."""
+
+    __slots__ = ("priority", "seq", "event")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.event = threading.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self) -> None:
+        self.event.set()
+
+
+class TokenBucket:
+    """
+    ``rate`` tokens per second up to ``capacity``, handed out in priority order.
+
+    Thread-safe and usable from several event loops at once: only the waiter at
+    the head of the queue polls the bucket; the rest sleep until they become head.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        capacity: float,
+        store: Optional[SqliteTokenStore] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("TokenBucket needs rate > 0 and capacity >= 1")
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._store = store
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._waiters: List[Union[_Waiter, _ThreadWaiter]] = []
+        self._seq = itertools.count()
+
+    def _try_take(self) -> float:
+        now = self._clock()
+        self._tokens, delay = _take(self._tokens, self._updated, self._blocked_until, now, self.rate, self.capacity)
+        self._updated = now
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        """Hands out no tokens for ``seconds`` (a ``Retry-After`` from upstream)."""
+        if self._store is not None:
+            self._store.block(self.name, time.time() + seconds)
+            return
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: Optional[Priority] = None) -> None:
+        priority = current_priority() if priority is None else priority
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            waiter = _Waiter(int(priority), next(self._seq), loop)
+            heapq.heappush(self._waiters, waiter)
+        try:
+            while True:
+                future = None
+                with self._lock:
+                    if self._waiters[0] is not waiter:
+                        waiter.future = future = loop.create_future()
+                    elif self._store is None:
+                        delay = self._try_take()
+                if future is not None:
+                    await future
+                    continue
+                if self._store is not None:
+                    # The shared store blocks on a file lock; keep it off the event loop.
+                    delay = await asyncio.to_thread(self._store.take, self.name, self.rate, self.capacity)
+                if delay <= 0:
+                    self._leave(waiter)
+                    return
+                # Head of the queue: sleep until the next token, then poll again.
+                await asyncio.sleep(delay)
+        except BaseException:
+            self._leave(waiter)
+            raise
+
+    def acquire_blocking(self, priority: Optional[Priority] = None) -> None:
+        """``acquire`` for synchronous callers on worker threads; queues with the async waiters."""
+        priority = current_priority() if priority is None else priority
+        with self._lock:
+            waiter = _ThreadWaiter(int(priority), next(self._seq))
+            heapq.heappush(self._waiters, waiter)
+        try:
+            while True:
+                with self._lock:
+                    head = self._waiters[0] is waiter
+                    if not head:
+                        waiter.event.clear()
+                    elif self._store is None:
+                        delay = self._try_take()
+                if not head:
+                    waiter.event.wait()
+                    continue
+                if self._store is not None:
+                    delay = self._store.take(self.name, self.rate, self.capacity)
+                if delay <= 0:
+                    self._leave(waiter)
+                    return
+                time.sleep(delay)
+        except BaseException:
+            self._leave(waiter)
+            raise
+
+    def _leave(self, waiter: Union[_Waiter, _ThreadWaiter]) -> None:
+        with self._lock:
+            if waiter in self._waiters:
+                was_head = self._waiters[0] is waiter
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                if was_head and self._waiters:
+                    self._waiters[0].wake()
+
+
+_buckets: Dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+_limits: Optional[Dict[str, Tuple[float, float, float]]] = None
+_store: Optional[SqliteTokenStore] = None
+
+
+def get_rate_limiter(url: str) -> Optional[TokenBucket]:
+    """The bucket for ``url``'s host, or None when the host is not limited (or traffic is replayed)."""
+    global _limits, _store
+    if replaying():
+        return None
+    host = (httpx.URL(url).host or "").lower()
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is not None:
+            return bucket
+        if _limits is None:
+            _limits = configured_limits()
+            path = os.getenv("RATE_LIMIT_SHARED_PATH")
+            _store = SqliteTokenStore(path) if path else None
+        limit = _limits.get(host)
+        if limit is None:
+            return None
+        requests, seconds, burst = limit
+        bucket = TokenBucket(host, requests / seconds, burst, store=_store)
+        _buckets[host] = bucket
+        return bucket
+
+
+def reset_rate_limiters() -> None:
+    """Forgets every bucket and re-reads the configuration on next use (tests, config reloads)."""
+    global _limits, _store
+    with _buckets_lock:
+        _buckets.clear()
+        _limits = None
+        _store = None
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds from a ``Retry-After`` header (delta-seconds or HTTP date), if any."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform in ``[0, min(cap, 2 ** attempt))`` seconds, at least 0.1."""
+    cap = float(os.getenv("RATE_LIMIT_MAX_BACKOFF_S", "30"))
+    return max(0.1, random.uniform(0, min(cap, 2.0 ** attempt)))
+
+
+async def rate_limited_get(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    priority: Optional[Priority] = None,
+    max_retries: Optional[int] = None,
+    **kwargs: Any,
+) -> httpx.Response:
+    """
+    ``client.get(url, **kwargs)`` behind the host's bucket, retried on 429/5xx and
+    connection errors. Returns the last response when retries run out.
+    """
+    retries = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3")) if max_retries is None else max_retries
+    bucket = get_rate_limiter(url)
+    cap = float(os.getenv("RATE_LIMIT_MAX_BACKOFF_S", "30"))
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            await bucket.acquire(priority)
+        try:
+            response = await client.get(url, **kwargs)
+        except httpx.TransportError as exc:
+            if attempt == retries:
+                raise
+            delay = backoff(attempt)
+            logger.warning("Request to %s failed (%s); retrying in %.1fs", httpx.URL(url).host, exc, delay)
+            await asyncio.sleep(delay)
+            continue
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+        delay = retry_after(response)
+        if delay is None:
+            delay = backoff(attempt)
+        delay = min(delay, cap)
+        logger.warning("%s answered %d; retrying in %.1fs", httpx.URL(url).host, response.status_code, delay)
+        if response.status_code == 429 and bucket is not None:
+            # Everyone waiting on this host backs off, not just this request.
+            await asyncio.to_thread(bucket.pause, delay)
+        else:
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def rate_limited_get_sync(
+    client: httpx.Client,
+    url: str,
+    *,
+    priority: Optional[Priority] = None,
+    max_retries: Optional[int] = None,
+    **kwargs: Any,
+) -> httpx.Response:
+    """
+    ``rate_limited_get`` for the synchronous tools: blocks the calling worker thread
+    on the same per-host bucket, so sync and async callers share one budget.
+    """
+    retries = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3")) if max_retries is None else max_retries
+    bucket = get_rate_limiter(url)
+    cap = float(os.getenv("RATE_LIMIT_MAX_BACKOFF_S", "30"))
+    for attempt in range(retries + 1):
+        if bucket is not None:
+            bucket.acquire_blocking(priority)
+        try:
+            response = client.get(url, **kwargs)
+        except httpx.TransportError as exc:
+            if attempt == retries:
+                raise
+            delay = backoff(attempt)
+            logger.warning("Request to %s failed (%s); retrying in %.1fs", httpx.URL(url).host, exc, delay)
+            time.sleep(delay)
+            continue
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+        delay = retry_after(response)
+        if delay is None:
+            delay = backoff(attempt)
+        delay = min(delay, cap)
+        logger.warning("%s answered %d; retrying in %.1fs", httpx.URL(url).host, response.status_code, delay)
+        if response.status_code == 429 and bucket is not None:
+            bucket.pause(delay)
+        else:
+            time.sleep(delay)
+    raise AssertionError("unreachable")
@@ -0,0 +1,56 @@
+"""
+web3 providers that send JSON-RPC through the shared ``httpx`` clients.
+
+``Web3.HTTPProvider`` and ``AsyncHTTPProvider`` bring their own ``requests`` and
+``aiohttp`` sessions, which are not part of the pooled clients in
+``backend.http_client`` and cannot be recorded or replayed by
+``backend.cassettes``. These providers swap web3's session manager for one that
+posts through ``get_client`` / ``get_async_client``, so RPC calls share the
+per-origin keep-alive pools and the cassette transport with every other
+outbound request.
+"""
+from typing import Any, Dict, Optional, Union
+
+from web3 import AsyncHTTPProvider, HTTPProvider
+
+from backend.http_client import get_async_client, get_client
+
+DEFAULT_RPC_TIMEOUT_S = 30.0
+
+
+class _HttpxSessionManager:
+    """The subset of web3's ``HTTPSessionManager`` the HTTP providers call."""
+
+    def __init__(self):
+        # Read by ``AsyncHTTPProvider.disconnect``; the shared clients are closed at shutdown instead.
+        self.session_cache: Dict[str, Any] = {}
+
+    @staticmethod
+    def _options(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {"headers": kwargs.get("headers"), "timeout": kwargs.get("timeout") or DEFAULT_RPC_TIMEOUT_S}
+
+    def make_post_request(self, endpoint_uri: str, data: Union[bytes, Dict[str, Any]], **kwargs: Any) -> bytes:
+        body = {"json": data} if isinstance(data, dict) else {"content": data}
+        response = get_client(endpoint_uri).post(endpoint_uri, **body, **self._options(kwargs))
+        response.raise_for_status()
+        return response.content
+
+    async def async_make_post_request(self, endpoint_uri: str, data: Union[bytes, Dict[str, Any]], **kwargs: Any) -> bytes:
+        body = {"json": data} if isinstance(data, dict) else {"content": data}
+        response = await get_async_client(endpoint_uri).post(endpoint_uri, **body, **self._options(kwargs))
+        response.raise_for_status()
+        return response.content
+
+
+def http_provider(rpc_url: str, request_kwargs: Optional[Dict[str, Any]] = None) -> HTTPProvider:
+    """A synchronous ``HTTPProvider`` for ``rpc_url`` that posts through the shared client."""
+    provider = HTTPProvider(rpc_url, request_kwargs=request_kwargs)
+    provider._request_session_manager = _HttpxSessionManager()
+    return provider
+
+
+def async_http_provider(rpc_url: str, request_kwargs: Optional[Dict[str, Any]] = None) -> AsyncHTTPProvider:
+    """An ``AsyncHTTPProvider`` for ``rpc_url`` that posts through the shared async client."""
+    provider = AsyncHTTPProvider(rpc_url, request_kwargs=request_kwargs)
+    provider._request_session_manager = _HttpxSessionManager()
+    return provider
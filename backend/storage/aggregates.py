@@ -0,0 +1,251 @@
+"""
+Incrementally maintained trade aggregates.
+
+``add_trade`` folds each new trade into three ``trade_aggregates`` rows (overall,
+its token, its UTC day) inside the insert's transaction, so reporting reads a few
+rows instead of scanning ``trades``. ``add_trades`` folds a whole batch and writes
+each touched row once. The arithmetic is done in Python on
+``Decimal`` values, because SQLite would coerce the TEXT columns to REAL.
+
+Equity, peak equity and max drawdown depend on order. Both paths fold trades in
+chronological ``(timestamp, id)`` order: a batch is sorted before folding, and a
+backdated trade (not later than every trade already recorded) cannot be
+appended, so its insert rebuilds all aggregates in the same transaction instead.
+
+The trade INSERT runs before the aggregate rows are read. That statement takes
+SQLite's write lock, so the read-modify-write cannot interleave with another
+writer, even one in another process. PostgreSQL has no database-wide write lock,
+so there the fold takes a transaction-scoped advisory lock instead.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .models import TradeAggregate, TradeData
+from .utils import to_epoch_us
+
+SCOPE_ALL = "all"
+SCOPE_TOKEN = "token"
+SCOPE_DAY = "day"
+
+_US_PER_DAY = 86_400_000_000
+# pg_advisory_xact_lock key serializing aggregate updates; released at commit/rollback.
+_PG_LOCK_KEY = 0x74726164
+
+UPSERT_AGGREGATE = """
+INSERT INTO trade_aggregates (
+    scope, bucket, trade_count, winners, losers, notional, realized_profit,
+    profit_sq_sum, equity, peak_equity, max_drawdown, first_trade_us, last_trade_us
+) VALUES (
+    :scope, :bucket, :trade_count, :winners, :losers, :notional, :realized_profit,
+    :profit_sq_sum, :equity, :peak_equity, :max_drawdown, :first_trade_us, :last_trade_us
+)
+ON CONFLICT(scope, bucket) DO UPDATE SET
+    trade_count = excluded.trade_count,
+    winners = excluded.winners,
+    losers = excluded.losers,
+    notional = excluded.notional,
+    realized_profit = excluded.realized_profit,
+    profit_sq_sum = excluded.profit_sq_sum,
+    equity = excluded.equity,
+    peak_equity = excluded.peak_equity,
+    max_drawdown = excluded.max_drawdown,
+    first_trade_us = excluded.first_trade_us,
+    last_trade_us = excluded.last_trade_us;
+"""
+GET_AGGREGATE = "SELECT * FROM trade_aggregates WHERE scope = :scope AND bucket = :bucket;"
+GET_AGGREGATES = "SELECT * FROM trade_aggregates WHERE scope = :scope ORDER BY bucket;"
+
+
+def utc_day(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).date().isoformat()
+
+
+class _Running:
+    """Mutable accumulator for one aggregate row; avoids a model copy per trade."""
+
+    __slots__ = (
+        "scope", "bucket", "trade_count", "winners", "losers", "notional", "realized_profit",
+        "profit_sq_sum", "equity", "peak_equity", "max_drawdown", "first_trade_us", "last_trade_us",
+    )
+
+    def __init__(self, scope: str, bucket: str, row: Optional[Mapping[str, Any]] = None):
+        self.scope = scope
+        self.bucket = bucket
+        if row is None:
+            self.trade_count = self.winners = self.losers = 0
+            self.notional = self.realized_profit = self.profit_sq_sum = Decimal("0")
+            self.equity = self.peak_equity = self.max_drawdown = Decimal("0")
+            self.first_trade_us = self.last_trade_us = None
+            return
+        self.trade_count = row["trade_count"]
+        self.winners = row["winners"]
+        self.losers = row["losers"]
+        self.notional = Decimal(row["notional"])
+        self.realized_profit = Decimal(row["realized_profit"])
+        self.profit_sq_sum = Decimal(row["profit_sq_sum"])
+        self.equity = Decimal(row["equity"])
+        self.peak_equity = Decimal(row["peak_equity"])
+        self.max_drawdown = Decimal(row["max_drawdown"])
+        self.first_trade_us = row["first_trade_us"]
+        self.last_trade_us = row["last_trade_us"]
+
+    def add(self, profit: Decimal, notional: Decimal, timestamp_us: int) -> None:
+        self.trade_count += 1
+        if profit > 0:
+            self.winners += 1
+        elif profit < 0:
+            self.losers += 1
+        self.notional += notional
+        self.realized_profit += profit
+        self.profit_sq_sum += profit * profit
+        self.equity += profit
+        if self.equity > self.peak_equity:
+            self.peak_equity = self.equity
+        drawdown = self.equity - self.peak_equity
+        if drawdown < self.max_drawdown:
+            self.max_drawdown = drawdown
+        if self.first_trade_us is None or timestamp_us < self.first_trade_us:
+            self.first_trade_us = timestamp_us
+        if self.last_trade_us is None or timestamp_us > self.last_trade_us:
+            self.last_trade_us = timestamp_us
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "scope": self.scope,
+            "bucket": self.bucket,
+            "trade_count": self.trade_count,
+            "winners": self.winners,
+            "losers": self.losers,
+            "notional": str(self.notional),
+            "realized_profit": str(self.realized_profit),
+            "profit_sq_sum": str(self.profit_sq_sum),
+            "equity": str(self.equity),
+            "peak_equity": str(self.peak_equity),
+            "max_drawdown": str(self.max_drawdown),
+            "first_trade_us": self.first_trade_us,
+            "last_trade_us": self.last_trade_us,
+        }
+
+
+def _fold(trades: Iterable[TradeData], load: Callable[[str, str], _Running]) -> Dict[Tuple[str, str], _Running]:
+    """Folds ``trades`` (already in chronological order) into their overall/token/day rows."""
+    running: Dict[Tuple[str, str], _Running] = {}
+    days: Dict[int, str] = {}
+    for trade in trades:
+        timestamp_us = to_epoch_us(trade.timestamp)
+        day_number = timestamp_us // _US_PER_DAY
+        day = days.get(day_number)
+        if day is None:
+            day = days[day_number] = utc_day(trade.timestamp)
+        profit = Decimal(trade.profit)
+        notional = Decimal(trade.price) * Decimal(trade.amount)
+        for key in ((SCOPE_ALL, ""), (SCOPE_TOKEN, trade.token), (SCOPE_DAY, day)):
+            row = running.get(key)
+            if row is None:
+                row = running[key] = load(*key)
+            row.add(profit, notional, timestamp_us)
+    return running
+
+
+def _from_epoch_us(value: Optional[int]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value / 1_000_000, tz=timezone.utc)
+
+
+def row_to_aggregate(row: Mapping[str, Any]) -> TradeAggregate:
+    data = dict(row)
+    data["first_trade_at"] = _from_epoch_us(data.pop("first_trade_us"))
+    data["last_trade_at"] = _from_epoch_us(data.pop("last_trade_us"))
+    return TradeAggregate(**data)
+
+
+def _lock(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+
+
+def record_trade(
+    conn: Connection,
+    insert_statement: str,
+    params: Dict[str, Any],
+    trade: TradeData,
+) -> bool:
+    """
+    Inserts ``trade`` and folds it into its aggregate rows. The caller owns the
+    transaction. See ``record_trades`` for the return value.
+    """
+    return record_trades(conn, insert_statement, [params], [trade])
+
+
+def record_trades(
+    conn: Connection,
+    insert_statement: str,
+    params: List[Dict[str, Any]],
+    trades: List[TradeData],
+) -> bool:
+    """
+    Bulk form of ``record_trade``: one executemany for the rows, each touched
+    aggregate read and written once. Trades are folded in chronological order.
+    Returns False when a trade is backdated: the rows are inserted but the
+    aggregates are left alone, and the caller must ``rebuild_aggregates`` in the
+    same transaction.
+    """
+    if not trades:
+        return True
+    conn.execute(text(insert_statement), params)
+    _lock(conn)
+
+    def load(scope: str, bucket: str) -> _Running:
+        row = conn.execute(text(GET_AGGREGATE), {"scope": scope, "bucket": bucket}).fetchone()
+        return _Running(scope, bucket, row._mapping if row else None)
+
+    ordered = sorted(trades, key=lambda t: (to_epoch_us(t.timestamp), t.id))
+    overall = load(SCOPE_ALL, "")
+    if overall.last_trade_us is not None and to_epoch_us(ordered[0].timestamp) <= overall.last_trade_us:
+        return False
+    running = _fold(ordered, lambda scope, bucket: overall if scope == SCOPE_ALL else load(scope, bucket))
+    conn.execute(text(UPSERT_AGGREGATE), [row.params() for row in running.values()])
+    return True
+
+
+def rebuild_aggregates(
+    conn: Connection, trades: Optional[List[TradeData]] = None, sealed: Iterable[TradeData] = ()
+) -> int:
+    """
+    Recomputes every aggregate in chronological order, from ``trades`` or else the
+    ``trades`` table plus ``sealed`` (rows moved out of it, e.g. month partitions).
+    Returns the trade count.
+    """
+    _lock(conn)
+    if trades is None:
+        trades = [TradeData(**row._mapping) for row in conn.execute(text("SELECT * FROM trades ORDER BY timestamp_us, id"))]
+        sealed = list(sealed)
+        if sealed:
+            by_id = {trade.id: trade for trade in sealed + trades}
+            trades = sorted(by_id.values(), key=lambda t: (to_epoch_us(t.timestamp), t.id))
+    running = _fold(trades, lambda scope, bucket: _Running(scope, bucket))
+    conn.execute(text("DELETE FROM trade_aggregates"))
+    if running:
+        conn.execute(text(UPSERT_AGGREGATE), [row.params() for row in running.values()])
+    return len(trades)
+
+
+def profit_stats(aggregate: TradeAggregate) -> Dict[str, float]:
+    """Win rate, mean and population standard deviation of per-trade profit."""
+    n = aggregate.trade_count
+    if not n:
+        return {"win_rate": 0.0, "average_profit": 0.0, "profit_volatility": 0.0}
+    mean = aggregate.realized_profit / n
+    variance = max(aggregate.profit_sq_sum / n - mean * mean, Decimal("0"))
+    return {
+        "win_rate": aggregate.winners / n,
+        "average_profit": float(mean),
+        "profit_volatility": float(variance.sqrt()) if n > 1 else 0.0,
+    }
@@ -0,0 +1,311 @@
+"""
+Columnar analytics export (Arrow IPC) with memory-mapped reads.
+
+Backtests and heavy analytics read a snapshot exported from the live database
+instead of querying it, so they never hold read transactions open against the
+WAL. ``refresh_export`` writes::
+
+    <export_dir>/trades/month=YYYY-MM/part-<first_ts_us>-<last_ts_us>.arrow
+    <export_dir>/portfolio_positions.arrow
+    <export_dir>/activity_daily.arrow
+    <export_dir>/_manifest.json
+
+Trades are appended incrementally. Each refresh reads the rows after the
+``(timestamp_us, id)`` watermark kept in the manifest through the columnar
+``get_trade_columns`` path and writes them as new part files. The per-day
+activity counts keep a day watermark: days before it are carried over from the
+previous file and only the activities from that day on are counted again. A
+trade or activity inserted behind its watermark is only picked up by a
+``full=True`` refresh. Positions are small, so they are rewritten each time.
+
+Files are uncompressed Arrow IPC rather than Parquet. Parquet has to be decoded
+into memory. IPC files can be memory-mapped and read without copying. Money
+columns are float64, as in ``columns.py``.
+
+pyarrow is optional; it is only imported when an export or read is requested.
+"""
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .aggregates import utc_day
+from .base import Storage
+from .columns import TRADE_COLUMNS, rows_to_columns
+from .utils import to_epoch_us
+
+EXPORT_TRADE_COLUMNS: Tuple[str, ...] = ("id", "token", "action", "status", "amount", "price", "profit", "timestamp")
+_MANIFEST = "_manifest.json"
+_PAGE_SIZE = 5000
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc  # noqa: F401
+    except ImportError as exc:  # pragma: no cover - optional dependency
+        raise ValueError("Analytics export requires pyarrow to be installed.") from exc
+    return pa
+
+
+def _arrow_type(pa, dtype: str):
+    if dtype == "object":
+        return pa.string()
+    if dtype == "datetime64[us]":
+        return pa.timestamp("us", tz="UTC")
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def _to_table(pa, columns: Dict[str, np.ndarray], dtypes: Dict[str, str]):
+    return pa.table({
+        name: pa.array(values, type=_arrow_type(pa, dtypes[name]))
+        for name, values in columns.items()
+    })
+
+
+def _write_ipc(pa, table, path: str) -> None:
+    """Writes ``table`` to ``path`` atomically (readers never see a partial file)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def _month_of(timestamp_us: int) -> str:
+    return datetime.fromtimestamp(timestamp_us / 1_000_000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def _read_manifest(export_dir: str) -> Dict[str, Any]:
+    path = os.path.join(export_dir, _MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _write_manifest(export_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(export_dir, _MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _from_epoch_us(timestamp_us: int) -> datetime:
+    return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=int(timestamp_us))
+
+
+def _export_trades(pa, storage: Storage, export_dir: str, watermark: Optional[Tuple[int, str]]):
+    dtypes = {name: TRADE_COLUMNS[name][1] for name in EXPORT_TRADE_COLUMNS}
+    start = _from_epoch_us(watermark[0]) if watermark else None
+    columns = storage.get_trade_columns(EXPORT_TRADE_COLUMNS + ("timestamp_us",), start=start)
+    timestamps, ids = columns.pop("timestamp_us"), columns["id"]
+    if watermark:
+        # Rows at the watermark's microsecond were exported up to its id.
+        after = (timestamps > watermark[0]) | ((timestamps == watermark[0]) & (ids > watermark[1]))
+        timestamps = timestamps[after]
+        columns = {name: values[after] for name, values in columns.items()}
+    if not len(timestamps):
+        return 0, watermark
+    # Rows are chronological, so each month is one contiguous slice.
+    months = timestamps.astype("datetime64[us]").astype("datetime64[M]")
+    bounds = np.flatnonzero(months[1:] != months[:-1]) + 1
+    for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(months)]))):
+        table = _to_table(pa, {name: values[lo:hi] for name, values in columns.items()}, dtypes)
+        month = str(months[lo])
+        path = os.path.join(
+            export_dir, "trades", f"month={month}", f"part-{timestamps[lo]}-{timestamps[hi - 1]}.arrow"
+        )
+        _write_ipc(pa, table, path)
+    return len(timestamps), (int(timestamps[-1]), str(columns["id"][-1]))
+
+
+def _part_key(name: str) -> int:
+    # part-<first_ts_us>-<last_ts_us>.arrow; numeric order of the first timestamp is chronological.
+    return int(name.split("-")[1])
+
+
+def _compact_partitions(pa, export_dir: str, max_parts: int) -> None:
+    """Merges a month's parts into one file once frequent small refreshes pile up more than ``max_parts``."""
+    root = os.path.join(export_dir, "trades")
+    if not os.path.isdir(root):
+        return
+    for partition in os.listdir(root):
+        directory = os.path.join(root, partition)
+        names = sorted((n for n in os.listdir(directory) if n.endswith(".arrow")), key=_part_key)
+        if len(names) <= max_parts:
+            continue
+        tables = []
+        for name in names:
+            with pa.memory_map(os.path.join(directory, name), "r") as source:
+                tables.append(pa.ipc.open_file(source).read_all())
+        merged = pa.concat_tables(tables).combine_chunks()
+        first, last = names[0].split("-")[1], names[-1].rsplit("-", 1)[1]
+        target = os.path.join(directory, f"part-{first}-{last}")
+        _write_ipc(pa, merged, target)
+        for name in names:
+            if os.path.join(directory, name) != target:
+                os.remove(os.path.join(directory, name))
+
+
+def _export_positions(pa, storage: Storage, export_dir: str) -> int:
+    positions = storage.get_portfolio_positions()
+    table = pa.table({
+        "token_address": pa.array([p.token_address for p in positions], type=pa.string()),
+        "symbol": pa.array([p.symbol for p in positions], type=pa.string()),
+        "chain": pa.array([p.chain for p in positions], type=pa.string()),
+        "amount": pa.array([float(p.amount) for p in positions], type=pa.float64()),
+        "average_price": pa.array([float(p.average_price) for p in positions], type=pa.float64()),
+        "last_valuation_usd": pa.array(
+            [float(p.last_valuation_usd) if p.last_valuation_usd is not None else None for p in positions],
+            type=pa.float64(),
+        ),
+        "updated_at": pa.array([p.updated_at for p in positions], type=pa.timestamp("us", tz="UTC")),
+    })
+    _write_ipc(pa, table, os.path.join(export_dir, "portfolio_positions.arrow"))
+    return len(positions)
+
+
+def _export_activity_daily(pa, storage: Storage, export_dir: str, watermark: Optional[str]):
+    """
+    Rewrites ``activity_daily.arrow``, counting only activities from day ``watermark``
+    on; earlier days come from the previous file. Returns the recounted rows and the
+    new watermark (the latest day seen, which may still grow).
+    """
+    path = os.path.join(export_dir, "activity_daily.arrow")
+    kept = None
+    start = None
+    if watermark and os.path.exists(path):
+        import pyarrow.compute as pc
+
+        with pa.memory_map(path, "r") as source:
+            previous = pa.ipc.open_file(source).read_all()
+        kept = previous.filter(pc.less(previous.column("day"), pa.scalar(watermark)))
+        start = datetime.fromisoformat(watermark).replace(tzinfo=timezone.utc)
+    counts: Dict[Tuple[str, str], int] = {}
+    for activity in storage.iter_activities(start=start, page_size=_PAGE_SIZE):
+        key = (utc_day(activity.timestamp), activity.type)
+        counts[key] = counts.get(key, 0) + 1
+    keys = sorted(counts)
+    table = pa.table({
+        "day": pa.array([day for day, _ in keys], type=pa.string()),
+        "type": pa.array([kind for _, kind in keys], type=pa.string()),
+        "count": pa.array([counts[key] for key in keys], type=pa.int64()),
+    })
+    if kept is not None:
+        table = pa.concat_tables([kept, table]).combine_chunks()
+    _write_ipc(pa, table, path)
+    return len(keys), (keys[-1][0] if keys else watermark)
+
+
+def refresh_export(storage: Storage, export_dir: str, full: bool = False, max_parts: int = 32) -> Dict[str, int]:
+    """
+    Brings the export in ``export_dir`` up to date with ``storage``. ``full`` drops
+    the trade partitions and re-exports everything. Returns rows written per dataset.
+
+    If a refresh dies before the manifest is written, the next one starts from the
+    old watermark and rewrites the same part files.
+    """
+    pa = _pyarrow()
+    os.makedirs(export_dir, exist_ok=True)
+    manifest = {} if full else _read_manifest(export_dir)
+    if full:
+        shutil.rmtree(os.path.join(export_dir, "trades"), ignore_errors=True)
+    watermark = tuple(manifest["trades_watermark"]) if manifest.get("trades_watermark") else None
+
+    trades, watermark = _export_trades(pa, storage, export_dir, watermark)
+    _compact_partitions(pa, export_dir, max_parts)
+    activity_days, activity_watermark = _export_activity_daily(
+        pa, storage, export_dir, manifest.get("activity_daily_watermark")
+    )
+    stats = {
+        "trades": trades,
+        "portfolio_positions": _export_positions(pa, storage, export_dir),
+        "activity_daily": activity_days,
+    }
+    manifest["trades_watermark"] = list(watermark) if watermark else None
+    manifest["activity_daily_watermark"] = activity_watermark
+    manifest["refreshed_at"] = datetime.now(timezone.utc).isoformat()
+    _write_manifest(export_dir, manifest)
+    return stats
+
+
+class AnalyticsReader:
+    """
+    Memory-mapped reads over an export written by ``refresh_export``.
+
+    Tables returned here reference the mapped files directly. Keep the reader (or
+    the table) alive while using arrays derived from them.
+    """
+
+    def __init__(self, export_dir: str):
+        self._pa = _pyarrow()
+        self.export_dir = export_dir
+
+    def _read(self, path: str):
+        pa = self._pa
+        with pa.memory_map(path, "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _trade_parts(self, start: Optional[datetime], end: Optional[datetime]) -> List[str]:
+        root = os.path.join(self.export_dir, "trades")
+        if not os.path.isdir(root):
+            return []
+        first = _month_of(to_epoch_us(start)) if start else None
+        last = _month_of(to_epoch_us(end) - 1) if end else None
+        parts = []
+        for partition in sorted(os.listdir(root)):
+            month = partition.partition("=")[2]
+            if (first and month < first) or (last and month > last):
+                continue
+            directory = os.path.join(root, partition)
+            names = sorted((n for n in os.listdir(directory) if n.endswith(".arrow")), key=_part_key)
+            parts.extend(os.path.join(directory, name) for name in names)
+        return parts
+
+    def trades(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[Sequence[str]] = None,
+    ):
+        """Exported trades in ``[start, end)``, oldest first, as a ``pyarrow.Table``."""
+        pa = self._pa
+        tables = [self._read(path) for path in self._trade_parts(start, end)]
+        if not tables:
+            dtypes = {name: TRADE_COLUMNS[name][1] for name in EXPORT_TRADE_COLUMNS}
+            table = _to_table(pa, rows_to_columns([], EXPORT_TRADE_COLUMNS), dtypes)
+        else:
+            table = pa.concat_tables(tables)
+        if start is not None or end is not None:
+            import pyarrow.compute as pc
+
+            timestamps = table.column("timestamp")
+            mask = None
+            if start is not None:
+                mask = pc.greater_equal(timestamps, pa.scalar(start, type=timestamps.type))
+            if end is not None:
+                upper = pc.less(timestamps, pa.scalar(end, type=timestamps.type))
+                mask = upper if mask is None else pc.and_(mask, upper)
+            table = table.filter(mask)
+        if columns is not None:
+            table = table.select(list(columns))
+        return table
+
+    def trade_arrays(self, columns: Sequence[str], start: Optional[datetime] = None, end: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """NumPy views of the requested trade columns (no copy when a single part is read unfiltered)."""
+        table = self.trades(start, end, columns).combine_chunks()
+        return {name: table.column(name).to_numpy() for name in columns}
+
+    def trades_frame(self, start: Optional[datetime] = None, end: Optional[datetime] = None, columns: Optional[Sequence[str]] = None):
+        return self.trades(start, end, columns).to_pandas(split_blocks=True, self_destruct=True)
+
+    def portfolio_positions(self):
+        return self._read(os.path.join(self.export_dir, "portfolio_positions.arrow"))
+
+    def activity_daily(self):
+        return self._read(os.path.join(self.export_dir, "activity_daily.arrow"))
@@ -0,0 +1,315 @@
+"""
+Dialect-neutral base for the SQLAlchemy asyncio storages; the coroutine
+counterpart of ``sql.SqlStorage``.
+"""
+import asyncio
+import logging
+import weakref
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from . import aggregates as agg
+from . import queries as q
+from .base import AsyncStorage
+from .columns import DEFAULT_TRADE_COLUMNS, rows_to_columns, trade_columns_query
+from .migrations import MIGRATIONS, Migration, apply_migrations
+from .models import (
+    Team,
+    Workflow,
+    TradeData,
+    ActivityData,
+    PortfolioPosition,
+    AlertRecord,
+    AgentMessageRecord,
+    BlacklistRecord,
+    RecordPage,
+    TradeAggregate,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSqlStorage(AsyncStorage):
+    """
+    Runs the statements and codecs shared with ``SqlStorage`` on an async engine.
+
+    Async driver connections belong to the event loop that opened them. The loop
+    that calls ``start()`` (the API server loop) gets a pooled engine; any other
+    loop, such as the short-lived loops toolkits may run on, gets an unpooled
+    engine so no connection outlives its loop. Subclasses build the engines.
+    """
+
+    migrations: List[Migration] = MIGRATIONS
+
+    def __init__(self, url: str):
+        self.url = url
+        self._pooled_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pooled_engine: Optional[AsyncEngine] = None
+        self._loop_engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncEngine]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._schema_ready = False
+
+    def _create_engine(self, pooled: bool) -> AsyncEngine:
+        """Builds an engine for the running loop; unpooled engines should use ``NullPool``."""
+        raise NotImplementedError
+
+    def _migrate(self, conn: Connection) -> None:
+        apply_migrations(conn, self.migrations)
+
+    def _engine(self) -> AsyncEngine:
+        loop = asyncio.get_running_loop()
+        if loop is self._pooled_loop and self._pooled_engine is not None:
+            return self._pooled_engine
+        engine = self._loop_engines.get(loop)
+        if engine is None:
+            engine = self._create_engine(pooled=False)
+            self._loop_engines[loop] = engine
+        return engine
+
+    async def start(self) -> None:
+        if self._pooled_engine is None:
+            self._pooled_loop = asyncio.get_running_loop()
+            self._pooled_engine = self._create_engine(pooled=True)
+        await self._ensure_schema()
+
+    async def aclose(self) -> None:
+        if self._pooled_engine is not None:
+            await self._pooled_engine.dispose()
+            self._pooled_engine = None
+            self._pooled_loop = None
+        engine = self._loop_engines.pop(asyncio.get_running_loop(), None)
+        if engine is not None:
+            await engine.dispose()
+
+    async def _ensure_schema(self) -> None:
+        # Migrations are idempotent, so a race between two loops is harmless.
+        if self._schema_ready:
+            return
+        async with self._engine().begin() as conn:
+            await conn.run_sync(self._migrate)
+        self._schema_ready = True
+
+    async def _execute(self, query: str, params: Dict[str, Any]) -> int:
+        await self._ensure_schema()
+        async with self._engine().begin() as conn:
+            result = await conn.execute(text(query), params)
+            return result.rowcount
+
+    async def _execute_many(self, query: str, params: List[Dict[str, Any]]) -> None:
+        if not params:
+            return
+        await self._ensure_schema()
+        async with self._engine().begin() as conn:
+            await conn.execute(text(query), params)
+
+    async def _fetch_one(self, query: str, params: Dict[str, Any]):
+        rows = await self._fetch_rows(query, params)
+        return rows[0] if rows else None
+
+    async def _fetch_all(self, query: str, params: Optional[Dict[str, Any]] = None):
+        return await self._fetch_rows(query, params or {})
+
+    async def _fetch_rows(self, query: str, params: Dict[str, Any], as_tuples: bool = False) -> List[Any]:
+        # Plain tuples/dicts instead of RowMapping, which costs more per row than the codecs.
+        await self._ensure_schema()
+        async with self._engine().connect() as conn:
+            result = await conn.execute(text(query), params)
+            keys = list(result.keys())
+            rows = result.tuples().all()
+        if as_tuples:
+            return rows
+        return [dict(zip(keys, row)) for row in rows]
+
+    async def _fetch_page(
+        self,
+        table: str,
+        codec: Callable[[Any], Any],
+        limit: int,
+        cursor: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        ascending: bool,
+    ) -> RecordPage:
+        params = q.page_params(limit, cursor, start, end)
+        rows = await self._fetch_all(q.page_query(table, params, ascending), params)
+        return q.build_page(rows, limit, codec)
+
+    async def save_team(self, team: Team) -> None:
+        await self._execute(q.SAVE_TEAM, q.team_params(team))
+
+    async def get_team(self, name: str) -> Optional[Team]:
+        row = await self._fetch_one(q.GET_TEAM, {"name": name})
+        return q.row_to_team(row) if row else None
+
+    async def delete_team(self, name: str) -> None:
+        await self._execute(q.DELETE_TEAM, {"name": name})
+
+    async def save_workflow(self, workflow: Workflow) -> None:
+        await self._execute(q.SAVE_WORKFLOW, q.workflow_params(workflow))
+
+    async def get_workflow(self, name: str) -> Optional[Workflow]:
+        row = await self._fetch_one(q.GET_WORKFLOW, {"name": name})
+        return q.row_to_workflow(row) if row else None
+
+    async def delete_workflow(self, name: str) -> None:
+        await self._execute(q.DELETE_WORKFLOW, {"name": name})
+
+    async def get_all_workflows(self) -> List[Workflow]:
+        return [q.row_to_workflow(row) for row in await self._fetch_all(q.GET_ALL_WORKFLOWS)]
+
+    async def add_trade(self, trade: TradeData) -> None:
+        await self._ensure_schema()
+        async with self._engine().begin() as conn:
+            if not await conn.run_sync(agg.record_trade, q.INSERT_TRADE, q.trade_params(trade), trade):
+                await self._rebuild(conn)
+
+    async def add_trades(self, trades: List[TradeData]) -> None:
+        params = [q.trade_params(t) for t in trades]
+        await self._ensure_schema()
+        async with self._engine().begin() as conn:
+            if not await conn.run_sync(agg.record_trades, q.INSERT_TRADE, params, trades):
+                await self._rebuild(conn)
+
+    async def get_trade_summary(self) -> TradeAggregate:
+        row = await self._fetch_one(agg.GET_AGGREGATE, {"scope": agg.SCOPE_ALL, "bucket": ""})
+        return agg.row_to_aggregate(row) if row else TradeAggregate(scope=agg.SCOPE_ALL)
+
+    async def get_trade_aggregates(self, scope: str) -> List[TradeAggregate]:
+        rows = await self._fetch_all(agg.GET_AGGREGATES, {"scope": scope})
+        return [agg.row_to_aggregate(row) for row in rows]
+
+    async def rebuild_trade_aggregates(self) -> None:
+        await self._ensure_schema()
+        async with self._engine().begin() as conn:
+            await self._rebuild(conn)
+
+    async def _rebuild(self, conn: AsyncConnection) -> None:
+        sealed = await self._sealed_trades()
+        await conn.run_sync(lambda sync_conn: agg.rebuild_aggregates(sync_conn, sealed=sealed))
+
+    async def _sealed_trades(self) -> List[TradeData]:
+        """Trades kept outside the ``trades`` table, needed to rebuild aggregates."""
+        return []
+
+    async def get_recent_trades(self, limit: int) -> List[TradeData]:
+        rows = await self._fetch_all(q.RECENT_TRADES, {"limit": limit})
+        return [q.row_to_trade(row) for row in rows]
+
+    async def get_trade_columns(
+        self,
+        columns: Sequence[str] = DEFAULT_TRADE_COLUMNS,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, np.ndarray]:
+        query, params = trade_columns_query(columns, start, end)
+        return rows_to_columns(await self._fetch_rows(query, params, as_tuples=True), columns)
+
+    async def get_trades_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> RecordPage:
+        return await self._fetch_page("trades", q.row_to_trade, limit, cursor, start, end, ascending)
+
+    async def add_activity(self, activity: ActivityData) -> None:
+        await self._execute(q.INSERT_ACTIVITY, q.activity_params(activity))
+
+    async def add_activities(self, activities: List[ActivityData]) -> None:
+        await self._execute_many(q.INSERT_ACTIVITY, [q.activity_params(a) for a in activities])
+
+    async def get_recent_activities(self, limit: int) -> List[ActivityData]:
+        rows = await self._fetch_all(q.RECENT_ACTIVITIES, {"limit": limit})
+        return [q.row_to_activity(row) for row in rows]
+
+    async def get_activities_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> RecordPage:
+        return await self._fetch_page("activities", q.row_to_activity, limit, cursor, start, end, ascending)
+
+    async def get_portfolio_positions(self) -> List[PortfolioPosition]:
+        return [q.row_to_position(row) for row in await self._fetch_all(q.GET_PORTFOLIO_POSITIONS)]
+
+    async def upsert_portfolio_position(self, position: PortfolioPosition) -> None:
+        await self._execute(q.UPSERT_PORTFOLIO_POSITION, q.position_params(position))
+
+    async def upsert_portfolio_positions(self, positions: List[PortfolioPosition]) -> None:
+        await self._execute_many(q.UPSERT_PORTFOLIO_POSITION, [q.position_params(p) for p in positions])
+
+    async def record_alert(self, alert: AlertRecord) -> None:
+        await self._execute(q.UPSERT_ALERT, q.alert_params(alert))
+
+    async def get_recent_alerts(self, limit: int) -> List[AlertRecord]:
+        rows = await self._fetch_all(q.RECENT_ALERTS, {"limit": limit})
+        return [q.row_to_alert(row) for row in rows]
+
+    async def get_alerts_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> RecordPage:
+        return await self._fetch_page("alerts", q.row_to_alert, limit, cursor, start, end, ascending)
+
+    async def record_agent_message(self, message: AgentMessageRecord) -> None:
+        await self._execute(q.UPSERT_AGENT_MESSAGE, q.agent_message_params(message))
+
+    async def get_recent_agent_messages(self, limit: int) -> List[AgentMessageRecord]:
+        rows = await self._fetch_all(q.RECENT_AGENT_MESSAGES, {"limit": limit})
+        return [q.row_to_agent_message(row) for row in rows]
+
+    async def get_agent_messages_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> RecordPage:
+        return await self._fetch_page("agent_messages", q.row_to_agent_message, limit, cursor, start, end, ascending)
+
+    async def set_state_value(self, namespace: str, key: str, value: Dict[str, Any]) -> None:
+        # Bump the namespace version so StateCache instances (any process) drop it.
+        await self._ensure_schema()
+        async with self._engine().begin() as conn:
+            await conn.execute(text(q.UPSERT_STATE_VALUE), q.state_params(namespace, key, value))
+            await conn.execute(text(q.BUMP_STATE_VERSION), {"namespace": namespace})
+
+    async def get_state_value(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        row = await self._fetch_one(q.GET_STATE_VALUE, {"namespace": namespace, "key": key})
+        return q.row_to_state_value(row) if row else None
+
+    async def upsert_blacklist_entry(self, entry: BlacklistRecord) -> None:
+        await self._execute(q.UPSERT_BLACKLIST_ENTRY, q.blacklist_params(entry))
+
+    async def delete_blacklist_entry(self, entry_type: str, identifier: str) -> bool:
+        return await self._execute(q.DELETE_BLACKLIST_ENTRY, q.blacklist_key_params(entry_type, identifier)) > 0
+
+    async def get_blacklist_entries(self, entry_type: Optional[str] = None) -> List[BlacklistRecord]:
+        if entry_type is None:
+            rows = await self._fetch_all(q.GET_BLACKLIST_ENTRIES)
+        else:
+            rows = await self._fetch_all(q.GET_BLACKLIST_ENTRIES_BY_TYPE, {"entry_type": entry_type})
+        return [q.row_to_blacklist_entry(row) for row in rows]
+
+    async def get_blacklist_keys(self) -> List[Tuple[str, str]]:
+        return [(row["entry_type"], row["identifier"]) for row in await self._fetch_all(q.GET_BLACKLIST_KEYS)]
+
+    async def count_blacklist_entries(self) -> int:
+        row = await self._fetch_one(q.COUNT_BLACKLIST_ENTRIES, {})
+        return row["count"] if row else 0
@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from . import queries as q
+from .async_sql import AsyncSqlStorage
+from .columns import DEFAULT_TRADE_COLUMNS, rows_to_columns, trade_columns_query
+from .models import ActivityData, RecordPage, TradeData
+from .partitions import PARTITIONED_TABLES, PartitionManager, default_partition_dir
+from .sqlite import _configure_sqlite, normalize_sqlite_url
+from .utils import to_epoch_us
+
+
+def to_async_sqlite_url(url: str) -> str:
+    """Maps a sqlite URL or bare path onto the aiosqlite driver."""
+    url = normalize_sqlite_url(url)
+    if url.startswith("sqlite:"):
+        url = "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    return url
+
+
+class AsyncSqliteStorage(AsyncSqlStorage):
+    """
+    aiosqlite-backed storage sharing SQL and row codecs with ``SqliteStorage``.
+
+    Reads merge sealed month partitions like ``SqliteStorage`` does; sealing itself
+    is left to the sync storage's maintenance.
+    """
+
+    def __init__(self, url: str, partition_dir: Optional[str] = None):
+        super().__init__(to_async_sqlite_url(url))
+        self.partitions = PartitionManager(partition_dir or default_partition_dir(make_url(self.url).database))
+
+    def _create_engine(self, pooled: bool) -> AsyncEngine:
+        kwargs: Dict[str, Any] = {"pool_size": 5, "max_overflow": 10} if pooled else {"poolclass": NullPool}
+        engine = create_async_engine(self.url, **kwargs)
+        event.listen(engine.sync_engine, "connect", _configure_sqlite)
+        return engine
+
+    async def _fetch_page(
+        self,
+        table: str,
+        codec: Callable[[Any], Any],
+        limit: int,
+        cursor: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        ascending: bool,
+    ) -> RecordPage:
+        params = q.page_params(limit, cursor, start, end)
+        query = q.page_query(table, params, ascending)
+        rows = await self._fetch_all(query, params)
+        if table in PARTITIONED_TABLES and self.partitions.partitions(table):
+            # Partition files are read with the blocking sqlite3 module.
+            rows = await asyncio.to_thread(self.partitions.merge_page, table, query, params, ascending, rows)
+        return q.build_page(rows, limit, codec)
+
+    async def get_recent_trades(self, limit: int) -> List[TradeData]:
+        if limit < 1 or not self.partitions.partitions("trades"):
+            return await super().get_recent_trades(limit)
+        return (await self.get_trades_page(limit)).items
+
+    async def get_recent_activities(self, limit: int) -> List[ActivityData]:
+        if limit < 1 or not self.partitions.partitions("activities"):
+            return await super().get_recent_activities(limit)
+        return (await self.get_activities_page(limit)).items
+
+    async def _sealed_trades(self) -> List[TradeData]:
+        rows = await asyncio.to_thread(lambda: list(self.partitions.iter_rows("trades")))
+        return [q.row_to_trade(row) for row in rows]
+
+    async def get_trade_columns(
+        self,
+        columns: Sequence[str] = DEFAULT_TRADE_COLUMNS,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, np.ndarray]:
+        if not self.partitions.partitions("trades"):
+            return await super().get_trade_columns(columns, start, end)
+        query, params = trade_columns_query(tuple(columns) + ("timestamp_us", "id"), start, end)
+        hot = await self._fetch_rows(query, params, as_tuples=True)
+        rows = await asyncio.to_thread(
+            self.partitions.merge_columns, "trades", query, params, hot,
+            to_epoch_us(start) if start else None, to_epoch_us(end) if end else None,
+        )
+        return rows_to_columns(rows, columns)
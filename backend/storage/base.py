@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterator, List, Optional, Dict, Any, Sequence, Tuple
 
+import numpy as np
+
+from .columns import DEFAULT_TRADE_COLUMNS, check_trade_columns, trades_to_columns
 from .models import (
     Team,
     Workflow,
@@ -9,8 +13,44 @@ from .models import (
     PortfolioPosition,
     AlertRecord,
     AgentMessageRecord,
+    BlacklistRecord,
+    RecordPage,
+    TradeAggregate,
 )
 
+DEFAULT_PAGE_SIZE = 500
+
+
+def _iterate_pages(
+    fetch_page: Callable[..., RecordPage],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    page_size: int,
+) -> Iterator[Any]:
+    cursor = None
+    while True:
+        page = fetch_page(page_size, cursor=cursor, start=start, end=end, ascending=True)
+        yield from page.items
+        if page.next_cursor is None:
+            return
+        cursor = page.next_cursor
+
+
+async def _aiterate_pages(
+    fetch_page: Callable[..., Awaitable[RecordPage]],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    page_size: int,
+) -> AsyncIterator[Any]:
+    cursor = None
+    while True:
+        page = await fetch_page(page_size, cursor=cursor, start=start, end=end, ascending=True)
+        for item in page.items:
+            yield item
+        if page.next_cursor is None:
+            return
+        cursor = page.next_cursor
+
 
 class Storage(ABC):
     """
@@ -24,6 +64,41 @@ class Storage(ABC):
         """
         raise NotImplementedError
 
+    def flush(self) -> None:
+        """
+        Blocks until buffered writes are durable. No-op for unbuffered storages.
+        """
+
+    def close(self) -> None:
+        """
+        Releases connections held by the storage. Safe to call more than once.
+        """
+
+    def run_maintenance(self) -> Dict[str, int]:
+        """
+        Applies retention policies and compacts the database once. Returns counters
+        for logging. No-op for storages without housekeeping.
+        """
+        return {}
+
+    def start_maintenance(self, interval: Optional[float] = None) -> None:
+        """
+        Runs ``run_maintenance`` every ``interval`` seconds in the background until
+        ``close()``. No-op for storages without housekeeping.
+        """
+
+    def iter_archived(
+        self,
+        table: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Any]:
+        """
+        Streams records of ``table`` that retention moved out of the hot database,
+        oldest first, in ``[start, end)``.
+        """
+        return iter(())
+
     @abstractmethod
     def save_team(self, team: "Team") -> None:
         """
@@ -80,6 +155,13 @@ class Storage(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def add_trades(self, trades: List["TradeData"]) -> None:
+        """
+        Saves many trades in one transaction.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def get_recent_trades(self, limit: int) -> List["TradeData"]:
         """
@@ -87,6 +169,27 @@ class Storage(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def get_trade_summary(self) -> "TradeAggregate":
+        """
+        Retrieves the running totals over all trades (zeros when there are none).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_trade_aggregates(self, scope: str) -> List["TradeAggregate"]:
+        """
+        Retrieves per-token (scope "token") or per-UTC-day (scope "day") totals, ordered by bucket.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def rebuild_trade_aggregates(self) -> None:
+        """
+        Recomputes all trade aggregates from the trades table.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def add_activity(self, activity: "ActivityData") -> None:
         """
@@ -94,6 +197,13 @@ class Storage(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def add_activities(self, activities: List["ActivityData"]) -> None:
+        """
+        Saves many activities in one transaction.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def get_recent_activities(self, limit: int) -> List["ActivityData"]:
         """
@@ -118,6 +228,13 @@ class Storage(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def upsert_portfolio_positions(self, positions: List["PortfolioPosition"]) -> None:
+        """
+        Inserts or updates many portfolio positions in one transaction.
+        """
+        raise NotImplementedError
+
     @abstractmethod
     def record_alert(self, alert: "AlertRecord") -> None:
         """
@@ -146,6 +263,150 @@ class Storage(ABC):
         """
         raise NotImplementedError
 
+    # --- Keyset pagination and time ranges ---
+    #
+    # Pages are ordered by (timestamp, id), newest first unless ``ascending``.
+    # ``cursor`` is the opaque ``next_cursor`` of the previous page. Ranges are
+    # half-open: ``start <= timestamp < end``. The iterators walk the range oldest
+    # first in fixed-size pages, so callers can stream arbitrarily long histories.
+
+    @abstractmethod
+    def get_trades_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> "RecordPage[TradeData]":
+        """
+        Retrieves one page of trades.
+        """
+        raise NotImplementedError
+
+    def iter_trades(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> Iterator["TradeData"]:
+        """
+        Streams trades in chronological order, ``page_size`` rows per query.
+        """
+        return _iterate_pages(self.get_trades_page, start, end, page_size)
+
+    def get_trades_between(self, start: datetime, end: datetime) -> List["TradeData"]:
+        """
+        Retrieves all trades in ``[start, end)``, oldest first.
+        """
+        return list(self.iter_trades(start, end))
+
+    def get_trade_columns(
+        self,
+        columns: Sequence[str] = DEFAULT_TRADE_COLUMNS,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Reads trades in ``[start, end)``, oldest first, as one NumPy array per column
+        (see ``columns.TRADE_COLUMNS``). Skips model construction; meant for analytics.
+        """
+        check_trade_columns(columns)
+        return trades_to_columns(self.iter_trades(start, end), columns)
+
+    @abstractmethod
+    def get_activities_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> "RecordPage[ActivityData]":
+        """
+        Retrieves one page of activities.
+        """
+        raise NotImplementedError
+
+    def iter_activities(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> Iterator["ActivityData"]:
+        """
+        Streams activities in chronological order, ``page_size`` rows per query.
+        """
+        return _iterate_pages(self.get_activities_page, start, end, page_size)
+
+    def get_activities_between(self, start: datetime, end: datetime) -> List["ActivityData"]:
+        """
+        Retrieves all activities in ``[start, end)``, oldest first.
+        """
+        return list(self.iter_activities(start, end))
+
+    @abstractmethod
+    def get_alerts_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> "RecordPage[AlertRecord]":
+        """
+        Retrieves one page of alerts.
+        """
+        raise NotImplementedError
+
+    def iter_alerts(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> Iterator["AlertRecord"]:
+        """
+        Streams alerts in chronological order, ``page_size`` rows per query.
+        """
+        return _iterate_pages(self.get_alerts_page, start, end, page_size)
+
+    def get_alerts_between(self, start: datetime, end: datetime) -> List["AlertRecord"]:
+        """
+        Retrieves all alerts in ``[start, end)``, oldest first.
+        """
+        return list(self.iter_alerts(start, end))
+
+    @abstractmethod
+    def get_agent_messages_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> "RecordPage[AgentMessageRecord]":
+        """
+        Retrieves one page of agent messages.
+        """
+        raise NotImplementedError
+
+    def iter_agent_messages(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> Iterator["AgentMessageRecord"]:
+        """
+        Streams agent messages in chronological order, ``page_size`` rows per query.
+        """
+        return _iterate_pages(self.get_agent_messages_page, start, end, page_size)
+
+    def get_agent_messages_between(self, start: datetime, end: datetime) -> List["AgentMessageRecord"]:
+        """
+        Retrieves all agent messages in ``[start, end)``, oldest first.
+        """
+        return list(self.iter_agent_messages(start, end))
+
     @abstractmethod
     def set_state_value(self, namespace: str, key: str, value: Dict[str, Any]) -> None:
         """
@@ -159,3 +420,408 @@ class Storage(ABC):
         Retrieves a stored configuration or state value.
         """
         raise NotImplementedError
+
+    @abstractmethod
+    def upsert_blacklist_entry(self, entry: "BlacklistRecord") -> None:
+        """
+        Adds a blacklist entry, replacing the reason of an existing one.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_blacklist_entry(self, entry_type: str, identifier: str) -> bool:
+        """
+        Removes a blacklist entry. Returns whether it existed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_blacklist_entries(self, entry_type: Optional[str] = None) -> List["BlacklistRecord"]:
+        """
+        Retrieves blacklist entries, optionally of one type.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_blacklist_keys(self) -> List[Tuple[str, str]]:
+        """
+        Retrieves every ``(entry_type, identifier)`` pair, for building membership sets.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_blacklist_entries(self) -> int:
+        """
+        Counts blacklist entries.
+        """
+        raise NotImplementedError
+
+
+class AsyncStorage(ABC):
+    """
+    Coroutine counterpart of ``Storage`` for callers running on an event loop.
+    Methods mirror ``Storage`` one-to-one.
+    """
+
+    async def start(self) -> None:
+        """
+        Binds pooled connections to the running event loop. Optional; without it
+        every call opens and closes its own connection.
+        """
+
+    async def aclose(self) -> None:
+        """
+        Releases connections held by the storage. Safe to call more than once.
+        """
+
+    @abstractmethod
+    async def save_team(self, team: "Team") -> None:
+        """
+        Saves a team to the storage.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_team(self, name: str) -> Optional["Team"]:
+        """
+        Retrieves a team from the storage by name.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_team(self, name: str) -> None:
+        """
+        Deletes a team from the storage by name.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def save_workflow(self, workflow: "Workflow") -> None:
+        """
+        Saves a workflow to the storage.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_workflow(self, name: str) -> Optional["Workflow"]:
+        """
+        Retrieves a workflow from the storage by name.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_workflow(self, name: str) -> None:
+        """
+        Deletes a workflow from the storage by name.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_all_workflows(self) -> List["Workflow"]:
+        """
+        Retrieves all workflows from the storage.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_trade(self, trade: "TradeData") -> None:
+        """
+        Saves a trade to the storage.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_trades(self, trades: List["TradeData"]) -> None:
+        """
+        Saves many trades in one transaction.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_recent_trades(self, limit: int) -> List["TradeData"]:
+        """
+        Retrieves recent trades from the storage.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_trade_summary(self) -> "TradeAggregate":
+        """
+        Retrieves the running totals over all trades (zeros when there are none).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_trade_aggregates(self, scope: str) -> List["TradeAggregate"]:
+        """
+        Retrieves per-token (scope "token") or per-UTC-day (scope "day") totals, ordered by bucket.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def rebuild_trade_aggregates(self) -> None:
+        """
+        Recomputes all trade aggregates from the trades table.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_activity(self, activity: "ActivityData") -> None:
+        """
+        Saves an activity to the storage.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def add_activities(self, activities: List["ActivityData"]) -> None:
+        """
+        Saves many activities in one transaction.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_recent_activities(self, limit: int) -> List["ActivityData"]:
+        """
+        Retrieves recent activities from the storage.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_portfolio_positions(self) -> List["PortfolioPosition"]:
+        """
+        Retrieves all portfolio positions.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert_portfolio_position(
+        self,
+        position: "PortfolioPosition",
+    ) -> None:
+        """
+        Inserts or updates a portfolio position.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert_portfolio_positions(self, positions: List["PortfolioPosition"]) -> None:
+        """
+        Inserts or updates many portfolio positions in one transaction.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def record_alert(self, alert: "AlertRecord") -> None:
+        """
+        Persists an alert record for auditing.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_recent_alerts(self, limit: int) -> List["AlertRecord"]:
+        """
+        Retrieves recently generated alerts.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def record_agent_message(self, message: "AgentMessageRecord") -> None:
+        """
+        Stores a message exchanged between agents or systems.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_recent_agent_messages(self, limit: int) -> List["AgentMessageRecord"]:
+        """
+        Retrieves recent agent messages.
+        """
+        raise NotImplementedError
+
+    # --- Keyset pagination and time ranges (see ``Storage``) ---
+
+    @abstractmethod
+    async def get_trades_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> "RecordPage[TradeData]":
+        """
+        Retrieves one page of trades.
+        """
+        raise NotImplementedError
+
+    def iter_trades(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator["TradeData"]:
+        """
+        Streams trades in chronological order, ``page_size`` rows per query.
+        """
+        return _aiterate_pages(self.get_trades_page, start, end, page_size)
+
+    async def get_trades_between(self, start: datetime, end: datetime) -> List["TradeData"]:
+        """
+        Retrieves all trades in ``[start, end)``, oldest first.
+        """
+        return [item async for item in self.iter_trades(start, end)]
+
+    async def get_trade_columns(
+        self,
+        columns: Sequence[str] = DEFAULT_TRADE_COLUMNS,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Reads trades in ``[start, end)``, oldest first, as one NumPy array per column
+        (see ``columns.TRADE_COLUMNS``). Skips model construction; meant for analytics.
+        """
+        check_trade_columns(columns)
+        return trades_to_columns([trade async for trade in self.iter_trades(start, end)], columns)
+
+    @abstractmethod
+    async def get_activities_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> "RecordPage[ActivityData]":
+        """
+        Retrieves one page of activities.
+        """
+        raise NotImplementedError
+
+    def iter_activities(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator["ActivityData"]:
+        """
+        Streams activities in chronological order, ``page_size`` rows per query.
+        """
+        return _aiterate_pages(self.get_activities_page, start, end, page_size)
+
+    async def get_activities_between(self, start: datetime, end: datetime) -> List["ActivityData"]:
+        """
+        Retrieves all activities in ``[start, end)``, oldest first.
+        """
+        return [item async for item in self.iter_activities(start, end)]
+
+    @abstractmethod
+    async def get_alerts_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> "RecordPage[AlertRecord]":
+        """
+        Retrieves one page of alerts.
+        """
+        raise NotImplementedError
+
+    def iter_alerts(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator["AlertRecord"]:
+        """
+        Streams alerts in chronological order, ``page_size`` rows per query.
+        """
+        return _aiterate_pages(self.get_alerts_page, start, end, page_size)
+
+    async def get_alerts_between(self, start: datetime, end: datetime) -> List["AlertRecord"]:
+        """
+        Retrieves all alerts in ``[start, end)``, oldest first.
+        """
+        return [item async for item in self.iter_alerts(start, end)]
+
+    @abstractmethod
+    async def get_agent_messages_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> "RecordPage[AgentMessageRecord]":
+        """
+        Retrieves one page of agent messages.
+        """
+        raise NotImplementedError
+
+    def iter_agent_messages(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+    ) -> AsyncIterator["AgentMessageRecord"]:
+        """
+        Streams agent messages in chronological order, ``page_size`` rows per query.
+        """
+        return _aiterate_pages(self.get_agent_messages_page, start, end, page_size)
+
+    async def get_agent_messages_between(self, start: datetime, end: datetime) -> List["AgentMessageRecord"]:
+        """
+        Retrieves all agent messages in ``[start, end)``, oldest first.
+        """
+        return [item async for item in self.iter_agent_messages(start, end)]
+
+    @abstractmethod
+    async def set_state_value(self, namespace: str, key: str, value: Dict[str, Any]) -> None:
+        """
+        Persists a configuration or state value identified by namespace and key.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_state_value(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieves a stored configuration or state value.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upsert_blacklist_entry(self, entry: "BlacklistRecord") -> None:
+        """
+        Adds a blacklist entry, replacing the reason of an existing one.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_blacklist_entry(self, entry_type: str, identifier: str) -> bool:
+        """
+        Removes a blacklist entry. Returns whether it existed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_blacklist_entries(self, entry_type: Optional[str] = None) -> List["BlacklistRecord"]:
+        """
+        Retrieves blacklist entries, optionally of one type.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_blacklist_keys(self) -> List[Tuple[str, str]]:
+        """
+        Retrieves every ``(entry_type, identifier)`` pair, for building membership sets.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def count_blacklist_entries(self) -> int:
+        """
+        Counts blacklist entries.
+        """
+        raise NotImplementedError
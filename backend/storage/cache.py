@@ -0,0 +1,143 @@
+"""
+Read-through cache for ``state_store`` values.
+
+Hot keys such as ``risk/trading_status`` are read before every trade. The cache
+keeps decoded values in memory with a per-namespace TTL. A write through the same
+storage updates the cache immediately. Writes from other processes are detected
+through the ``state_versions`` table: every write bumps its namespace's counter in
+the same transaction, and the cache compares counters at most once per
+``sync_interval``. A changed counter drops that namespace's entries.
+"""
+import copy
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+_MISSING = object()
+
+
+def parse_namespace_ttls(spec: str) -> Dict[str, float]:
+    """Parses ``"risk=1,compliance=300"`` into ``{"risk": 1.0, "compliance": 300.0}``."""
+    ttls: Dict[str, float] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        namespace, _, seconds = item.partition("=")
+        ttls[namespace.strip()] = float(seconds)
+    return ttls
+
+
+class StateCache:
+    """
+    Thread-safe ``(namespace, key) -> value`` cache with cross-process version checks.
+
+    Values are deep-copied on the way in and out, so callers may mutate what they get
+    without corrupting the cache. ``None`` (key absent) is cached too.
+    """
+
+    def __init__(
+        self,
+        default_ttl: float = 60.0,
+        namespace_ttls: Optional[Mapping[str, float]] = None,
+        sync_interval: float = 1.0,
+        max_entries: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._default_ttl = default_ttl
+        self._namespace_ttls = dict(namespace_ttls or {})
+        self._sync_interval = sync_interval
+        self._max_entries = max(1, max_entries)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        self._next_sync = 0.0
+        # Bumped on every invalidation; fills started before it are discarded.
+        self._generation = 0
+
+    def ttl_for(self, namespace: str) -> float:
+        return self._namespace_ttls.get(namespace, self._default_ttl)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, namespace: str, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Returns ``(hit, value)``."""
+        with self._lock:
+            entry = self._entries.get((namespace, key), _MISSING)
+            if entry is _MISSING:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[(namespace, key)]
+                return False, None
+        return True, copy.deepcopy(value)
+
+    def fill(self, namespace: str, key: str, value: Optional[Dict[str, Any]], generation: int) -> None:
+        """
+        Caches a value read from the database, unless something was invalidated since
+        ``generation`` was taken (the read may predate that write).
+        """
+        ttl = self.ttl_for(namespace)
+        if ttl <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._store(namespace, key, value, ttl)
+
+    def write(self, namespace: str, key: str, value: Optional[Dict[str, Any]], version: int) -> None:
+        """
+        Records a local write that produced namespace ``version``. If the counter
+        skipped (another process wrote in between), the namespace is dropped instead.
+        A namespace without a known version counts as version 0.
+        """
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._generation += 1
+            known = self._versions.get(namespace, 0)
+            if version != known + 1:
+                self._drop_namespace(namespace)
+            self._versions[namespace] = version
+            ttl = self.ttl_for(namespace)
+            if ttl > 0:
+                self._store(namespace, key, value, ttl)
+            else:
+                self._entries.pop((namespace, key), None)
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """Drops one namespace, or everything."""
+        with self._lock:
+            self._generation += 1
+            if namespace is None:
+                self._entries.clear()
+                self._versions.clear()
+            else:
+                self._drop_namespace(namespace)
+                self._versions.pop(namespace, None)
+
+    def sync_due(self) -> bool:
+        return self._clock() >= self._next_sync
+
+    def apply_versions(self, versions: Mapping[str, int]) -> None:
+        """Drops namespaces whose version changed since the last sync."""
+        with self._lock:
+            stale = [ns for ns, version in versions.items() if self._versions.get(ns) != version]
+            if stale:
+                self._generation += 1
+                for namespace in stale:
+                    self._drop_namespace(namespace)
+            self._versions = dict(versions)
+            self._next_sync = self._clock() + self._sync_interval
+
+    def _store(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        if len(self._entries) >= self._max_entries and (namespace, key) not in self._entries:
+            # Evict the oldest insertion; hot keys are re-filled on their next read.
+            self._entries.pop(next(iter(self._entries)))
+        self._entries[(namespace, key)] = (self._clock() + ttl, value)
+
+    def _drop_namespace(self, namespace: str) -> None:
+        for cache_key in [k for k in self._entries if k[0] == namespace]:
+            del self._entries[cache_key]
@@ -0,0 +1,92 @@
+"""
+Columnar trade reads for analytics.
+
+Analytics callers (volatility, VaR, equity curves) only need a few columns as
+NumPy arrays. Building a validated ``TradeData`` per row just to pull one field
+back out costs more than the query itself. These helpers turn raw rows into
+arrays directly, converting each column in one pass.
+
+Money columns come back as ``float64``. That is fine for statistics but not for
+bookkeeping, which must keep using the ``Decimal`` models.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .utils import to_epoch_us
+
+# Column -> (SQL expression, dtype). ``timestamp`` is derived from the integer
+# epoch column so it never goes through ISO-8601 parsing.
+TRADE_COLUMNS: Dict[str, Tuple[str, str]] = {
+    "id": ("id", "object"),
+    "token": ("token", "object"),
+    "action": ("action", "object"),
+    "status": ("status", "object"),
+    "amount": ("amount", "float64"),
+    "price": ("price", "float64"),
+    "profit": ("profit", "float64"),
+    "timestamp_us": ("timestamp_us", "int64"),
+    "timestamp": ("timestamp_us", "datetime64[us]"),
+}
+DEFAULT_TRADE_COLUMNS: Tuple[str, ...] = ("timestamp", "token", "amount", "price", "profit")
+
+
+def check_trade_columns(columns: Sequence[str]) -> None:
+    unknown = [name for name in columns if name not in TRADE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown trade columns: {', '.join(unknown)}")
+
+
+def trade_columns_query(
+    columns: Sequence[str],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Chronological ``SELECT`` of ``columns`` over ``[start, end)`` and its bind parameters."""
+    check_trade_columns(columns)
+    conditions = []
+    params: Dict[str, Any] = {}
+    if start is not None:
+        conditions.append("timestamp_us >= :start_us")
+        params["start_us"] = to_epoch_us(start)
+    if end is not None:
+        conditions.append("timestamp_us < :end_us")
+        params["end_us"] = to_epoch_us(end)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    select = ", ".join(TRADE_COLUMNS[name][0] for name in columns)
+    return f"SELECT {select} FROM trades{where} ORDER BY timestamp_us, id;", params
+
+
+def to_array(values: Sequence[Any], dtype: str) -> np.ndarray:
+    if dtype == "float64":
+        # TEXT decimals: float() per value is the fastest exact-to-float path.
+        return np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+    if dtype == "object":
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+    return np.asarray(values, dtype=np.int64).astype(dtype, copy=False)
+
+
+def rows_to_columns(rows: List[Tuple[Any, ...]], columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Transposes ``rows`` (one value per requested column) into named arrays."""
+    transposed = list(zip(*rows)) if rows else [()] * len(columns)
+    return {
+        name: to_array(values, TRADE_COLUMNS[name][1])
+        for name, values in zip(columns, transposed)
+    }
+
+
+def trades_to_columns(trades: Iterable[Any], columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Generic fallback for storages without a native columnar read."""
+    rows = []
+    for trade in trades:
+        row = []
+        for name in columns:
+            if name in ("timestamp", "timestamp_us"):
+                row.append(to_epoch_us(trade.timestamp))
+            else:
+                row.append(getattr(trade, name))
+        rows.append(tuple(row))
+    return rows_to_columns(rows, columns)
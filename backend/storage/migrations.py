@@ -0,0 +1,441 @@
+"""
+Versioned schema migrations for the SQL storages.
+
+Migrations are numbered and applied in order at startup. Applied versions are
+recorded in ``schema_migrations`` so an existing database upgrades in place and a
+fresh one is built by replaying every step. Each step is idempotent (``IF NOT
+EXISTS`` guards, column checks) because SQLite commits some DDL implicitly and two
+processes may race on first start.
+
+PostgreSQL starts from ``PG_MIGRATIONS``, whose baseline builds the schema of
+SQLite version 5 directly with native types. Later steps should be added to both
+lists under the same version number.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .aggregates import rebuild_aggregates
+from .utils import iso_to_epoch_us, normalize_identifier
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _column_names(conn: Connection, table: str) -> Set[str]:
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+
+
+def _create_base_tables(conn: Connection) -> None:
+    # RESURRECTION FIX: Use TEXT for financial values to prevent precision loss.
+    queries = [
+        """
+        CREATE TABLE IF NOT EXISTS teams (
+            name TEXT PRIMARY KEY,
+            team_id TEXT,
+            members TEXT,
+            description TEXT,
+            instructions TEXT
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS workflows (
+            name TEXT PRIMARY KEY,
+            id TEXT,
+            description TEXT,
+            steps TEXT
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS trades (
+            id TEXT PRIMARY KEY,
+            token TEXT,
+            action TEXT,
+            amount TEXT,
+            price TEXT,
+            timestamp TEXT,
+            profit TEXT,
+            status TEXT
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activities (
+            id TEXT PRIMARY KEY,
+            timestamp TEXT,
+            type TEXT,
+            message TEXT,
+            details TEXT
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS portfolio_positions (
+            token_address TEXT PRIMARY KEY,
+            symbol TEXT,
+            chain TEXT,
+            coingecko_id TEXT,
+            amount TEXT,
+            average_price TEXT,
+            last_price TEXT,
+            last_valuation_usd TEXT,
+            updated_at TEXT
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS alerts (
+            id TEXT PRIMARY KEY,
+            timestamp TEXT,
+            recipient TEXT,
+            channel TEXT,
+            message TEXT,
+            status TEXT,
+            metadata TEXT
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS agent_messages (
+            id TEXT PRIMARY KEY,
+            timestamp TEXT,
+            sender TEXT,
+            recipient TEXT,
+            content TEXT,
+            status TEXT,
+            correlation_id TEXT
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS state_store (
+            namespace TEXT,
+            key TEXT,
+            value TEXT,
+            updated_at TEXT,
+            PRIMARY KEY (namespace, key)
+        );
+        """,
+    ]
+    for query in queries:
+        conn.execute(text(query))
+
+
+# Tables read with "most recent N" queries. They get an integer epoch column so
+# ordering no longer depends on ISO strings (which sort wrongly across offsets).
+TIME_ORDERED_TABLES = ("trades", "activities", "alerts", "agent_messages")
+
+
+def _add_epoch_timestamps(conn: Connection) -> None:
+    for table in TIME_ORDERED_TABLES:
+        if "timestamp_us" not in _column_names(conn, table):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN timestamp_us INTEGER"))
+
+        rows = conn.execute(
+            text(f"SELECT id, timestamp FROM {table} WHERE timestamp_us IS NULL")
+        ).fetchall()
+        if rows:
+            # Unparseable legacy timestamps sort as the oldest rows.
+            params = [{"id": row[0], "ts": iso_to_epoch_us(row[1]) or 0} for row in rows]
+            conn.execute(text(f"UPDATE {table} SET timestamp_us = :ts WHERE id = :id"), params)
+            logger.info("Backfilled timestamp_us for %d %s rows", len(rows), table)
+
+        # (timestamp_us, id) gives a total order, so it serves both "recent N"
+        # (reverse scan + LIMIT) and keyset pagination without a sort step.
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp_us ON {table} (timestamp_us, id)"
+        ))
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_trades_token ON trades (token, timestamp_us)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_activities_type ON activities (type, timestamp_us)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_agent_messages_correlation_id "
+        "ON agent_messages (correlation_id, timestamp_us)"
+    ))
+
+
+def _create_blacklist_table(conn: Connection) -> None:
+    conn.execute(text(
+        """
+        CREATE TABLE IF NOT EXISTS blacklist (
+            entry_type TEXT NOT NULL,
+            identifier TEXT NOT NULL,
+            reason TEXT,
+            added_at TEXT,
+            PRIMARY KEY (entry_type, identifier)
+        );
+        """
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_blacklist_identifier ON blacklist (identifier)"))
+
+    # Move the legacy single-blob list (state_store "blacklist"/"entries") into the table.
+    row = conn.execute(text(
+        "SELECT value FROM state_store WHERE namespace = 'blacklist' AND key = 'entries'"
+    )).fetchone()
+    if row is None:
+        return
+    try:
+        entries = json.loads(row[0]) or []
+    except ValueError:
+        logger.warning("Legacy blacklist blob is not valid JSON; leaving it in state_store")
+        return
+    params = [
+        {
+            "entry_type": entry.get("entry_type"),
+            "identifier": normalize_identifier(entry.get("identifier")),
+            "reason": entry.get("reason"),
+            "added_at": entry.get("added_at") or datetime.utcnow().isoformat(),
+        }
+        for entry in entries
+        if entry.get("entry_type") and entry.get("identifier")
+    ]
+    if params:
+        conn.execute(
+            text(
+                "INSERT OR REPLACE INTO blacklist (entry_type, identifier, reason, added_at) "
+                "VALUES (:entry_type, :identifier, :reason, :added_at)"
+            ),
+            params,
+        )
+    conn.execute(text("DELETE FROM state_store WHERE namespace = 'blacklist' AND key = 'entries'"))
+    logger.info("Migrated %d legacy blacklist entries", len(params))
+
+
+def _create_state_versions(conn: Connection) -> None:
+    # One counter per state_store namespace, bumped in the same transaction as each
+    # write, so in-process caches in other processes can detect changes cheaply.
+    conn.execute(text(
+        """
+        CREATE TABLE IF NOT EXISTS state_versions (
+            namespace TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+        """
+    ))
+
+
+def _create_trade_aggregates(conn: Connection) -> None:
+    # Decimal columns are TEXT like the rest of the schema; see aggregates.py.
+    conn.execute(text(
+        """
+        CREATE TABLE IF NOT EXISTS trade_aggregates (
+            scope TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            trade_count INTEGER NOT NULL,
+            winners INTEGER NOT NULL,
+            losers INTEGER NOT NULL,
+            notional TEXT NOT NULL,
+            realized_profit TEXT NOT NULL,
+            profit_sq_sum TEXT NOT NULL,
+            equity TEXT NOT NULL,
+            peak_equity TEXT NOT NULL,
+            max_drawdown TEXT NOT NULL,
+            first_trade_us INTEGER,
+            last_trade_us INTEGER,
+            PRIMARY KEY (scope, bucket)
+        );
+        """
+    ))
+    count = rebuild_aggregates(conn)
+    if count:
+        logger.info("Built trade aggregates from %d existing trades", count)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Base tables", _create_base_tables),
+    Migration(2, "Epoch timestamps and recent-N / lookup indexes", _add_epoch_timestamps),
+    Migration(3, "Normalized blacklist table", _create_blacklist_table),
+    Migration(4, "state_store namespace versions", _create_state_versions),
+    Migration(5, "Incremental trade aggregates", _create_trade_aggregates),
+]
+
+
+def _create_postgres_schema(conn: Connection) -> None:
+    # Native types instead of TEXT: NUMERIC keeps Decimal precision, TIMESTAMPTZ and
+    # JSONB can be queried server-side. timestamp_us stays as the shared keyset column.
+    queries = [
+        """
+        CREATE TABLE IF NOT EXISTS teams (
+            name TEXT PRIMARY KEY,
+            team_id TEXT,
+            members JSONB,
+            description TEXT,
+            instructions JSONB
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS workflows (
+            name TEXT PRIMARY KEY,
+            id TEXT,
+            description TEXT,
+            steps JSONB
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS trades (
+            id TEXT PRIMARY KEY,
+            token TEXT,
+            action TEXT,
+            amount NUMERIC,
+            price NUMERIC,
+            timestamp TIMESTAMPTZ,
+            profit NUMERIC,
+            status TEXT,
+            timestamp_us BIGINT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activities (
+            id TEXT PRIMARY KEY,
+            timestamp TIMESTAMPTZ,
+            type TEXT,
+            message TEXT,
+            details JSONB,
+            timestamp_us BIGINT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS portfolio_positions (
+            token_address TEXT PRIMARY KEY,
+            symbol TEXT,
+            chain TEXT,
+            coingecko_id TEXT,
+            amount NUMERIC,
+            average_price NUMERIC,
+            last_price NUMERIC,
+            last_valuation_usd NUMERIC,
+            updated_at TIMESTAMPTZ
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS alerts (
+            id TEXT PRIMARY KEY,
+            timestamp TIMESTAMPTZ,
+            recipient TEXT,
+            channel TEXT,
+            message TEXT,
+            status TEXT,
+            metadata JSONB,
+            timestamp_us BIGINT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS agent_messages (
+            id TEXT PRIMARY KEY,
+            timestamp TIMESTAMPTZ,
+            sender TEXT,
+            recipient TEXT,
+            content JSONB,
+            status TEXT,
+            correlation_id TEXT,
+            timestamp_us BIGINT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS state_store (
+            namespace TEXT,
+            key TEXT,
+            value JSONB,
+            updated_at TIMESTAMPTZ,
+            PRIMARY KEY (namespace, key)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS state_versions (
+            namespace TEXT PRIMARY KEY,
+            version BIGINT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS blacklist (
+            entry_type TEXT NOT NULL,
+            identifier TEXT NOT NULL,
+            reason TEXT,
+            added_at TIMESTAMPTZ,
+            PRIMARY KEY (entry_type, identifier)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS trade_aggregates (
+            scope TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            trade_count INTEGER NOT NULL,
+            winners INTEGER NOT NULL,
+            losers INTEGER NOT NULL,
+            notional NUMERIC NOT NULL,
+            realized_profit NUMERIC NOT NULL,
+            profit_sq_sum NUMERIC NOT NULL,
+            equity NUMERIC NOT NULL,
+            peak_equity NUMERIC NOT NULL,
+            max_drawdown NUMERIC NOT NULL,
+            first_trade_us BIGINT,
+            last_trade_us BIGINT,
+            PRIMARY KEY (scope, bucket)
+        )
+        """,
+    ]
+    for table in TIME_ORDERED_TABLES:
+        queries.append(f"CREATE INDEX IF NOT EXISTS idx_{table}_timestamp_us ON {table} (timestamp_us, id)")
+    queries += [
+        "CREATE INDEX IF NOT EXISTS idx_trades_token ON trades (token, timestamp_us)",
+        "CREATE INDEX IF NOT EXISTS idx_activities_type ON activities (type, timestamp_us)",
+        "CREATE INDEX IF NOT EXISTS idx_agent_messages_correlation_id ON agent_messages (correlation_id, timestamp_us)",
+        "CREATE INDEX IF NOT EXISTS idx_blacklist_identifier ON blacklist (identifier)",
+    ]
+    for query in queries:
+        conn.execute(text(query))
+
+
+PG_MIGRATIONS: List[Migration] = [
+    Migration(5, "PostgreSQL baseline (SQLite migrations 1-5)", _create_postgres_schema),
+]
+
+
+def current_version(conn: Connection) -> int:
+    result = conn.execute(text("SELECT MAX(version) FROM schema_migrations")).scalar()
+    return result or 0
+
+
+def apply_migrations(conn: Connection, migrations: List[Migration] = MIGRATIONS) -> int:
+    """
+    Applies every migration newer than the recorded schema version.
+    Returns the resulting version. The caller owns the transaction.
+    """
+    conn.execute(text(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        );
+        """
+    ))
+    version = current_version(conn)
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= version:
+            continue
+        logger.info("Applying storage migration %d: %s", migration.version, migration.description)
+        migration.apply(conn)
+        conn.execute(
+            text(
+                "INSERT INTO schema_migrations (version, description, applied_at) "
+                "VALUES (:version, :description, :applied_at) ON CONFLICT (version) DO NOTHING"
+            ),
+            {
+                "version": migration.version,
+                "description": migration.description,
+                "applied_at": datetime.utcnow().isoformat(),
+            },
+        )
+        version = migration.version
+    return version
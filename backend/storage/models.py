@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import Generic, List, Optional, Dict, Any, TypeVar
 from pydantic import BaseModel
 from datetime import datetime
 from decimal import Decimal
@@ -70,8 +70,47 @@ class AgentMessageRecord(BaseModel):
     correlation_id: Optional[str] = None
 
 
+class BlacklistRecord(BaseModel):
+    entry_type: str
+    identifier: str
+    reason: Optional[str] = None
+    added_at: datetime
+
+
+class TradeAggregate(BaseModel):
+    """
+    Running totals over a set of trades: everything (scope "all"), one token
+    (scope "token", bucket = token) or one UTC day (scope "day", bucket = YYYY-MM-DD).
+    ``equity`` is cumulative realized profit in chronological ``(timestamp, id)``
+    order, rebuilt when a backdated trade arrives; ``peak_equity`` and
+    ``max_drawdown`` (<= 0) track it.
+    """
+    scope: str
+    bucket: str = ""
+    trade_count: int = 0
+    winners: int = 0
+    losers: int = 0
+    notional: Decimal = Decimal("0")
+    realized_profit: Decimal = Decimal("0")
+    profit_sq_sum: Decimal = Decimal("0")
+    equity: Decimal = Decimal("0")
+    peak_equity: Decimal = Decimal("0")
+    max_drawdown: Decimal = Decimal("0")
+    first_trade_at: Optional[datetime] = None
+    last_trade_at: Optional[datetime] = None
+
+
 class KeyValueRecord(BaseModel):
     namespace: str
     key: str
     value: Dict[str, Any]
     updated_at: datetime
+
+
+RecordT = TypeVar("RecordT")
+
+
+class RecordPage(BaseModel, Generic[RecordT]):
+    """One page of a keyset-paginated query. ``next_cursor`` is None on the last page."""
+    items: List[RecordT]
+    next_cursor: Optional[str] = None
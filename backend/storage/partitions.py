@@ -0,0 +1,386 @@
+"""
+Monthly partitions for the SQLite ``trades`` and ``activities`` tables.
+
+The hot database keeps the recent months. ``PartitionManager.seal`` moves whole
+months older than the hot window into one SQLite file per table and UTC month::
+
+    <partition_dir>/<table>/<YYYY-MM>.db
+
+Sealed files are read-only (mode 0444, opened ``immutable``). Reads of a time
+range or keyset page merge the hot rows with the partitions the range covers,
+newest (or oldest) first. They stop as soon as the page is full and the next
+partition cannot contribute, so "recent N" queries never open a partition and
+their cost does not grow with history. ``VACUUM`` and maintenance only touch the
+hot database.
+
+A month's rows are removed from the hot table with ``DELETE ... RETURNING``. The
+partition file is written, fsynced and renamed into place before the delete
+commits. A crash in between leaves the rows in both places; the next ``seal``
+rewrites the partition (the month's file is copied, updated and renamed, never
+modified in place) and reads drop the duplicate keys meanwhile. Rows inserted
+later with a timestamp in a sealed month stay in the hot table until the next
+``seal`` folds them in.
+
+``expire`` hands sealed rows past a retention cutoff to the archive, then deletes
+their month files (or rewrites the month that straddles the cutoff). A crash
+after archiving leaves the rows in both places until the next run.
+
+``detach`` moves a partition to ``<partition_dir>/detached/<table>/`` and out of
+every query; ``attach`` brings a file back. Primary keys are only enforced per
+file, so re-inserting the id of a sealed row is not rejected.
+"""
+import logging
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .utils import to_epoch_us
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("trades", "activities")
+
+_SUFFIX = ".db"
+_DETACHED = "detached"
+
+
+class Partition(NamedTuple):
+    table: str
+    month: str
+    path: str
+    start_us: int
+    end_us: int
+
+
+def month_bounds(month: str) -> Tuple[int, int]:
+    """``"2024-02"`` -> epoch microseconds of ``[2024-02-01, 2024-03-01)`` UTC."""
+    year, number = (int(part) for part in month.split("-"))
+    start = datetime(year, number, 1, tzinfo=timezone.utc)
+    end = datetime(year + number // 12, number % 12 + 1, 1, tzinfo=timezone.utc)
+    return to_epoch_us(start), to_epoch_us(end)
+
+
+def month_of(timestamp_us: int) -> str:
+    return datetime.fromtimestamp(timestamp_us / 1_000_000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def default_partition_dir(database: Optional[str]) -> Optional[str]:
+    """``STORAGE_PARTITION_DIR``, else ``<database file>.partitions``; None for in-memory databases."""
+    directory = os.getenv("STORAGE_PARTITION_DIR")
+    if directory:
+        return directory
+    return f"{database}.partitions" if database and database != ":memory:" else None
+
+
+def _check_table(table: str) -> None:
+    if table not in PARTITIONED_TABLES:
+        raise ValueError(f"Partitioning is not supported for table: {table}")
+
+
+def _connect_ro(path: str) -> sqlite3.Connection:
+    # immutable=1 skips locking and change detection; safe because sealed files are
+    # only ever replaced by rename, never written in place.
+    return sqlite3.connect(f"file:{path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+
+
+def _fetch(path: str, query: str, params: Dict[str, Any], as_tuples: bool = False) -> List[Any]:
+    db = _connect_ro(path)
+    try:
+        cursor = db.execute(query, params)
+        rows = cursor.fetchall()
+        if as_tuples:
+            return rows
+        keys = [column[0] for column in cursor.description]
+        return [dict(zip(keys, row)) for row in rows]
+    finally:
+        db.close()
+
+
+def _fsync_dir(directory: str) -> None:
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_partition(path: str, table: str, ddl: str, rows: List[Dict[str, Any]]) -> None:
+    """Merges ``rows`` into the partition at ``path`` by writing a new file and renaming it over."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    if os.path.exists(path):
+        shutil.copyfile(path, tmp)
+        os.chmod(tmp, 0o644)
+    db = sqlite3.connect(tmp)
+    try:
+        if not os.path.exists(path):
+            db.execute(ddl)
+            db.execute(f"CREATE INDEX idx_{table}_timestamp_us ON {table} (timestamp_us, id)")
+        columns = list(rows[0])
+        db.executemany(
+            f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(':' + name for name in columns)})",
+            rows,
+        )
+        db.commit()
+    finally:
+        db.close()
+    with open(tmp, "rb") as handle:
+        os.fsync(handle.fileno())
+    os.chmod(tmp, 0o444)
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+def _trim_partition(path: str, table: str, cutoff_us: int) -> int:
+    """Rewrites the partition at ``path`` without its rows before ``cutoff_us``. Returns rows removed."""
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    shutil.copyfile(path, tmp)
+    os.chmod(tmp, 0o644)
+    db = sqlite3.connect(tmp)
+    try:
+        removed = db.execute(f"DELETE FROM {table} WHERE timestamp_us < ?", (cutoff_us,)).rowcount
+        db.commit()
+        db.execute("VACUUM")
+    finally:
+        db.close()
+    with open(tmp, "rb") as handle:
+        os.fsync(handle.fileno())
+    os.chmod(tmp, 0o444)
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path))
+    return removed
+
+
+class PartitionManager:
+    """
+    Finds, seals and reads the month partitions under ``directory``. With
+    ``directory=None`` (in-memory databases) every table is unpartitioned.
+    """
+
+    def __init__(self, directory: Optional[str]):
+        self.directory = directory
+        self._listing: Dict[str, Tuple[int, List[Partition]]] = {}
+
+    def partitions(self, table: str) -> List[Partition]:
+        """Attached partitions of ``table``, oldest first."""
+        _check_table(table)
+        if self.directory is None:
+            return []
+        directory = os.path.join(self.directory, table)
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        cached = self._listing.get(table)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        parts = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(_SUFFIX):
+                continue
+            month = name[: -len(_SUFFIX)]
+            parts.append(Partition(table, month, os.path.join(directory, name), *month_bounds(month)))
+        self._listing[table] = (mtime, parts)
+        return parts
+
+    def path(self, table: str, month: str) -> str:
+        return os.path.join(self.directory, table, month + _SUFFIX)
+
+    def seal(self, engine: Engine, table: str, before: datetime) -> Dict[str, int]:
+        """
+        Moves every hot row of ``table`` from a month that ends on or before
+        ``before`` into its partition. Returns rows moved per month.
+        """
+        _check_table(table)
+        if self.directory is None:
+            raise ValueError("Partitioning needs a partition_dir for in-memory databases")
+        cutoff_us = month_bounds(month_of(to_epoch_us(before)))[0]
+        moved: Dict[str, int] = {}
+        with engine.connect() as conn:
+            ddl = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+            ).scalar()
+        while True:
+            with engine.begin() as conn:
+                oldest = conn.execute(
+                    text(f"SELECT MIN(timestamp_us) FROM {table} WHERE timestamp_us < :cutoff"),
+                    {"cutoff": cutoff_us},
+                ).scalar()
+                if oldest is None:
+                    return moved
+                month = month_of(oldest)
+                start_us, end_us = month_bounds(month)
+                rows = [
+                    dict(row._mapping)
+                    for row in conn.execute(
+                        text(f"DELETE FROM {table} WHERE timestamp_us >= :start AND timestamp_us < :end RETURNING *"),
+                        {"start": start_us, "end": end_us},
+                    )
+                ]
+                _write_partition(self.path(table, month), table, ddl, rows)
+            moved[month] = moved.get(month, 0) + len(rows)
+            logger.info("Sealed %d %s rows into partition %s", len(rows), table, month)
+
+    def expire(
+        self,
+        table: str,
+        cutoff: datetime,
+        archive: Callable[[List[Dict[str, Any]]], None],
+    ) -> int:
+        """
+        Removes sealed rows of ``table`` older than ``cutoff``, oldest month first.
+        Each month's expired rows go to ``archive`` (which must make them durable)
+        before its file is deleted, or rewritten without them when the month
+        straddles ``cutoff``. Returns the row count.
+        """
+        cutoff_us = to_epoch_us(cutoff)
+        expired = 0
+        for part in self.partitions(table):
+            if part.start_us >= cutoff_us:
+                break
+            rows = _fetch(
+                part.path,
+                f"SELECT * FROM {table} WHERE timestamp_us < :cutoff ORDER BY timestamp_us, id",
+                {"cutoff": cutoff_us},
+            )
+            if rows:
+                archive(rows)
+            if part.end_us <= cutoff_us:
+                os.remove(part.path)
+                _fsync_dir(os.path.dirname(part.path))
+            elif rows:
+                _trim_partition(part.path, table, cutoff_us)
+            expired += len(rows)
+            logger.info("Expired %d %s rows from partition %s", len(rows), table, part.month)
+        return expired
+
+    def detach(self, table: str, month: str) -> str:
+        """Takes a partition out of every query. Returns its new path."""
+        _check_table(table)
+        source = self.path(table, month) if self.directory else ""
+        if not os.path.exists(source):
+            raise ValueError(f"No attached {table} partition for {month}")
+        target = os.path.join(self.directory, _DETACHED, table, month + _SUFFIX)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source, target)
+        return target
+
+    def attach(self, table: str, path: str) -> Partition:
+        """Brings a detached (or copied-in) month file back into queries."""
+        _check_table(table)
+        if self.directory is None:
+            raise ValueError("Partitioning needs a partition_dir for in-memory databases")
+        month = os.path.basename(path)[: -len(_SUFFIX)]
+        month_bounds(month)  # validates the file name
+        target = self.path(table, month)
+        if os.path.exists(target):
+            raise ValueError(f"A {table} partition for {month} is already attached")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+        os.chmod(target, 0o444)
+        return Partition(table, month, target, *month_bounds(month))
+
+    def iter_rows(self, table: str) -> Iterable[Dict[str, Any]]:
+        """Every sealed row of ``table``, oldest first."""
+        for part in self.partitions(table):
+            yield from _fetch(part.path, f"SELECT * FROM {table} ORDER BY timestamp_us, id", {})
+
+    def _covering(
+        self,
+        table: str,
+        start_us: Optional[int],
+        end_us: Optional[int],
+        ascending: bool,
+    ) -> List[Partition]:
+        parts = [
+            part for part in self.partitions(table)
+            if (start_us is None or part.end_us > start_us) and (end_us is None or part.start_us < end_us)
+        ]
+        return parts if ascending else parts[::-1]
+
+    def merge_page(
+        self,
+        table: str,
+        query: str,
+        params: Dict[str, Any],
+        ascending: bool,
+        hot_rows: Sequence[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Merges the hot result of a ``queries.page_query`` with the partitions it may
+        reach, returning at most ``params["limit"]`` rows in page order.
+        """
+        if table not in PARTITIONED_TABLES:
+            return list(hot_rows)
+        cursor_us = params.get("cursor_ts")
+        start_us, end_us = params.get("start_us"), params.get("end_us")
+        if cursor_us is not None:
+            # Keyset bound: later pages only reach one side of the cursor.
+            if ascending:
+                start_us = cursor_us if start_us is None else max(start_us, cursor_us)
+            else:
+                end_us = cursor_us + 1 if end_us is None else min(end_us, cursor_us + 1)
+        parts = self._covering(table, start_us, end_us, ascending)
+        if not parts:
+            return list(hot_rows)
+
+        limit = params["limit"]
+
+        def key(row):
+            return (row["timestamp_us"], row["id"])
+
+        rows = list(hot_rows)
+        for part in parts:
+            if len(rows) >= limit:
+                rows.sort(key=key, reverse=not ascending)
+                boundary = rows[limit - 1]["timestamp_us"]
+                if (part.start_us > boundary) if ascending else (part.end_us <= boundary):
+                    break
+            rows.extend(_fetch(part.path, query, params))
+        return _dedupe(sorted(rows, key=key, reverse=not ascending), key)[:limit]
+
+    def merge_columns(
+        self,
+        table: str,
+        query: str,
+        params: Dict[str, Any],
+        hot_rows: Iterable[Tuple[Any, ...]],
+        start_us: Optional[int],
+        end_us: Optional[int],
+    ) -> List[Tuple[Any, ...]]:
+        """
+        Chronological merge of column tuples whose last two values are
+        ``(timestamp_us, id)``, as selected by ``query``.
+        """
+        rows = list(hot_rows)
+        parts = self._covering(table, start_us, end_us, ascending=True)
+        if not parts:
+            return rows
+        for part in parts:
+            rows.extend(_fetch(part.path, query, params, as_tuples=True))
+
+        def key(row):
+            return row[-2:]
+
+        return _dedupe(sorted(rows, key=key), key)
+
+
+def _dedupe(rows: List[Any], key: Callable[[Any], Any]) -> List[Any]:
+    # Rows present in both the hot table and a partition (interrupted seal) are adjacent.
+    result, last = [], None
+    for row in rows:
+        current = key(row)
+        if current != last:
+            result.append(row)
+            last = current
+    return result
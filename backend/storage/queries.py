@@ -0,0 +1,372 @@
+"""
+SQL statements and row codecs shared by the sync and async SQL storages.
+
+Keeping the statements and the model <-> row conversions in one place means
+the SQLite and PostgreSQL storages cannot drift apart: each only adds its own
+way of executing them. Statements stick to syntax both dialects accept
+(``ON CONFLICT`` upserts, row-value comparisons). Parameters are always bound as
+strings; PostgreSQL casts them to its NUMERIC, TIMESTAMPTZ and JSONB columns,
+and the codecs accept either the stored text or the native value read back.
+"""
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, TypeVar
+
+from .models import (
+    Team,
+    Workflow,
+    TradeData,
+    ActivityData,
+    PortfolioPosition,
+    AlertRecord,
+    AgentMessageRecord,
+    BlacklistRecord,
+    RecordPage,
+)
+from .migrations import TIME_ORDERED_TABLES
+from .utils import decode_cursor, encode_cursor, normalize_identifier, to_epoch_us
+
+T = TypeVar("T")
+
+SAVE_TEAM = """
+INSERT INTO teams (name, team_id, members, description, instructions)
+VALUES (:name, :team_id, :members, :description, :instructions)
+ON CONFLICT (name) DO UPDATE
+SET team_id = excluded.team_id,
+    members = excluded.members,
+    description = excluded.description,
+    instructions = excluded.instructions;
+"""
+GET_TEAM = "SELECT * FROM teams WHERE name = :name;"
+DELETE_TEAM = "DELETE FROM teams WHERE name = :name;"
+
+SAVE_WORKFLOW = """
+INSERT INTO workflows (name, id, description, steps)
+VALUES (:name, :id, :description, :steps)
+ON CONFLICT (name) DO UPDATE
+SET id = excluded.id,
+    description = excluded.description,
+    steps = excluded.steps;
+"""
+GET_WORKFLOW = "SELECT * FROM workflows WHERE name = :name;"
+DELETE_WORKFLOW = "DELETE FROM workflows WHERE name = :name;"
+GET_ALL_WORKFLOWS = "SELECT * FROM workflows;"
+
+INSERT_TRADE = """
+INSERT INTO trades (id, token, action, amount, price, timestamp, timestamp_us, profit, status)
+VALUES (:id, :token, :action, :amount, :price, :timestamp, :timestamp_us, :profit, :status)
+"""
+RECENT_TRADES = "SELECT * FROM trades ORDER BY timestamp_us DESC, id DESC LIMIT :limit;"
+
+INSERT_ACTIVITY = """
+INSERT INTO activities (id, timestamp, timestamp_us, type, message, details)
+VALUES (:id, :timestamp, :timestamp_us, :type, :message, :details)
+"""
+RECENT_ACTIVITIES = "SELECT * FROM activities ORDER BY timestamp_us DESC, id DESC LIMIT :limit;"
+
+GET_PORTFOLIO_POSITIONS = "SELECT * FROM portfolio_positions;"
+# RESURRECTION FIX: Remove float casting.
+UPSERT_PORTFOLIO_POSITION = """
+INSERT INTO portfolio_positions (
+    token_address, symbol, chain, coingecko_id, amount,
+    average_price, last_price, last_valuation_usd, updated_at
+) VALUES (
+    :token_address, :symbol, :chain, :coingecko_id, :amount,
+    :average_price, :last_price, :last_valuation_usd, :updated_at
+)
+ON CONFLICT(token_address) DO UPDATE SET
+    symbol = excluded.symbol,
+    chain = excluded.chain,
+    coingecko_id = excluded.coingecko_id,
+    amount = excluded.amount,
+    average_price = excluded.average_price,
+    last_price = excluded.last_price,
+    last_valuation_usd = excluded.last_valuation_usd,
+    updated_at = excluded.updated_at;
+"""
+
+UPSERT_ALERT = """
+INSERT INTO alerts (id, timestamp, timestamp_us, recipient, channel, message, status, metadata)
+VALUES (:id, :timestamp, :timestamp_us, :recipient, :channel, :message, :status, :metadata)
+ON CONFLICT(id) DO UPDATE SET
+    timestamp = excluded.timestamp,
+    timestamp_us = excluded.timestamp_us,
+    recipient = excluded.recipient,
+    channel = excluded.channel,
+    message = excluded.message,
+    status = excluded.status,
+    metadata = excluded.metadata;
+"""
+RECENT_ALERTS = "SELECT * FROM alerts ORDER BY timestamp_us DESC, id DESC LIMIT :limit;"
+
+UPSERT_AGENT_MESSAGE = """
+INSERT INTO agent_messages (id, timestamp, timestamp_us, sender, recipient, content, status, correlation_id)
+VALUES (:id, :timestamp, :timestamp_us, :sender, :recipient, :content, :status, :correlation_id)
+ON CONFLICT(id) DO UPDATE SET
+    timestamp = excluded.timestamp,
+    timestamp_us = excluded.timestamp_us,
+    sender = excluded.sender,
+    recipient = excluded.recipient,
+    content = excluded.content,
+    status = excluded.status,
+    correlation_id = excluded.correlation_id;
+"""
+RECENT_AGENT_MESSAGES = "SELECT * FROM agent_messages ORDER BY timestamp_us DESC, id DESC LIMIT :limit;"
+
+UPSERT_STATE_VALUE = """
+INSERT INTO state_store (namespace, key, value, updated_at)
+VALUES (:namespace, :key, :value, :updated_at)
+ON CONFLICT(namespace, key) DO UPDATE SET
+    value = excluded.value,
+    updated_at = excluded.updated_at;
+"""
+GET_STATE_VALUE = "SELECT value FROM state_store WHERE namespace = :namespace AND key = :key;"
+BUMP_STATE_VERSION = """
+INSERT INTO state_versions (namespace, version) VALUES (:namespace, 1)
+ON CONFLICT(namespace) DO UPDATE SET version = state_versions.version + 1;
+"""
+GET_STATE_VERSION = "SELECT version FROM state_versions WHERE namespace = :namespace;"
+GET_STATE_VERSIONS = "SELECT namespace, version FROM state_versions;"
+
+UPSERT_BLACKLIST_ENTRY = """
+INSERT INTO blacklist (entry_type, identifier, reason, added_at)
+VALUES (:entry_type, :identifier, :reason, :added_at)
+ON CONFLICT(entry_type, identifier) DO UPDATE SET
+    reason = excluded.reason,
+    added_at = excluded.added_at;
+"""
+DELETE_BLACKLIST_ENTRY = "DELETE FROM blacklist WHERE entry_type = :entry_type AND identifier = :identifier;"
+GET_BLACKLIST_ENTRIES = "SELECT * FROM blacklist ORDER BY added_at, entry_type, identifier;"
+GET_BLACKLIST_ENTRIES_BY_TYPE = (
+    "SELECT * FROM blacklist WHERE entry_type = :entry_type ORDER BY added_at, identifier;"
+)
+GET_BLACKLIST_KEYS = "SELECT entry_type, identifier FROM blacklist;"
+COUNT_BLACKLIST_ENTRIES = "SELECT COUNT(*) AS count FROM blacklist;"
+
+
+def page_query(table: str, params: Dict[str, Any], ascending: bool = False) -> str:
+    """
+    Builds a keyset-paginated query over ``(timestamp_us, id)`` for a time-ordered table.
+
+    ``params`` must come from ``page_params``; only the constraints present in it are
+    emitted. The range is half-open: ``start <= timestamp < end``. The row-value
+    comparison against the cursor is served by the ``(timestamp_us, id)`` index, so
+    deep pages cost the same as the first one (no OFFSET scan).
+    """
+    if table not in TIME_ORDERED_TABLES:
+        raise ValueError(f"Table {table!r} does not support keyset pagination")
+    conditions = []
+    if "start_us" in params:
+        conditions.append("timestamp_us >= :start_us")
+    if "end_us" in params:
+        conditions.append("timestamp_us < :end_us")
+    if "cursor_ts" in params:
+        op = ">" if ascending else "<"
+        conditions.append(f"(timestamp_us, id) {op} (:cursor_ts, :cursor_id)")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    direction = "ASC" if ascending else "DESC"
+    return (
+        f"SELECT * FROM {table}{where} "
+        f"ORDER BY timestamp_us {direction}, id {direction} LIMIT :limit;"
+    )
+
+
+def page_params(
+    limit: int,
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """Bind parameters for ``page_query``. Fetches one extra row to detect the last page."""
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    params: Dict[str, Any] = {"limit": limit + 1}
+    if start is not None:
+        params["start_us"] = to_epoch_us(start)
+    if end is not None:
+        params["end_us"] = to_epoch_us(end)
+    if cursor:
+        params["cursor_ts"], params["cursor_id"] = decode_cursor(cursor)
+    return params
+
+
+def build_page(rows: Sequence[Mapping[str, Any]], limit: int, codec: Callable[[Mapping[str, Any]], T]) -> RecordPage:
+    """Turns ``limit + 1`` fetched rows into a page whose cursor points at its last item."""
+    rows = list(rows)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["timestamp_us"], last["id"])
+    items: List[T] = [codec(row) for row in rows]
+    return RecordPage(items=items, next_cursor=next_cursor)
+
+
+def _json(value: Any) -> Any:
+    # JSON columns are TEXT in SQLite and JSONB (decoded by the driver) in PostgreSQL.
+    return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+
+def _datetime(value: Any) -> Any:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def team_params(team: Team) -> Dict[str, Any]:
+    return {
+        "name": team.name,
+        "team_id": team.team_id,
+        "members": json.dumps(team.members),
+        "description": team.description,
+        "instructions": json.dumps(team.instructions),
+    }
+
+
+def row_to_team(row: Mapping[str, Any]) -> Team:
+    data = dict(row)
+    data["members"] = _json(data["members"])
+    data["instructions"] = _json(data["instructions"])
+    return Team(**data)
+
+
+def workflow_params(workflow: Workflow) -> Dict[str, Any]:
+    return {
+        "name": workflow.name,
+        "id": workflow.id,
+        "description": workflow.description,
+        "steps": json.dumps(workflow.steps),
+    }
+
+
+def row_to_workflow(row: Mapping[str, Any]) -> Workflow:
+    data = dict(row)
+    data["steps"] = _json(data["steps"])
+    return Workflow(**data)
+
+
+def trade_params(trade: TradeData) -> Dict[str, Any]:
+    # RESURRECTION FIX: Remove float casting. Store as str.
+    return {
+        "id": trade.id,
+        "token": trade.token,
+        "action": trade.action,
+        "amount": str(trade.amount),
+        "price": str(trade.price),
+        "timestamp": trade.timestamp.isoformat(),
+        "timestamp_us": to_epoch_us(trade.timestamp),
+        "profit": str(trade.profit) if trade.profit is not None else "0",
+        "status": trade.status,
+    }
+
+
+def row_to_trade(row: Mapping[str, Any]) -> TradeData:
+    return TradeData(**row)
+
+
+def activity_params(activity: ActivityData) -> Dict[str, Any]:
+    return {
+        "id": activity.id,
+        "timestamp": activity.timestamp.isoformat(),
+        "timestamp_us": to_epoch_us(activity.timestamp),
+        "type": activity.type,
+        "message": activity.message,
+        "details": json.dumps(activity.details),
+    }
+
+
+def row_to_activity(row: Mapping[str, Any]) -> ActivityData:
+    data = dict(row)
+    data["details"] = _json(data["details"])
+    return ActivityData(**data)
+
+
+def position_params(position: PortfolioPosition) -> Dict[str, Any]:
+    return {
+        "token_address": position.token_address.lower(),
+        "symbol": position.symbol,
+        "chain": position.chain,
+        "coingecko_id": position.coingecko_id,
+        "amount": str(position.amount),
+        "average_price": str(position.average_price),
+        "last_price": str(position.last_price) if position.last_price else None,
+        "last_valuation_usd": str(position.last_valuation_usd) if position.last_valuation_usd else None,
+        "updated_at": position.updated_at.isoformat(),
+    }
+
+
+def row_to_position(row: Mapping[str, Any]) -> PortfolioPosition:
+    data = dict(row)
+    if data.get("updated_at"):
+        data["updated_at"] = _datetime(data["updated_at"])
+    return PortfolioPosition(**data)
+
+
+def alert_params(alert: AlertRecord) -> Dict[str, Any]:
+    return {
+        "id": alert.id,
+        "timestamp": alert.timestamp.isoformat(),
+        "timestamp_us": to_epoch_us(alert.timestamp),
+        "recipient": alert.recipient,
+        "channel": alert.channel,
+        "message": alert.message,
+        "status": alert.status,
+        "metadata": json.dumps(alert.metadata),
+    }
+
+
+def row_to_alert(row: Mapping[str, Any]) -> AlertRecord:
+    data = dict(row)
+    data["metadata"] = _json(data["metadata"]) if data["metadata"] else {}
+    if data.get("timestamp"):
+        data["timestamp"] = _datetime(data["timestamp"])
+    return AlertRecord(**data)
+
+
+def agent_message_params(message: AgentMessageRecord) -> Dict[str, Any]:
+    return {
+        "id": message.id,
+        "timestamp": message.timestamp.isoformat(),
+        "timestamp_us": to_epoch_us(message.timestamp),
+        "sender": message.sender,
+        "recipient": message.recipient,
+        "content": json.dumps(message.content),
+        "status": message.status,
+        "correlation_id": message.correlation_id,
+    }
+
+
+def row_to_agent_message(row: Mapping[str, Any]) -> AgentMessageRecord:
+    data = dict(row)
+    data["content"] = _json(data["content"]) if data["content"] else {}
+    if data.get("timestamp"):
+        data["timestamp"] = _datetime(data["timestamp"])
+    return AgentMessageRecord(**data)
+
+
+def state_params(namespace: str, key: str, value: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "namespace": namespace,
+        "key": key,
+        "value": json.dumps(value),
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+def row_to_state_value(row: Mapping[str, Any]) -> Dict[str, Any]:
+    return _json(row["value"])
+
+
+def blacklist_params(entry: BlacklistRecord) -> Dict[str, Any]:
+    return {
+        "entry_type": entry.entry_type,
+        "identifier": normalize_identifier(entry.identifier),
+        "reason": entry.reason,
+        "added_at": entry.added_at.isoformat(),
+    }
+
+
+def blacklist_key_params(entry_type: str, identifier: str) -> Dict[str, Any]:
+    return {"entry_type": entry_type, "identifier": normalize_identifier(identifier)}
+
+
+def row_to_blacklist_entry(row: Mapping[str, Any]) -> BlacklistRecord:
+    return BlacklistRecord(**row)
@@ -0,0 +1,123 @@
+"""
+Process-wide registry of storage engines.
+
+Every toolkit used to build its own ``SqliteStorage`` per call, which meant a new
+SQLAlchemy engine, a new pool and a full schema bootstrap each time. The registry
+hands out one long-lived storage per ``(type, url)`` instead; ``SqliteStorage`` is
+already thread-safe through its connection pool, so the instance can be shared by
+every thread in the process.
+"""
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from .base import AsyncStorage, Storage
+from .sqlite import SqliteStorage, normalize_sqlite_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORAGE_TYPE = "sqlite"
+DEFAULT_STORAGE_URL = "sqlite.db"
+
+_lock = threading.Lock()
+_storages: Dict[Tuple[str, str], Storage] = {}
+_async_storages: Dict[Tuple[str, str], AsyncStorage] = {}
+
+
+def _resolve(storage_type: Optional[str], url: Optional[str]) -> Tuple[str, str]:
+    storage_type = (storage_type or os.getenv("STORAGE_TYPE", DEFAULT_STORAGE_TYPE)).lower()
+    if storage_type == "postgresql":
+        storage_type = "postgres"
+    url = url or os.getenv("STORAGE_URL", DEFAULT_STORAGE_URL)
+    if storage_type == "sqlite":
+        url = normalize_sqlite_url(url)
+    elif storage_type == "postgres":
+        from .postgres import normalize_postgres_url
+
+        url = normalize_postgres_url(url)
+    return storage_type, url
+
+
+def _create(storage_type: str, url: str) -> Storage:
+    if storage_type == "sqlite":
+        return SqliteStorage(url)
+    if storage_type == "postgres":
+        from .postgres import PostgresStorage
+
+        return PostgresStorage(url)
+    raise ValueError(f"Unsupported storage type: {storage_type}")
+
+
+def _create_async(storage_type: str, url: str) -> AsyncStorage:
+    if storage_type == "sqlite":
+        from .async_sqlite import AsyncSqliteStorage
+
+        return AsyncSqliteStorage(url)
+    if storage_type == "postgres":
+        from .postgres import AsyncPostgresStorage
+
+        return AsyncPostgresStorage(url)
+    raise ValueError(f"Unsupported storage type: {storage_type}")
+
+
+def get_storage(url: Optional[str] = None, storage_type: Optional[str] = None) -> Storage:
+    """
+    Returns the shared storage for ``url`` (defaults to ``STORAGE_URL``).
+
+    The first call for a given URL creates the engine and runs schema setup;
+    subsequent calls return the same instance.
+    """
+    key = _resolve(storage_type, url)
+    storage = _storages.get(key)
+    if storage is not None:
+        return storage
+    with _lock:
+        storage = _storages.get(key)
+        if storage is None:
+            storage = _create(*key)
+            _storages[key] = storage
+            logger.debug("Registered %s storage for %s", *key)
+    return storage
+
+
+def close_storages() -> None:
+    """Closes and forgets every registered storage. Called on application shutdown."""
+    with _lock:
+        storages = list(_storages.values())
+        _storages.clear()
+    for storage in storages:
+        try:
+            storage.close()
+        except Exception:
+            logger.exception("Failed to close storage cleanly")
+
+
+def get_async_storage(url: Optional[str] = None, storage_type: Optional[str] = None) -> AsyncStorage:
+    """
+    Async counterpart of ``get_storage``. Creating the instance is cheap and does
+    no I/O; connections are opened (and the schema checked) on first use.
+    """
+    key = _resolve(storage_type, url)
+    storage = _async_storages.get(key)
+    if storage is not None:
+        return storage
+    with _lock:
+        storage = _async_storages.get(key)
+        if storage is None:
+            storage = _create_async(*key)
+            _async_storages[key] = storage
+            logger.debug("Registered async %s storage for %s", *key)
+    return storage
+
+
+async def close_async_storages() -> None:
+    """Closes and forgets every registered async storage. Called on application shutdown."""
+    with _lock:
+        storages = list(_async_storages.values())
+        _async_storages.clear()
+    for storage in storages:
+        try:
+            await storage.aclose()
+        except Exception:
+            logger.exception("Failed to close async storage cleanly")
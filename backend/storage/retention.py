@@ -0,0 +1,230 @@
+"""
+Retention, archival and compaction for the append-only audit tables.
+
+Rows older than a table's retention period are moved out of the hot database
+into gzipped JSON Lines segments, one per table and UTC month::
+
+    <archive_dir>/<table>/<YYYY-MM>.jsonl.gz
+
+Each batch is removed with ``DELETE ... RETURNING``, written to its segments and
+fsynced before the delete commits. A crash between the fsync and the commit
+leaves the rows in both places, so the next run archives them again. Readers
+drop duplicate ids. Sealed month partitions (``partitions.py``) expire the same
+way: their rows are archived first, then the month file is deleted, or rewritten
+without them when the month straddles the cutoff.
+
+Deleted pages only shrink the file if the database uses incremental
+auto-vacuum. New databases get it from the connect hook. An existing database
+needs a one-off full ``VACUUM`` (``convert_auto_vacuum``), which blocks writers
+for its whole duration, so it only runs when asked for
+(``STORAGE_CONVERT_AUTO_VACUUM=1`` or ``SqliteStorage.convert_auto_vacuum``).
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, Mapping, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from . import queries as q
+from .partitions import PARTITIONED_TABLES, PartitionManager
+from .utils import to_epoch_us
+
+logger = logging.getLogger(__name__)
+
+RETENTION_TABLES: Dict[str, Callable[[Mapping[str, Any]], Any]] = {
+    "activities": q.row_to_activity,
+    "alerts": q.row_to_alert,
+    "agent_messages": q.row_to_agent_message,
+}
+
+_SEGMENT_SUFFIX = ".jsonl.gz"
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+def parse_retention_policies(spec: str) -> Dict[str, float]:
+    """Parses ``"activities=30,alerts=90"`` into retention days per table."""
+    policies: Dict[str, float] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        table, _, days = item.partition("=")
+        table = table.strip()
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"Retention is not supported for table: {table}")
+        policies[table] = float(days)
+    return policies
+
+
+def _month_of(timestamp_us: int) -> str:
+    return datetime.fromtimestamp(timestamp_us / 1_000_000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def segment_path(archive_dir: str, table: str, month: str) -> str:
+    return os.path.join(archive_dir, table, month + _SEGMENT_SUFFIX)
+
+
+def _append_segment(path: str, rows: list) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Appending starts a new gzip member; gzip readers concatenate members transparently.
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for row in rows:
+                gz.write(json.dumps(row, separators=(",", ":")).encode("utf-8") + b"\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_expired(
+    engine: Engine,
+    archive_dir: str,
+    table: str,
+    cutoff: datetime,
+    batch_size: int = 1000,
+) -> int:
+    """Moves rows of ``table`` older than ``cutoff`` into the archive. Returns the row count."""
+    if table not in RETENTION_TABLES:
+        raise ValueError(f"Retention is not supported for table: {table}")
+    statement = text(
+        f"DELETE FROM {table} WHERE id IN ("
+        f"SELECT id FROM {table} WHERE timestamp_us < :cutoff ORDER BY timestamp_us, id LIMIT :limit"
+        f") RETURNING *"
+    )
+    params = {"cutoff": to_epoch_us(cutoff), "limit": max(1, batch_size)}
+    archived = 0
+    while True:
+        with engine.begin() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(statement, params)]
+            if not rows:
+                return archived
+            by_month: Dict[str, list] = {}
+            for row in sorted(rows, key=lambda r: (r["timestamp_us"], r["id"])):
+                by_month.setdefault(_month_of(row["timestamp_us"]), []).append(row)
+            for month, month_rows in by_month.items():
+                _append_segment(segment_path(archive_dir, table, month), month_rows)
+        archived += len(rows)
+
+
+def archive_expired_partitions(
+    partitions: PartitionManager,
+    archive_dir: str,
+    table: str,
+    cutoff: datetime,
+) -> int:
+    """Moves sealed rows of ``table`` older than ``cutoff`` into the archive. Returns the row count."""
+    if table not in PARTITIONED_TABLES:
+        return 0
+
+    def archive(rows: list) -> None:
+        by_month: Dict[str, list] = {}
+        for row in rows:
+            by_month.setdefault(_month_of(row["timestamp_us"]), []).append(row)
+        for month, month_rows in by_month.items():
+            _append_segment(segment_path(archive_dir, table, month), month_rows)
+
+    return partitions.expire(table, cutoff, archive)
+
+
+def read_archive(
+    archive_dir: str,
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields archived raw rows of ``table`` in ``[start, end)``, oldest first.
+    Only the segments whose month overlaps the range are opened.
+    """
+    directory = os.path.join(archive_dir, table)
+    if not os.path.isdir(directory):
+        return
+    start_us = to_epoch_us(start) if start else None
+    end_us = to_epoch_us(end) if end else None
+    first_month = _month_of(start_us) if start_us is not None else None
+    last_month = _month_of(end_us - 1) if end_us is not None else None
+    months = sorted(
+        name[: -len(_SEGMENT_SUFFIX)] for name in os.listdir(directory) if name.endswith(_SEGMENT_SUFFIX)
+    )
+    for month in months:
+        if (first_month and month < first_month) or (last_month and month > last_month):
+            continue
+        rows: Dict[str, Dict[str, Any]] = {}
+        with gzip.open(os.path.join(directory, month + _SEGMENT_SUFFIX), "rt", encoding="utf-8") as segment:
+            for line in segment:
+                row = json.loads(line)
+                ts = row["timestamp_us"]
+                if (start_us is not None and ts < start_us) or (end_us is not None and ts >= end_us):
+                    continue
+                rows[row["id"]] = row
+        yield from sorted(rows.values(), key=lambda r: (r["timestamp_us"], r["id"]))
+
+
+def convert_auto_vacuum(engine: Engine) -> bool:
+    """
+    Switches an existing database to incremental auto-vacuum with a full
+    ``VACUUM``. Returns False when it already uses it.
+    """
+    raw = engine.raw_connection()
+    try:
+        db = raw.driver_connection
+        db.commit()
+        if db.execute("PRAGMA auto_vacuum").fetchone()[0] == _AUTO_VACUUM_INCREMENTAL:
+            return False
+        logger.info("Converting %s to incremental auto-vacuum", engine.url.database)
+        db.executescript("PRAGMA auto_vacuum=INCREMENTAL; VACUUM;")
+        return True
+    finally:
+        raw.close()
+
+
+def compact(engine: Engine, vacuum_pages: int = 0) -> Dict[str, int]:
+    """
+    Truncates the WAL and returns free pages to the filesystem (``vacuum_pages=0``
+    frees them all; a no-op unless the database uses incremental auto-vacuum).
+    Returns the freelist size before vacuuming and the WAL checkpoint counters.
+    """
+    # Raw DBAPI connection: pysqlite's execute() steps incremental_vacuum only once
+    # (one page), while executescript() runs each statement to completion.
+    raw = engine.raw_connection()
+    try:
+        db = raw.driver_connection
+        db.commit()
+        freelist = db.execute("PRAGMA freelist_count").fetchone()[0]
+        pages = f"({int(vacuum_pages)})" if vacuum_pages > 0 else ""
+        db.executescript(f"PRAGMA incremental_vacuum{pages};")
+        busy, wal_pages, checkpointed = db.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    finally:
+        raw.close()
+    return {"freelist_pages": freelist, "wal_busy": busy, "wal_pages": wal_pages, "checkpointed": checkpointed}
+
+
+class MaintenanceWorker:
+    """Runs ``task`` every ``interval`` seconds on a daemon thread until closed."""
+
+    def __init__(self, task: Callable[[], Any], interval: float):
+        self._task = task
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="storage-maintenance", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self._task()
+            except Exception:
+                logger.exception("Storage maintenance run failed")
+
+    def close(self) -> None:
+        """Stops the worker, waiting for a run in progress to finish. Idempotent."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        atexit.unregister(self.close)
@@ -0,0 +1,342 @@
+"""
+Dialect-neutral base for the SQLAlchemy-backed storages.
+
+``SqlStorage`` runs the shared statements in ``queries`` on whatever engine a
+subclass builds, and owns the write-behind queue and the state cache. Subclasses
+create the engine, choose the migrations and may override ``_fetch_rows`` with a
+faster driver-level read.
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from . import aggregates as agg
+from . import queries as q
+from .base import Storage
+from .cache import StateCache, parse_namespace_ttls
+from .columns import DEFAULT_TRADE_COLUMNS, rows_to_columns, trade_columns_query
+from .migrations import MIGRATIONS, Migration, apply_migrations
+from .models import (
+    Team,
+    Workflow,
+    TradeData,
+    ActivityData,
+    PortfolioPosition,
+    AlertRecord,
+    AgentMessageRecord,
+    BlacklistRecord,
+    RecordPage,
+    TradeAggregate,
+)
+from .write_behind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+
+def _env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
+class SqlStorage(Storage):
+    """
+    Thread-safe storage over a pooled SQLAlchemy engine.
+    """
+
+    migrations: List[Migration] = MIGRATIONS
+
+    def __init__(
+        self,
+        engine: Engine,
+        write_behind: Optional[bool] = None,
+        state_cache: Optional[bool] = None,
+    ):
+        """
+        Args:
+            engine: Pooled engine the storage owns; ``close()`` disposes it.
+            write_behind: Queue activity/alert/agent-message writes and commit them
+                in batches from a background thread. Defaults to STORAGE_WRITE_BEHIND.
+                Reads may lag queued writes until ``flush()``.
+            state_cache: Serve ``get_state_value`` from an in-process cache (see
+                ``cache.StateCache``). Defaults to STORAGE_STATE_CACHE, on unless set to 0.
+        """
+        self.engine = engine
+        self._migrate()
+
+        if write_behind is None:
+            write_behind = _env_flag("STORAGE_WRITE_BEHIND")
+        self._write_queue: Optional[WriteBehindQueue] = None
+        if write_behind:
+            self._write_queue = WriteBehindQueue(
+                self.engine,
+                max_queue=int(os.getenv("STORAGE_WRITE_BEHIND_QUEUE_SIZE", "10000")),
+                batch_size=int(os.getenv("STORAGE_WRITE_BEHIND_BATCH_SIZE", "500")),
+                flush_interval=float(os.getenv("STORAGE_WRITE_BEHIND_FLUSH_MS", "50")) / 1000,
+            )
+
+        if state_cache is None:
+            state_cache = _env_flag("STORAGE_STATE_CACHE", default=True)
+        self._state_cache: Optional[StateCache] = None
+        if state_cache:
+            self._state_cache = StateCache(
+                default_ttl=float(os.getenv("STORAGE_STATE_CACHE_TTL", "60")),
+                namespace_ttls=parse_namespace_ttls(os.getenv("STORAGE_STATE_CACHE_TTLS", "")),
+                sync_interval=float(os.getenv("STORAGE_STATE_CACHE_SYNC_MS", "1000")) / 1000,
+            )
+
+    def _migrate(self) -> None:
+        with self.engine.begin() as conn:
+            version = apply_migrations(conn, self.migrations)
+        logger.debug("Storage schema at version %d", version)
+
+    def flush(self) -> None:
+        """Blocks until queued write-behind writes are committed. No-op when disabled."""
+        if self._write_queue is not None:
+            self._write_queue.flush()
+
+    def close(self) -> None:
+        """Flushes queued writes, then disposes the connection pool."""
+        if self._write_queue is not None:
+            self._write_queue.close()
+        self.engine.dispose()
+
+    def _append(self, query: str, params: Dict[str, Any]) -> None:
+        """Executes an audit write, through the write-behind queue when enabled."""
+        if self._write_queue is not None and not self._write_queue.closed:
+            try:
+                self._write_queue.submit(query, params)
+                return
+            except RuntimeError:
+                pass  # closed since the check: write directly
+        self._execute(query, params)
+
+    def _execute(self, query: str, params: Dict[str, Any]) -> int:
+        with self.engine.connect() as conn:
+            result = conn.execute(text(query), params)
+            conn.commit()
+            return result.rowcount
+
+    def _execute_many(self, query: str, params: List[Dict[str, Any]]) -> None:
+        if not params:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(text(query), params)
+
+    def _fetch_one(self, query: str, params: Dict[str, Any]):
+        rows = self._fetch_rows(query, params)
+        return rows[0] if rows else None
+
+    def _fetch_all(self, query: str, params: Optional[Dict[str, Any]] = None):
+        return self._fetch_rows(query, params or {})
+
+    def _fetch_rows(self, query: str, params: Dict[str, Any], as_tuples: bool = False) -> List[Any]:
+        # Plain tuples/dicts instead of RowMapping, which costs more per row than the codecs.
+        with self.engine.connect() as conn:
+            result = conn.execute(text(query), params)
+            keys = list(result.keys())
+            rows = result.tuples().all()
+        if as_tuples:
+            return rows
+        return [dict(zip(keys, row)) for row in rows]
+
+    def _fetch_page(
+        self,
+        table: str,
+        codec: Callable[[Any], Any],
+        limit: int,
+        cursor: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        ascending: bool,
+    ) -> RecordPage:
+        params = q.page_params(limit, cursor, start, end)
+        rows = self._fetch_all(q.page_query(table, params, ascending), params)
+        return q.build_page(rows, limit, codec)
+
+    def save_team(self, team: Team) -> None:
+        self._execute(q.SAVE_TEAM, q.team_params(team))
+
+    def get_team(self, name: str) -> Optional[Team]:
+        row = self._fetch_one(q.GET_TEAM, {"name": name})
+        return q.row_to_team(row) if row else None
+
+    def delete_team(self, name: str) -> None:
+        self._execute(q.DELETE_TEAM, {"name": name})
+
+    def save_workflow(self, workflow: Workflow) -> None:
+        self._execute(q.SAVE_WORKFLOW, q.workflow_params(workflow))
+
+    def get_workflow(self, name: str) -> Optional[Workflow]:
+        row = self._fetch_one(q.GET_WORKFLOW, {"name": name})
+        return q.row_to_workflow(row) if row else None
+
+    def delete_workflow(self, name: str) -> None:
+        self._execute(q.DELETE_WORKFLOW, {"name": name})
+
+    def get_all_workflows(self) -> List[Workflow]:
+        return [q.row_to_workflow(row) for row in self._fetch_all(q.GET_ALL_WORKFLOWS)]
+
+    def add_trade(self, trade: TradeData) -> None:
+        with self.engine.begin() as conn:
+            if not agg.record_trade(conn, q.INSERT_TRADE, q.trade_params(trade), trade):
+                agg.rebuild_aggregates(conn, sealed=self._sealed_trades())
+
+    def add_trades(self, trades: List[TradeData]) -> None:
+        with self.engine.begin() as conn:
+            if not agg.record_trades(conn, q.INSERT_TRADE, [q.trade_params(t) for t in trades], trades):
+                agg.rebuild_aggregates(conn, sealed=self._sealed_trades())
+
+    def get_trade_summary(self) -> TradeAggregate:
+        row = self._fetch_one(agg.GET_AGGREGATE, {"scope": agg.SCOPE_ALL, "bucket": ""})
+        return agg.row_to_aggregate(row) if row else TradeAggregate(scope=agg.SCOPE_ALL)
+
+    def get_trade_aggregates(self, scope: str) -> List[TradeAggregate]:
+        return [agg.row_to_aggregate(row) for row in self._fetch_all(agg.GET_AGGREGATES, {"scope": scope})]
+
+    def rebuild_trade_aggregates(self) -> None:
+        with self.engine.begin() as conn:
+            agg.rebuild_aggregates(conn, sealed=self._sealed_trades())
+
+    def _sealed_trades(self) -> List[TradeData]:
+        """Trades kept outside the ``trades`` table, needed to rebuild aggregates."""
+        return []
+
+    def get_recent_trades(self, limit: int) -> List[TradeData]:
+        return [q.row_to_trade(row) for row in self._fetch_all(q.RECENT_TRADES, {"limit": limit})]
+
+    def get_trade_columns(
+        self,
+        columns: Sequence[str] = DEFAULT_TRADE_COLUMNS,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, np.ndarray]:
+        query, params = trade_columns_query(columns, start, end)
+        return rows_to_columns(self._fetch_rows(query, params, as_tuples=True), columns)
+
+    def get_trades_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> RecordPage:
+        return self._fetch_page("trades", q.row_to_trade, limit, cursor, start, end, ascending)
+
+    def add_activity(self, activity: ActivityData) -> None:
+        self._append(q.INSERT_ACTIVITY, q.activity_params(activity))
+
+    def add_activities(self, activities: List[ActivityData]) -> None:
+        # Already one batched commit, so this bypasses the write-behind queue.
+        self._execute_many(q.INSERT_ACTIVITY, [q.activity_params(a) for a in activities])
+
+    def get_recent_activities(self, limit: int) -> List[ActivityData]:
+        return [q.row_to_activity(row) for row in self._fetch_all(q.RECENT_ACTIVITIES, {"limit": limit})]
+
+    def get_activities_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> RecordPage:
+        return self._fetch_page("activities", q.row_to_activity, limit, cursor, start, end, ascending)
+
+    def get_portfolio_positions(self) -> List[PortfolioPosition]:
+        return [q.row_to_position(row) for row in self._fetch_all(q.GET_PORTFOLIO_POSITIONS)]
+
+    def upsert_portfolio_position(self, position: PortfolioPosition) -> None:
+        self._execute(q.UPSERT_PORTFOLIO_POSITION, q.position_params(position))
+
+    def upsert_portfolio_positions(self, positions: List[PortfolioPosition]) -> None:
+        self._execute_many(q.UPSERT_PORTFOLIO_POSITION, [q.position_params(p) for p in positions])
+
+    def record_alert(self, alert: AlertRecord) -> None:
+        self._append(q.UPSERT_ALERT, q.alert_params(alert))
+
+    def get_recent_alerts(self, limit: int) -> List[AlertRecord]:
+        return [q.row_to_alert(row) for row in self._fetch_all(q.RECENT_ALERTS, {"limit": limit})]
+
+    def get_alerts_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> RecordPage:
+        return self._fetch_page("alerts", q.row_to_alert, limit, cursor, start, end, ascending)
+
+    def record_agent_message(self, message: AgentMessageRecord) -> None:
+        self._append(q.UPSERT_AGENT_MESSAGE, q.agent_message_params(message))
+
+    def get_recent_agent_messages(self, limit: int) -> List[AgentMessageRecord]:
+        return [
+            q.row_to_agent_message(row)
+            for row in self._fetch_all(q.RECENT_AGENT_MESSAGES, {"limit": limit})
+        ]
+
+    def get_agent_messages_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        ascending: bool = False,
+    ) -> RecordPage:
+        return self._fetch_page("agent_messages", q.row_to_agent_message, limit, cursor, start, end, ascending)
+
+    def set_state_value(self, namespace: str, key: str, value: Dict[str, Any]) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text(q.UPSERT_STATE_VALUE), q.state_params(namespace, key, value))
+            conn.execute(text(q.BUMP_STATE_VERSION), {"namespace": namespace})
+            version = conn.execute(text(q.GET_STATE_VERSION), {"namespace": namespace}).scalar()
+        if self._state_cache is not None:
+            self._state_cache.write(namespace, key, value, version)
+
+    def get_state_value(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        cache = self._state_cache
+        if cache is None:
+            return self._read_state_value(namespace, key)
+        if cache.sync_due():
+            versions = {row["namespace"]: row["version"] for row in self._fetch_all(q.GET_STATE_VERSIONS)}
+            cache.apply_versions(versions)
+        hit, value = cache.get(namespace, key)
+        if hit:
+            return value
+        generation = cache.generation
+        value = self._read_state_value(namespace, key)
+        cache.fill(namespace, key, value, generation)
+        return value
+
+    def _read_state_value(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        row = self._fetch_one(q.GET_STATE_VALUE, {"namespace": namespace, "key": key})
+        return q.row_to_state_value(row) if row else None
+
+    def upsert_blacklist_entry(self, entry: BlacklistRecord) -> None:
+        self._execute(q.UPSERT_BLACKLIST_ENTRY, q.blacklist_params(entry))
+
+    def delete_blacklist_entry(self, entry_type: str, identifier: str) -> bool:
+        return self._execute(q.DELETE_BLACKLIST_ENTRY, q.blacklist_key_params(entry_type, identifier)) > 0
+
+    def get_blacklist_entries(self, entry_type: Optional[str] = None) -> List[BlacklistRecord]:
+        if entry_type is None:
+            rows = self._fetch_all(q.GET_BLACKLIST_ENTRIES)
+        else:
+            rows = self._fetch_all(q.GET_BLACKLIST_ENTRIES_BY_TYPE, {"entry_type": entry_type})
+        return [q.row_to_blacklist_entry(row) for row in rows]
+
+    def get_blacklist_keys(self) -> List[Tuple[str, str]]:
+        return [(row["entry_type"], row["identifier"]) for row in self._fetch_all(q.GET_BLACKLIST_KEYS)]
+
+    def count_blacklist_entries(self) -> int:
+        row = self._fetch_one(q.COUNT_BLACKLIST_ENTRIES, {})
+        return row["count"] if row else 0
@@ -1,51 +1,74 @@
-import json
 import logging
 import os
-from typing import List, Optional, Dict, Any
-from datetime import datetime
-from decimal import Decimal
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence
 
-from sqlalchemy import create_engine, text, event
+import numpy as np
+from sqlalchemy import create_engine, event
 from sqlalchemy.pool import QueuePool
-from sqlalchemy.engine import Row
 
-from .base import Storage
-from .models import (
-    Team,
-    Workflow,
-    TradeData,
-    ActivityData,
-    PortfolioPosition,
-    AlertRecord,
-    AgentMessageRecord,
-)
+from . import queries as q
+from . import retention
+from .analytics import refresh_export
+from .columns import DEFAULT_TRADE_COLUMNS, rows_to_columns, trade_columns_query
+from .models import ActivityData, RecordPage, TradeData
+from .partitions import PARTITIONED_TABLES, Partition, PartitionManager, default_partition_dir
+from .sql import SqlStorage, _env_flag
+from .utils import to_epoch_us
 
 logger = logging.getLogger(__name__)
 
 def _configure_sqlite(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
+    # Only takes effect on a new, empty database; see retention.convert_auto_vacuum for existing ones.
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
     cursor.execute("PRAGMA journal_mode=WAL")
     cursor.execute("PRAGMA synchronous=NORMAL")
     cursor.close()
 
-class SqliteStorage(Storage):
+def normalize_sqlite_url(url: str) -> str:
+    """Turns a bare file path into a SQLAlchemy sqlite URL; full URLs pass through."""
+    if not url.startswith("sqlite:") and "://" not in url:
+        url = f"sqlite:///{url}"
+    return url
+
+class SqliteStorage(SqlStorage):
     """
     Thread-safe SQLite storage implementation using SQLAlchemy connection pooling.
     Fortified with WAL mode and Decimal precision.
     """
 
-    def __init__(self, url: str):
-        # Normalize URL
-        if not url.startswith("sqlite:"):
-            if "://" not in url:
-                url = f"sqlite:///{url}"
-
-        # Ensure it starts with sqlite:/// if it was just sqlite:path
-        # Actually sqlalchemy handles sqlite:///file.db
+    def __init__(
+        self,
+        url: str,
+        write_behind: Optional[bool] = None,
+        state_cache: Optional[bool] = None,
+        retention_days: Optional[Mapping[str, float]] = None,
+        archive_dir: Optional[str] = None,
+        partition_dir: Optional[str] = None,
+        hot_months: Optional[int] = None,
+    ):
+        """
+        Args:
+            url: Database URL or bare file path.
+            write_behind, state_cache: See ``SqlStorage``.
+            retention_days: Days to keep rows per audit table (``activities``, ``alerts``,
+                ``agent_messages``) before ``run_maintenance`` archives them. Defaults to
+                STORAGE_RETENTION_DAYS, e.g. ``activities=30,alerts=90``; unset tables are kept.
+            archive_dir: Where archive segments go. Defaults to STORAGE_ARCHIVE_DIR, else
+                ``<database file>.archive``.
+            partition_dir: Where sealed month partitions of ``trades`` and ``activities``
+                live (see ``partitions.py``). Defaults to STORAGE_PARTITION_DIR, else
+                ``<database file>.partitions``.
+            hot_months: Months (including the current one) kept in the hot database;
+                ``run_maintenance`` seals older ones. Defaults to STORAGE_HOT_MONTHS;
+                0 never seals.
+        """
+        url = normalize_sqlite_url(url)
 
         # WAL mode handles concurrency better.
         # check_same_thread=False is needed for QueuePool, but WAL makes it safer.
-        self.engine = create_engine(
+        engine = create_engine(
             url,
             poolclass=QueuePool,
             pool_size=5,
@@ -54,389 +77,173 @@ class SqliteStorage(Storage):
         )
 
         # Listen for connect event to set WAL mode
-        event.listen(self.engine, "connect", _configure_sqlite)
-
-        self._create_tables()
-
-    # ... (Rest of the class is same as previous overwrite) ...
-
-    def _create_tables(self):
-        # RESURRECTION FIX: Use TEXT for financial values to prevent precision loss.
-        queries = [
-            """
-            CREATE TABLE IF NOT EXISTS teams (
-                name TEXT PRIMARY KEY,
-                team_id TEXT,
-                members TEXT,
-                description TEXT,
-                instructions TEXT
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS workflows (
-                name TEXT PRIMARY KEY,
-                id TEXT,
-                description TEXT,
-                steps TEXT
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS trades (
-                id TEXT PRIMARY KEY,
-                token TEXT,
-                action TEXT,
-                amount TEXT,
-                price TEXT,
-                timestamp TEXT,
-                profit TEXT,
-                status TEXT
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS activities (
-                id TEXT PRIMARY KEY,
-                timestamp TEXT,
-                type TEXT,
-                message TEXT,
-                details TEXT
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS portfolio_positions (
-                token_address TEXT PRIMARY KEY,
-                symbol TEXT,
-                chain TEXT,
-                coingecko_id TEXT,
-                amount TEXT,
-                average_price TEXT,
-                last_price TEXT,
-                last_valuation_usd TEXT,
-                updated_at TEXT
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS alerts (
-                id TEXT PRIMARY KEY,
-                timestamp TEXT,
-                recipient TEXT,
-                channel TEXT,
-                message TEXT,
-                status TEXT,
-                metadata TEXT
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS agent_messages (
-                id TEXT PRIMARY KEY,
-                timestamp TEXT,
-                sender TEXT,
-                recipient TEXT,
-                content TEXT,
-                status TEXT,
-                correlation_id TEXT
-            );
-            """,
-            """
-            CREATE TABLE IF NOT EXISTS state_store (
-                namespace TEXT,
-                key TEXT,
-                value TEXT,
-                updated_at TEXT,
-                PRIMARY KEY (namespace, key)
-            );
-            """
-        ]
-        with self.engine.connect() as conn:
-            for q in queries:
-                conn.execute(text(q))
-            conn.commit()
+        event.listen(engine, "connect", _configure_sqlite)
 
-    def _row_to_dict(self, row: Row) -> Dict[str, Any]:
-        """Convert SQLAlchemy Row to dict."""
-        return dict(row._mapping)
+        super().__init__(engine, write_behind=write_behind, state_cache=state_cache)
 
-    def save_team(self, team: Team) -> None:
-        query = """
-        INSERT INTO teams (name, team_id, members, description, instructions)
-        VALUES (:name, :team_id, :members, :description, :instructions)
-        ON CONFLICT (name) DO UPDATE
-        SET team_id = excluded.team_id,
-            members = excluded.members,
-            description = excluded.description,
-            instructions = excluded.instructions;
-        """
-        params = {
-            "name": team.name,
-            "team_id": team.team_id,
-            "members": json.dumps(team.members),
-            "description": team.description,
-            "instructions": json.dumps(team.instructions),
+        if retention_days is None:
+            retention_days = retention.parse_retention_policies(os.getenv("STORAGE_RETENTION_DAYS", ""))
+        self._retention_days = dict(retention_days)
+        database = self.engine.url.database
+        self.archive_dir = archive_dir or os.getenv("STORAGE_ARCHIVE_DIR") or (
+            f"{database}.archive" if database and database != ":memory:" else None
+        )
+        self.partitions = PartitionManager(partition_dir or default_partition_dir(database))
+        if hot_months is None:
+            hot_months = int(os.getenv("STORAGE_HOT_MONTHS", "0"))
+        self._hot_months = hot_months
+        self._maintenance: Optional[retention.MaintenanceWorker] = None
+        # Arrow export for offline analytics, refreshed by run_maintenance when set.
+        self.analytics_dir: Optional[str] = os.getenv("STORAGE_ANALYTICS_DIR") or None
+
+    def close(self) -> None:
+        """Stops maintenance, flushes queued writes, then disposes the connection pool."""
+        if self._maintenance is not None:
+            self._maintenance.close()
+        super().close()
+
+    def apply_retention(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Archives rows past their table's retention period. Returns rows archived per table."""
+        if not self._retention_days:
+            return {}
+        if self.archive_dir is None:
+            raise ValueError("Retention needs an archive_dir for in-memory databases")
+        self.flush()
+        now = now or datetime.now(timezone.utc)
+        archived = {}
+        for table, days in self._retention_days.items():
+            cutoff = now - timedelta(days=days)
+            archived[table] = retention.archive_expired(
+                self.engine, self.archive_dir, table, cutoff
+            ) + retention.archive_expired_partitions(self.partitions, self.archive_dir, table, cutoff)
+        return archived
+
+    def seal_partitions(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """Moves months older than the hot window into partitions. Returns rows moved per table."""
+        if self._hot_months <= 0:
+            return {}
+        self.flush()
+        now = now or datetime.now(timezone.utc)
+        # First month kept hot: the current one counts as the first of hot_months.
+        months = now.year * 12 + now.month - 1 - (self._hot_months - 1)
+        before = datetime(months // 12, months % 12 + 1, 1, tzinfo=timezone.utc)
+        return {
+            table: sum(self.partitions.seal(self.engine, table, before).values())
+            for table in PARTITIONED_TABLES
         }
-        with self.engine.connect() as conn:
-            conn.execute(text(query), params)
-            conn.commit()
 
-    def get_team(self, name: str) -> Optional[Team]:
-        query = "SELECT * FROM teams WHERE name = :name;"
-        with self.engine.connect() as conn:
-            result = conn.execute(text(query), {"name": name}).fetchone()
-            if result:
-                data = self._row_to_dict(result)
-                data["members"] = json.loads(data["members"])
-                data["instructions"] = json.loads(data["instructions"])
-                return Team(**data)
-            return None
-
-    def delete_team(self, name: str) -> None:
-        query = "DELETE FROM teams WHERE name = :name;"
-        with self.engine.connect() as conn:
-            conn.execute(text(query), {"name": name})
-            conn.commit()
-
-    def save_workflow(self, workflow: Workflow) -> None:
-        query = """
-        INSERT INTO workflows (name, id, description, steps)
-        VALUES (:name, :id, :description, :steps)
-        ON CONFLICT (name) DO UPDATE
-        SET id = excluded.id,
-            description = excluded.description,
-            steps = excluded.steps;
+    def detach_partition(self, table: str, month: str) -> str:
+        """Takes a sealed month (``"YYYY-MM"``) out of every query. Returns the file's new path."""
+        return self.partitions.detach(table, month)
+
+    def attach_partition(self, table: str, path: str) -> Partition:
+        return self.partitions.attach(table, path)
+
+    @property
+    def maintenance_configured(self) -> bool:
+        """Whether retention, sealing or the analytics export give maintenance work to do."""
+        return bool(self._retention_days) or self._hot_months > 0 or bool(self.analytics_dir)
+
+    def convert_auto_vacuum(self) -> bool:
+        """One-off, blocking switch of an existing database to incremental auto-vacuum."""
+        self.flush()
+        return retention.convert_auto_vacuum(self.engine)
+
+    def run_maintenance(self) -> Dict[str, int]:
+        archived = self.apply_retention()
+        sealed = self.seal_partitions()
+        if _env_flag("STORAGE_CONVERT_AUTO_VACUUM"):
+            self.convert_auto_vacuum()
+        stats = retention.compact(self.engine, int(os.getenv("STORAGE_VACUUM_PAGES", "0")))
+        stats.update({f"partitioned_{table}": count for table, count in sealed.items()})
+        if any(archived.values()) or any(sealed.values()):
+            logger.info("Archived %s; sealed %s; compaction %s", archived, sealed, stats)
+        if self.analytics_dir:
+            exported = refresh_export(self, self.analytics_dir)
+            stats.update({f"exported_{name}": count for name, count in exported.items()})
+        return {**{f"archived_{table}": count for table, count in archived.items()}, **stats}
+
+    def start_maintenance(self, interval: Optional[float] = None) -> None:
+        """Runs ``run_maintenance`` in the background, if there is anything configured for it to do."""
+        if not self.maintenance_configured:
+            return
+        if interval is None:
+            interval = float(os.getenv("STORAGE_MAINTENANCE_INTERVAL_S", "3600"))
+        if interval <= 0 or self._maintenance is not None:
+            return
+        self._maintenance = retention.MaintenanceWorker(self.run_maintenance, interval)
+
+    def iter_archived(
+        self,
+        table: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Any]:
+        if table not in retention.RETENTION_TABLES:
+            raise ValueError(f"Retention is not supported for table: {table}")
+        if self.archive_dir is None:
+            return iter(())
+        codec = retention.RETENTION_TABLES[table]
+        return (codec(row) for row in retention.read_archive(self.archive_dir, table, start, end))
+
+    def _fetch_rows(self, query: str, params: Dict[str, Any], as_tuples: bool = False) -> List[Any]:
         """
-        params = {
-            "name": workflow.name,
-            "id": workflow.id,
-            "description": workflow.description,
-            "steps": json.dumps(workflow.steps),
-        }
-        with self.engine.connect() as conn:
-            conn.execute(text(query), params)
-            conn.commit()
-
-    def get_workflow(self, name: str) -> Optional[Workflow]:
-        query = "SELECT * FROM workflows WHERE name = :name;"
-        with self.engine.connect() as conn:
-            result = conn.execute(text(query), {"name": name}).fetchone()
-            if result:
-                data = self._row_to_dict(result)
-                data["steps"] = json.loads(data["steps"])
-                return Workflow(**data)
-            return None
-
-    def delete_workflow(self, name: str) -> None:
-        query = "DELETE FROM workflows WHERE name = :name;"
-        with self.engine.connect() as conn:
-            conn.execute(text(query), {"name": name})
-            conn.commit()
-
-    def get_all_workflows(self) -> List[Workflow]:
-        query = "SELECT * FROM workflows;"
-        with self.engine.connect() as conn:
-            results = conn.execute(text(query)).fetchall()
-            workflows = []
-            for row in results:
-                data = self._row_to_dict(row)
-                data["steps"] = json.loads(data["steps"])
-                workflows.append(Workflow(**data))
-            return workflows
-
-    def add_trade(self, trade: TradeData) -> None:
-        # RESURRECTION FIX: Remove float casting. Store as str.
-        query = """
-        INSERT INTO trades (id, token, action, amount, price, timestamp, profit, status)
-        VALUES (:id, :token, :action, :amount, :price, :timestamp, :profit, :status)
+        Reads through the DBAPI cursor. SQLAlchemy's ``Row``/``RowMapping`` layer costs
+        more per row than validating the model, and these statements use no SQLAlchemy
+        typing; sqlite3 binds the same ``:name`` parameters natively.
         """
-        params = {
-            "id": trade.id,
-            "token": trade.token,
-            "action": trade.action,
-            "amount": str(trade.amount),
-            "price": str(trade.price),
-            "timestamp": trade.timestamp.isoformat(),
-            "profit": str(trade.profit) if trade.profit is not None else "0",
-            "status": trade.status,
-        }
         with self.engine.connect() as conn:
-            conn.execute(text(query), params)
-            conn.commit()
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                if as_tuples:
+                    return rows
+                keys = [column[0] for column in cursor.description]
+                return [dict(zip(keys, row)) for row in rows]
+            finally:
+                cursor.close()
+
+    def _fetch_page(
+        self,
+        table: str,
+        codec: Callable[[Any], Any],
+        limit: int,
+        cursor: Optional[str],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        ascending: bool,
+    ) -> RecordPage:
+        params = q.page_params(limit, cursor, start, end)
+        query = q.page_query(table, params, ascending)
+        rows = self.partitions.merge_page(table, query, params, ascending, self._fetch_all(query, params))
+        return q.build_page(rows, limit, codec)
 
     def get_recent_trades(self, limit: int) -> List[TradeData]:
-        query = "SELECT * FROM trades ORDER BY timestamp DESC LIMIT :limit;"
-        with self.engine.connect() as conn:
-            results = conn.execute(text(query), {"limit": limit}).fetchall()
-            return [TradeData(**self._row_to_dict(row)) for row in results]
-
-    def add_activity(self, activity: ActivityData) -> None:
-        query = """
-        INSERT INTO activities (id, timestamp, type, message, details)
-        VALUES (:id, :timestamp, :type, :message, :details)
-        """
-        params = {
-            "id": activity.id,
-            "timestamp": activity.timestamp.isoformat(),
-            "type": activity.type,
-            "message": activity.message,
-            "details": json.dumps(activity.details),
-        }
-        with self.engine.connect() as conn:
-            conn.execute(text(query), params)
-            conn.commit()
+        if limit < 1 or not self.partitions.partitions("trades"):
+            return super().get_recent_trades(limit)
+        return self.get_trades_page(limit).items
 
     def get_recent_activities(self, limit: int) -> List[ActivityData]:
-        query = "SELECT * FROM activities ORDER BY timestamp DESC LIMIT :limit;"
-        with self.engine.connect() as conn:
-            results = conn.execute(text(query), {"limit": limit}).fetchall()
-            activities = []
-            for row in results:
-                data = self._row_to_dict(row)
-                data["details"] = json.loads(data["details"])
-                activities.append(ActivityData(**data))
-            return activities
-
-    def get_portfolio_positions(self) -> List[PortfolioPosition]:
-        query = "SELECT * FROM portfolio_positions;"
-        with self.engine.connect() as conn:
-            results = conn.execute(text(query)).fetchall()
-            positions = []
-            for row in results:
-                data = self._row_to_dict(row)
-                if data.get("updated_at"):
-                    data["updated_at"] = datetime.fromisoformat(data["updated_at"])
-                positions.append(PortfolioPosition(**data))
-            return positions
-
-    def upsert_portfolio_position(self, position: PortfolioPosition) -> None:
-        # RESURRECTION FIX: Remove float casting.
-        query = """
-        INSERT INTO portfolio_positions (
-            token_address, symbol, chain, coingecko_id, amount,
-            average_price, last_price, last_valuation_usd, updated_at
-        ) VALUES (
-            :token_address, :symbol, :chain, :coingecko_id, :amount,
-            :average_price, :last_price, :last_valuation_usd, :updated_at
+        if limit < 1 or not self.partitions.partitions("activities"):
+            return super().get_recent_activities(limit)
+        return self.get_activities_page(limit).items
+
+    def get_trade_columns(
+        self,
+        columns: Sequence[str] = DEFAULT_TRADE_COLUMNS,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, np.ndarray]:
+        if not self.partitions.partitions("trades"):
+            return super().get_trade_columns(columns, start, end)
+        # Select the sort key as well so hot and sealed rows can be merged in order.
+        query, params = trade_columns_query(tuple(columns) + ("timestamp_us", "id"), start, end)
+        rows = self.partitions.merge_columns(
+            "trades", query, params, self._fetch_rows(query, params, as_tuples=True),
+            to_epoch_us(start) if start else None, to_epoch_us(end) if end else None,
         )
-        ON CONFLICT(token_address) DO UPDATE SET
-            symbol = excluded.symbol,
-            chain = excluded.chain,
-            coingecko_id = excluded.coingecko_id,
-            amount = excluded.amount,
-            average_price = excluded.average_price,
-            last_price = excluded.last_price,
-            last_valuation_usd = excluded.last_valuation_usd,
-            updated_at = excluded.updated_at;
-        """
-        params = {
-            "token_address": position.token_address.lower(),
-            "symbol": position.symbol,
-            "chain": position.chain,
-            "coingecko_id": position.coingecko_id,
-            "amount": str(position.amount),
-            "average_price": str(position.average_price),
-            "last_price": str(position.last_price) if position.last_price else None,
-            "last_valuation_usd": str(position.last_valuation_usd) if position.last_valuation_usd else None,
-            "updated_at": position.updated_at.isoformat(),
-        }
-        with self.engine.connect() as conn:
-            conn.execute(text(query), params)
-            conn.commit()
-
-    def record_alert(self, alert: AlertRecord) -> None:
-        query = """
-        INSERT INTO alerts (id, timestamp, recipient, channel, message, status, metadata)
-        VALUES (:id, :timestamp, :recipient, :channel, :message, :status, :metadata)
-        ON CONFLICT(id) DO UPDATE SET
-            timestamp = excluded.timestamp,
-            recipient = excluded.recipient,
-            channel = excluded.channel,
-            message = excluded.message,
-            status = excluded.status,
-            metadata = excluded.metadata;
-        """
-        params = {
-            "id": alert.id,
-            "timestamp": alert.timestamp.isoformat(),
-            "recipient": alert.recipient,
-            "channel": alert.channel,
-            "message": alert.message,
-            "status": alert.status,
-            "metadata": json.dumps(alert.metadata),
-        }
-        with self.engine.connect() as conn:
-            conn.execute(text(query), params)
-            conn.commit()
+        return rows_to_columns(rows, columns)
 
-    def get_recent_alerts(self, limit: int) -> List[AlertRecord]:
-        query = "SELECT * FROM alerts ORDER BY timestamp DESC LIMIT :limit;"
-        with self.engine.connect() as conn:
-            results = conn.execute(text(query), {"limit": limit}).fetchall()
-            alerts = []
-            for row in results:
-                data = self._row_to_dict(row)
-                data["metadata"] = json.loads(data["metadata"]) if data["metadata"] else {}
-                if data.get("timestamp"):
-                    data["timestamp"] = datetime.fromisoformat(data["timestamp"])
-                alerts.append(AlertRecord(**data))
-            return alerts
-
-    def record_agent_message(self, message: AgentMessageRecord) -> None:
-        query = """
-        INSERT INTO agent_messages (id, timestamp, sender, recipient, content, status, correlation_id)
-        VALUES (:id, :timestamp, :sender, :recipient, :content, :status, :correlation_id)
-        ON CONFLICT(id) DO UPDATE SET
-            timestamp = excluded.timestamp,
-            sender = excluded.sender,
-            recipient = excluded.recipient,
-            content = excluded.content,
-            status = excluded.status,
-            correlation_id = excluded.correlation_id;
-        """
-        params = {
-            "id": message.id,
-            "timestamp": message.timestamp.isoformat(),
-            "sender": message.sender,
-            "recipient": message.recipient,
-            "content": json.dumps(message.content),
-            "status": message.status,
-            "correlation_id": message.correlation_id,
-        }
-        with self.engine.connect() as conn:
-            conn.execute(text(query), params)
-            conn.commit()
-
-    def get_recent_agent_messages(self, limit: int) -> List[AgentMessageRecord]:
-        query = "SELECT * FROM agent_messages ORDER BY timestamp DESC LIMIT :limit;"
-        with self.engine.connect() as conn:
-            results = conn.execute(text(query), {"limit": limit}).fetchall()
-            messages = []
-            for row in results:
-                data = self._row_to_dict(row)
-                data["content"] = json.loads(data["content"]) if data["content"] else {}
-                if data.get("timestamp"):
-                    data["timestamp"] = datetime.fromisoformat(data["timestamp"])
-                messages.append(AgentMessageRecord(**data))
-            return messages
-
-    def set_state_value(self, namespace: str, key: str, value: Dict[str, Any]) -> None:
-        query = """
-        INSERT INTO state_store (namespace, key, value, updated_at)
-        VALUES (:namespace, :key, :value, :updated_at)
-        ON CONFLICT(namespace, key) DO UPDATE SET
-            value = excluded.value,
-            updated_at = excluded.updated_at;
-        """
-        params = {
-            "namespace": namespace,
-            "key": key,
-            "value": json.dumps(value),
-            "updated_at": datetime.utcnow().isoformat(),
-        }
-        with self.engine.connect() as conn:
-            conn.execute(text(query), params)
-            conn.commit()
-
-    def get_state_value(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
-        query = "SELECT value FROM state_store WHERE namespace = :namespace AND key = :key;"
-        with self.engine.connect() as conn:
-            result = conn.execute(text(query), {"namespace": namespace, "key": key}).fetchone()
-            if not result:
-                return None
-            return json.loads(result[0])
+    def _sealed_trades(self) -> List[TradeData]:
+        return [q.row_to_trade(row) for row in self.partitions.iter_rows("trades")]
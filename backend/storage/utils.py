@@ -0,0 +1,57 @@
+import base64
+from datetime import datetime, timezone, timedelta
+from typing import Optional, Tuple
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def to_epoch_us(value: datetime) -> int:
+    """
+    Converts a datetime to integer microseconds since the Unix epoch.
+    Naive datetimes are treated as UTC (the codebase stamps with ``datetime.utcnow()``).
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def iso_to_epoch_us(value: Optional[str]) -> Optional[int]:
+    """Parses a stored ISO-8601 string into epoch microseconds; returns None if unparseable."""
+    if not value:
+        return None
+    try:
+        return to_epoch_us(datetime.fromisoformat(value))
+    except ValueError:
+        return None
+
+
+def encode_cursor(timestamp_us: int, record_id: str) -> str:
+    """Encodes a keyset position as an opaque, URL-safe cursor string."""
+    raw = f"{timestamp_us}:{record_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """Inverse of ``encode_cursor``. Raises ValueError for malformed cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+        timestamp_us, record_id = raw.split(":", 1)
+        return int(timestamp_us), record_id
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def normalize_identifier(identifier: Optional[str]) -> Optional[str]:
+    """
+    Canonical form for blacklist identifiers. EVM addresses are case-insensitive
+    (checksum casing is cosmetic), so hex addresses are lowercased; other identifiers,
+    such as base58 Solana addresses, are case-sensitive and only stripped.
+    """
+    if identifier is None:
+        return None
+    identifier = identifier.strip()
+    if identifier[:2].lower() == "0x":
+        return identifier.lower()
+    return identifier
@@ -0,0 +1,134 @@
+"""
+Write-behind queue for append-only audit writes.
+
+Activity, alert and agent-message inserts are queued in memory and a single
+background writer commits them in batches, so tool calls no longer wait on a
+commit (and its fsync) per row. The queue is bounded: when it is full, producers
+block, which is the backpressure signal that the database is falling behind.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_Write = Tuple[str, Dict[str, Any]]
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue drained by one writer thread in group-committed batches.
+
+    A batch is committed when ``batch_size`` writes have accumulated or
+    ``flush_interval`` seconds have passed since the first write of the batch,
+    whichever comes first. Writes are applied in submission order.
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+    ):
+        self._engine = engine
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = max(0.0, flush_interval)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue))
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="storage-write-behind", daemon=True)
+        self._thread.start()
+        # Daemon threads are killed at interpreter exit; drain the queue first.
+        atexit.register(self.close)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def submit(self, statement: str, params: Dict[str, Any], timeout: Optional[float] = None) -> None:
+        """
+        Queues a write. Blocks while the queue is full (backpressure).
+        Raises ``queue.Full`` if ``timeout`` elapses first, ``RuntimeError`` once closed.
+        """
+        # Checked and queued under the close lock, so no write can land behind _STOP
+        # where the stopped writer would never commit it.
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("Write-behind queue is closed")
+            self._queue.put((statement, params), timeout=timeout)
+
+    def flush(self) -> None:
+        """Blocks until every write submitted so far has been committed (or dropped on error)."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Flushes pending writes and stops the writer thread. Idempotent."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _next_batch(self) -> Tuple[List[_Write], bool]:
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                self._commit(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if stopping:
+                # Account for the sentinel itself so join() callers are released.
+                self._queue.task_done()
+
+    def _commit(self, batch: List[_Write]) -> None:
+        try:
+            with self._engine.begin() as conn:
+                for statement, params in _group_consecutive(batch):
+                    conn.execute(text(statement), params)
+        except Exception:
+            logger.exception("Write-behind batch of %d failed; retrying row by row", len(batch))
+            for statement, params in batch:
+                try:
+                    with self._engine.begin() as conn:
+                        conn.execute(text(statement), params)
+                except Exception:
+                    logger.exception("Dropping write-behind row that failed to commit")
+
+
+def _group_consecutive(batch: List[_Write]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """Groups runs of the same statement so each run becomes one executemany call."""
+    groups: List[Tuple[str, List[Dict[str, Any]]]] = []
+    for statement, params in batch:
+        if groups and groups[-1][0] == statement:
+            groups[-1][1].append(params)
+        else:
+            groups.append((statement, [params]))
+    return groups
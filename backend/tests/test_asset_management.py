@@ -16,18 +16,11 @@ class TestAssetManagement(unittest.IsolatedAsyncioTestCase):
         }
         mock_response.raise_for_status = lambda: None
 
-        # Mock AsyncClient context manager
+        # Mock the shared AsyncClient
         mock_client_instance = AsyncMock()
         mock_client_instance.get.return_value = mock_response # get() is awaited, returns response
 
-        # Mock AsyncClient constructor to return context manager
-        # async with httpx.AsyncClient() as client:
-        # __aenter__ returns client instance
-        mock_client_cls = MagicMock()
-        mock_client_cls.return_value.__aenter__.return_value = mock_client_instance
-        mock_client_cls.return_value.__aexit__.return_value = AsyncMock()
-
-        with patch('httpx.AsyncClient', new=mock_client_cls):
+        with patch('backend.tools.asset_management.get_async_client', return_value=mock_client_instance):
 
             output = await toolkit.monitor_transactions(MonitorTransactionsInput(
                 wallet_address="0xUser",
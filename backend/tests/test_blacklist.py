@@ -0,0 +1,67 @@
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from backend.storage.models import BlacklistRecord
+from backend.storage.sqlite import SqliteStorage
+from backend.tools import blacklist
+from backend.tools.blacklist import (
+    AddBlacklistInput,
+    RemoveBlacklistInput,
+    add_to_blacklist,
+    is_blacklisted,
+    list_blacklist,
+    remove_from_blacklist,
+)
+from backend.tools.dex import DexToolkit, ExecuteSwapInput
+
+SCAM_TOKEN = "0xabcdef0000000000000000000000000000000001"
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "blacklist.db"))
+    with patch("backend.tools.blacklist._get_storage", return_value=storage), \
+            patch.object(blacklist, "_membership", None):
+        yield storage
+    storage.close()
+
+
+def test_membership_tracks_writes(storage):
+    assert not is_blacklisted(SCAM_TOKEN)
+
+    add_to_blacklist(AddBlacklistInput(entry_type="token", identifier="0xABCDEF0000000000000000000000000000000001", reason="rug"))
+    assert is_blacklisted(SCAM_TOKEN)
+    assert is_blacklisted(SCAM_TOKEN, "token")
+    assert not is_blacklisted(SCAM_TOKEN, "developer")
+    assert storage.count_blacklist_entries() == 1
+    assert list_blacklist("token").entries[0]["identifier"] == SCAM_TOKEN
+
+    assert remove_from_blacklist(RemoveBlacklistInput(entry_type="token", identifier=SCAM_TOKEN))
+    assert not is_blacklisted(SCAM_TOKEN)
+
+
+def test_reload_picks_up_external_writes(storage):
+    assert not is_blacklisted(SCAM_TOKEN)
+    storage.upsert_blacklist_entry(BlacklistRecord(entry_type="token", identifier=SCAM_TOKEN, added_at=datetime.utcnow()))
+    assert not is_blacklisted(SCAM_TOKEN)
+    blacklist.reload_blacklist()
+    assert is_blacklisted(SCAM_TOKEN)
+
+
+@pytest.mark.asyncio
+async def test_swap_refuses_blacklisted_token(storage):
+    add_to_blacklist(AddBlacklistInput(entry_type="token", identifier=SCAM_TOKEN, reason="honeypot"))
+
+    with patch("backend.tools.dex.Web3Provider.get_async_w3") as mock_w3:
+        output = await DexToolkit().execute_swap(ExecuteSwapInput(
+            token_in="0xeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeeee",
+            token_out=SCAM_TOKEN,
+            amount_in=Decimal("1"),
+        ))
+
+    assert not output.success
+    assert "blacklisted" in output.error
+    mock_w3.assert_not_called()
@@ -0,0 +1,204 @@
+import json
+import threading
+import time
+
+import httpx
+import pytest
+from unittest.mock import patch
+from web3 import Web3
+
+from backend.cassettes import (
+    AsyncCassetteTransport,
+    Cassette,
+    CassetteMiss,
+    CassetteStore,
+    CassetteTransport,
+    cassette_call,
+    fingerprint,
+    get_cassette,
+    parse_latency,
+    redact_path,
+    reset_cassette,
+)
+from backend.http_client import HttpClients
+from backend.rate_limit import get_rate_limiter, reset_rate_limiters
+from backend.rpc import http_provider
+
+
+@pytest.fixture(autouse=True)
+def fresh_cassette():
+    reset_cassette()
+    reset_rate_limiters()
+    yield
+    reset_cassette()
+    reset_rate_limiters()
+
+
+class Upstream:
+    """Counts requests and answers with a body that changes on every call."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if request.content and b"jsonrpc" in request.content:
+            rpc = json.loads(request.content)
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": rpc["id"], "result": hex(100 + self.calls)})
+        return httpx.Response(200, json={"call": self.calls, "url": str(request.url.copy_with(query=None))})
+
+
+def offline(request):
+    raise AssertionError(f"network used for {request.url}")
+
+
+def cassette(tmp_path, mode, latency="0"):
+    return Cassette(CassetteStore(str(tmp_path / "http.sqlite")), mode, latency)
+
+
+def test_fingerprint_normalization():
+    base = fingerprint("GET", "https://api.example.com/x?b=2&a=1&apikey=secret")
+    assert base == fingerprint("get", "https://api.example.com/x?a=1&b=2&apikey=other")
+    assert base != fingerprint("GET", "https://api.example.com/x?a=1&b=3")
+    assert base != fingerprint("GET", "https://api.example.com/X?a=1&b=2")
+    rpc = fingerprint("POST", "https://rpc", b'{"jsonrpc":"2.0","id":1,"method":"eth_chainId","params":[]}')
+    assert rpc == fingerprint("POST", "https://rpc", b'{"params":[],"method":"eth_chainId","id":7,"jsonrpc":"2.0"}')
+
+
+def test_path_credentials_are_redacted(tmp_path):
+    infura = fingerprint("POST", "https://mainnet.infura.io/v3/0123abcd", b"{}")
+    assert infura == fingerprint("POST", "https://mainnet.infura.io/v3/ffff9999", b"{}")
+    assert infura != fingerprint("POST", "https://sepolia.infura.io/v3/0123abcd", b"{}")
+    assert fingerprint("GET", "https://api.example.com/v3/a") != fingerprint("GET", "https://api.example.com/v3/b")
+
+    recorder = cassette(tmp_path, "record")
+    with httpx.Client(transport=CassetteTransport(recorder, httpx.MockTransport(Upstream()))) as client:
+        client.post("https://eth-mainnet.g.alchemy.com/v2/s3cret-key", json={"jsonrpc": "2.0", "id": 1, "method": "eth_chainId"})
+    urls = [row[0] for row in recorder.store._db.execute("SELECT url FROM responses")]
+    assert urls == ["https://eth-mainnet.g.alchemy.com/v2/REDACTED"]
+
+
+def test_redaction_patterns_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("HTTP_CASSETTE_MODE", "record")
+    monkeypatch.setenv("HTTP_CASSETTE_PATH", str(tmp_path / "env.sqlite"))
+    monkeypatch.setenv("HTTP_CASSETTE_REDACT", r"node\.example\.com/key/([^/]+)")
+    cassette = get_cassette()
+    assert redact_path("https://node.example.com/key/abc/rpc", cassette.redact) == "https://node.example.com/key/REDACTED/rpc"
+    monkeypatch.setenv("HTTP_CASSETTE_REDACT", r"node\.example\.com/key/[^/]+")
+    with pytest.raises(ValueError):
+        get_cassette()
+
+
+def test_record_then_replay_offline(tmp_path):
+    upstream = Upstream()
+    recorder = cassette(tmp_path, "record")
+    with httpx.Client(transport=CassetteTransport(recorder, httpx.MockTransport(upstream))) as client:
+        first = client.get("https://api.example.com/prices", params={"ids": "bitcoin", "apikey": "secret"}).json()
+        second = client.get("https://api.example.com/prices", params={"ids": "bitcoin"}).json()
+    assert (first["call"], second["call"]) == (1, 2)
+    recorder.store.close()
+
+    player = cassette(tmp_path, "replay")
+    with httpx.Client(transport=CassetteTransport(player, httpx.MockTransport(offline))) as client:
+        replayed = [client.get("https://api.example.com/prices?ids=bitcoin").json()["call"] for _ in range(3)]
+        assert replayed == [1, 2, 2]  # recording order, then the last response repeats
+        with pytest.raises(CassetteMiss):
+            client.get("https://api.example.com/prices?ids=ethereum")
+    assert player.hits == 3
+    # Credentials are not stored.
+    urls = [row[0] for row in player.store._db.execute("SELECT url FROM responses")]
+    assert urls and all("secret" not in url for url in urls)
+
+
+@pytest.mark.asyncio
+async def test_async_auto_mode_records_misses_only(tmp_path):
+    upstream = Upstream()
+    auto = cassette(tmp_path, "auto")
+    async with httpx.AsyncClient(transport=AsyncCassetteTransport(auto, httpx.MockTransport(upstream))) as client:
+        await client.get("https://api.example.com/a")
+        auto.rewind()
+        again = await client.get("https://api.example.com/a")
+        await client.get("https://api.example.com/b")
+    assert again.json()["call"] == 1
+    assert upstream.calls == 2 and auto.recorded == 2 and auto.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_async_transport_uses_the_store_off_the_event_loop(tmp_path):
+    auto = cassette(tmp_path, "auto")
+    loop_thread = threading.get_ident()
+    threads = []
+    get, put = auto.store.get, auto.store.put
+
+    def recording(method):
+        def call(*args):
+            threads.append(threading.get_ident())
+            return method(*args)
+        return call
+
+    auto.store.get, auto.store.put = recording(get), recording(put)
+    async with httpx.AsyncClient(transport=AsyncCassetteTransport(auto, httpx.MockTransport(Upstream()))) as client:
+        await client.get("https://api.example.com/a")
+    assert len(threads) == 2 and loop_thread not in threads
+
+
+def test_replayed_rpc_gets_callers_id(tmp_path):
+    upstream = Upstream()
+    recorder = cassette(tmp_path, "record")
+    with httpx.Client(transport=CassetteTransport(recorder, httpx.MockTransport(upstream))) as client:
+        client.post("https://rpc.example.com", json={"jsonrpc": "2.0", "id": 1, "method": "eth_blockNumber", "params": []})
+
+    player = cassette(tmp_path, "replay")
+    shared = httpx.Client(transport=CassetteTransport(player, httpx.MockTransport(offline)))
+    w3 = Web3(http_provider("https://rpc.example.com"))
+    with patch("backend.rpc.get_client", return_value=shared):
+        assert w3.eth.block_number == 101
+    shared.close()
+
+
+def test_latency(tmp_path):
+    ranged = parse_latency("50-150")
+    delays = {ranged(fingerprint("GET", f"https://x/{i}"), None) for i in range(20)}
+    assert all(0.05 <= d <= 0.15 for d in delays) and len(delays) > 1
+    assert ranged("00000000" + "0" * 24, None) == ranged("00000000" + "0" * 24, None)
+
+    recorder = cassette(tmp_path, "record")
+    with httpx.Client(transport=CassetteTransport(recorder, httpx.MockTransport(Upstream()))) as client:
+        client.get("https://api.example.com/slow")
+    player = cassette(tmp_path, "replay", latency="60")
+    with httpx.Client(transport=CassetteTransport(player, httpx.MockTransport(offline))) as client:
+        start = time.perf_counter()
+        client.get("https://api.example.com/slow")
+        assert time.perf_counter() - start >= 0.06
+
+
+@pytest.mark.asyncio
+async def test_shared_clients_use_cassettes_from_environment(tmp_path, monkeypatch):
+    path = str(tmp_path / "env.sqlite")
+    recorder = Cassette(CassetteStore(path), "record")
+    with httpx.Client(transport=CassetteTransport(recorder, httpx.MockTransport(Upstream()))) as client:
+        client.get("https://api.coingecko.com/api/v3/ping")
+    recorder.store.close()
+
+    monkeypatch.setenv("HTTP_CASSETTE_MODE", "replay")
+    monkeypatch.setenv("HTTP_CASSETTE_PATH", path)
+    assert get_rate_limiter("https://api.coingecko.com/api/v3/ping") is None
+    clients = HttpClients()
+    response = await clients.async_client("https://api.coingecko.com").get("https://api.coingecko.com/api/v3/ping")
+    assert response.json()["call"] == 1
+    with pytest.raises(CassetteMiss):
+        clients.client("https://api.coingecko.com").get("https://api.coingecko.com/api/v3/unrecorded")
+    await clients.aclose()
+    clients.close()
+
+
+def test_call_level_recording(tmp_path, monkeypatch):
+    monkeypatch.setenv("HTTP_CASSETTE_PATH", str(tmp_path / "calls.sqlite"))
+    monkeypatch.setenv("HTTP_CASSETTE_MODE", "record")
+    assert cassette_call("search", {"q": "btc"}, lambda: [{"title": "live"}]) == [{"title": "live"}]
+
+    monkeypatch.setenv("HTTP_CASSETTE_MODE", "replay")
+    assert get_cassette().mode == "replay"
+    assert cassette_call("search", {"q": "btc"}, lambda: pytest.fail("called upstream")) == [{"title": "live"}]
+    with pytest.raises(CassetteMiss):
+        cassette_call("search", {"q": "eth"}, lambda: [])
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import time
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.market.charts import Chart, ChartCache, lttb, minmax, reset_chart_cache
+from backend.market.live import Tick, reset_live_prices
+from backend.rate_limit import reset_rate_limiters
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    reset_chart_cache()
+    reset_live_prices()
+    reset_rate_limiters()
+    yield
+    reset_chart_cache()
+    reset_live_prices()
+
+
+def series(n=5000, seed=3):
+    rng = np.random.default_rng(seed)
+    times = 1_700_000_000 + np.arange(n, dtype=np.float64) * 300
+    prices = 100 + np.cumsum(rng.normal(0, 1, n))
+    return times, prices
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    times, prices = series()
+    index = lttb(times, prices, 200)
+    assert len(index) == 200
+    assert index[0] == 0 and index[-1] == len(times) - 1
+    assert np.all(np.diff(index) > 0)
+    # A lone spike survives downsampling.
+    prices[2500] += 500
+    assert 2500 in lttb(times, prices, 200)
+    np.testing.assert_array_equal(lttb(times, prices, 10_000), np.arange(len(times)))
+
+
+def test_minmax_keeps_extremes():
+    _, prices = series()
+    index = minmax(prices, 100)
+    assert len(index) <= 100 and np.all(np.diff(index) > 0)
+    assert prices.argmax() in index and prices.argmin() in index
+
+
+def test_minmax_never_exceeds_the_budget():
+    _, prices = series()
+    for points in range(0, 12):
+        index = minmax(prices, points)
+        assert len(index) <= points
+    np.testing.assert_array_equal(minmax(prices, 2), [0, len(prices) - 1])
+    np.testing.assert_array_equal(minmax(prices, 3), [0, len(prices) - 1])
+
+
+def test_render_formats_and_memoization():
+    times, prices = series(10)
+    chart = Chart(times, prices, fetched_at=1_700_000_000.0)
+    objects = chart.render()
+    assert json.loads(objects.body)[0] == {"time": times[0], "price": prices[0]}
+    compact = chart.render(fmt="compact")
+    assert json.loads(compact.body)[-1] == [times[-1], prices[-1]]
+    assert objects.etag != compact.etag
+    assert chart.render() is objects
+    assert objects.headers["Last-Modified"] == "Tue, 14 Nov 2023 22:13:20 GMT"
+
+    # The live tail is appended only when newer than the last point.
+    live = chart.render(tail=(123.0, times[-1] + 60))
+    assert json.loads(live.body)[-1] == {"time": times[-1] + 60, "price": 123.0}
+    assert chart.render(tail=(123.0, times[-1])) is objects
+
+
+def test_conditional_requests():
+    chart = Chart(*series(10), fetched_at=1_700_000_000.0)
+    rendered = chart.render()
+    assert rendered.not_modified(rendered.etag, None)
+    assert rendered.not_modified(f'"other", W/{rendered.etag}', None)
+    assert not rendered.not_modified('"other"', None)
+    assert rendered.not_modified(None, "Tue, 14 Nov 2023 22:13:20 GMT")
+    assert not rendered.not_modified(None, "Tue, 14 Nov 2023 22:13:19 GMT")
+    # If-None-Match wins over If-Modified-Since.
+    assert not rendered.not_modified('"other"', "Tue, 14 Nov 2023 22:13:20 GMT")
+
+
+@pytest.mark.asyncio
+async def test_cache_coalesces_and_expires():
+    now = [0.0]
+    cache = ChartCache(ttls={"minute": 60, "hourly": 300, "daily": 1800}, clock=lambda: now[0])
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return series(10)
+
+    waiters = [asyncio.create_task(cache.get_or_fetch("bitcoin", 1, fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    charts = await asyncio.gather(*waiters)
+    assert calls == 1 and cache.coalesced == 2
+    assert charts[0] is charts[1] is charts[2]
+    assert await cache.get_or_fetch("bitcoin", 1, fetch) is charts[0]
+    now[0] = 61
+    await cache.get_or_fetch("bitcoin", 1, fetch)
+    assert calls == 2
+
+
+@pytest.fixture
+def api_client():
+    from fastapi.testclient import TestClient
+
+    try:
+        from backend.main import app, get_api_key
+    except ValueError as e:  # the API module needs model credentials at import
+        pytest.skip(str(e))
+    app.dependency_overrides[get_api_key] = lambda: "test_api_key"
+    yield TestClient(app)
+    app.dependency_overrides = {}
+
+
+def test_market_price_endpoint_caches_and_revalidates(api_client):
+    times, prices = series(2000)
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.raise_for_status = lambda: None
+    resp.json.return_value = {"prices": [[t * 1000, p] for t, p in zip(times, prices)]}
+    client = AsyncMock()
+    client.get.return_value = resp
+
+    with patch("backend.main.get_async_client", return_value=client):
+        full = api_client.get("/market/price?symbol=BTC&period=7D")
+        assert full.status_code == 200 and len(full.json()) == 2000
+        assert set(full.json()[0]) == {"time", "price"}
+        small = api_client.get("/market/price?symbol=BTC&period=7D&points=100&format=compact")
+        assert len(small.json()) == 100 and len(small.json()[0]) == 2
+        again = api_client.get("/market/price?symbol=BTC&period=7D", headers={"If-None-Match": full.headers["ETag"]})
+        assert again.status_code == 304 and again.headers["ETag"] == full.headers["ETag"]
+    assert client.get.await_count == 1
+
+    from backend.market.live import get_live_prices
+
+    get_live_prices().write(Tick("BTC", 1.0, 0.0, time.time()))
+    with patch("backend.main.get_async_client", return_value=client):
+        live = api_client.get("/market/price?symbol=BTC&period=7D", headers={"If-None-Match": full.headers["ETag"]})
+    assert live.status_code == 200 and live.json()[-1]["price"] == 1.0
+
+
+def test_market_price_schema_documents_both_formats(api_client):
+    responses = api_client.get("/openapi.json").json()["paths"]["/market/price"]["get"]["responses"]
+    variants = responses["200"]["content"]["application/json"]["schema"]["oneOf"]
+    assert [variant["title"] for variant in variants] == ["objects", "compact"]
+    assert "304" in responses
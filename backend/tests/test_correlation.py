@@ -0,0 +1,149 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.market.correlation import (
+    SymbolFetchError,
+    ewma_covariance,
+    load_returns,
+    pearson_matrix,
+    reset_correlation_cache,
+    rolling_correlation,
+    spearman_matrix,
+)
+from backend.market.symbols import Coin, SymbolIndex, get_symbol_resolver, reset_symbol_resolver, seed_coins
+from backend.tools.market_correlation import GetCorrelationMatrixInput, MarketCorrelationToolkit
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setenv("SYMBOLS_CACHE_PATH", "")
+    reset_symbol_resolver()
+    reset_correlation_cache()
+    yield
+    reset_correlation_cache()
+    reset_symbol_resolver()
+
+
+def random_returns(n=120, k=5, seed=7):
+    rng = np.random.default_rng(seed)
+    base = rng.normal(0, 0.02, size=(n, 1))
+    return base + rng.normal(0, 0.01, size=(n, k))
+
+
+def price_frame(returns, start="2024-01-01", freq="h"):
+    # Hourly points: load_returns must resample to daily closes itself.
+    prices = 100 * np.cumprod(1 + np.repeat(returns, 24) / 24)
+    return pd.DataFrame({"price": prices}, index=pd.date_range(start, periods=len(prices), freq=freq))
+
+
+def test_pearson_and_spearman_match_pandas():
+    returns = random_returns()
+    frame = pd.DataFrame(returns)
+    np.testing.assert_allclose(pearson_matrix(returns), frame.corr().to_numpy(), atol=1e-12)
+    np.testing.assert_allclose(spearman_matrix(returns), frame.corr(method="spearman").to_numpy(), atol=1e-12)
+
+
+def test_constant_column_is_nan_not_error():
+    returns = random_returns(k=3)
+    returns[:, 2] = 0.0
+    corr = pearson_matrix(returns)
+    assert np.isnan(corr[0, 2]) and np.isnan(corr[2, 2])
+    assert corr[0, 0] == 1.0
+
+
+def test_rolling_correlation_matches_pandas():
+    returns = random_returns(k=4)
+    frame = pd.DataFrame(returns)
+    expected = np.column_stack([frame[i].rolling(20).corr(frame[1]).to_numpy()[19:] for i in range(4)])
+    np.testing.assert_allclose(rolling_correlation(returns, 20, reference=1), expected, atol=1e-9)
+    with pytest.raises(ValueError):
+        rolling_correlation(returns, 1)
+
+
+def test_ewma_covariance_matches_recursion():
+    returns = random_returns(n=60, k=3)
+    lam = 0.94
+    weights = np.array([(1 - lam) * lam ** (len(returns) - 1 - t) for t in range(len(returns))])
+    expected = sum(w * np.outer(r, r) for w, r in zip(weights, returns)) / weights.sum()
+    np.testing.assert_allclose(ewma_covariance(returns, lam), expected, atol=1e-15)
+
+
+@pytest.mark.asyncio
+async def test_load_returns_fetches_concurrently_and_caches():
+    returns = random_returns(n=40, k=3)
+    in_flight = 0
+    peak = 0
+    calls = []
+    currencies = set()
+
+    async def fetch(symbol, days, vs_currency):
+        nonlocal in_flight, peak
+        calls.append(symbol)
+        currencies.add(vs_currency)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return price_frame(returns[:, ["a", "b", "c"].index(symbol.lower())])
+
+    matrix = await load_returns(["A", "b", "c", "a"], 40, fetch=fetch)
+    assert matrix.symbols == ("a", "b", "c")
+    assert currencies == {"usd"}
+    assert peak == 3
+    assert matrix.returns.shape[1] == 3 and len(matrix.index) == len(matrix.returns)
+    again = await load_returns(["a", "b", "c"], 40, fetch=fetch)
+    assert len(calls) == 3
+    np.testing.assert_array_equal(again.returns, matrix.returns)
+    await load_returns(["a", "b", "c"], 40, vs_currency="EUR", fetch=fetch)
+    assert len(calls) == 6
+    assert currencies == {"usd", "eur"}
+
+
+@pytest.mark.asyncio
+async def test_load_returns_keeps_case_sensitive_addresses():
+    mint = "DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263"
+    get_symbol_resolver().index = SymbolIndex(seed_coins() + [Coin("bonk", "bonk", "Bonk", {"solana": mint})])
+    returns = random_returns(n=20, k=2)
+    fetched = []
+
+    async def fetch(symbol, days, vs_currency):
+        fetched.append(symbol)
+        return price_frame(returns[:, len(fetched) - 1])
+
+    matrix = await load_returns([mint, "BTC", "bonk"], 20, fetch=fetch)
+    assert fetched == [mint, "BTC"]
+    assert matrix.symbols == ("bonk", "bitcoin")
+    assert matrix.column("bonk") == 0
+
+
+@pytest.mark.asyncio
+async def test_load_returns_reports_failed_symbol():
+    async def fetch(symbol, days, vs_currency):
+        if symbol == "ghost":
+            raise ValueError("No price data found")
+        return price_frame(random_returns(n=20, k=1)[:, 0])
+
+    with pytest.raises(SymbolFetchError) as info:
+        await load_returns(["bitcoin", "ghost"], 20, fetch=fetch)
+    assert info.value.symbol == "ghost"
+
+
+@pytest.mark.asyncio
+async def test_correlation_matrix_tool(monkeypatch):
+    returns = random_returns(n=60, k=3)
+    frames = {s: price_frame(returns[:, i]) for i, s in enumerate(["bitcoin", "ethereum", "solana"])}
+
+    async def fetch(symbol, days, vs_currency):
+        return frames[symbol]
+
+    monkeypatch.setattr("backend.tools.market_correlation.fetch_coingecko_prices", fetch)
+    result = await MarketCorrelationToolkit().get_correlation_matrix(
+        GetCorrelationMatrixInput(symbols=["bitcoin", "ethereum", "solana"], days=60, rolling_window=10)
+    )
+    assert result["pearson"]["bitcoin"]["bitcoin"] == 1.0
+    assert result["pearson"]["ethereum"]["solana"] == result["pearson"]["solana"]["ethereum"]
+    assert set(result["rolling_vs_bitcoin"]) == {"ethereum", "solana"}
+    assert result["ewma_volatility"]["bitcoin"] > 0
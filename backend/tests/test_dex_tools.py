@@ -7,6 +7,7 @@ class TestDexToolkit(unittest.IsolatedAsyncioTestCase):
         toolkit = DexToolkit()
 
         with patch('backend.tools.dex.Web3Provider.get_async_w3') as mock_get_w3, \
+             patch('backend.tools.dex.is_blacklisted', return_value=False), \
              patch('os.getenv', return_value="0x1234567890abcdef1234567890abcdef1234567890abcdef1234567890abcdef"):
 
             mock_w3 = AsyncMock()
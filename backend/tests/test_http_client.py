@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+
+from backend.http_client import HttpClients, client_options
+
+
+def test_sync_clients_are_shared_per_origin():
+    clients = HttpClients()
+    try:
+        a = clients.client("https://api.coingecko.com/api/v3/simple/price")
+        b = clients.client("https://api.coingecko.com/api/v3/coins/bitcoin")
+        c = clients.client("https://api.etherscan.io/api")
+        assert a is b
+        assert a is not c
+    finally:
+        clients.close()
+    assert a.is_closed and c.is_closed
+
+
+def test_client_options_from_env(monkeypatch):
+    monkeypatch.setenv("HTTP_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("HTTP_CONNECT_TIMEOUT_S", "2")
+    monkeypatch.setenv("HTTP_HTTP2", "0")
+    options = client_options()
+    assert options["limits"].max_connections == 7
+    assert options["timeout"].connect == 2.0
+    assert options["http2"] is False
+
+
+def test_invalid_url_rejected():
+    with pytest.raises(ValueError):
+        HttpClients().client("not-a-url")
+
+
+def test_async_clients_are_bound_to_their_loop():
+    clients = HttpClients()
+
+    async def server():
+        clients.start()
+        first = clients.async_client("https://api.coingecko.com/x")
+        assert clients.async_client("https://api.coingecko.com/y") is first
+        return first
+
+    async def toolkit_loop():
+        return clients.async_client("https://api.coingecko.com/x")
+
+    async def shutdown():
+        await clients.aclose()
+
+    loop = asyncio.new_event_loop()
+    try:
+        pooled = loop.run_until_complete(server())
+        other = asyncio.run(toolkit_loop())
+        assert other is not pooled
+        loop.run_until_complete(shutdown())
+        assert pooled.is_closed
+    finally:
+        loop.close()
+
+
+@pytest.mark.asyncio
+async def test_closed_client_is_replaced():
+    clients = HttpClients()
+    first = clients.async_client("https://example.com")
+    await first.aclose()
+    second = clients.async_client("https://example.com")
+    assert second is not first and isinstance(second, httpx.AsyncClient)
+    await clients.aclose()
@@ -0,0 +1,155 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.market.indicators import (
+    DEFAULT_INDICATORS,
+    IndicatorEngine,
+    Spec,
+    bollinger,
+    ema,
+    macd,
+    parse_spec,
+    reset_indicator_engine,
+    rsi,
+    sma,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_engine():
+    reset_indicator_engine()
+    yield
+    reset_indicator_engine()
+
+
+def walk(n=2000, seed=5, start=60_000.0):
+    rng = np.random.default_rng(seed)
+    return start * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+def frame(prices):
+    df = pd.DataFrame({"price": prices})
+    df.index = pd.date_range(start="2024-01-01", periods=len(prices), freq="D")
+    return df
+
+
+def test_matches_pandas():
+    prices = walk()
+    s = pd.Series(prices)
+    np.testing.assert_allclose(sma(prices, 25), s.rolling(25).mean(), rtol=1e-9)
+    np.testing.assert_allclose(ema(prices, 12), s.ewm(span=12, adjust=False).mean(), rtol=1e-12)
+
+    delta = s.diff()
+    gain = delta.where(delta > 0, 0).rolling(14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+    expected_rsi = 100 - 100 / (1 + gain / loss)
+    np.testing.assert_allclose(rsi(prices, 14)[15:], expected_rsi[15:], rtol=1e-6)
+    assert np.isnan(rsi(prices, 14)[:14]).all()
+
+    line, signal, hist = macd(prices)
+    expected_line = s.ewm(span=12, adjust=False).mean() - s.ewm(span=26, adjust=False).mean()
+    np.testing.assert_allclose(line, expected_line, atol=1e-8)
+    np.testing.assert_allclose(signal, expected_line.ewm(span=9, adjust=False).mean(), atol=1e-8)
+    np.testing.assert_allclose(hist, line - signal)
+
+    middle, upper, lower = bollinger(prices, 20, 2.0)
+    std = s.rolling(20).std()
+    np.testing.assert_allclose(upper, s.rolling(20).mean() + 2 * std, rtol=1e-9)
+    np.testing.assert_allclose(lower, s.rolling(20).mean() - 2 * std, rtol=1e-9)
+
+
+def test_edge_cases():
+    assert np.isnan(sma(np.arange(5.0), 10)).all()
+    assert len(ema(np.array([]), 12)) == 0
+    # Only gains: RSI saturates at 100.
+    assert rsi(np.arange(30.0), 14)[-1] == 100.0
+
+
+def test_parse_spec():
+    assert parse_spec("SMA:50") == Spec("sma", (50.0,))
+    assert parse_spec("macd") == Spec("macd", (12.0, 26.0, 9.0))
+    assert parse_spec("bb:20").columns == ["bb_middle", "bb_upper", "bb_lower"]
+    assert parse_spec("bb:50,2.5").columns == ["bb_middle_50_2.5", "bb_upper_50_2.5", "bb_lower_50_2.5"]
+    assert parse_spec("macd:5,35,5").columns[0] == "macd_5_35_5"
+    for bad in ("vwap:10", "sma", "sma:0", "sma:2.5", "rsi:x", "macd:1,2,3,4"):
+        with pytest.raises(ValueError):
+            parse_spec(bad)
+
+
+def test_engine_memoizes_per_series_version():
+    engine = IndicatorEngine(max_entries=2)
+    prices = walk(500)
+    df = frame(prices)
+
+    first = engine.from_frame("BTC", df)
+    assert engine.misses == len(DEFAULT_INDICATORS) and engine.hits == 0
+    second = engine.from_frame("btc", df, ["sma:25", "ema:21"])
+    # The shared column is the same array; only the new indicator is computed.
+    assert second.columns["sma_25"] is first.columns["sma_25"]
+    assert engine.misses == len(DEFAULT_INDICATORS) + 1 and engine.hits == 1
+    with pytest.raises(ValueError):
+        first.columns["sma_7"][0] = 1.0
+
+    # An appended point is a new version.
+    updated = engine.from_frame("BTC", frame(np.append(prices, prices[-1] * 1.01)))
+    assert updated.columns["sma_7"] is not first.columns["sma_7"]
+    assert len(updated.columns["sma_7"]) == 501
+    assert len(engine) == 2
+    engine.from_frame("ETH", df, ["sma:7"])
+    assert len(engine) == 2  # oldest series evicted
+
+    engine.invalidate("eth")
+    assert len(engine) == 1
+
+
+def test_last_values_are_json_friendly():
+    engine = IndicatorEngine()
+    out = engine.compute("BTC", np.arange(30.0), walk(30), DEFAULT_INDICATORS).last()
+    assert out["sma_100"] is None and isinstance(out["rsi_14"], float)
+    json.dumps(out)
+
+
+@pytest.mark.asyncio
+async def test_toolkit_custom_indicators():
+    from unittest.mock import AsyncMock, patch
+
+    from backend.tools.technical_analysis import GetTechIndicatorsInput, TechnicalAnalysisToolkit
+
+    prices = walk(300)
+    with patch("backend.tools.technical_analysis.fetch_coingecko_prices", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = frame(prices)
+        toolkit = TechnicalAnalysisToolkit()
+        default = await toolkit.get_technical_indicators(GetTechIndicatorsInput(symbol="BTC"))
+        custom = await toolkit.get_technical_indicators(GetTechIndicatorsInput(symbol="BTC", indicators=["ema:21", "bb:50,2.5"]))
+        bad = await toolkit.get_technical_indicators(GetTechIndicatorsInput(symbol="BTC", indicators=["vwap:3"]))
+
+    assert set(default) == {
+        "ma_7", "ma_25", "ma_100", "rsi_14", "macd", "macd_signal", "macd_hist", "bb_upper", "bb_lower", "current_price",
+    }
+    assert default["ma_25"] == pytest.approx(prices[-25:].mean())
+    assert set(custom) == {"ema_21", "bb_middle_50_2.5", "bb_upper_50_2.5", "bb_lower_50_2.5", "current_price"}
+    assert "error" in bad
+
+
+def test_strategy_optimization_unchanged():
+    from backend.tools.strategy import StrategyOptimizationInput, strategy_optimization
+
+    prices = walk(300, seed=9, start=100.0)
+    config = json.loads(
+        strategy_optimization(StrategyOptimizationInput(strategy="sma_cross", data=[{"close": p} for p in prices])).optimized_strategy
+    )
+
+    close = pd.Series(prices)
+    returns = close.pct_change().fillna(0)
+    best = (-np.inf, None)
+    for short in range(5, 31, 5):
+        for long in range(short + 5, 61, 5):
+            signal = pd.Series(np.where(close.rolling(short).mean() > close.rolling(long).mean(), 1, 0))
+            total = float((1 + signal.shift(1).fillna(0) * returns).prod() - 1)
+            if total > best[0]:
+                best = (total, (short, long))
+    assert (config["short_window"], config["long_window"]) == best[1]
+    assert config["total_return"] == pytest.approx(best[0])
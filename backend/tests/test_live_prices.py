@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.market.live import (
+    FEEDS,
+    LiveFeed,
+    LivePrices,
+    PriceRing,
+    ReplayServer,
+    Tick,
+    normalize_binance,
+    normalize_coinbase,
+    reset_live_prices,
+)
+from backend.market.symbols import Coin, SymbolIndex, get_symbol_resolver, reset_symbol_resolver, seed_coins
+from backend.rate_limit import reset_rate_limiters
+from backend.tools.market_data import FetchMarketDataInput, MarketDataToolkit
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    reset_live_prices()
+    reset_rate_limiters()
+    yield
+    reset_live_prices()
+    reset_rate_limiters()
+
+
+def binance_trade(symbol, price, ms, qty="0.5"):
+    return {"stream": f"{symbol.lower()}@trade", "data": {"e": "trade", "s": symbol, "p": str(price), "q": qty, "T": ms}}
+
+
+def test_ring_wraps_and_keeps_order():
+    ring = PriceRing(capacity=4)
+    assert ring.latest() is None
+    for i in range(10):
+        ring.append(float(i), 100.0 + i, 1.0)
+    assert len(ring) == 4
+    assert ring.latest() == (109.0, 9.0)
+    timestamps, prices, _ = ring.snapshot()
+    np.testing.assert_array_equal(timestamps, [6.0, 7.0, 8.0, 9.0])
+    np.testing.assert_array_equal(ring.snapshot(last=2)[1], [108.0, 109.0])
+    # Snapshots are copies, not views of the ring.
+    prices[:] = 0
+    assert ring.latest() == (109.0, 9.0)
+
+
+def test_normalizers():
+    assert normalize_binance(binance_trade("ETHUSDT", 3000.5, 1_700_000_000_000)) == [
+        Tick("ETH", 3000.5, 0.5, 1_700_000_000.0)
+    ]
+    ticker = {"e": "24hrMiniTicker", "s": "SOLUSDC", "c": "150", "v": "10", "E": 1_700_000_000_000}
+    assert normalize_binance(ticker)[0].symbol == "SOL"
+    coinbase = {"type": "ticker", "product_id": "BTC-USD", "price": "65000.1", "last_size": "0.01",
+                "time": "2024-01-01T00:00:00.000000Z"}
+    assert normalize_coinbase(coinbase) == [Tick("BTC", 65000.1, 0.01, 1704067200.0)]
+    assert normalize_coinbase({"type": "subscriptions"}) == []
+
+
+def test_aliases_and_staleness():
+    now = [1000.0]
+    prices = LivePrices(max_age=30, clock=lambda: now[0])
+    prices.write(Tick("BTC", 65000.0, 1.0, 990.0))
+    assert prices.price("bitcoin") == prices.price("btc") == 65000.0
+    now[0] = 1100.0
+    assert prices.price("BTC") is None
+    assert prices.price("BTC", max_age=200) == 65000.0
+    assert prices.price("ETH") is None
+
+
+def test_ids_sharing_a_ticker_do_not_read_its_ring(monkeypatch):
+    monkeypatch.setenv("SYMBOLS_CACHE_PATH", "")
+    reset_symbol_resolver()
+    get_symbol_resolver().index = SymbolIndex(seed_coins() + [Coin("batcat", "btc", "Batcat", {})])
+    try:
+        prices = LivePrices(clock=lambda: 1000.0)
+        prices.write(Tick("BTC", 65000.0, 1.0, 990.0))
+        assert prices.price("bitcoin") == 65000.0
+        assert prices.price("batcat") is None
+    finally:
+        reset_symbol_resolver()
+
+
+@pytest.mark.asyncio
+async def test_feed_ingests_replayed_messages():
+    now_ms = int(time.time() * 1000)
+    messages = [binance_trade("BTCUSDT", 65000 + i, now_ms + i) for i in range(5)]
+    messages += ["not json", binance_trade("ETHUSDT", 3000, now_ms)]
+    prices = LivePrices()
+    async with ReplayServer(messages) as server:
+        feed = LiveFeed(FEEDS["binance"], ["BTC", "ETH"], prices, url=server.url)
+        feed.start()
+        for _ in range(200):
+            if feed.ticks == 6:
+                break
+            await asyncio.sleep(0.01)
+        await feed.stop()
+    assert feed.errors == 1
+    assert prices.price("BTC") == 65004.0
+    assert prices.price("ethereum") == 3000.0
+    assert len(prices.ring("BTC")) == 5
+
+
+@pytest.mark.asyncio
+async def test_feed_subscribes_and_reconnects():
+    message = {"type": "ticker", "product_id": "BTC-USD", "price": "65000", "time": "2024-01-01T00:00:00Z"}
+    prices = LivePrices()
+    with patch("backend.market.live.backoff", return_value=0.01):
+        async with ReplayServer([message], wait_for_subscribe=True) as server:
+            feed = LiveFeed(FEEDS["coinbase"], ["btc"], prices, url=server.url)
+            feed.start()
+            for _ in range(200):
+                if server.connections >= 2 and server.received:
+                    break
+                await asyncio.sleep(0.01)
+            await feed.stop()
+    assert server.connections >= 2 and feed.reconnects >= 1
+    assert '"BTC-USD"' in server.received[0]
+    assert prices.ring("BTC") is not None
+
+
+@pytest.mark.asyncio
+async def test_market_data_reads_streamed_prices_from_memory():
+    from backend.market.live import get_live_prices
+
+    get_live_prices().write(Tick("BTC", 65000.0, 1.0, time.time()))
+    resp = MagicMock()
+    resp.json.return_value = {"ethereum": {"usd": 3000}}
+    resp.raise_for_status = lambda: None
+    client = AsyncMock()
+    client.get.return_value = resp
+
+    with patch("backend.tools.market_data.get_async_client", return_value=client):
+        output = await MarketDataToolkit().fetch_market_data(FetchMarketDataInput(coin_ids=["bitcoin", "ethereum"]))
+    assert output.market_data["bitcoin"] == {"usd": 65000.0}
+    assert output.market_data["ethereum"] == {"usd": 3000}
+    assert "ids=ethereum&" in client.get.await_args.args[0]
+
+    client.get.reset_mock()
+    with patch("backend.tools.market_data.get_async_client", return_value=client):
+        output = await MarketDataToolkit().fetch_market_data(FetchMarketDataInput(coin_ids=["bitcoin"]))
+    assert output.market_data == {"bitcoin": {"usd": 65000.0}}
+    client.get.assert_not_awaited()
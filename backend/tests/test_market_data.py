@@ -1,8 +1,12 @@
 import unittest
 from unittest.mock import AsyncMock, patch, MagicMock
+from backend.rate_limit import reset_rate_limiters
 from backend.tools.market_data import MarketDataToolkit, FetchMarketDataInput
 
 class TestMarketData(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        reset_rate_limiters()
+
     async def test_fetch_parallel(self):
         toolkit = MarketDataToolkit()
 
@@ -26,11 +30,7 @@ class TestMarketData(unittest.IsolatedAsyncioTestCase):
 
         mock_client.get.side_effect = side_effect
 
-        mock_client_cls = MagicMock()
-        mock_client_cls.return_value.__aenter__.return_value = mock_client
-        mock_client_cls.return_value.__aexit__.return_value = AsyncMock()
-
-        with patch('httpx.AsyncClient', new=mock_client_cls):
+        with patch('backend.tools.market_data.get_async_client', return_value=mock_client):
             input_data = FetchMarketDataInput(
                 coin_ids=["bitcoin", "ethereum"],
                 vs_currency="usd",
@@ -0,0 +1,127 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.market.cache import SeriesCache, granularity, parse_ttls, reset_price_cache
+from backend.rate_limit import reset_rate_limiters
+from backend.tools.utils import fetch_coingecko_prices
+
+
+def make_df(n=10, start=100.0):
+    df = pd.DataFrame({"price": [start + i for i in range(n)]})
+    df.index = pd.date_range(start="2024-01-01", periods=n, freq="D")
+    return df
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    reset_price_cache()
+    reset_rate_limiters()
+    yield
+    reset_price_cache()
+    reset_rate_limiters()
+
+
+def test_granularity_ttls():
+    assert granularity(1) == "minute"
+    assert granularity(30) == "hourly"
+    assert granularity(365) == "daily"
+    ttls = parse_ttls("daily=60")
+    assert ttls["daily"] == 60.0 and ttls["minute"] == 60.0
+    with pytest.raises(ValueError):
+        parse_ttls("weekly=1")
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry():
+    clock = FakeClock()
+    cache = SeriesCache(clock=clock)
+    fetch = AsyncMock(side_effect=lambda: make_df())
+
+    await cache.get_or_fetch("k", fetch, ttl=10)
+    await cache.get_or_fetch("k", fetch, ttl=10)
+    assert fetch.await_count == 1
+    clock.now = 11
+    await cache.get_or_fetch("k", fetch, ttl=10)
+    assert fetch.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_coalesce():
+    cache = SeriesCache()
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await release.wait()
+        return make_df()
+
+    waiters = [asyncio.create_task(cache.get_or_fetch("k", fetch, ttl=60)) for _ in range(5)]
+    await started.wait()
+    release.set()
+    frames = await asyncio.gather(*waiters)
+    assert calls == 1
+    assert cache.coalesced == 4
+    # Each caller gets its own copy.
+    frames[0]["returns"] = 0.0
+    assert "returns" not in frames[1].columns
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_not_cached():
+    cache = SeriesCache()
+    fetch = AsyncMock(side_effect=RuntimeError("Rate Limit Exceeded"))
+    results = await asyncio.gather(
+        cache.get_or_fetch("k", fetch, ttl=60), cache.get_or_fetch("k", fetch, ttl=60), return_exceptions=True
+    )
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert fetch.await_count == 1
+    fetch.side_effect = lambda: make_df()
+    await cache.get_or_fetch("k", fetch, ttl=60)
+    assert len(cache) == 1
+
+
+def test_lru_eviction_under_memory_cap():
+    frame_size = int(make_df(100).memory_usage(index=True, deep=True).sum())
+    cache = SeriesCache(max_bytes=frame_size * 2)
+    cache.put("a", make_df(100), ttl=60)
+    cache.put("b", make_df(100), ttl=60)
+    assert cache.get("a") is not None  # a is now most recently used
+    cache.put("c", make_df(100), ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.size_bytes <= frame_size * 2
+
+
+@pytest.mark.asyncio
+async def test_fetch_coingecko_prices_uses_shared_cache():
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.raise_for_status = lambda: None
+    resp.json.return_value = {"prices": [[1704067200000, 42000.0], [1704153600000, 43000.0]]}
+    client = AsyncMock()
+    client.get.return_value = resp
+
+    first = await fetch_coingecko_prices("bitcoin", 365, client=client)
+    second = await fetch_coingecko_prices("Bitcoin", 365, client=client)
+    await fetch_coingecko_prices("bitcoin", 30, client=client)
+    assert client.get.await_count == 2
+    assert second["price"].tolist() == first["price"].tolist() == [42000.0, 43000.0]
+
+    with patch.dict("os.environ", {"MARKET_CACHE": "0"}):
+        await fetch_coingecko_prices("bitcoin", 365, client=client)
+    assert client.get.await_count == 3
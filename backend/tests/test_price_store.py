@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.market.cache import reset_price_cache
+from backend.market.store import PriceStore, payload_to_rows, reset_price_store
+from backend.rate_limit import reset_rate_limiters
+from backend.tools.utils import fetch_coingecko_prices
+
+DAY_MS = 86_400_000
+NOW = 1_717_200_000.0  # 2024-06-01 00:00 UTC
+
+
+def chart(start_ms, end_ms, step_ms, live_ms=None):
+    """A market_chart payload: settled points on the step grid plus CoinGecko's live last point."""
+    stamps = list(range(start_ms, end_ms + 1, step_ms))
+    if live_ms is not None:
+        stamps.append(live_ms)
+    return {
+        "prices": [[t, t / 1e9] for t in stamps],
+        "market_caps": [[t, 1e9] for t in stamps],
+        "total_volumes": [[t, 1e6] for t in stamps],
+    }
+
+
+class FakeCoinGecko:
+    """Serves /market_chart/range from a synthetic daily series."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = []
+
+    async def __call__(self, from_s, to_s):
+        self.calls.append((from_s, to_s))
+        now_ms = int(self.clock() * 1000)
+        first = -(-from_s * 1000 // DAY_MS) * DAY_MS
+        return chart(first, now_ms - 1, DAY_MS, live_ms=now_ms)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_payload_to_rows_sorts_and_dedupes():
+    rows = payload_to_rows({"prices": [[3, 30.0], [1, 10.0], [3, 31.0]], "total_volumes": [[3, 1], [1, 2], [3, 3]]})
+    assert rows[:, 0].tolist() == [1, 3]
+    assert rows[:, 1].tolist() == [10.0, 31.0]
+    assert np.isnan(rows[0, 2])
+    with pytest.raises(ValueError):
+        payload_to_rows({"prices": []})
+
+
+@pytest.mark.asyncio
+async def test_local_read_then_tail_only_backfill(tmp_path):
+    clock = Clock(NOW)
+    store = PriceStore(str(tmp_path), ttls={"minute": 60, "hourly": 300, "daily": 1800}, clock=clock)
+    upstream = FakeCoinGecko(clock)
+
+    first = await store.load("bitcoin", 365, "usd", upstream)
+    assert len(upstream.calls) == 1
+    assert first.index[-1].value // 1_000_000 == int(NOW * 1000)  # live point kept
+
+    # Within the TTL: a local read, any window the series covers.
+    clock.now += 600
+    shorter = await store.load("bitcoin", 200, "usd", upstream)
+    assert len(upstream.calls) == 1 and store.local_reads == 1
+    assert len(shorter) in (200, 201)
+
+    # Two days later only the tail is fetched (widened to 91 days to stay daily).
+    clock.now = NOW + 2 * 86_400
+    after = await store.load("bitcoin", 365, "usd", upstream)
+    from_s, to_s = upstream.calls[-1]
+    assert to_s - from_s == 91 * 86_400
+    timestamps = after.index.asi8 // 1_000_000
+    assert np.all(np.diff(timestamps) > 0)
+    assert timestamps[-1] == int(clock.now * 1000)
+    window = store.series("bitcoin", "usd", "daily").window(0)
+    assert isinstance(window.timestamps, np.memmap)
+
+
+@pytest.mark.asyncio
+async def test_longer_window_rewrites_series(tmp_path):
+    clock = Clock(NOW)
+    store = PriceStore(str(tmp_path), clock=clock)
+    upstream = FakeCoinGecko(clock)
+    await store.load("ethereum", 100, "usd", upstream)
+    frame = await store.load("ethereum", 365, "usd", upstream)
+    assert len(upstream.calls) == 2
+    assert frame.index[0].value // 1_000_000 <= int(NOW * 1000) - 364 * DAY_MS
+    versions = os.listdir(tmp_path / "usd" / "ethereum" / "daily")
+    assert [v for v in versions if v.startswith("v")] == ["v2"]
+
+
+def test_torn_append_is_not_visible(tmp_path):
+    store = PriceStore(str(tmp_path))
+    series = store.series("bitcoin", "usd", "daily")
+    series.replace(payload_to_rows(chart(0, 9 * DAY_MS, DAY_MS)))
+    version = tmp_path / "usd" / "bitcoin" / "daily" / "v1"
+    with open(version / "price.bin", "ab") as handle:  # value column written, timestamp not yet
+        handle.write(np.float64(1.0).tobytes())
+    columns, tail = series.columns()
+    assert len(columns["timestamp"]) == len(columns["price"]) == 9
+    assert tail[0] == 9 * DAY_MS
+
+
+@pytest.mark.asyncio
+async def test_load_does_file_io_off_the_event_loop(tmp_path, monkeypatch):
+    from backend.market import store as store_module
+
+    loop_thread = threading.get_ident()
+    io_threads = []
+    for name in ("span", "frame", "replace", "extend"):
+        original = getattr(store_module.PriceSeries, name)
+
+        def recording(self, *args, _original=original):
+            io_threads.append(threading.get_ident())
+            return _original(self, *args)
+
+        monkeypatch.setattr(store_module.PriceSeries, name, recording)
+    monkeypatch.setattr(store_module, "fcntl", None)  # as on Windows
+    clock = Clock(NOW)
+    store = PriceStore(str(tmp_path), clock=clock)
+    await store.load("bitcoin", 365, "usd", FakeCoinGecko(clock))
+    assert io_threads and loop_thread not in io_threads
+
+
+def test_rejects_path_like_symbols(tmp_path):
+    with pytest.raises(ValueError):
+        PriceStore(str(tmp_path)).series("../etc", "usd", "daily")
+
+
+@pytest.mark.asyncio
+async def test_fetch_coingecko_prices_uses_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("MARKET_STORE_DIR", str(tmp_path))
+    monkeypatch.setenv("MARKET_CACHE", "0")
+    reset_price_store()
+    reset_price_cache()
+    reset_rate_limiters()
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.raise_for_status = lambda: None
+    now_ms = int(time.time() * 1000)
+    resp.json.return_value = {"prices": [[now_ms - 400 * DAY_MS, 1.0], [now_ms - DAY_MS, 2.0], [now_ms, 3.0]]}
+    client = AsyncMock()
+    client.get.return_value = resp
+    try:
+        frame = await fetch_coingecko_prices("bitcoin", 365, client=client)
+        url = client.get.await_args.args[0]
+        assert "/market_chart/range?" in url
+        assert frame["price"].tolist() == [2.0, 3.0]
+        assert frame.index.dtype == "datetime64[ns]"
+    finally:
+        reset_price_store()
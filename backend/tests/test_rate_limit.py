@@ -0,0 +1,215 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.rate_limit import (
+    Priority,
+    SqliteTokenStore,
+    TokenBucket,
+    configured_limits,
+    get_rate_limiter,
+    parse_limits,
+    rate_limited_get,
+    rate_limited_get_sync,
+    request_priority,
+    reset_rate_limiters,
+    retry_after,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters():
+    reset_rate_limiters()
+    yield
+    reset_rate_limiters()
+
+
+def response(status, headers=None):
+    return httpx.Response(status, headers=headers or {}, request=httpx.Request("GET", "https://api.coingecko.com/x"))
+
+
+def test_limits_from_tier_and_overrides(monkeypatch):
+    monkeypatch.delenv("COINGECKO_API_KEY", raising=False)
+    monkeypatch.delenv("RATE_LIMITS", raising=False)
+    monkeypatch.setenv("COINGECKO_API_TIER", "analyst")
+    assert configured_limits()["api.coingecko.com"][:2] == (500.0, 60.0)
+    monkeypatch.setenv("RATE_LIMITS", "api.coingecko.com=30/60:3,example.com=2")
+    limits = configured_limits()
+    assert limits["api.coingecko.com"] == (30.0, 60.0, 3.0)
+    assert limits["example.com"] == (2.0, 1.0, 1.0)
+    assert parse_limits("") == {}
+    monkeypatch.setenv("COINGECKO_API_TIER", "platinum")
+    with pytest.raises(ValueError):
+        configured_limits()
+
+
+def test_unlimited_hosts_have_no_bucket():
+    assert get_rate_limiter("https://news.google.com/rss") is None
+    bucket = get_rate_limiter("https://api.coingecko.com/api/v3/simple/price")
+    assert bucket is get_rate_limiter("https://api.coingecko.com/api/v3/coins/bitcoin")
+
+
+@pytest.mark.asyncio
+async def test_bucket_paces_after_burst():
+    bucket = TokenBucket("t", rate=50.0, capacity=2)
+    start = time.monotonic()
+    for _ in range(4):
+        await bucket.acquire()
+    # Two from the burst, two refilled at 50/s.
+    assert time.monotonic() - start >= 0.035
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_by_priority():
+    bucket = TokenBucket("t", rate=100.0, capacity=1)
+    await bucket.acquire()  # drain the burst so the rest queue
+    order = []
+
+    async def take(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    tasks = [
+        asyncio.create_task(take("background", Priority.BACKGROUND)),
+        asyncio.create_task(take("default", Priority.DEFAULT)),
+        asyncio.create_task(take("interactive", Priority.INTERACTIVE)),
+    ]
+    await asyncio.gather(*tasks)
+    assert order == ["interactive", "default", "background"]
+
+
+@pytest.mark.asyncio
+async def test_priority_from_context():
+    bucket = TokenBucket("t", rate=100.0, capacity=1)
+    await bucket.acquire()
+    order = []
+
+    async def take(name):
+        await bucket.acquire()
+        order.append(name)
+
+    with request_priority(Priority.BACKGROUND):
+        background = asyncio.create_task(take("background"))
+    interactive = asyncio.create_task(take("default"))
+    await asyncio.gather(background, interactive)
+    assert order == ["default", "background"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_head_hands_over():
+    bucket = TokenBucket("t", rate=20.0, capacity=1)
+    await bucket.acquire()
+    head = asyncio.create_task(bucket.acquire(Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(bucket.acquire(Priority.BACKGROUND))
+    await asyncio.sleep(0)
+    head.cancel()
+    await asyncio.wait_for(follower, timeout=1)
+    assert bucket.queued == 0
+
+
+def test_retry_after_parsing():
+    assert retry_after(response(429, {"Retry-After": "7"})) == 7.0
+    assert retry_after(response(429)) is None
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 <= retry_after(response(429, {"Retry-After": date})) <= 31
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_get_retries_and_pauses_bucket(monkeypatch):
+    monkeypatch.setenv("RATE_LIMITS", "api.coingecko.com=100/1:5")
+    client = AsyncMock()
+    client.get.side_effect = [response(429, {"Retry-After": "0.05"}), response(200)]
+    bucket = get_rate_limiter("https://api.coingecko.com/x")
+    with patch.object(bucket, "pause", wraps=bucket.pause) as pause:
+        result = await rate_limited_get(client, "https://api.coingecko.com/x", timeout=10.0)
+    assert result.status_code == 200
+    assert client.get.await_count == 2
+    pause.assert_called_once_with(0.05)
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_get_gives_up_with_last_response(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_MAX_BACKOFF_S", "0.01")
+    client = AsyncMock()
+    client.get.return_value = response(503)
+    result = await rate_limited_get(client, "https://news.google.com/rss", max_retries=2)
+    assert result.status_code == 503
+    assert client.get.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_get_retries_connection_errors(monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_MAX_BACKOFF_S", "0.01")
+    client = AsyncMock()
+    client.get.side_effect = [httpx.ConnectError("boom"), response(200)]
+    with patch("backend.rate_limit.backoff", return_value=0.0):
+        result = await rate_limited_get(client, "https://news.google.com/rss")
+    assert result.status_code == 200
+
+
+def test_shared_store_spans_buckets(tmp_path):
+    path = str(tmp_path / "limits.db")
+    first = SqliteTokenStore(path)
+    second = SqliteTokenStore(path)  # another worker process
+    assert first.take("api", rate=0.001, capacity=2) == 0
+    assert second.take("api", rate=0.001, capacity=2) == 0
+    assert first.take("api", rate=0.001, capacity=2) > 0
+    second.block("other", time.time() + 60)
+    assert first.take("other", rate=100, capacity=5) > 50
+
+
+@pytest.mark.asyncio
+async def test_shared_store_takes_off_the_event_loop(tmp_path):
+    store = SqliteTokenStore(str(tmp_path / "limits.db"))
+    threads = []
+    take = store.take
+
+    def recording_take(*args):
+        threads.append(threading.get_ident())
+        return take(*args)
+
+    store.take = recording_take
+    bucket = TokenBucket("api", rate=50.0, capacity=1, store=store)
+    await asyncio.gather(bucket.acquire(), bucket.acquire())
+    assert len(threads) >= 2
+    assert threading.get_ident() not in threads
+    assert bucket.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_blocking_acquire_shares_the_bucket_with_async_waiters():
+    bucket = TokenBucket("t", rate=20.0, capacity=1)
+    await bucket.acquire()  # bucket now empty
+    order = []
+
+    async def take_async():
+        await bucket.acquire(Priority.INTERACTIVE)
+        order.append("async")
+
+    def take_blocking():
+        bucket.acquire_blocking(Priority.BACKGROUND)
+        order.append("sync")
+
+    start = time.perf_counter()
+    await asyncio.gather(take_async(), asyncio.to_thread(take_blocking))
+    assert sorted(order) == ["async", "sync"]
+    assert time.perf_counter() - start >= 0.08  # two more tokens at 20/s
+    assert bucket.queued == 0
+
+
+def test_rate_limited_get_sync_uses_the_host_bucket(monkeypatch):
+    monkeypatch.setenv("RATE_LIMITS", "api.etherscan.io=100/1:5")
+    client = MagicMock()
+    client.get.side_effect = [response(429, {"Retry-After": "0.01"}), response(200)]
+    bucket = get_rate_limiter("https://api.etherscan.io/api")
+    with patch.object(bucket, "acquire_blocking", wraps=bucket.acquire_blocking) as acquire, \
+            patch.object(bucket, "pause", wraps=bucket.pause) as pause:
+        result = rate_limited_get_sync(client, "https://api.etherscan.io/api", params={"module": "account"})
+    assert result.status_code == 200
+    assert acquire.call_count == 2
+    pause.assert_called_once_with(0.01)
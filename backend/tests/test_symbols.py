@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.market.symbols import (
+    SymbolIndex,
+    SymbolResolver,
+    get_symbol_resolver,
+    parse_coin_list,
+    reset_symbol_resolver,
+    resolve_coin_id,
+)
+from backend.rate_limit import reset_rate_limiters
+from backend.tools.market_data import MarketDataToolkit, ResolveSymbolInput
+
+COIN_LIST = [
+    {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "platforms": {}},
+    {"id": "batcat", "symbol": "btc", "name": "batcat", "platforms": {"solana": "EBGaJP7srpUUN8eRdta1MKEXsjNBkA1PAcnkQ1FX3rGp"}},
+    {"id": "bitcoin-avalanche-bridged-btc-b", "symbol": "btc.b", "name": "Bitcoin Avalanche Bridged (BTC.b)", "platforms": {}},
+    {"id": "pepe-token", "symbol": "pepe", "name": "Pepe", "platforms": {"ethereum": "0x6982508145454Ce325dDbE47a25d4ec3d2311933"}},
+    {"id": "pepe-on-bsc", "symbol": "pepe", "name": "Pepe (BSC)", "platforms": {"binance-smart-chain": "0xaaa"}},
+    {"id": "based-pepe", "symbol": "pepe", "name": "Based Pepe", "platforms": {"base": "0xbbb"}},
+    {"id": "uniswap", "symbol": "uni", "name": "Uniswap", "platforms": {"ethereum": "0x1f9840a85d5af5bf1d1762f925bdaddc4201f984"}},
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_resolver(monkeypatch, tmp_path):
+    monkeypatch.setenv("SYMBOLS_CACHE_PATH", str(tmp_path / "coins.json"))
+    reset_symbol_resolver()
+    reset_rate_limiters()
+    yield
+    reset_symbol_resolver()
+    reset_rate_limiters()
+
+
+def response(payload):
+    resp = MagicMock()
+    resp.status_code = 200
+    resp.raise_for_status = lambda: None
+    resp.json.return_value = payload
+    return resp
+
+
+def test_ambiguous_tickers_resolve_deterministically():
+    index = SymbolIndex(parse_coin_list(COIN_LIST))
+    # Built-in preference beats everything for major tickers.
+    assert index.resolve("BTC") == "bitcoin"
+    # Otherwise: tokens after native coins, then shortest id.
+    assert [c.id for c in index.candidates("pepe")] == ["based-pepe", "pepe-token", "pepe-on-bsc"]
+    # Market-cap rank beats the id tie-break.
+    ranked = SymbolIndex(parse_coin_list(COIN_LIST), ranks={"pepe-on-bsc": 40, "pepe-token": 41})
+    assert ranked.resolve("PEPE") == "pepe-on-bsc"
+    # Shuffling the input does not change the answer.
+    assert SymbolIndex(parse_coin_list(COIN_LIST[::-1])).resolve("pepe") == "based-pepe"
+    # An exact id wins over other coins using it as a ticker.
+    assert index.resolve("pepe-token") == "pepe-token"
+    assert index.resolve("Uniswap") == "uniswap"
+    assert index.resolve("nonexistent") is None
+
+
+def test_contract_lookup_per_chain():
+    index = SymbolIndex(parse_coin_list(COIN_LIST))
+    address = "0x6982508145454ce325ddbe47a25d4ec3d2311933"
+    assert index.resolve(address) == "pepe-token"
+    assert index.contract(address.upper().replace("0X", "0x"), "eth").id == "pepe-token"
+    assert index.contract(address, "bsc") is None
+    assert index.contract("0xAAA", "bsc").id == "pepe-on-bsc"
+    # Base58 addresses are case-sensitive.
+    assert index.contract("EBGaJP7srpUUN8eRdta1MKEXsjNBkA1PAcnkQ1FX3rGp", "solana").id == "batcat"
+    assert index.contract("ebgajp7srpuun8erdta1mkexsjnbka1pacnkq1fx3rgp") is None
+
+
+def test_prefix_search():
+    index = SymbolIndex(parse_coin_list(COIN_LIST))
+    assert [c.id for c in index.search("btc")][:2] == ["bitcoin", "batcat"]
+    assert "bitcoin-avalanche-bridged-btc-b" in [c.id for c in index.search("bitcoin a")]
+    assert index.search("zzz") == []
+
+
+def test_unknown_symbols_fall_back_until_the_list_is_loaded():
+    assert resolve_coin_id("ETH") == "ethereum"
+    assert resolve_coin_id("SomeCoin") == "somecoin"
+    assert not get_symbol_resolver().loaded
+
+
+@pytest.mark.asyncio
+async def test_refresh_downloads_once_and_persists(tmp_path):
+    async def get(url, **kwargs):
+        await asyncio.sleep(0.01)
+        if "/coins/list" in url:
+            return response(COIN_LIST)
+        return response([{"id": "pepe-on-bsc"}])
+
+    client = AsyncMock()
+    client.get.side_effect = get
+    path = tmp_path / "coins.json"
+    resolver = SymbolResolver(path=str(path), ranked=250)
+    with patch("backend.market.symbols.get_async_client", return_value=client):
+        await asyncio.gather(resolver.refresh(), resolver.refresh())
+    assert client.get.await_count == 2  # one list + one ranks page
+    assert resolver.loaded and not resolver.is_stale()
+    assert resolver.resolve("pepe") == "pepe-on-bsc"
+
+    stored = json.loads(path.read_text())
+    assert stored["ranks"] == {"pepe-on-bsc": 1}
+    reloaded = SymbolResolver(path=str(path))
+    assert reloaded.loaded and reloaded.resolve("pepe") == "pepe-on-bsc"
+    assert reloaded.resolve("btc") == "bitcoin"
+
+
+@pytest.mark.asyncio
+async def test_tools_resolve_tickers():
+    with open(get_symbol_resolver().path, "w") as f:
+        json.dump({"fetched_at": 0, "coins": COIN_LIST, "ranks": {}}, f)
+    reset_symbol_resolver()
+
+    result = MarketDataToolkit().resolve_symbol(ResolveSymbolInput(query="pepe", limit=2))
+    assert [c["id"] for c in result["candidates"]] == ["based-pepe", "pepe-token"]
+
+    client = AsyncMock()
+    client.get.return_value = response({"prices": [[1704067200000, 1.0]]})
+    from backend.tools.utils import fetch_coingecko_prices
+
+    with patch.dict("os.environ", {"MARKET_CACHE": "0", "MARKET_STORE_DIR": ""}):
+        await fetch_coingecko_prices("Uniswap", 30, client=client)
+    assert "/coins/uniswap/market_chart" in client.get.await_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_background_refresh_replaces_the_index(tmp_path):
+    client = AsyncMock()
+    client.get.return_value = response(COIN_LIST)
+    resolver = SymbolResolver(path=str(tmp_path / "coins.json"), ranked=0)
+    assert resolver.resolve("uni") is None
+    with patch("backend.market.symbols.get_async_client", return_value=client):
+        resolver.start()
+        for _ in range(100):
+            if resolver.loaded:
+                break
+            await asyncio.sleep(0.01)
+        await resolver.stop()
+    assert resolver.resolve("uni") == "uniswap"
+    assert client.get.await_count == 1
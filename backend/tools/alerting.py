@@ -3,12 +3,12 @@ import uuid
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
-import requests
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
+from backend.http_client import get_client
 from backend.storage.models import AlertRecord
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.registry import get_storage
 
 
 class SendInternalAlertInput(BaseModel):
@@ -37,7 +37,7 @@ def _build_webhook_payload(alert_id: str, payload: SendInternalAlertInput) -> Di
 
 
 def send_internal_alert(input: SendInternalAlertInput) -> SendInternalAlertOutput:
-    storage = SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+    storage = get_storage()
     alert_id = str(uuid.uuid4())
     delivered_via: List[str] = []
     error: Optional[str] = None
@@ -46,7 +46,7 @@ def send_internal_alert(input: SendInternalAlertInput) -> SendInternalAlertOutpu
     webhook_url = os.getenv(webhook_env_key) or os.getenv("ALERT_WEBHOOK_URL")
     if webhook_url:
         try:
-            response = requests.post(webhook_url, json=_build_webhook_payload(alert_id, input), timeout=10)
+            response = get_client(webhook_url).post(webhook_url, json=_build_webhook_payload(alert_id, input), timeout=10)
             response.raise_for_status()
             delivered_via.append("webhook")
         except Exception as exc:  # pragma: no cover - network failure
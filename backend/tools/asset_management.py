@@ -1,6 +1,5 @@
 import os
 import uuid
-import requests
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List, Optional
 from decimal import Decimal
@@ -8,7 +7,8 @@ from decimal import Decimal
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
-from backend.storage.sqlite import SqliteStorage
+from backend.http_client import get_async_client
+from backend.rate_limit import rate_limited_get
 from backend.storage.models import ActivityData
 from backend.tools.dex import Web3Provider # Use shared provider
 
@@ -49,15 +49,12 @@ class AssetManagementToolkit(Toolkit):
             "apikey": api_key,
         }
 
-        # Non-blocking IO
-        # requests is blocking. In strict async environment, should use httpx.
-        # For now, wrapping in thread or switching to httpx if available.
-        # Ideally, we follow the Necromancer rule: No blocking.
-        import httpx
-        async with httpx.AsyncClient() as client:
-             response = await client.get(config["base_url"], params=params, timeout=20.0)
-             response.raise_for_status()
-             payload = response.json()
+        # Non-blocking IO over the shared keep-alive client (Necromancer rule: no blocking).
+        response = await rate_limited_get(
+            get_async_client(config["base_url"]), config["base_url"], params=params, timeout=20.0
+        )
+        response.raise_for_status()
+        payload = response.json()
 
         if payload.get("status") not in {"1", 1}:
             return MonitorTransactionsOutput(transactions=[])
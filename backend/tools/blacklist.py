@@ -1,17 +1,19 @@
-import os
+import threading
 import uuid
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Set
 
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
-from backend.storage.sqlite import SqliteStorage
-from backend.storage.models import ActivityData
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
+from backend.storage.models import ActivityData, BlacklistRecord
+from backend.storage.utils import normalize_identifier
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 
 class BlacklistEntry(BaseModel):
@@ -36,27 +38,60 @@ class ListBlacklistOutput(BaseModel):
     entries: List[Dict[str, Any]] = Field(..., description="Current blacklist entries.")
 
 
-def _load_entries(storage: SqliteStorage) -> List[Dict[str, Any]]:
-    return storage.get_state_value("blacklist", "entries") or []
+# In-process membership index: identifier -> entry types. Loaded from the blacklist
+# table on first use and updated by the add/remove tools below, so per-trade checks
+# are a dict lookup. Writes made by other processes are picked up on reload.
+_membership_lock = threading.Lock()
+_membership: Optional[Dict[str, Set[str]]] = None
 
 
-def _persist_entries(storage: SqliteStorage, entries: List[Dict[str, Any]]) -> None:
-    storage.set_state_value("blacklist", "entries", entries)
+def _membership_index() -> Dict[str, Set[str]]:
+    global _membership
+    index = _membership
+    if index is None:
+        with _membership_lock:
+            if _membership is None:
+                loaded: Dict[str, Set[str]] = {}
+                for entry_type, identifier in _get_storage().get_blacklist_keys():
+                    loaded.setdefault(identifier, set()).add(entry_type)
+                _membership = loaded
+            index = _membership
+    return index
+
+
+def reload_blacklist() -> None:
+    """Rebuilds the membership index from storage (e.g. at startup or after external writes)."""
+    global _membership
+    with _membership_lock:
+        _membership = None
+    _membership_index()
+
+
+def is_blacklisted(identifier: str, entry_type: Optional[str] = None) -> bool:
+    """
+    Constant-time check whether ``identifier`` (token address or developer wallet)
+    is blacklisted, optionally as a specific ``entry_type``.
+    """
+    types = _membership_index().get(normalize_identifier(identifier))
+    if not types:
+        return False
+    return entry_type is None or entry_type in types
 
 
 def add_to_blacklist(input: AddBlacklistInput) -> BlacklistEntry:
     storage = _get_storage()
-    entries = _load_entries(storage)
-    entry = BlacklistEntry(**input.dict())
-    entries = [e for e in entries if not (e.get("entry_type") == entry.entry_type and e.get("identifier") == entry.identifier)]
-    entries.append(entry.dict())
-    _persist_entries(storage, entries)
+    entry = BlacklistEntry(**input.model_dump())
+    entry.identifier = normalize_identifier(entry.identifier)
+    storage.upsert_blacklist_entry(BlacklistRecord(**entry.model_dump()))
+    with _membership_lock:
+        if _membership is not None:
+            _membership.setdefault(entry.identifier, set()).add(entry.entry_type)
     activity = ActivityData(
         id=str(uuid.uuid4()),
         timestamp=datetime.utcnow(),
         type="blacklist_add",
         message=f"Added {entry.identifier} to {entry.entry_type} blacklist",
-        details=entry.dict(),
+        details=entry.model_dump(mode="json"),
     )
     storage.add_activity(activity)
     return entry
@@ -64,26 +99,28 @@ def add_to_blacklist(input: AddBlacklistInput) -> BlacklistEntry:
 
 def remove_from_blacklist(input: RemoveBlacklistInput) -> bool:
     storage = _get_storage()
-    entries = _load_entries(storage)
-    updated = [e for e in entries if not (e.get("entry_type") == input.entry_type and e.get("identifier") == input.identifier)]
-    _persist_entries(storage, updated)
+    identifier = normalize_identifier(input.identifier)
+    removed = storage.delete_blacklist_entry(input.entry_type, identifier)
+    with _membership_lock:
+        if _membership is not None and identifier in _membership:
+            _membership[identifier].discard(input.entry_type)
+            if not _membership[identifier]:
+                del _membership[identifier]
     activity = ActivityData(
         id=str(uuid.uuid4()),
         timestamp=datetime.utcnow(),
         type="blacklist_remove",
         message=f"Removed {input.identifier} from {input.entry_type} blacklist",
-        details=input.dict(),
+        details=input.model_dump(),
     )
     storage.add_activity(activity)
-    return len(updated) != len(entries)
+    return removed
 
 
 def list_blacklist(entry_type: str | None = None) -> ListBlacklistOutput:
     storage = _get_storage()
-    entries = _load_entries(storage)
-    if entry_type:
-        entries = [e for e in entries if e.get("entry_type") == entry_type]
-    return ListBlacklistOutput(entries=entries)
+    entries = storage.get_blacklist_entries(entry_type or None)
+    return ListBlacklistOutput(entries=[entry.model_dump(mode="json") for entry in entries])
 
 
 blacklist_toolkit = Toolkit(name="blacklist")
@@ -1,10 +1,12 @@
 import os
 from typing import Dict, Any
 
-import requests
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
+from backend.http_client import get_client
+from backend.rate_limit import rate_limited_get_sync
+
 
 class FetchBlockchainDataInput(BaseModel):
     address: str = Field(..., description="Target address to inspect.")
@@ -31,7 +33,7 @@ def fetch_blockchain_data(input: FetchBlockchainDataInput) -> FetchBlockchainDat
         "apikey": api_key,
     }
     try:
-        response = requests.get(base_url, params=params, timeout=20)
+        response = rate_limited_get_sync(get_client(base_url), base_url, params=params, timeout=20)
         response.raise_for_status()
         return FetchBlockchainDataOutput(data=response.json(), error=None)
     except Exception as exc:
@@ -3,23 +3,24 @@ import uuid
 from datetime import datetime
 from typing import Dict, Any, List
 
-import requests
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
+from backend.http_client import get_client
 from backend.storage.models import AgentMessageRecord
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 
 def _dispatch_payload(endpoint_env: str, payload: Dict[str, Any], delivered_via: List[str]) -> None:
     webhook_url = os.getenv(endpoint_env) or os.getenv("COMMUNICATION_WEBHOOK_URL")
     if not webhook_url:
         return
-    response = requests.post(webhook_url, json=payload, timeout=10)
+    response = get_client(webhook_url).post(webhook_url, json=payload, timeout=10)
     response.raise_for_status()
     delivered_via.append("webhook")
 
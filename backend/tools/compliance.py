@@ -1,17 +1,19 @@
 import json
 import os
 from datetime import datetime
-from typing import Dict, Any, List
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
 
-import requests
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
-from backend.storage.sqlite import SqliteStorage
+from backend.http_client import get_client
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 
 class ComplianceCheckInput(BaseModel):
@@ -76,7 +78,9 @@ def calculate_fees(input: CalculateFeesInput) -> CalculateFeesOutput:
 
 
 class GenerateFinancialReportsInput(BaseModel):
-    limit: int = Field(500, description="Number of recent trades to include in the report.")
+    start: Optional[datetime] = Field(None, description="Report period start (inclusive). Defaults to all history.")
+    end: Optional[datetime] = Field(None, description="Report period end (exclusive). Defaults to now.")
+    limit: Optional[int] = Field(None, description="Only report on the N most recent trades instead of a period.")
 
 
 class GenerateFinancialReportsOutput(BaseModel):
@@ -85,19 +89,39 @@ class GenerateFinancialReportsOutput(BaseModel):
 
 def generate_financial_reports(input: GenerateFinancialReportsInput) -> GenerateFinancialReportsOutput:
     storage = _get_storage()
-    trades = storage.get_recent_trades(limit=input.limit)
-    total_notional = sum(getattr(trade, "price", 0) * getattr(trade, "amount", 0) for trade in trades)
-    realized_profit = sum(getattr(trade, "profit", 0) for trade in trades)
-    winners = sum(1 for trade in trades if getattr(trade, "profit", 0) > 0)
-    losers = sum(1 for trade in trades if getattr(trade, "profit", 0) < 0)
+    if input.limit is None and input.start is None and input.end is None:
+        # All-time report: read the maintained totals instead of scanning trades.
+        summary = storage.get_trade_summary()
+        trade_count, winners, losers = summary.trade_count, summary.winners, summary.losers
+        total_notional, realized_profit = summary.notional, summary.realized_profit
+    else:
+        if input.limit is not None:
+            trades = storage.get_recent_trades(limit=input.limit)
+        else:
+            # Stream the whole period page by page instead of truncating it.
+            trades = storage.iter_trades(start=input.start, end=input.end)
+
+        trade_count = winners = losers = 0
+        total_notional = Decimal("0")
+        realized_profit = Decimal("0")
+        for trade in trades:
+            trade_count += 1
+            total_notional += trade.price * trade.amount
+            realized_profit += trade.profit
+            if trade.profit > 0:
+                winners += 1
+            elif trade.profit < 0:
+                losers += 1
 
     report_payload = {
         "generated_at": datetime.utcnow().isoformat(),
-        "trade_count": len(trades),
+        "period_start": input.start.isoformat() if input.start else None,
+        "period_end": input.end.isoformat() if input.end else None,
+        "trade_count": trade_count,
         "total_notional_usd": total_notional,
         "realized_profit_usd": realized_profit,
-        "win_ratio": winners / len(trades) if trades else 0,
-        "loss_ratio": losers / len(trades) if trades else 0,
+        "win_ratio": winners / trade_count if trade_count else 0,
+        "loss_ratio": losers / trade_count if trade_count else 0,
     }
     return GenerateFinancialReportsOutput(report=json.dumps(report_payload, default=str))
 
@@ -121,7 +145,7 @@ def regulatory_watch(input: RegulatoryWatchInput) -> RegulatoryWatchOutput:
     updates: List[str] = []
     for source in input.sources:
         try:
-            response = requests.get(source, timeout=10)
+            response = get_client(source).get(source, timeout=10)
             response.raise_for_status()
             if source.endswith(".json"):
                 data = response.json()
@@ -9,11 +9,11 @@ from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
 from backend.storage.models import ActivityData
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.registry import get_storage
 
 
 def _log_activity(activity_type: str, details: Dict[str, Any]) -> None:
-    storage = SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+    storage = get_storage()
     activity = ActivityData(
         id=str(uuid.uuid4()),
         timestamp=datetime.utcnow(),
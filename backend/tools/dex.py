@@ -8,12 +8,14 @@ from typing import Optional, Dict, Any
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 from web3 import Web3, AsyncWeb3
-from web3.providers.rpc import AsyncHTTPProvider
 try:
     from web3.middleware import geth_poa_middleware
 except ImportError:
     from web3.middleware import ExtraDataToPOAMiddleware as geth_poa_middleware
 
+from backend.rpc import async_http_provider
+from backend.tools.blacklist import is_blacklisted
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -37,8 +39,8 @@ class Web3Provider:
             if not rpc_url:
                 raise ValueError(f"RPC URL for {chain} is not configured.")
 
-            # Use AsyncHTTPProvider
-            w3 = AsyncWeb3(AsyncHTTPProvider(rpc_url))
+            # AsyncHTTPProvider over the shared keep-alive client (recordable, see backend.rpc)
+            w3 = AsyncWeb3(async_http_provider(rpc_url))
             cls._instances[chain] = w3
         return cls._instances[chain]
 
@@ -78,6 +80,11 @@ class DexToolkit(Toolkit):
         """
         Executes a swap asynchronously. Non-blocking.
         """
+        for token in (input.token_in, input.token_out):
+            if token.lower() != NATIVE_TOKEN_SENTINEL and is_blacklisted(token, "token"):
+                logger.warning(f"Refusing swap involving blacklisted token {token}")
+                return ExecuteSwapOutput(tx_hash="", success=False, error=f"Token {token} is blacklisted")
+
         try:
             w3 = Web3Provider.get_async_w3(input.chain)
 
@@ -1,9 +1,12 @@
 from typing import Dict, Any
 
 from agno.tools.toolkit import Toolkit
-from pycoingecko import CoinGeckoAPI
 from pydantic import BaseModel, Field
 
+from backend.http_client import get_client
+from backend.rate_limit import rate_limited_get_sync
+from backend.tools.utils import COINGECKO_API_URL
+
 
 class FetchFundamentalDataInput(BaseModel):
     coin_id: str = Field(..., description="CoinGecko identifier of the asset.")
@@ -15,10 +18,11 @@ class FetchFundamentalDataOutput(BaseModel):
 
 
 def fetch_fundamental_data(input: FetchFundamentalDataInput) -> FetchFundamentalDataOutput:
-    client = CoinGeckoAPI()
+    url = f"{COINGECKO_API_URL}/coins/{input.coin_id}"
     try:
-        data = client.get_coin_by_id(id=input.coin_id)
-        return FetchFundamentalDataOutput(data=data, error=None)
+        response = rate_limited_get_sync(get_client(url), url, timeout=10)
+        response.raise_for_status()
+        return FetchFundamentalDataOutput(data=response.json(), error=None)
     except Exception as exc:
         return FetchFundamentalDataOutput(data={}, error=str(exc))
 
@@ -1,14 +1,14 @@
-import os
 from typing import Dict, Any
 
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 
 class HubOverviewOutput(BaseModel):
@@ -21,8 +21,7 @@ def get_hub_overview() -> HubOverviewOutput:
     storage = _get_storage()
     risk = storage.get_state_value("risk", "global_parameters") or {}
     trading = storage.get_state_value("risk", "trading_status") or {"paused": False}
-    blacklist = storage.get_state_value("blacklist", "entries") or []
-    return HubOverviewOutput(risk=risk, trading=trading, blacklist_entries=len(blacklist))
+    return HubOverviewOutput(risk=risk, trading=trading, blacklist_entries=storage.count_blacklist_entries())
 
 
 hub_toolkit = Toolkit(name="hub")
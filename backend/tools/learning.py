@@ -1,19 +1,20 @@
-import os
 import statistics
 import uuid
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
+from backend.storage.aggregates import profit_stats
 from backend.storage.models import ActivityData, TradeData
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
 from backend.tools.consensus import ConsensusToolkit
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 
 class GetTradeHistoryInput(BaseModel):
@@ -31,7 +32,9 @@ def get_trade_history(input: GetTradeHistoryInput) -> GetTradeHistoryOutput:
 
 
 class AnalyzePerformanceInput(BaseModel):
-    trades: List[Dict[str, Any]] = Field(..., description="Trades to analyze.")
+    trades: Optional[List[Dict[str, Any]]] = Field(
+        None, description="Trades to analyze. Omit to analyze the full stored trade history."
+    )
 
 
 class AnalyzePerformanceOutput(BaseModel):
@@ -39,6 +42,18 @@ class AnalyzePerformanceOutput(BaseModel):
 
 
 def analyze_performance(input: AnalyzePerformanceInput) -> AnalyzePerformanceOutput:
+    if input.trades is None:
+        summary = _get_storage().get_trade_summary()
+        total_notional = float(summary.notional)
+        total_profit = float(summary.realized_profit)
+        metrics = {
+            "roi": total_profit / total_notional if total_notional else 0.0,
+            "total_profit": total_profit,
+            "total_notional": total_notional,
+            **profit_stats(summary),
+        }
+        return AnalyzePerformanceOutput(performance_metrics=metrics)
+
     profits = [float(trade.get("profit", 0)) for trade in input.trades]
     notionals = [float(trade.get("price", 0)) * float(trade.get("amount", 0)) for trade in input.trades]
     total_profit = sum(profits)
@@ -1,18 +1,26 @@
-from typing import Dict, Any
-import httpx
-import pandas as pd
+from typing import Dict, Any, List, Optional
+import numpy as np
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
+from backend.market.correlation import SymbolFetchError, load_returns, pearson_matrix, universe_summary
+from backend.market.symbols import resolve_coin_id
 from backend.tools.utils import fetch_coingecko_prices
 
 class GetCorrelationInput(BaseModel):
-    symbol: str = Field(..., description="The CoinGecko ID of the token.")
+    symbol: str = Field(..., description="The CoinGecko ID, ticker or name of the token.")
     days: int = Field(30, description="Correlation period (default 30 days).")
 
+class GetCorrelationMatrixInput(BaseModel):
+    symbols: List[str] = Field(..., min_length=2, max_length=100, description="CoinGecko IDs, tickers or names of the tokens to compare.")
+    days: int = Field(90, description="History to use, in days.")
+    rolling_window: Optional[int] = Field(None, description="If set, rolling correlations of every token against the first one over this many days.")
+    ewma_lambda: float = Field(0.94, gt=0, lt=1, description="Decay for the EWMA covariance (0.94 = RiskMetrics daily).")
+
 class MarketCorrelationToolkit(Toolkit):
     def __init__(self, **kwargs):
         super().__init__(name="market_correlation", **kwargs)
         self.register(self.get_market_correlations)
+        self.register(self.get_correlation_matrix)
 
     async def get_market_correlations(self, input: GetCorrelationInput) -> Dict[str, Any]:
         """
@@ -22,44 +30,23 @@ class MarketCorrelationToolkit(Toolkit):
         days = input.days
 
         try:
-            async with httpx.AsyncClient() as client:
-                # Fetch Target
-                try:
-                    target_df = await fetch_coingecko_prices(client, symbol, days)
-                except Exception as e:
-                    return {"error": f"Failed to fetch {symbol}: {e}"}
-
-                # Fetch BTC
-                try:
-                    btc_df = await fetch_coingecko_prices(client, "bitcoin", days)
-                except Exception as e:
-                    return {"error": f"Failed to fetch BTC: {e}"}
-
-                # Fetch ETH
-                try:
-                    eth_df = await fetch_coingecko_prices(client, "ethereum", days)
-                except Exception as e:
-                    return {"error": f"Failed to fetch ETH: {e}"}
-
-            # Resample to daily close and calculate returns
-            target_series = target_df["price"].resample('D').last().pct_change().dropna()
-            btc_series = btc_df["price"].resample('D').last().pct_change().dropna()
-            eth_series = eth_df["price"].resample('D').last().pct_change().dropna()
+            # Target, BTC and ETH are fetched concurrently and aligned on one daily index.
+            try:
+                matrix = await load_returns([symbol, "bitcoin", "ethereum"], days, fetch=fetch_coingecko_prices)
+            except SymbolFetchError as e:
+                return {"error": str(e)}
 
-            # Align indices (use intersection)
-            common_idx = target_series.index.intersection(btc_series.index).intersection(eth_series.index)
-
-            if len(common_idx) < 10:
+            if len(matrix.returns) < 10:
                 return {"error": "Insufficient overlapping data points for correlation"}
 
-            # Calculate Correlation
-            corr_btc = target_series[common_idx].corr(btc_series[common_idx])
-            corr_eth = target_series[common_idx].corr(eth_series[common_idx])
+            corr = pearson_matrix(matrix.returns)
+            target = matrix.column(resolve_coin_id(symbol))
+            corr_btc = corr[target, matrix.column("bitcoin")]
+            corr_eth = corr[target, matrix.column("ethereum")]
 
-            # Simple Trend Context (Price vs 30d MA)
-            btc_price = btc_df["price"].iloc[-1]
-            btc_ma = btc_df["price"].mean()
-            btc_trend = "Bullish" if btc_price > btc_ma else "Bearish"
+            # Simple Trend Context (Price vs period mean of daily closes)
+            btc_closes = matrix.closes[:, matrix.column("bitcoin")]
+            btc_trend = "Bullish" if btc_closes[-1] > np.mean(btc_closes) else "Bearish"
 
             return {
                 "correlation_btc": float(corr_btc),
@@ -71,6 +58,27 @@ class MarketCorrelationToolkit(Toolkit):
         except Exception as e:
             return {"error": str(e)}
 
+    async def get_correlation_matrix(self, input: GetCorrelationMatrixInput) -> Dict[str, Any]:
+        """
+        Correlation structure of a token universe: Pearson and Spearman matrices, EWMA covariance
+        and volatility, and optionally rolling correlations against the first token.
+        """
+        try:
+            try:
+                matrix = await load_returns(input.symbols, input.days, fetch=fetch_coingecko_prices)
+            except SymbolFetchError as e:
+                return {"error": str(e)}
+
+            if len(matrix.returns) < 10:
+                return {"error": "Insufficient overlapping data points for correlation"}
+            if input.rolling_window and not 2 <= input.rolling_window <= len(matrix.returns):
+                return {"error": f"rolling_window must be between 2 and {len(matrix.returns)}"}
+
+            return universe_summary(matrix, window=input.rolling_window, lam=input.ewma_lambda)
+
+        except Exception as e:
+            return {"error": str(e)}
+
     def _interpret_correlation(self, corr: float) -> str:
         if corr > 0.8: return "Very High (Shadows Market)"
         if corr > 0.5: return "High Correlation"
@@ -1,12 +1,18 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import asyncio
 from agno.tools.toolkit import Toolkit
 from pycoingecko import CoinGeckoAPI
 from pydantic import BaseModel, Field
 import httpx
 
+from backend.http_client import get_async_client
+from backend.market.live import get_live_prices
+from backend.market.symbols import get_symbol_resolver, resolve_coin_id
+from backend.rate_limit import rate_limited_get
+from backend.tools.utils import COINGECKO_API_URL
+
 class FetchMarketDataInput(BaseModel):
-    coin_ids: List[str] = Field(..., description="A list of coin IDs from CoinGecko.")
+    coin_ids: List[str] = Field(..., description="A list of coin IDs from CoinGecko (tickers and names are resolved to IDs).")
     vs_currency: str = Field("usd", description="The target currency of market data.")
     include_history: bool = Field(False, description="Whether to include historical data.")
     days: int = Field(7, description="Number of days of historical data to include.")
@@ -16,10 +22,29 @@ class FetchMarketDataOutput(BaseModel):
     market_data: Dict[str, Any] = Field(..., description="A dictionary containing the market data.")
 
 
+class ResolveSymbolInput(BaseModel):
+    query: str = Field(..., description="Ticker, name, CoinGecko ID or contract address.")
+    chain: Optional[str] = Field(None, description="Chain of a contract address (e.g. 'ethereum', 'bsc', 'solana').")
+    limit: int = Field(5, ge=1, le=50, description="Maximum number of candidates.")
+
+
 class MarketDataToolkit(Toolkit):
     def __init__(self, **kwargs):
         super().__init__(name="market_data", **kwargs)
         self.register(self.fetch_market_data)
+        self.register(self.resolve_symbol)
+
+    def resolve_symbol(self, input: ResolveSymbolInput) -> Dict[str, Any]:
+        """
+        Resolves a ticker, name or contract address to CoinGecko IDs, best match first.
+        Falls back to a prefix search when nothing matches exactly.
+        """
+        index = get_symbol_resolver().index
+        coins = index.candidates(input.query, input.chain) or index.search(input.query, input.limit)
+        return {
+            "query": input.query,
+            "candidates": [{"id": c.id, "symbol": c.symbol.upper(), "name": c.name} for c in coins[: input.limit]],
+        }
 
     async def fetch_market_data(self, input: FetchMarketDataInput) -> FetchMarketDataOutput:
         """
@@ -27,49 +52,60 @@ class MarketDataToolkit(Toolkit):
         Uses parallel async requests.
         """
         market_data = {}
+        coin_ids = list(dict.fromkeys(resolve_coin_id(cid) for cid in input.coin_ids))
+
+        # 1. Current Prices: streamed coins are read from memory, the rest in one batch
+        remote_ids = coin_ids
+        if input.vs_currency.lower() == "usd":
+            live = get_live_prices()
+            remote_ids = []
+            for cid in coin_ids:
+                price = live.price(cid)
+                if price is None:
+                    remote_ids.append(cid)
+                else:
+                    market_data[cid] = {"usd": price}
 
-        # 1. Fetch Current Prices (Batch)
-        # Using httpx for async instead of synchronous pycoingecko
-        async with httpx.AsyncClient() as client:
+        # Shared keep-alive client instead of synchronous pycoingecko
+        client = get_async_client(COINGECKO_API_URL)
+        if remote_ids:
             try:
                 # API limits apply. Coingecko free tier is strict.
-                ids_str = ",".join(input.coin_ids)
-                price_url = f"https://api.coingecko.com/api/v3/simple/price?ids={ids_str}&vs_currencies={input.vs_currency}"
+                ids_str = ",".join(remote_ids)
+                price_url = f"{COINGECKO_API_URL}/simple/price?ids={ids_str}&vs_currencies={input.vs_currency}"
 
-                resp = await client.get(price_url, timeout=10.0)
+                resp = await rate_limited_get(client, price_url, timeout=10.0)
                 resp.raise_for_status()
                 prices = resp.json()
                 market_data.update(prices)
             except Exception as e:
                 # Log error but continue
-                for cid in input.coin_ids:
+                for cid in remote_ids:
                     market_data[cid] = {"error": str(e)}
 
-            if input.include_history:
-                # 2. Fetch History (Parallel)
-                tasks = []
-                for coin_id in input.coin_ids:
-                    url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart?vs_currency={input.vs_currency}&days={input.days}"
-                    tasks.append(self._fetch_history(client, coin_id, url))
+        if input.include_history:
+            # 2. Fetch History (Parallel; the shared rate limiter paces the requests)
+            tasks = []
+            for coin_id in coin_ids:
+                url = f"{COINGECKO_API_URL}/coins/{coin_id}/market_chart?vs_currency={input.vs_currency}&days={input.days}"
+                tasks.append(self._fetch_history(client, coin_id, url))
 
-                results = await asyncio.gather(*tasks, return_exceptions=True)
+            results = await asyncio.gather(*tasks, return_exceptions=True)
 
-                for res in results:
-                    if isinstance(res, dict) and "coin_id" in res:
-                        cid = res["coin_id"]
-                        if cid not in market_data:
-                            market_data[cid] = {}
-                        market_data[cid]["history"] = res.get("data", res.get("error"))
+            for res in results:
+                if isinstance(res, dict) and "coin_id" in res:
+                    cid = res["coin_id"]
+                    if cid not in market_data:
+                        market_data[cid] = {}
+                    market_data[cid]["history"] = res.get("data", res.get("error"))
 
         return FetchMarketDataOutput(market_data=market_data)
 
     async def _fetch_history(self, client: httpx.AsyncClient, coin_id: str, url: str) -> Dict[str, Any]:
         try:
-            # Add delay to avoid Rate Limit if list is long?
-            # Free tier is ~10-30 req/min. Parallel requests WILL hit 429.
-            # Adding simple jitter/backoff is complex here.
-            # For "Zero Fragility", we assume we have an API Key or we handle 429.
-            resp = await client.get(url, timeout=10.0)
+            # Free tier is ~10-30 req/min: requests queue on the CoinGecko token bucket
+            # and 429s are retried with backoff; one still left after that is reported.
+            resp = await rate_limited_get(client, url, timeout=10.0)
             if resp.status_code == 429:
                 return {"coin_id": coin_id, "error": "Rate Limit Exceeded"}
             resp.raise_for_status()
@@ -1,12 +1,11 @@
 from typing import Dict, Any, List
 import numpy as np
-import httpx
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 from backend.tools.utils import fetch_coingecko_prices
 
 class FourierTrendInput(BaseModel):
-    symbol: str = Field(..., description="The CoinGecko ID of the token.")
+    symbol: str = Field(..., description="The CoinGecko ID, ticker or name of the token.")
     days: int = Field(100, description="Analysis period.")
     components: int = Field(3, description="Number of FFT components to keep (lower = smoother).")
 
@@ -24,8 +23,7 @@ class FourierToolkit(Toolkit):
         n_components = input.components
 
         try:
-            async with httpx.AsyncClient() as client:
-                df = await fetch_coingecko_prices(client, symbol, days)
+            df = await fetch_coingecko_prices(symbol, days)
 
             prices = df["price"].values
             n = len(prices)
@@ -2,10 +2,11 @@ import urllib.parse
 from datetime import datetime
 from typing import List, Dict, Any
 
-import requests
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
+from backend.http_client import get_client
+
 
 class FetchNewsInput(BaseModel):
     query: str = Field(..., description="The query to search for news articles.")
@@ -20,7 +21,7 @@ class FetchNewsOutput(BaseModel):
 def _fetch_google_news(query: str, limit: int) -> List[Dict[str, Any]]:
     encoded_query = urllib.parse.quote(query)
     url = f"https://news.google.com/rss/search?q={encoded_query}&hl=en-US&gl=US&ceid=US:en"
-    response = requests.get(url, timeout=10)
+    response = get_client(url).get(url, timeout=10)
     response.raise_for_status()
     from xml.etree import ElementTree as ET
 
@@ -41,7 +42,7 @@ def _fetch_google_news(query: str, limit: int) -> List[Dict[str, Any]]:
 
 def _fetch_cryptocompare_news(limit: int) -> List[Dict[str, Any]]:
     url = "https://min-api.cryptocompare.com/data/v2/news/"
-    response = requests.get(url, params={"lang": "EN"}, timeout=10)
+    response = get_client(url).get(url, params={"lang": "EN"}, timeout=10)
     response.raise_for_status()
     data = response.json()
     articles: List[Dict[str, Any]] = []
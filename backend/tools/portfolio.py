@@ -1,17 +1,21 @@
-import os
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 
 from agno.tools.toolkit import Toolkit
-from pycoingecko import CoinGeckoAPI
 from pydantic import BaseModel, Field
 
+from backend.http_client import get_client
+from backend.rate_limit import rate_limited_get_sync
+from backend.market.live import get_live_prices
+from backend.market.symbols import get_symbol_resolver
 from backend.storage.models import PortfolioPosition
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
+from backend.tools.utils import COINGECKO_API_URL
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 
 class PortfolioItem(BaseModel):
@@ -37,16 +41,38 @@ def get_portfolio() -> GetPortfolioOutput:
     positions = storage.get_portfolio_positions()
     now = datetime.utcnow()
 
-    coin_ids = {pos.coingecko_id for pos in positions if pos.coingecko_id}
+    # Positions recorded without a CoinGecko id are matched by contract address.
+    index = get_symbol_resolver().index
+    for pos in positions:
+        if not pos.coingecko_id and pos.token_address:
+            coin = index.contract(pos.token_address, pos.chain)
+            if coin is not None:
+                pos.coingecko_id = coin.id
+
+    # Streamed prices come from memory; only the other coins need a CoinGecko call.
+    live = get_live_prices()
     latest_prices: Dict[str, Dict[str, float]] = {}
+    coin_ids = set()
+    for pos in positions:
+        if pos.coingecko_id and pos.coingecko_id not in latest_prices:
+            price = live.price(pos.coingecko_id)
+            if price is None:
+                coin_ids.add(pos.coingecko_id)
+            else:
+                latest_prices[pos.coingecko_id] = {"usd": price}
     if coin_ids:
-        cg = CoinGeckoAPI()
         try:
-            latest_prices = cg.get_price(ids=list(coin_ids), vs_currencies="usd")
+            url = f"{COINGECKO_API_URL}/simple/price"
+            response = rate_limited_get_sync(
+                get_client(url), url, params={"ids": ",".join(sorted(coin_ids)), "vs_currencies": "usd"}, timeout=10
+            )
+            response.raise_for_status()
+            latest_prices.update(response.json())
         except Exception:
-            latest_prices = {}
+            pass
 
     items: List[PortfolioItem] = []
+    revalued = []
     for position in positions:
         price: Optional[float] = None
         if position.coingecko_id and position.coingecko_id in latest_prices:
@@ -59,7 +85,7 @@ def get_portfolio() -> GetPortfolioOutput:
             position.last_price = price
             position.last_valuation_usd = value
             position.updated_at = now
-            storage.upsert_portfolio_position(position)
+            revalued.append(position)
 
         items.append(
             PortfolioItem(
@@ -75,6 +101,8 @@ def get_portfolio() -> GetPortfolioOutput:
             )
         )
 
+    # One transaction for the whole revaluation instead of one per position.
+    storage.upsert_portfolio_positions(revalued)
     total_value = sum(item.value_usd or 0.0 for item in items)
     return GetPortfolioOutput(items=items, total_value_usd=total_value, as_of=now)
 
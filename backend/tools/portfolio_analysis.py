@@ -1,15 +1,17 @@
-import os
-from typing import Dict, Any
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Optional
 
 import numpy as np
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 
 class CalculatePortfolioMetricsOutput(BaseModel):
@@ -18,30 +20,37 @@ class CalculatePortfolioMetricsOutput(BaseModel):
     max_drawdown: float = Field(..., description="Maximum historical drawdown.")
 
 
-def calculate_portfolio_metrics() -> CalculatePortfolioMetricsOutput:
+def _history_start(lookback_days: Optional[int]) -> Optional[datetime]:
+    return datetime.utcnow() - timedelta(days=lookback_days) if lookback_days else None
+
+
+def calculate_portfolio_metrics(lookback_days: Optional[int] = 365) -> CalculatePortfolioMetricsOutput:
+    """
+    Computes ROI, PnL and the max drawdown of realized profit over the last
+    ``lookback_days`` (all history when None, read from the maintained trade
+    aggregates).
+    """
     storage = _get_storage()
     positions = storage.get_portfolio_positions()
-    trades = storage.get_recent_trades(limit=500)
 
     total_value = sum((pos.last_valuation_usd or pos.amount * pos.average_price) for pos in positions)
     cost_basis = sum(pos.average_price * pos.amount for pos in positions)
     pnl = total_value - cost_basis
     roi = pnl / cost_basis if cost_basis else 0.0
 
-    equity_curve = []
-    cumulative = 0.0
-    for trade in trades:
-        cumulative += getattr(trade, "profit", 0.0)
-        equity_curve.append(cumulative)
-    if equity_curve:
-        equity_array = np.array(equity_curve)
-        running_max = np.maximum.accumulate(equity_array)
-        drawdowns = equity_array - running_max
-        max_drawdown = float(drawdowns.min())
+    if lookback_days is None:
+        max_drawdown = storage.get_trade_summary().max_drawdown
     else:
-        max_drawdown = 0.0
+        # Running drawdown over the chronological equity curve; O(1) memory.
+        cumulative = Decimal("0")
+        running_max = Decimal("0")
+        max_drawdown = Decimal("0")
+        for trade in storage.iter_trades(start=_history_start(lookback_days)):
+            cumulative += trade.profit
+            running_max = max(running_max, cumulative)
+            max_drawdown = min(max_drawdown, cumulative - running_max)
 
-    return CalculatePortfolioMetricsOutput(roi=roi, pnl=pnl, max_drawdown=max_drawdown)
+    return CalculatePortfolioMetricsOutput(roi=roi, pnl=pnl, max_drawdown=float(max_drawdown))
 
 class CalculatePortfolioRiskInput(BaseModel):
     pass
@@ -52,12 +61,15 @@ class CalculatePortfolioRiskOutput(BaseModel):
     exposure: Dict[str, float] = Field(..., description="Per-asset exposure weights.")
 
 
-def calculate_portfolio_risk() -> CalculatePortfolioRiskOutput:
+def calculate_portfolio_risk(lookback_days: Optional[int] = 90) -> CalculatePortfolioRiskOutput:
+    """
+    Computes profit volatility, 5% VaR and per-asset exposure over the last
+    ``lookback_days`` of trades (all history when None).
+    """
     storage = _get_storage()
     positions = storage.get_portfolio_positions()
-    trades = storage.get_recent_trades(limit=300)
 
-    profits = np.array([getattr(trade, "profit", 0.0) for trade in trades])
+    profits = storage.get_trade_columns(("profit",), start=_history_start(lookback_days))["profit"]
     volatility = float(np.std(profits)) if profits.size else 0.0
     var = float(np.percentile(profits, 5)) if profits.size else 0.0
 
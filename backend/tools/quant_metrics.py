@@ -1,13 +1,12 @@
 from typing import Dict, Any, Optional, Union
 import pandas as pd
 import numpy as np
-import httpx
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 from backend.tools.utils import fetch_coingecko_prices
 
 class GetQuantMetricsInput(BaseModel):
-    symbol: str = Field(..., description="The CoinGecko ID of the token.")
+    symbol: str = Field(..., description="The CoinGecko ID, ticker or name of the token.")
     days: int = Field(365, description="Analysis period (default 1 year).")
     risk_free_rate: float = Field(0.02, description="Risk-free rate (default 2%).")
 
@@ -71,11 +70,10 @@ class QuantitativeAnalysisToolkit(Toolkit):
         rf = input.risk_free_rate
 
         try:
-            async with httpx.AsyncClient() as client:
-                try:
-                    df = await fetch_coingecko_prices(client, symbol, days)
-                except Exception as e:
-                    return {"error": f"Failed to fetch data: {e}"}
+            try:
+                df = await fetch_coingecko_prices(symbol, days)
+            except Exception as e:
+                return {"error": f"Failed to fetch data: {e}"}
 
             if len(df) < 2:
                 return {"error": "Insufficient data"}
@@ -1,13 +1,13 @@
 from typing import Dict, Any
 import pandas as pd
 import numpy as np
-import httpx
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
+from backend.market.indicators import get_indicator_engine
 from backend.tools.utils import fetch_coingecko_prices
 
 class DetectRegimeInput(BaseModel):
-    symbol: str = Field(..., description="The CoinGecko ID of the token.")
+    symbol: str = Field(..., description="The CoinGecko ID, ticker or name of the token.")
 
 class MarketRegimeToolkit(Toolkit):
     def __init__(self, **kwargs):
@@ -22,11 +22,10 @@ class MarketRegimeToolkit(Toolkit):
         days = 365 # Need long history for SMA200
 
         try:
-            async with httpx.AsyncClient() as client:
-                try:
-                    df = await fetch_coingecko_prices(client, symbol, days)
-                except Exception as e:
-                    return {"error": f"Failed to fetch data: {e}"}
+            try:
+                df = await fetch_coingecko_prices(symbol, days)
+            except Exception as e:
+                return {"error": f"Failed to fetch data: {e}"}
 
             prices = df["price"]
 
@@ -35,8 +34,8 @@ class MarketRegimeToolkit(Toolkit):
 
             # 1. Trend (SMA200 vs Price)
             current_price = prices.iloc[-1]
-            sma_50 = prices.rolling(window=50).mean().iloc[-1]
-            sma_200 = prices.rolling(window=200).mean().iloc[-1]
+            smas = get_indicator_engine().from_frame(symbol, df, ("sma:50", "sma:200")).last()
+            sma_50, sma_200 = smas["sma_50"], smas["sma_200"]
 
             if current_price > sma_200:
                 trend = "Bull"
@@ -1,4 +1,3 @@
-import os
 import uuid
 from datetime import datetime
 from typing import Dict, Any
@@ -6,12 +5,13 @@ from typing import Dict, Any
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
 from backend.storage.models import ActivityData
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 class AdjustGlobalRiskParametersInput(BaseModel):
     new_parameters: Dict[str, Any] = Field(..., description="The new risk parameters.")
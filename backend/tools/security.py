@@ -2,6 +2,7 @@ from typing import Dict, Any
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 from web3 import Web3
+from backend.tools.blacklist import is_blacklisted
 from backend.tools.dex import Web3Provider
 import logging
 
@@ -24,6 +25,14 @@ class SecurityToolkit(Toolkit):
         Performs basic on-chain security checks (Renounced Ownership).
         Use this before trading unknown tokens.
         """
+        if is_blacklisted(input.token_address, "token"):
+            return {
+                "address": input.token_address,
+                "status": "Blacklisted",
+                "is_blacklisted": True,
+                "security_score": 0,
+            }
+
         try:
             w3 = Web3Provider.get_async_w3(input.chain)
 
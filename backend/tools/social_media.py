@@ -23,10 +23,11 @@ import os
 from datetime import datetime
 from typing import List, Dict, Any
 
-import requests
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
+from backend.http_client import get_client
+
 
 class FetchSocialMediaInput(BaseModel):
     query: str = Field(..., description="The query to search for on social media.")
@@ -49,7 +50,7 @@ def _fetch_twitter(query: str, limit: int) -> List[Dict[str, Any]]:
         "tweet.fields": "created_at,author_id,lang",
     }
     headers = {"Authorization": f"Bearer {bearer}"}
-    response = requests.get(url, params=params, headers=headers, timeout=10)
+    response = get_client(url).get(url, params=params, headers=headers, timeout=10)
     response.raise_for_status()
     payload = response.json()
     posts = []
@@ -77,7 +78,8 @@ def _fetch_reddit(query: str, limit: int) -> List[Dict[str, Any]]:
         "restrict_sr": False,
         "include_over_18": False,
     }
-    response = requests.get("https://www.reddit.com/search.json", params=params, headers=headers, timeout=10)
+    url = "https://www.reddit.com/search.json"
+    response = get_client(url).get(url, params=params, headers=headers, timeout=10)
     response.raise_for_status()
     payload = response.json()
     posts = []
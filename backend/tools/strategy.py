@@ -8,7 +8,8 @@ import pandas as pd
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
-from backend.storage.sqlite import SqliteStorage
+from backend.market.indicators import sma
+from backend.storage.registry import get_storage
 
 
 def _ensure_dataframe(data: List[Dict[str, Any]]) -> pd.DataFrame:
@@ -95,11 +96,14 @@ def strategy_optimization(input: StrategyOptimizationInput) -> StrategyOptimizat
     df = _ensure_dataframe(input.data)
     df["returns"] = df["close"].pct_change().fillna(0)
     best_config = {"strategy": input.strategy, "total_return": -np.inf}
+    # Each window's average once, shared by every pair that uses it.
+    close = df["close"].to_numpy(dtype=np.float64)
+    averages = {window: sma(close, window) for window in range(5, 61, 5)}
 
     for short_window in range(5, 31, 5):
         for long_window in range(short_window + 5, 61, 5):
-            df["short_ma"] = df["close"].rolling(short_window).mean()
-            df["long_ma"] = df["close"].rolling(long_window).mean()
+            df["short_ma"] = averages[short_window]
+            df["long_ma"] = averages[long_window]
             df["signal"] = np.where(df["short_ma"] > df["long_ma"], 1, 0)
             df["position"] = df["signal"].shift(1).fillna(0)
             df["strategy_returns"] = df["position"] * df["returns"]
@@ -125,7 +129,7 @@ class PaperTradingOutput(BaseModel):
 
 
 def paper_trading(input: PaperTradingInput) -> PaperTradingOutput:
-    storage = SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+    storage = get_storage()
     state_key = f"paper::{input.strategy.lower()}"
     state = storage.get_state_value("strategy", state_key) or {
         "equity": float(os.getenv("PAPER_TRADING_START_EQUITY", "100000")),
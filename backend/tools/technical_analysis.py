@@ -1,14 +1,19 @@
-from typing import Dict, Any, List
-import pandas as pd
-import numpy as np
-import httpx
+from typing import Dict, Any, List, Optional
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
+from backend.market.indicators import DEFAULT_INDICATORS, get_indicator_engine
 from backend.tools.utils import fetch_coingecko_prices
 
+# Keys this tool has always returned for the default indicator set.
+LEGACY_KEYS = {"sma_7": "ma_7", "sma_25": "ma_25", "sma_100": "ma_100"}
+
 class GetTechIndicatorsInput(BaseModel):
-    symbol: str = Field(..., description="The CoinGecko ID of the token (e.g., 'bitcoin').")
+    symbol: str = Field(..., description="The CoinGecko ID, ticker or name of the token (e.g., 'bitcoin' or 'BTC').")
     days: int = Field(100, description="Number of days of history to analyze.")
+    indicators: Optional[List[str]] = Field(
+        None,
+        description="Indicators to return instead of the default set, e.g. 'sma:50', 'ema:21', 'rsi:14', 'macd:12,26,9', 'bb:20,2'.",
+    )
 
 class TechnicalAnalysisToolkit(Toolkit):
     def __init__(self, **kwargs):
@@ -18,50 +23,25 @@ class TechnicalAnalysisToolkit(Toolkit):
     async def get_technical_indicators(self, input: GetTechIndicatorsInput) -> Dict[str, Any]:
         """
         Calculates technical indicators (RSI, MACD, Bollinger Bands, MA) for a token.
+        Returns the latest value of each; None where the history is shorter than the window.
         """
         symbol = input.symbol
         days = input.days
 
         try:
-            async with httpx.AsyncClient() as client:
-                try:
-                    df = await fetch_coingecko_prices(client, symbol, days)
-                except Exception as e:
-                    return {"error": f"Failed to fetch data: {e}"}
-
-            prices = df["price"]
-
-            # 2. Calculate Indicators
-            results = {}
-
-            # Moving Averages
-            results["ma_7"] = float(prices.rolling(window=7).mean().iloc[-1])
-            results["ma_25"] = float(prices.rolling(window=25).mean().iloc[-1])
-            results["ma_100"] = float(prices.rolling(window=100).mean().iloc[-1])
-
-            # RSI (14)
-            delta = prices.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            results["rsi_14"] = float(100 - (100 / (1 + rs)).iloc[-1])
-
-            # MACD (12, 26, 9)
-            exp1 = prices.ewm(span=12, adjust=False).mean()
-            exp2 = prices.ewm(span=26, adjust=False).mean()
-            macd = exp1 - exp2
-            signal = macd.ewm(span=9, adjust=False).mean()
-            results["macd"] = float(macd.iloc[-1])
-            results["macd_signal"] = float(signal.iloc[-1])
-            results["macd_hist"] = float((macd - signal).iloc[-1])
-
-            # Bollinger Bands (20, 2)
-            bb_ma = prices.rolling(window=20).mean()
-            bb_std = prices.rolling(window=20).std()
-            results["bb_upper"] = float((bb_ma + (bb_std * 2)).iloc[-1])
-            results["bb_lower"] = float((bb_ma - (bb_std * 2)).iloc[-1])
-            results["current_price"] = float(prices.iloc[-1])
-
+            try:
+                df = await fetch_coingecko_prices(symbol, days)
+            except Exception as e:
+                return {"error": f"Failed to fetch data: {e}"}
+
+            # Full-series columns, memoized per series (see backend.market.indicators).
+            indicators = get_indicator_engine().from_frame(symbol, df, input.indicators or DEFAULT_INDICATORS)
+            if input.indicators:
+                results = indicators.last()
+            else:
+                last = indicators.last()
+                results = {LEGACY_KEYS.get(name, name): value for name, value in last.items() if name != "bb_middle"}
+            results["current_price"] = float(indicators.prices[-1])
             return results
 
         except Exception as e:
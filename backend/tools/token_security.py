@@ -1,11 +1,14 @@
 import os
 from typing import Optional, List
 
-import requests
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 from web3 import Web3
 
+from backend.http_client import get_client
+from backend.rpc import http_provider
+from backend.tools.blacklist import is_blacklisted
+
 # Simplified ERC-20 ABI for totalSupply
 ERC20_ABI = '[{"constant":true,"inputs":[],"name":"totalSupply","outputs":[{"name":"","type":"uint256"}],"payable":false,"stateMutability":"view","type":"function"}]'
 
@@ -24,6 +27,9 @@ def check_token_security(input: CheckTokenSecurityInput) -> CheckTokenSecurityOu
     """
     Checks the security of a token contract by verifying its total supply and using Rugcheck.xyz.
     """
+    if is_blacklisted(input.token_address, "token"):
+        return CheckTokenSecurityOutput(is_safe=False, reasons=["Token is on the blacklist"])
+
     reasons = []
     is_safe = True
     total_supply = None
@@ -35,7 +41,7 @@ def check_token_security(input: CheckTokenSecurityInput) -> CheckTokenSecurityOu
         rpc_url = os.getenv(f"{input.chain.upper()}_RPC_URL")
         if not rpc_url:
             raise ValueError(f"RPC_URL for chain {input.chain} not found in environment variables.")
-        w3 = Web3(Web3.HTTPProvider(rpc_url))
+        w3 = Web3(http_provider(rpc_url))
         contract = w3.eth.contract(address=w3.to_checksum_address(input.token_address), abi=ERC20_ABI)
         total_supply = contract.functions.totalSupply().call()
     except Exception as e:
@@ -46,8 +52,9 @@ def check_token_security(input: CheckTokenSecurityInput) -> CheckTokenSecurityOu
     rugcheck_api_key = os.getenv("RUGCHECK_API_KEY")
     if rugcheck_api_key:
         try:
-            response = requests.get(
-                f"https://api.rugcheck.xyz/v1/check/{input.chain}/{input.token_address}",
+            url = f"https://api.rugcheck.xyz/v1/check/{input.chain}/{input.token_address}"
+            response = get_client(url).get(
+                url,
                 headers={"Authorization": f"Bearer {rugcheck_api_key}"}
             )
             response.raise_for_status()
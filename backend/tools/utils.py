@@ -1,21 +1,56 @@
 import httpx
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Any, Dict, Optional
 
-async def fetch_coingecko_prices(client: httpx.AsyncClient, symbol: str, days: int) -> pd.DataFrame:
-    """
-    Fetches historical price data from CoinGecko and returns a DataFrame with 'price' column indexed by 'timestamp'.
-    """
-    url = f"https://api.coingecko.com/api/v3/coins/{symbol}/market_chart?vs_currency=usd&days={days}"
-    resp = await client.get(url, timeout=10.0)
+from backend.http_client import get_async_client
+from backend.market.cache import get_price_cache
+from backend.market.store import get_price_store, payload_to_rows, rows_to_frame
+from backend.market.symbols import resolve_coin_id
+from backend.rate_limit import rate_limited_get
+
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+
+
+async def _get_market_chart(client: Optional[httpx.AsyncClient], url: str) -> Dict[str, Any]:
+    client = client or get_async_client(url)
+    resp = await rate_limited_get(client, url, timeout=10.0)
     if resp.status_code == 429:
         raise RuntimeError("Rate Limit Exceeded")
     resp.raise_for_status()
-    data = resp.json()
-    if "prices" not in data or not data["prices"]:
-        raise ValueError("No price data found")
-
-    df = pd.DataFrame(data["prices"], columns=["timestamp", "price"])
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms")
-    df.set_index("timestamp", inplace=True)
-    return df
+    return resp.json()
+
+
+async def _download_coingecko_prices(client: Optional[httpx.AsyncClient], symbol: str, days: int, vs_currency: str) -> pd.DataFrame:
+    chart_url = f"{COINGECKO_API_URL}/coins/{symbol}/market_chart"
+    store = get_price_store()
+    if store is not None:
+        # Local series; only the missing tail is downloaded.
+        async def fetch_range(from_s: int, to_s: int) -> Dict[str, Any]:
+            return await _get_market_chart(client, f"{chart_url}/range?vs_currency={vs_currency}&from={from_s}&to={to_s}")
+
+        return await store.load(symbol, days, vs_currency, fetch_range)
+
+    rows = payload_to_rows(await _get_market_chart(client, f"{chart_url}?vs_currency={vs_currency}&days={days}"))
+    return rows_to_frame(rows[:, 0].astype(np.int64), rows[:, 1:])
+
+
+async def fetch_coingecko_prices(
+    symbol: str, days: int, vs_currency: str = "usd", client: Optional[httpx.AsyncClient] = None
+) -> pd.DataFrame:
+    """
+    Fetches historical price data from CoinGecko and returns a DataFrame with 'price', 'market_cap' and 'volume'
+    columns indexed by 'timestamp'.
+    Served from the process-wide series cache (see backend.market.cache); identical concurrent calls share one request.
+    With MARKET_STORE_DIR set, misses read the local price store (backend.market.store) and fetch only new points.
+    Uses the shared CoinGecko client unless ``client`` is given.
+    ``symbol`` may be a CoinGecko id, ticker or name (resolved by backend.market.symbols).
+    """
+    symbol = resolve_coin_id(symbol)
+    cache = get_price_cache()
+    if cache is None:
+        return await _download_coingecko_prices(client, symbol, days, vs_currency)
+    key = (symbol, int(days), vs_currency.lower())
+    return await cache.get_or_fetch(
+        key, lambda: _download_coingecko_prices(client, symbol, days, vs_currency), cache.ttl_for(days)
+    )
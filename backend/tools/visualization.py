@@ -1,18 +1,21 @@
-import os
+from decimal import Decimal
 from typing import Dict, Any, List
 
 from agno.tools.toolkit import Toolkit
 from pydantic import BaseModel, Field
 
-from backend.storage.sqlite import SqliteStorage
+from backend.storage.aggregates import SCOPE_DAY
+from backend.storage.base import Storage
+from backend.storage.registry import get_storage
 
 
-def _get_storage() -> SqliteStorage:
-    return SqliteStorage(os.getenv("STORAGE_URL", "sqlite.db"))
+def _get_storage() -> Storage:
+    return get_storage()
 
 
 class EquityCurveInput(BaseModel):
-    limit: int = Field(200, description="Number of recent trades to include.")
+    granularity: str = Field("trade", description="'trade' for per-trade points, 'day' for one point per UTC day over all history.")
+    limit: int = Field(200, description="Number of recent trades (or days) to include.")
 
 
 class EquityCurveOutput(BaseModel):
@@ -21,14 +24,23 @@ class EquityCurveOutput(BaseModel):
 
 def get_equity_curve(input: EquityCurveInput) -> EquityCurveOutput:
     storage = _get_storage()
+    if input.granularity == "day":
+        # Daily aggregates are maintained on insert, so this reads one row per day.
+        equity = Decimal("0")
+        points = []
+        for day in storage.get_trade_aggregates(SCOPE_DAY):
+            equity += day.realized_profit
+            points.append({"timestamp": day.bucket, "equity": float(equity), "trade_count": day.trade_count})
+        return EquityCurveOutput(points=points[-input.limit:])
+
     trades = storage.get_recent_trades(limit=input.limit)
-    equity = 0.0
+    equity = Decimal("0")
     points: List[Dict[str, Any]] = []
     for trade in reversed(trades):
-        equity += getattr(trade, "profit", 0.0)
+        equity += trade.profit
         points.append({
             "timestamp": trade.timestamp.isoformat() if hasattr(trade, "timestamp") else None,
-            "equity": equity,
+            "equity": float(equity),
             "trade_id": trade.id,
         })
     points.sort(key=lambda p: p["timestamp"] or "")
@@ -4,6 +4,8 @@ from web3 import Web3
 import os
 import logging
 
+from backend.rpc import http_provider
+
 logger = logging.getLogger(__name__)
 
 class GetAccountBalanceInput(BaseModel):
@@ -31,7 +33,7 @@ class WalletToolkit(Toolkit):
             # Note: For strict optimization, we should use a shared Web3 provider (Singleton),
             # but for this specific fix, we prioritize Error Handling correctness.
             # The DEX tool fix handles the AsyncWeb3 singleton which should eventually cover this too.
-            w3 = Web3(Web3.HTTPProvider(rpc_url))
+            w3 = Web3(http_provider(rpc_url))
 
             if not w3.is_connected():
                  raise ConnectionError(f"Failed to connect to {input.chain} RPC node.")
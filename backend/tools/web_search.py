@@ -0,0 +1,51 @@
+"""
+agno's DuckDuckGo toolkit, recordable by ``backend.cassettes``.
+
+The DDGS library uses its own HTTP client, so the shared ``httpx`` transport
+never sees its traffic; results are recorded and replayed per call instead.
+"""
+from agno.tools.duckduckgo import DuckDuckGoTools as _DuckDuckGoTools
+
+from backend.cassettes import cassette_call
+
+
+class DuckDuckGoTools(_DuckDuckGoTools):
+    def _call_params(self, query: str, max_results: int) -> dict:
+        return {
+            "query": query,
+            "max_results": self.fixed_max_results or max_results,
+            "modifier": self.modifier,
+            "backend": self.backend,
+        }
+
+    def duckduckgo_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search DDGS for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The result from DDGS.
+        """
+        return cassette_call(
+            "duckduckgo.search",
+            self._call_params(query, max_results),
+            lambda: super(DuckDuckGoTools, self).duckduckgo_search(query, max_results),
+        )
+
+    def duckduckgo_news(self, query: str, max_results: int = 5) -> str:
+        """Use this function to get the latest news from DDGS.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The latest news from DDGS.
+        """
+        return cassette_call(
+            "duckduckgo.news",
+            self._call_params(query, max_results),
+            lambda: super(DuckDuckGoTools, self).duckduckgo_news(query, max_results),
+        )
@@ -0,0 +1,96 @@
+# scripts/benchmarks/storage_reads.py
+
+"""
+Compares the ways of reading trades back out of SqliteStorage.
+
+Seeds a throwaway database with N trades (default 100k), then times:
+1. ``rowmapping``: the previous read path, SQLAlchemy ``Row._mapping`` + ``TradeData(**row)``.
+2. ``models``: ``get_recent_trades(N)``, validated models from plain DBAPI rows.
+3. ``iter``: ``iter_trades()``, keyset pages of 500 rows.
+4. ``columns``: ``get_trade_columns()``, NumPy arrays with no models at all.
+5. ``columns_profit``: ``get_trade_columns(("profit",))``, what the risk tool reads.
+
+Usage (from the repository root):
+    python scripts/benchmarks/storage_reads.py --rows 100000 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from sqlalchemy import text  # noqa: E402
+
+from backend.storage import queries as q  # noqa: E402
+from backend.storage.models import TradeData  # noqa: E402
+from backend.storage.sqlite import SqliteStorage  # noqa: E402
+
+
+def seed(storage: SqliteStorage, rows: int) -> None:
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    storage.add_trades([
+        TradeData(
+            id=f"t{i:07d}",
+            token=f"TK{i % 50}",
+            action="buy" if i % 2 else "sell",
+            amount=Decimal("2.25"),
+            price=Decimal("1843.125"),
+            timestamp=base + timedelta(seconds=i),
+            profit=Decimal(i % 7 - 3) / 7,
+            status="completed",
+        )
+        for i in range(rows)
+    ])
+
+
+def rowmapping_read(storage: SqliteStorage, rows: int):
+    with storage.engine.connect() as conn:
+        result = conn.execute(text(q.RECENT_TRADES), {"limit": rows})
+        return [TradeData(**row._mapping) for row in result.fetchall()]
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+        del result
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SqliteStorage(os.path.join(tmp, "bench.db"), write_behind=False)
+        try:
+            seed(storage, args.rows)
+            cases = {
+                "rowmapping": lambda: rowmapping_read(storage, args.rows),
+                "models": lambda: storage.get_recent_trades(args.rows),
+                "iter": lambda: list(storage.iter_trades()),
+                "columns": lambda: storage.get_trade_columns(),
+                "columns_profit": lambda: storage.get_trade_columns(("profit",)),
+            }
+            baseline = None
+            print(f"{'case':<16}{'median s':>10}{'rows/s':>12}{'speedup':>9}")
+            for name, fn in cases.items():
+                seconds = timed(fn, args.repeat)
+                baseline = baseline or seconds
+                print(f"{name:<16}{seconds:>10.3f}{args.rows / seconds:>12,.0f}{baseline / seconds:>8.1f}x")
+        finally:
+            storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+# scripts/benchmarks/storage_suite.py
+
+"""
+Micro-benchmarks and a threaded load test for the Storage API.
+
+For each database size (rows per time-ordered table) the suite seeds a fresh
+database through the bulk methods, timing the inserts, then measures every public
+``Storage`` method on its own copy of the seeded file (PostgreSQL runs all reads
+before the writes instead):
+
+* cold: the first call on a newly opened storage (new pool, empty caches),
+* warm: up to ``--ops`` further calls, as p50/p99/mean latency and ops/s,
+* concurrent: ``--threads`` writers calling ``add_trade`` while ``--readers``
+  threads call ``get_recent_trades``, on one shared storage.
+
+Results are written as JSON (``--output``). ``--compare`` loads an earlier run and
+exits with status 1 when any warm p50 is more than ``--threshold`` slower, so each
+storage change can be measured against the previous numbers.
+
+Usage (from the repository root):
+    python scripts/benchmarks/storage_suite.py --sizes 1000,100000 --output bench.json
+    python scripts/benchmarks/storage_suite.py --sizes 1000000 --ops 50 --compare bench.json
+    python scripts/benchmarks/storage_suite.py --backend postgres --url postgresql://localhost/bench
+"""
+
+import argparse
+import inspect
+import itertools
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from backend.storage.base import Storage  # noqa: E402
+from backend.storage.models import (  # noqa: E402
+    ActivityData,
+    AgentMessageRecord,
+    AlertRecord,
+    BlacklistRecord,
+    PortfolioPosition,
+    Team,
+    TradeData,
+    Workflow,
+)
+from backend.storage.utils import encode_cursor, to_epoch_us  # noqa: E402
+
+# Lifecycle methods with nothing to measure.
+UNTIMED_METHODS = {"close", "flush", "start_maintenance"}
+POSTGRES_TABLES = (
+    "teams", "workflows", "trades", "activities", "portfolio_positions", "alerts", "agent_messages",
+    "state_store", "state_versions", "blacklist", "trade_aggregates",
+)
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+BATCH = 100
+
+
+@dataclass
+class Context:
+    """Per-size seed facts and id counters shared by the cases."""
+
+    size: int
+    counter: "itertools.count" = field(default_factory=itertools.count)
+
+    @property
+    def end(self) -> datetime:
+        return BASE_TIME + timedelta(seconds=self.size)
+
+    @property
+    def middle(self) -> datetime:
+        return BASE_TIME + timedelta(seconds=self.size // 2)
+
+    def next_time(self) -> datetime:
+        # New writes land after the seeded history, like live traffic.
+        return self.end + timedelta(microseconds=next(self.counter))
+
+    def next_id(self) -> int:
+        return next(self.counter)
+
+
+@dataclass
+class Case:
+    name: str
+    kind: str
+    fn: Callable[[Storage, Context], Any]
+    max_ops: Optional[int] = None  # caps full scans and rebuilds
+
+
+# Writes pass a prefix so their ids never collide with the seeded ``0..size-1``.
+def trade(i: int, timestamp: datetime, prefix: str = "") -> TradeData:
+    return TradeData(
+        id=f"t{prefix}{i}",
+        token=f"TK{i % 50}",
+        action="buy" if i % 2 else "sell",
+        amount=Decimal("2.25"),
+        price=Decimal("1843.125"),
+        timestamp=timestamp,
+        profit=Decimal(i % 7 - 3) / 7,
+        status="completed",
+    )
+
+
+def activity(i: int, timestamp: datetime, prefix: str = "") -> ActivityData:
+    return ActivityData(id=f"a{prefix}{i}", timestamp=timestamp, type=f"type{i % 5}", message="benchmark", details={"i": str(i)})
+
+
+def alert(i: int, timestamp: datetime, prefix: str = "") -> AlertRecord:
+    return AlertRecord(id=f"al{prefix}{i}", timestamp=timestamp, recipient="ops", channel="internal", message="benchmark", status="sent", metadata={"i": str(i)})
+
+
+def message(i: int, timestamp: datetime, prefix: str = "") -> AgentMessageRecord:
+    return AgentMessageRecord(
+        id=f"m{prefix}{i}", timestamp=timestamp, sender="a", recipient="b", content={"i": str(i)}, status="sent", correlation_id=f"c{i % 100}",
+    )
+
+
+def position(i: int) -> PortfolioPosition:
+    return PortfolioPosition(
+        token_address=f"0x{i:040d}", symbol="TK", amount=Decimal("1.5"),
+        average_price=Decimal("10"), updated_at=datetime.now(timezone.utc),
+    )
+
+
+def blacklist_entry(i: int, prefix: str = "") -> BlacklistRecord:
+    return BlacklistRecord(entry_type="token", identifier=f"0xbad{prefix}{i}", reason="benchmark", added_at=datetime.now(timezone.utc))
+
+
+def cases() -> List[Case]:
+    def page_cursor(c: Context) -> str:
+        return encode_cursor(to_epoch_us(c.middle), "~")
+
+    def hour(c: Context):
+        return c.middle, c.middle + timedelta(hours=1)
+
+    return [
+        # Trades
+        Case("add_trade", "write", lambda s, c: s.add_trade(trade(c.next_id(), c.next_time(), "w"))),
+        Case("add_trades", "write", lambda s, c: s.add_trades([trade(c.next_id(), c.next_time(), "wb") for _ in range(BATCH)])),
+        Case("get_recent_trades", "read", lambda s, c: s.get_recent_trades(50)),
+        Case("get_trades_page", "read", lambda s, c: s.get_trades_page(100)),
+        Case("get_trades_page:deep", "read", lambda s, c: s.get_trades_page(100, cursor=page_cursor(c))),
+        Case("get_trades_between", "read", lambda s, c: s.get_trades_between(*hour(c))),
+        Case("iter_trades", "read", lambda s, c: sum(1 for _ in s.iter_trades()), max_ops=3),
+        Case("get_trade_columns", "read", lambda s, c: s.get_trade_columns(), max_ops=10),
+        Case("get_trade_columns:profit", "read", lambda s, c: s.get_trade_columns(("profit",)), max_ops=10),
+        Case("get_trade_summary", "read", lambda s, c: s.get_trade_summary()),
+        Case("get_trade_aggregates", "read", lambda s, c: s.get_trade_aggregates("day")),
+        Case("rebuild_trade_aggregates", "write", lambda s, c: s.rebuild_trade_aggregates(), max_ops=3),
+        # Activities
+        Case("add_activity", "write", lambda s, c: s.add_activity(activity(c.next_id(), c.next_time(), "w"))),
+        Case("add_activities", "write", lambda s, c: s.add_activities([activity(c.next_id(), c.next_time(), "wb") for _ in range(BATCH)])),
+        Case("get_recent_activities", "read", lambda s, c: s.get_recent_activities(50)),
+        Case("get_activities_page", "read", lambda s, c: s.get_activities_page(100, cursor=page_cursor(c))),
+        Case("get_activities_between", "read", lambda s, c: s.get_activities_between(*hour(c))),
+        Case("iter_activities", "read", lambda s, c: sum(1 for _ in s.iter_activities()), max_ops=3),
+        # Alerts and agent messages
+        Case("record_alert", "write", lambda s, c: s.record_alert(alert(c.next_id(), c.next_time(), "w"))),
+        Case("get_recent_alerts", "read", lambda s, c: s.get_recent_alerts(50)),
+        Case("get_alerts_page", "read", lambda s, c: s.get_alerts_page(100)),
+        Case("get_alerts_between", "read", lambda s, c: s.get_alerts_between(*hour(c))),
+        Case("iter_alerts", "read", lambda s, c: sum(1 for _ in s.iter_alerts()), max_ops=3),
+        Case("record_agent_message", "write", lambda s, c: s.record_agent_message(message(c.next_id(), c.next_time(), "w"))),
+        Case("get_recent_agent_messages", "read", lambda s, c: s.get_recent_agent_messages(50)),
+        Case("get_agent_messages_page", "read", lambda s, c: s.get_agent_messages_page(100)),
+        Case("get_agent_messages_between", "read", lambda s, c: s.get_agent_messages_between(*hour(c))),
+        Case("iter_agent_messages", "read", lambda s, c: sum(1 for _ in s.iter_agent_messages()), max_ops=3),
+        # Portfolio, state, blacklist
+        Case("upsert_portfolio_position", "write", lambda s, c: s.upsert_portfolio_position(position(next(c.counter) % 100))),
+        Case("upsert_portfolio_positions", "write", lambda s, c: s.upsert_portfolio_positions([position(i) for i in range(BATCH)])),
+        Case("get_portfolio_positions", "read", lambda s, c: s.get_portfolio_positions()),
+        Case("set_state_value", "write", lambda s, c: s.set_state_value("bench", f"k{next(c.counter) % 100}", {"v": 1})),
+        Case("get_state_value", "read", lambda s, c: s.get_state_value("bench", f"k{next(c.counter) % 100}")),
+        Case("upsert_blacklist_entry", "write", lambda s, c: s.upsert_blacklist_entry(blacklist_entry(c.next_id(), "w"))),
+        Case("delete_blacklist_entry", "write", lambda s, c: s.delete_blacklist_entry("token", f"0xbad{next(c.counter) % 1000}")),
+        Case("get_blacklist_entries", "read", lambda s, c: s.get_blacklist_entries("token")),
+        Case("get_blacklist_keys", "read", lambda s, c: s.get_blacklist_keys()),
+        Case("count_blacklist_entries", "read", lambda s, c: s.count_blacklist_entries()),
+        # Teams and workflows
+        Case("save_team", "write", lambda s, c: s.save_team(Team(name=f"team{next(c.counter) % 50}", members=["a", "b"], instructions=["x"]))),
+        Case("get_team", "read", lambda s, c: s.get_team(f"team{next(c.counter) % 50}")),
+        Case("delete_team", "write", lambda s, c: s.delete_team(f"team{next(c.counter) % 50}")),
+        Case("save_workflow", "write", lambda s, c: s.save_workflow(Workflow(name=f"wf{next(c.counter) % 50}", steps=["a", "b"]))),
+        Case("get_workflow", "read", lambda s, c: s.get_workflow(f"wf{next(c.counter) % 50}")),
+        Case("get_all_workflows", "read", lambda s, c: s.get_all_workflows()),
+        Case("delete_workflow", "write", lambda s, c: s.delete_workflow(f"wf{next(c.counter) % 50}")),
+        # Housekeeping
+        Case("run_maintenance", "write", lambda s, c: s.run_maintenance(), max_ops=3),
+        Case("iter_archived", "read", lambda s, c: list(s.iter_archived("activities", start=c.middle))),
+    ]
+
+
+def uncovered_methods(suite: List[Case]) -> List[str]:
+    public = {name for name, _ in inspect.getmembers(Storage, inspect.isfunction) if not name.startswith("_")}
+    covered = {case.name.split(":")[0] for case in suite}
+    return sorted(public - covered - UNTIMED_METHODS)
+
+
+def open_storage(args: argparse.Namespace, path: str) -> Storage:
+    if args.backend == "postgres":
+        from backend.storage.postgres import PostgresStorage
+
+        return PostgresStorage(args.url, write_behind=args.write_behind)
+    from backend.storage.sqlite import SqliteStorage
+
+    return SqliteStorage(path, write_behind=args.write_behind)
+
+
+def summarize(samples_s: List[float], rows_per_op: int = 1) -> Dict[str, Any]:
+    samples = np.asarray(samples_s) * 1000
+    total = float(np.sum(samples)) / 1000
+    p50, p99 = np.percentile(samples, [50, 99])
+    return {
+        "ops": len(samples),
+        "p50_ms": round(float(p50), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(np.mean(samples)), 4),
+        "ops_per_s": round(len(samples) / total, 1) if total else None,
+        "rows_per_s": round(len(samples) * rows_per_op / total, 1) if total else None,
+    }
+
+
+def seed(storage: Storage, size: int) -> List[Dict[str, Any]]:
+    """Fills every table with the bulk methods, timing one batch of 10k rows per call."""
+    results = []
+    plans = [
+        ("add_trades", size, lambda batch: storage.add_trades([trade(i, BASE_TIME + timedelta(seconds=i)) for i in batch])),
+        ("add_activities", size, lambda batch: storage.add_activities([activity(i, BASE_TIME + timedelta(seconds=i)) for i in batch])),
+        ("record_alert", size // 10, lambda batch: [storage.record_alert(alert(i, BASE_TIME + timedelta(seconds=i * 10))) for i in batch]),
+        ("record_agent_message", size // 10, lambda batch: [storage.record_agent_message(message(i, BASE_TIME + timedelta(seconds=i * 10))) for i in batch]),
+        ("upsert_portfolio_positions", 100, lambda batch: storage.upsert_portfolio_positions([position(i) for i in batch])),
+        ("upsert_blacklist_entry", 1000, lambda batch: [storage.upsert_blacklist_entry(blacklist_entry(i)) for i in batch]),
+    ]
+    for name, rows, insert in plans:
+        samples, batches = [], range(0, rows, 10_000)
+        for first in batches:
+            batch = range(first, min(first + 10_000, rows))
+            start = time.perf_counter()
+            insert(batch)
+            samples.append(time.perf_counter() - start)
+        storage.flush()
+        result = {"case": f"seed:{name}", "phase": "seed", "rows": rows, "seconds": round(sum(samples), 4)}
+        result["rows_per_s"] = round(rows / sum(samples), 1) if sum(samples) else None
+        results.append(result)
+    for i in range(100):
+        storage.set_state_value("bench", f"k{i}", {"v": i})
+    return results
+
+
+def run_case(args: argparse.Namespace, path: str, case: Case, context: Context) -> Dict[str, Any]:
+    storage = open_storage(args, path)
+    try:
+        start = time.perf_counter()
+        case.fn(storage, context)
+        cold = time.perf_counter() - start
+        samples = []
+        for _ in range(min(args.ops, case.max_ops or args.ops)):
+            start = time.perf_counter()
+            case.fn(storage, context)
+            samples.append(time.perf_counter() - start)
+        storage.flush()
+    finally:
+        storage.close()
+    rows = BATCH if case.name in ("add_trades", "add_activities", "upsert_portfolio_positions") else 1
+    result = {"case": case.name, "kind": case.kind, "phase": "warm", "cold_ms": round(cold * 1000, 4)}
+    result.update(summarize(samples or [cold], rows))
+    return result
+
+
+def run_concurrent(args: argparse.Namespace, path: str, context: Context) -> List[Dict[str, Any]]:
+    storage = open_storage(args, path)
+    writes: List[float] = []
+    reads: List[float] = []
+    errors: List[BaseException] = []
+    done = threading.Event()
+    lock = threading.Lock()
+
+    def writer():
+        local = []
+        try:
+            for _ in range(args.concurrent_ops):
+                start = time.perf_counter()
+                storage.add_trade(trade(context.next_id(), context.next_time(), "cw"))
+                local.append(time.perf_counter() - start)
+        except BaseException as exc:  # reported in the results, not swallowed
+            errors.append(exc)
+        with lock:
+            writes.extend(local)
+
+    def reader():
+        local = []
+        while not done.is_set():
+            start = time.perf_counter()
+            storage.get_recent_trades(50)
+            local.append(time.perf_counter() - start)
+        with lock:
+            reads.extend(local)
+
+    writers = [threading.Thread(target=writer) for _ in range(args.threads)]
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    started = time.perf_counter()
+    try:
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+    finally:
+        storage.close()
+    wall = time.perf_counter() - started
+    results = []
+    for name, samples in (("concurrent:add_trade", writes), ("concurrent:get_recent_trades", reads)):
+        if not samples:
+            continue
+        result = {"case": name, "kind": "write" if "add" in name else "read", "phase": "concurrent",
+                  "threads": args.threads, "readers": args.readers}
+        result.update(summarize(samples))
+        result["ops_per_s"] = round(len(samples) / wall, 1)
+        del result["rows_per_s"]
+        results.append(result)
+    if errors:
+        results.append({"case": "concurrent:errors", "phase": "concurrent", "errors": [repr(e) for e in errors[:5]]})
+    return results
+
+
+def reset_postgres(args: argparse.Namespace) -> None:
+    from sqlalchemy import text
+
+    storage = open_storage(args, "")
+    try:
+        with storage.engine.begin() as conn:
+            conn.execute(text(f"TRUNCATE {', '.join(POSTGRES_TABLES)}"))
+    finally:
+        storage.close()
+
+
+@contextmanager
+def seeded_copy(args: argparse.Namespace, path: str) -> Iterator[str]:
+    """A scratch copy of the seeded SQLite file, so no case sees another's writes."""
+    if args.backend == "postgres":
+        yield path
+        return
+    copy = path[: -len(".db")] + "-case.db"
+    shutil.copyfile(path, copy)
+    try:
+        yield copy
+    finally:
+        for leftover in (copy, copy + "-wal", copy + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        for directory in (copy + ".archive", copy + ".partitions"):
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def run_size(args: argparse.Namespace, size: int, workdir: str, suite: List[Case]) -> List[Dict[str, Any]]:
+    path = os.path.join(workdir, f"bench-{size}.db")
+    if args.backend == "postgres":
+        reset_postgres(args)
+    context = Context(size)
+    storage = open_storage(args, path)
+    try:
+        results = seed(storage, size)
+    finally:
+        storage.close()
+    if args.backend == "postgres":
+        # One shared database: run every read before any write changes the seeded data.
+        suite = sorted(suite, key=lambda case: case.kind == "write")
+    for case in suite:
+        with seeded_copy(args, path) as case_path:
+            results.append(run_case(args, case_path, case, context))
+        print(f"  {size:>9} {case.name:<32} p50 {results[-1]['p50_ms']:>9.3f} ms", file=sys.stderr)
+    if args.threads:
+        with seeded_copy(args, path) as case_path:
+            results.extend(run_concurrent(args, case_path, context))
+    for result in results:
+        result["size"] = size
+        result["backend"] = args.backend
+    return results
+
+
+def metadata(args: argparse.Namespace, uncovered: List[str]) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("url", "output", "compare")},
+        "uncovered_methods": uncovered,
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, threshold: float) -> List[str]:
+    """Lists warm/concurrent cases whose p50 regressed by more than ``threshold`` (0.2 = 20%)."""
+    with open(baseline_path, "r", encoding="utf-8") as handle:
+        baseline = json.load(handle)
+
+    def key(result):
+        return (result.get("backend"), result.get("size"), result["case"], result.get("phase"))
+
+    previous = {key(result): result for result in baseline["results"] if "p50_ms" in result}
+    regressions = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None or "p50_ms" not in result or not before["p50_ms"]:
+            continue
+        change = result["p50_ms"] / before["p50_ms"] - 1
+        if change > threshold:
+            regressions.append(
+                f"{result['case']} @ {result['size']}: p50 {before['p50_ms']:.3f} -> {result['p50_ms']:.3f} ms (+{change:.0%})"
+            )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), default="sqlite")
+    parser.add_argument("--url", help="Database URL for --backend postgres (its tables are truncated).")
+    parser.add_argument("--sizes", default="1000,100000", help="Comma-separated rows per table, e.g. 1000,100000,1000000.")
+    parser.add_argument("--ops", type=int, default=200, help="Warm calls per method.")
+    parser.add_argument("--cases", default="", help="Comma-separated case names to run (default: all).")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent writer threads; 0 skips the load test.")
+    parser.add_argument("--readers", type=int, default=2, help="Reader threads during the load test.")
+    parser.add_argument("--concurrent-ops", type=int, default=250, help="add_trade calls per writer thread.")
+    parser.add_argument("--write-behind", action="store_true", help="Open storages with the write-behind queue.")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout).")
+    parser.add_argument("--compare", help="Earlier JSON report to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p50 slowdown for --compare.")
+    args = parser.parse_args(argv)
+    if args.backend == "postgres" and not args.url:
+        parser.error("--backend postgres needs --url")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    suite = cases()
+    if args.cases:
+        wanted = set(args.cases.split(","))
+        suite = [case for case in suite if case.name in wanted]
+    uncovered = uncovered_methods(cases())
+    if uncovered:
+        print(f"warning: no benchmark for {', '.join(uncovered)}", file=sys.stderr)
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in (int(value) for value in args.sizes.split(",")):
+            results.extend(run_size(args, size, workdir, suite))
+    report = {"meta": metadata(args, uncovered), "results": results}
+
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(payload + "\n")
+    else:
+        print(payload)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
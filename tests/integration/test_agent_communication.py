@@ -18,7 +18,7 @@ from backend.tools.portfolio import get_portfolio
 class TestAgentCommunication(unittest.TestCase):
 
     @patch('backend.tools.market_data.CoinGeckoAPI')
-    @patch('backend.tools.token_security.requests.get')
+    @patch('backend.tools.token_security.get_client')
     @patch('backend.tools.dex.Web3')
     @patch('backend.tools.wallet.Web3')
     @patch('agno.models.google.Gemini')
@@ -41,7 +41,7 @@ class TestAgentCommunication(unittest.TestCase):
         # Mock Rugcheck
         mock_rugcheck_response = MagicMock()
         mock_rugcheck_response.json.return_value = {'score': 95}
-        mock_requests_get.return_value = mock_rugcheck_response
+        mock_requests_get.return_value.get.return_value = mock_rugcheck_response
 
         # Mock Web3
         mock_web3_instance = MockDexWeb3.return_value
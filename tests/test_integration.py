@@ -1,3 +1,7 @@
+import asyncio
+import os
+import shutil
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock, ANY
 from fastapi.testclient import TestClient
@@ -7,6 +11,7 @@ from uuid import uuid4
 
 from backend.main import app, get_api_key
 from backend.protocol import TradeRecommendation, TradeOrder, TradeResult, MessageHeader
+from backend.storage.registry import close_async_storages
 
 class TestAgentIntegration(unittest.TestCase):
 
@@ -129,5 +134,32 @@ class TestAgentIntegration(unittest.TestCase):
         self.assertIn("TradeResult", str(fourth_call_args))
         self.assertIn("order-123", str(fourth_call_args))
 
+class TestPaginatedRoutes(unittest.TestCase):
+
+    def setUp(self):
+        # The routes resolve their storage from the environment, so point it at a scratch database.
+        self.tmpdir = tempfile.mkdtemp()
+        env = {"STORAGE_TYPE": "sqlite", "STORAGE_URL": os.path.join(self.tmpdir, "pages.db")}
+        self.env = patch.dict(os.environ, env)
+        self.env.start()
+        self.client = TestClient(app)
+        app.dependency_overrides[get_api_key] = lambda: "test_api_key"
+
+    def tearDown(self):
+        app.dependency_overrides = {}
+        asyncio.run(close_async_storages())
+        self.env.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_shared_page_parameters(self):
+        for route in ("/trades", "/agent/activities", "/alerts", "/agent/messages"):
+            page = self.client.get(route, params={"limit": 1, "order": "asc"})
+            self.assertEqual(page.status_code, 200, route)
+            self.assertEqual(set(page.json()), {"items", "next_cursor"})
+            self.assertLessEqual(len(page.json()["items"]), 1)
+            self.assertEqual(self.client.get(route, params={"cursor": "garbage"}).status_code, 400, route)
+            self.assertEqual(self.client.get(route, params={"limit": 0}).status_code, 422, route)
+            self.assertEqual(self.client.get(route, params={"order": "sideways"}).status_code, 422, route)
+
 if __name__ == '__main__':
     unittest.main()